@@ -64,10 +64,15 @@ class SystemController(QObject):
             'flow_sensor_type': 'uart',  # 'i2c' or 'uart' (Teensy)
             'uart_port': self._detect_initial_teensy_port(),  # Auto-detected Teensy USB port
             'flow_sampling_hz': 50.0,
+            'uart_binary_frames': True,  # negotiate binary frames with the Teensy
+            'flow_record_path': '',  # append raw flow stream + valve events (replay)
+            'flow_sensor_cages': {},  # port or Teensy serial -> cages; {} = one sensor
             'predictive_close_ms': 10.0,
             'residual_check_ms': 200.0,
             'residual_flow_threshold_ml_min': 1.0,
             'max_consecutive_sensor_errors': 10,
+            'relay_io_priority': 0,  # SCHED_FIFO priority for valve timing; 0 = off
+            'relay_io_cpus': [],  # CPUs to pin the relay I/O thread to; [] = any
             'cage_relays': {},
             'debug_mode': False,
             'log_level': 2,
@@ -92,10 +97,15 @@ class SystemController(QObject):
             'flow_sensor_type',
             'uart_port',
             'flow_sampling_hz',
+            'uart_binary_frames',
+            'flow_record_path',
+            'flow_sensor_cages',
             'predictive_close_ms',
             'residual_check_ms',
             'residual_flow_threshold_ml_min',
             'max_consecutive_sensor_errors',
+            'relay_io_priority',
+            'relay_io_cpus',
             'cage_relays',
             # Pulse-mode persistence (Parker Series 3)
             'use_pulse_delivery',
@@ -103,6 +113,10 @@ class SystemController(QObject):
             'pulse_settling_ms',
             'max_pulses_per_delivery',
             'max_pulse_delivery_time_s',
+            # Parallel multi-cage pulse delivery / manifold sessions
+            'parallel_delivery',
+            'independent_cage_lines',
+            'max_manifold_open_s',
             'debug_mode',
             'log_level',
             # Scheduler tuning
@@ -129,16 +143,21 @@ class SystemController(QObject):
             'global_master_relay_id': int,
             'i2c_bus': int,
             'flow_sampling_hz': float,
+            'uart_binary_frames': bool,
             'predictive_close_ms': float,
             'residual_check_ms': float,
             'residual_flow_threshold_ml_min': float,
             'max_consecutive_sensor_errors': int,
+            'relay_io_priority': int,
             # Pulse-mode types
             'use_pulse_delivery': bool,
             'pulse_width_ms': int,
             'pulse_settling_ms': int,
             'max_pulses_per_delivery': int,
             'max_pulse_delivery_time_s': float,
+            'parallel_delivery': bool,
+            'independent_cage_lines': bool,
+            'max_manifold_open_s': float,
         }
         return type_map.get(key, str)
 
@@ -388,9 +407,11 @@ class SystemController(QObject):
                     settings_changed = True
                     self.system_status.emit(f"Set pulse mode parameter: {key}={required_value}")
 
-            # If pulse mode is enabled, align sampling rate with pulse integration best practice
+            # If pulse mode is enabled, align sampling rate with pulse integration best practice.
+            # Only JSON-line streams need the cap; binary frames keep up at the
+            # rates short pulses want.
             try:
-                if s.get('use_pulse_delivery'):
+                if s.get('use_pulse_delivery') and not s.get('uart_binary_frames', True):
                     current_rate = float(s.get('flow_sampling_hz', 50.0))
                     if current_rate > 20.0:
                         s['flow_sampling_hz'] = 20.0
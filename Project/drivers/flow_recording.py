@@ -0,0 +1,118 @@
+"""Append-only recordings of the raw Teensy stream.
+
+When a delivery misbehaves in the field the log lines rarely say why. With
+``record_path`` set, ``UARTFlowSensor`` appends every chunk it reads from the
+serial port (exactly as received: JSON lines and binary frames), every
+command it sends, and valve open/close events to one compact file. A
+:class:`drivers.replay_flow_sensor.ReplayFlowSensor` feeds the file back
+through the same decoding and ``read_one``/``read`` code under a virtual
+clock.
+
+File layout: the 8-byte magic ``RRRFLOW\\x01``, then records of a 13-byte
+header ``<BdI`` (kind, host ``time.monotonic()``, payload length) followed
+by the payload. A session record (JSON: port, rate, calibration, wall time)
+starts every sensor run appended to the file. A record cut short by a crash
+ends the file cleanly on read.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional
+
+MAGIC = b'RRRFLOW\x01'
+RECORD = struct.Struct('<BdI')
+
+SESSION = 0  # JSON: sensor configuration at start
+RX = 1  # raw bytes read from the serial port
+TX = 2  # raw command bytes written to it
+EVENT = 3  # JSON: valve open/close and other annotations
+
+FLUSH_INTERVAL_S = 1.0
+
+
+class Record(NamedTuple):
+    kind: int
+    host_time: float
+    payload: bytes
+
+    def json(self) -> dict:
+        return json.loads(self.payload)
+
+
+class FlowRecorder:
+    """Thread-safe appender (the reader thread writes RX, others TX/events)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab', buffering=64 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, kind: int, payload: bytes, host_time: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if host_time is None:
+            host_time = now
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(RECORD.pack(kind, host_time, len(payload)))
+                self._file.write(payload)
+                # Events are rare and mark the interesting moments; make sure
+                # they (and the stream before them) survive a crash.
+                if kind in (SESSION, EVENT) or now - self._last_flush >= FLUSH_INTERVAL_S:
+                    self._file.flush()
+                    self._last_flush = now
+            except OSError as e:
+                self._logger.error(f"Flow recording stopped: {e}")
+                self._file.close()
+
+    def rx(self, data: bytes, host_time: Optional[float] = None) -> None:
+        self.write(RX, data, host_time)
+
+    def tx(self, data: bytes, host_time: Optional[float] = None) -> None:
+        self.write(TX, data, host_time)
+
+    def session(self, **info) -> None:
+        info.setdefault('wall_time', time.time())
+        self.write(SESSION, json.dumps(info).encode('utf-8'))
+
+    def event(self, name: str, host_time: Optional[float] = None, **fields) -> None:
+        fields['event'] = name
+        self.write(EVENT, json.dumps(fields).encode('utf-8'), host_time)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_recording(path: str) -> Iterator[Record]:
+    """Yield the records of a recording, oldest first."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a flow recording")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            kind, host_time, length = RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return  # torn final record
+            yield Record(kind, host_time, payload)
@@ -16,15 +16,27 @@ hardware and gets its own driver + branch.
 Configuration:
 - flow_sensor_type: 'uart' (Teensy bridge)
 - uart_port: Serial port for Teensy connection
+- uart_binary_frames: Negotiate binary measurement frames (JSON fallback)
+- flow_record_path: Append the raw stream and valve events here (replay)
+- flow_sensor_cages: One Teensy per manifold; maps a port or Teensy USB
+  serial number to its cages (see ``drivers/flow_sensor_pool.py``). Empty
+  means the single sensor on ``uart_port`` meters every cage.
 """
 
 import logging
+import os
+
+TEENSY_VID = 0x16C0
+TEENSY_PID = 0x0483
 
 
 def create_flow_sensor(settings: dict) -> 'UARTFlowSensor':
     """
     Create appropriate flow sensor driver based on settings.
 
+    Returns a :class:`~drivers.flow_sensor_pool.FlowSensorPool` instead when
+    ``flow_sensor_cages`` maps cages to more than one sensor.
+
     Args:
         settings: System settings dictionary
 
@@ -45,12 +57,20 @@ def create_flow_sensor(settings: dict) -> 'UARTFlowSensor':
         try:
             from .uart_flow_sensor import UARTFlowSensor
 
+            if settings.get('flow_sensor_cages'):
+                return create_flow_sensor_pool(settings)
+
             uart_port = settings.get('uart_port', '/dev/ttyACM0')
 
             logger.info(f"Creating UART flow sensor on {uart_port}")
 
             return UARTFlowSensor(
-                port=uart_port, sampling_hz=sampling_hz, zero_offset_ml_min=0.0, span_scale=1.0
+                port=uart_port,
+                sampling_hz=sampling_hz,
+                zero_offset_ml_min=0.0,
+                span_scale=1.0,
+                binary_frames=bool(settings.get('uart_binary_frames', True)),
+                record_path=settings.get('flow_record_path') or None,
             )
 
         except ImportError as e:
@@ -61,6 +81,85 @@ def create_flow_sensor(settings: dict) -> 'UARTFlowSensor':
         raise ValueError(f"Invalid flow sensor type: {sensor_type}. Must be 'uart'")
 
 
+def create_flow_sensor_pool(settings: dict, ports: dict = None) -> 'FlowSensorPool':
+    """
+    Create one UART flow sensor per ``flow_sensor_cages`` entry.
+
+    Args:
+        settings: System settings dictionary
+        ports: Teensy USB serial number -> device path (default: discovered)
+
+    Returns:
+        FlowSensorPool routing each listed cage to its sensor; unlisted cages
+        go to the first entry
+
+    Raises:
+        ValueError: If an entry names no cages, a serial number is not
+            connected, or a cage is listed twice
+    """
+    from .flow_sensor_pool import FlowSensorPool
+    from .uart_flow_sensor import UARTFlowSensor
+
+    logger = logging.getLogger(__name__)
+    mapping = settings.get('flow_sensor_cages') or {}
+    if ports is None:
+        ports = discover_teensy_ports()
+    record_path = settings.get('flow_record_path') or None
+
+    sensors = {}
+    cage_map = {}
+    for key, cages in mapping.items():
+        key = str(key)
+        if key in ports:
+            port = ports[key]
+        elif key.isdigit():  # Teensy serial numbers are decimal
+            raise ValueError(f"Teensy with serial number {key} is not connected")
+        else:
+            port = key
+        if not cages:
+            raise ValueError(f"Flow sensor {key} has no cages assigned")
+        for cage in cages:
+            if int(cage) in cage_map:
+                raise ValueError(f"Cage {cage} is assigned to more than one flow sensor")
+            cage_map[int(cage)] = port
+
+        logger.info(f"Creating UART flow sensor on {port} for cages {sorted(cages)}")
+        sensors[port] = UARTFlowSensor(
+            port=port,
+            sampling_hz=settings.get('flow_sampling_hz', 50.0),
+            zero_offset_ml_min=0.0,
+            span_scale=1.0,
+            binary_frames=bool(settings.get('uart_binary_frames', True)),
+            record_path=_per_sensor_path(record_path, port) if record_path else None,
+        )
+    return FlowSensorPool(sensors, cage_map)
+
+
+def _per_sensor_path(path: str, port: str) -> str:
+    """``flows.jsonl`` -> ``flows.ttyACM0.jsonl``: one recording per sensor."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.path.basename(port)}{ext}"
+
+
+def discover_teensy_ports() -> dict:
+    """
+    Find connected Teensy boards by USB VID/PID.
+
+    Returns:
+        Teensy USB serial number -> device path (empty if none or no pyserial)
+    """
+    try:
+        import serial.tools.list_ports
+
+        return {
+            port.serial_number: port.device
+            for port in serial.tools.list_ports.comports()
+            if port.vid == TEENSY_VID and port.pid == TEENSY_PID and port.serial_number
+        }
+    except Exception:
+        return {}
+
+
 def get_available_sensor_types() -> list:
     """
     Get list of available sensor types based on installed drivers.
@@ -105,7 +204,7 @@ def detect_teensy_port() -> str:
         ports = serial.tools.list_ports.comports()
         for port in ports:
             # Teensy 4.1 USB VID:PID is 16C0:0483
-            if port.vid == 0x16C0 and port.pid == 0x0483:
+            if port.vid == TEENSY_VID and port.pid == TEENSY_PID:
                 return port.device
     except Exception:
         pass
@@ -0,0 +1,134 @@
+"""Several flow sensors, one per metered manifold, routed by cage.
+
+A rig with more than one relay HAT can meter each manifold with its own
+Teensy + SLF3S. :class:`FlowSensorPool` holds one driver per Teensy (each
+with its own reader thread and ring buffer) and a cage -> sensor map from
+the ``flow_sensor_cages`` setting::
+
+    {"/dev/ttyACM0": [1, 2, 3], "12345670": [16, 17, 18]}
+
+Keys are serial ports or Teensy USB serial numbers; serial numbers are
+resolved with :func:`drivers.flow_sensor_factory.discover_teensy_ports`,
+so the mapping survives ttyACM numbers swapping on reboot. Cages not listed
+are metered by the first sensor.
+
+``SolenoidFlowStrategy`` routes each cage's delivery to its sensor and runs
+cages on different sensors concurrently in ``deliver_many``. The pool also
+answers the sensor lifecycle calls the relay worker makes on a single
+sensor (``start``, ``wait_for_frames``, ``stop``, ``close``, ...). A sensor
+that fails to start is left out (its cages run calibration-only); the pool
+only fails to start if none of them does.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+
+class FlowSensorPool:
+    """Flow sensors keyed by name, with a cage -> sensor routing table."""
+
+    def __init__(
+        self,
+        sensors: Dict[str, object],
+        cage_map: Dict[int, str],
+        default: Optional[str] = None,
+    ) -> None:
+        if not sensors:
+            raise ValueError("A flow sensor pool needs at least one sensor")
+        unknown = sorted(set(cage_map.values()) - set(sensors))
+        if unknown:
+            raise ValueError(f"Cages mapped to unknown flow sensors: {unknown}")
+        self._sensors = dict(sensors)
+        self._cage_map = {int(cage): name for cage, name in cage_map.items()}
+        self.default = default if default is not None else next(iter(self._sensors))
+        self.failed: Dict[str, str] = {}  # sensor name -> start error
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return len(self._sensors)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._sensors)
+
+    def sensor(self, name: str):
+        return self._sensors[name]
+
+    def name_for(self, cage_id: int) -> str:
+        return self._cage_map.get(int(cage_id), self.default)
+
+    def sensor_for(self, cage_id: int):
+        """The sensor metering ``cage_id``, or None if it failed to start."""
+        name = self.name_for(cage_id)
+        return None if name in self.failed else self._sensors[name]
+
+    def groups(self, cage_ids: Iterable[int]) -> Dict[str, List[int]]:
+        """``cage_ids`` split by sensor name, each in the given order."""
+        grouped: Dict[str, List[int]] = {}
+        for cage_id in cage_ids:
+            grouped.setdefault(self.name_for(cage_id), []).append(int(cage_id))
+        return grouped
+
+    # ----- lifecycle, as for a single sensor -----
+
+    def start(self) -> None:
+        """Start every sensor; raises only if none of them starts."""
+        self.failed.clear()
+        for name, sensor in self._sensors.items():
+            try:
+                sensor.start()
+            except Exception as e:
+                self.failed[name] = str(e)
+                self._logger.error(f"Flow sensor {name} failed to start: {e}")
+        if len(self.failed) == len(self._sensors):
+            from drivers.uart_flow_sensor import TeensyUnavailableError
+
+            raise TeensyUnavailableError(f"No flow sensor in the pool started: {self.failed}")
+
+    def wait_for_frames(self, min_frames: int = 3, timeout_s: float = 5.0) -> bool:
+        return all(
+            sensor.wait_for_frames(min_frames=min_frames, timeout_s=timeout_s)
+            for name, sensor in self._sensors.items()
+            if name not in self.failed
+        )
+
+    def stop(self) -> None:
+        for sensor in self._sensors.values():
+            try:
+                sensor.stop()
+            except Exception as e:
+                self._logger.error(f"Failed to stop flow sensor: {e}")
+
+    def close(self) -> None:
+        for sensor in self._sensors.values():
+            try:
+                sensor.close()
+            except Exception as e:
+                self._logger.error(f"Failed to close flow sensor: {e}")
+
+    @property
+    def port(self) -> str:
+        return ", ".join(getattr(sensor, 'port', name) for name, sensor in self._sensors.items())
+
+    @property
+    def record_path(self) -> Optional[str]:
+        paths = [getattr(sensor, 'record_path', None) for sensor in self._sensors.values()]
+        return next((path for path in paths if path), None)
+
+    def record_event(self, name: str, **fields) -> None:
+        """Annotate every sensor's recording (valve events span manifolds)."""
+        for sensor in self._sensors.values():
+            if getattr(sensor, 'record_path', None):
+                sensor.record_event(name, **fields)
+
+    def get_status(self) -> dict:
+        status = {}
+        for name, sensor in self._sensors.items():
+            entry = sensor.get_status() if hasattr(sensor, 'get_status') else {}
+            entry['cages'] = sorted(c for c, n in self._cage_map.items() if n == name)
+            if name in self.failed:
+                entry['start_error'] = self.failed[name]
+            status[name] = entry
+        return status
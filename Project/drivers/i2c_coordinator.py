@@ -7,9 +7,13 @@ Provides thread-safe access to I2C bus for relay HAT operations.
 With Teensy UART flow sensor, only relay coordination is needed.
 
 Architecture:
-- Relay operations get exclusive windows for switching
-- Thread-safe access for multiple relay operations
-- Configurable timing for relay switching requirements
+- One arbiter per I2C bus (``get_i2c_coordinator(bus)``)
+- Waiters queue in FIFO order and block on a ``threading.Condition``
+  (coroutines on a future); the releasing holder hands the bus to the
+  next waiter directly, so there is no polling
+- A stabilization gap is only inserted when the device type changes:
+  back-to-back relay writes pay no dead time
+- Wait and hold times are measured per device type (``stats()``)
 
 Based on I2C arbitration best practices for shared bus systems.
 """
@@ -18,34 +22,210 @@ import asyncio
 import logging
 import threading
 import time
+from collections import deque
 from contextlib import asynccontextmanager
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Optional
+
+from utils.stream_stats import PERCENTILES, Histogram
+
+DEFAULT_BUS = 1  # Raspberry Pi header I2C
+MAX_WAIT_S = 0.5  # 500ms max wait for bus access
+TIMING_BIN_MS = 0.1
+TIMING_BINS = 512  # 0..51.2 ms in range, plus an overflow bin
+
+
+class _Waiter:
+    __slots__ = ('owner', 'device', 'granted', 'gap', 'loop', 'future')
+
+    def __init__(self, owner, device, loop=None, future=None):
+        self.owner = owner
+        self.device = device
+        self.granted = False
+        self.gap = 0.0
+        self.loop = loop
+        self.future = future
+
+
+class _DeviceStats:
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.overruns = 0
+        self.wait_ms = Histogram(TIMING_BIN_MS, TIMING_BINS)
+        self.hold_ms = Histogram(TIMING_BIN_MS, TIMING_BINS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def summary(hist):
+            result = {f"p{q}": hist.percentile(q) for q in PERCENTILES}
+            result['max'] = round(hist.max, 3) if hist.total else None
+            return result
+
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'timeouts': self.timeouts,
+            'overruns': self.overruns,
+            'wait_ms': summary(self.wait_ms),
+            'hold_ms': summary(self.hold_ms),
+        }
 
 
 class I2CCoordinator:
     """
-    Coordinates thread-safe I2C access for relay HAT operations.
-
-    Uses exclusive access approach:
-    - Relay operations: 50ms exclusive windows
-    - Thread-safe switching for multiple relays
-    - Inter-operation gaps: 10ms stabilization
+    Coordinates thread-safe access to one I2C bus.
+
+    Exclusive access with FIFO hand-off:
+    - One holder at a time; a thread already holding the bus re-enters
+      (coroutines on one event loop share their thread's ownership)
+    - Other callers queue and are served in arrival order
+    - Device type changes wait out the previous device's stabilization gap
+    - Holding longer than a device's max_duration is logged, not preempted
     """
 
-    def __init__(self):
-        self._lock = threading.RLock()
-        self._active_device = None
-        self._operation_start = None
+    def __init__(self, bus: int = DEFAULT_BUS):
+        self.bus = bus
+        self._cond = threading.Condition(threading.Lock())
+        self._queue: deque = deque()
+        self._owner: Optional[int] = None
+        self._active_device: Optional[str] = None
+        self._depth = 0
+        self._held_since = 0.0
+        self._last_device: Optional[str] = None
+        self._released_at = 0.0
+        self._stats: Dict[str, _DeviceStats] = {}
         self.logger = logging.getLogger(self.__class__.__name__)
 
         # Device-specific timing (based on datasheets)
         self._device_timings = {
             'relay': {
                 'max_duration': 0.05,  # 50ms max for relay switching
-                'stabilization': 0.01,  # 10ms post-operation delay
+                'stabilization': 0.01,  # 10ms before another device type
             }
         }
 
+    # ------------------------------------------------------------------
+    # Arbitration (all *_locked methods run under self._cond)
+    # ------------------------------------------------------------------
+    def _device_stats(self, device_type: str) -> _DeviceStats:
+        stats = self._stats.get(device_type)
+        if stats is None:
+            stats = self._stats[device_type] = _DeviceStats()
+        return stats
+
+    def _grant_locked(self, waiter: _Waiter) -> None:
+        self._owner = waiter.owner
+        self._active_device = waiter.device
+        self._depth = 1
+        waiter.granted = True
+        if self._last_device is not None and self._last_device != waiter.device:
+            timing = self._device_timings.get(self._last_device, {})
+            gap_until = self._released_at + timing.get('stabilization', 0.0)
+            waiter.gap = max(0.0, gap_until - time.monotonic())
+
+    def _try_acquire_locked(self, waiter: _Waiter) -> bool:
+        if self._owner == waiter.owner:
+            self._depth += 1
+            return True
+        if self._owner is None and not self._queue:
+            self._grant_locked(waiter)
+            return True
+        self._queue.append(waiter)
+        self._device_stats(waiter.device).contended += 1
+        return False
+
+    def _release_locked(self) -> None:
+        self._depth -= 1
+        if self._depth:
+            return
+        now = time.monotonic()
+        hold = now - self._held_since
+        device = self._active_device
+        stats = self._device_stats(device)
+        stats.hold_ms.add(hold * 1000.0)
+        max_duration = self._device_timings.get(device, {}).get('max_duration')
+        if max_duration is not None and hold > max_duration:
+            stats.overruns += 1
+            self.logger.warning(f"I2C bus {self.bus} held by {device} for {hold:.3f}s")
+        self._last_device = device
+        self._released_at = now
+        self._owner = None
+        self._active_device = None
+        if self._queue:
+            waiter = self._queue.popleft()
+            self._grant_locked(waiter)
+            if waiter.future is not None:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            else:
+                self._cond.notify_all()
+
+    def _granted(self, waiter: _Waiter, wait_start: float, reentrant: bool) -> None:
+        """Book-keeping once ``waiter`` holds the bus (after any gap)."""
+        if reentrant:
+            return
+        now = time.monotonic()
+        with self._cond:
+            self._held_since = now
+            stats = self._device_stats(waiter.device)
+            stats.acquisitions += 1
+            stats.wait_ms.add((now - wait_start) * 1000.0)
+
+    def _timed_out(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up; False if the bus was handed over meanwhile."""
+        if waiter.granted:
+            return False
+        self._queue.remove(waiter)
+        self._device_stats(waiter.device).timeouts += 1
+        return True
+
+    def acquire(self, device_type: str, timeout: float = MAX_WAIT_S) -> None:
+        """Block until this thread holds the bus for ``device_type``."""
+        wait_start = time.monotonic()
+        waiter = _Waiter(threading.get_ident(), device_type)
+        with self._cond:
+            reentrant = self._owner == waiter.owner
+            if not self._try_acquire_locked(waiter):
+                if not self._cond.wait_for(lambda: waiter.granted, timeout):
+                    if self._timed_out(waiter):
+                        raise TimeoutError(f"I2C bus access timeout for {device_type}")
+        if waiter.gap:
+            time.sleep(waiter.gap)
+        self._granted(waiter, wait_start, reentrant)
+
+    async def acquire_async(self, device_type: str, timeout: float = MAX_WAIT_S) -> None:
+        """Coroutine form of :meth:`acquire`; waits without blocking the loop."""
+        wait_start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(threading.get_ident(), device_type, loop, loop.create_future())
+        with self._cond:
+            reentrant = self._owner == waiter.owner
+            queued = not self._try_acquire_locked(waiter)
+        if queued:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with self._cond:
+                    if self._timed_out(waiter):
+                        if isinstance(e, asyncio.CancelledError):
+                            raise
+                        raise TimeoutError(f"I2C bus access timeout for {device_type}") from e
+                    if isinstance(e, asyncio.CancelledError):
+                        # Handed over while being cancelled: pass it on
+                        self._release_locked()
+                        raise
+        if waiter.gap:
+            await asyncio.sleep(waiter.gap)
+        self._granted(waiter, wait_start, reentrant)
+
+    def release(self) -> None:
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("I2C bus released by a thread that does not hold it")
+            self._release_locked()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
     @asynccontextmanager
     async def exclusive_access(self, device_type: str, operation_name: str = ""):
         """
@@ -60,56 +240,13 @@ class I2CCoordinator:
                 # Safe relay operations
                 relay_controller.open_master()
         """
-        max_wait = 0.5  # 500ms max wait for bus access
-        wait_start = time.time()
-
-        # Wait for exclusive access
-        while True:
-            with self._lock:
-                if self._active_device is None:
-                    # Bus is free, claim it
-                    self._active_device = device_type
-                    self._operation_start = time.time()
-                    break
-                elif self._active_device == device_type:
-                    # Same device, allow reentrant access
-                    break
-                else:
-                    # Different device is active, check if it's exceeded its time
-                    elapsed = time.time() - self._operation_start
-                    max_duration = self._device_timings[self._active_device]['max_duration']
-
-                    if elapsed > max_duration:
-                        # Force release stuck device
-                        self.logger.warning(
-                            f"Force releasing stuck device {self._active_device} after {elapsed:.3f}s"
-                        )
-                        self._active_device = device_type
-                        self._operation_start = time.time()
-                        break
-
-            # Check timeout
-            if time.time() - wait_start > max_wait:
-                raise TimeoutError(f"I2C bus access timeout for {device_type}")
-
-            # Brief wait before retry
-            await asyncio.sleep(0.001)  # 1ms
-
+        await self.acquire_async(device_type)
         try:
             self.logger.debug(f"I2C access granted to {device_type}: {operation_name}")
             yield
-
         finally:
-            # Release access with stabilization delay
-            with self._lock:
-                if self._active_device == device_type:
-                    # Add stabilization delay
-                    stabilization = self._device_timings[device_type]['stabilization']
-                    await asyncio.sleep(stabilization)
-
-                    self._active_device = None
-                    self._operation_start = None
-                    self.logger.debug(f"I2C access released by {device_type}")
+            self.release()
+            self.logger.debug(f"I2C access released by {device_type}")
 
     def sync_exclusive_access(
         self, device_type: str, operation_func: Callable, *args, **kwargs
@@ -125,56 +262,33 @@ class I2CCoordinator:
         Returns:
             Result of operation_func
         """
-        max_wait = 0.5
-        wait_start = time.time()
-
-        # Wait for exclusive access (synchronous)
-        while True:
-            with self._lock:
-                if self._active_device is None:
-                    self._active_device = device_type
-                    self._operation_start = time.time()
-                    break
-                elif self._active_device == device_type:
-                    break
-                else:
-                    elapsed = time.time() - self._operation_start
-                    max_duration = self._device_timings[self._active_device]['max_duration']
-
-                    if elapsed > max_duration:
-                        self.logger.warning(f"Force releasing stuck device {self._active_device}")
-                        self._active_device = device_type
-                        self._operation_start = time.time()
-                        break
-
-            if time.time() - wait_start > max_wait:
-                raise TimeoutError(f"I2C bus access timeout for {device_type}")
-
-            time.sleep(0.001)
-
+        self.acquire(device_type)
         try:
-            # Execute operation with exclusive access
-            result = operation_func(*args, **kwargs)
-            return result
-
+            return operation_func(*args, **kwargs)
         finally:
-            # Release with stabilization delay
-            with self._lock:
-                if self._active_device == device_type:
-                    stabilization = self._device_timings[device_type]['stabilization']
-                    time.sleep(stabilization)
+            self.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per device type: acquisitions, contention, timeouts, and wait/hold
+        time percentiles in milliseconds."""
+        with self._cond:
+            return {device: stats.snapshot() for device, stats in self._stats.items()}
+
 
-                    self._active_device = None
-                    self._operation_start = None
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
 
 
-# Global coordinator instance
-_coordinator = None
+# Coordinator instance per I2C bus
+_coordinators: Dict[int, I2CCoordinator] = {}
+_coordinators_lock = threading.Lock()
 
 
-def get_i2c_coordinator() -> I2CCoordinator:
-    """Get global I2C coordinator instance."""
-    global _coordinator
-    if _coordinator is None:
-        _coordinator = I2CCoordinator()
-    return _coordinator
+def get_i2c_coordinator(bus: int = DEFAULT_BUS) -> I2CCoordinator:
+    """Get the process-wide I2C coordinator for ``bus``."""
+    with _coordinators_lock:
+        coordinator = _coordinators.get(bus)
+        if coordinator is None:
+            coordinator = _coordinators[bus] = I2CCoordinator(bus)
+        return coordinator
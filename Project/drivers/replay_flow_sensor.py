@@ -0,0 +1,287 @@
+"""Replay a flow recording through the UARTFlowSensor interface.
+
+:class:`ReplayFlowSensor` reads a file written with ``record_path``
+(drivers/flow_recording.py) and feeds the recorded bytes through the same
+FrameDecoder, ``_process_message``/``_process_frames`` and ring buffer code
+as the live driver, so ``read_one``, ``read``, ``drain_samples`` and
+``ring`` window queries see what the live sensor saw.
+
+Time is a :class:`VirtualClock`. Recorded chunks become readable when the
+clock passes their (rebased) receive time; waiting advances the clock
+instead of sleeping. Run the strategy on :meth:`VirtualClock.new_event_loop`
+and patch its module's ``time`` with :meth:`VirtualClock.patch` and a
+``SolenoidFlowStrategy`` delivery replays faster than real time on identical
+data, so integration and cutoff changes can be compared run against run::
+
+    clock = VirtualClock()
+    sensor = ReplayFlowSensor("delivery.rrrflow", clock)
+    sensor.start()
+    strategy = SolenoidFlowStrategy(valves, sensor, None, settings)
+    with clock.patch(solenoid_flow_strategy):
+        ok = clock.run(strategy.deliver(cage_id, 0.5))
+
+Replay is open loop: the recorded flow does not react to the valves the
+replayed strategy switches. Recorded valve events are in ``events``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import selectors
+from typing import Iterator, List, Optional, Tuple
+
+from drivers.flow_recording import EVENT, RX, SESSION, read_recording
+from drivers.teensy_frames import FrameDecoder
+from drivers.uart_flow_sensor import UARTFlowSensor
+
+
+class VirtualClock:
+    """Stand-in for the ``time`` module whose clock only moves when told to."""
+
+    def __init__(self, start: float = 1000.0, wall_offset: float = 1.7e9) -> None:
+        self._now = float(start)
+        self._wall_offset = wall_offset
+
+    def monotonic(self) -> float:
+        return self._now
+
+    perf_counter = monotonic
+
+    def time(self) -> float:
+        return self._now + self._wall_offset
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            self._now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def new_event_loop(self) -> asyncio.AbstractEventLoop:
+        """An event loop on this clock; idle waits advance it instantly."""
+        return _VirtualTimeLoop(self)
+
+    def run(self, coro):
+        """Run ``coro`` to completion on a private virtual-time loop."""
+        loop = self.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    @contextlib.contextmanager
+    def patch(self, *modules) -> Iterator["VirtualClock"]:
+        """Point each module's ``time`` global at this clock for the block."""
+        saved = [(module, module.time) for module in modules]
+        try:
+            for module, _ in saved:
+                module.time = self
+            yield self
+        finally:
+            for module, original in saved:
+                module.time = original
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Polls the real selector; an idle timed wait advances the clock."""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self) -> None:
+        self._selector.close()
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            return self._selector.select(None)  # only another thread can wake us
+        self._clock.advance(timeout)
+        return []
+
+
+class _VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock) -> None:
+        self._virtual_clock = clock
+        super().__init__(_VirtualSelector(clock))
+
+    def time(self) -> float:
+        return self._virtual_clock.monotonic()
+
+
+class ReplayFlowSensor(UARTFlowSensor):
+    """UARTFlowSensor that reads a recording instead of a serial port.
+
+    Args:
+        path: Recording written with ``record_path``.
+        clock: Virtual clock the replay runs on (a new one if omitted).
+        session: Which recorded session to play (0 = first).
+        zero_offset_ml_min, span_scale: Override the recorded calibration,
+            e.g. to compare calibrations on the same trace.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        clock: Optional[VirtualClock] = None,
+        session: int = 0,
+        zero_offset_ml_min: Optional[float] = None,
+        span_scale: Optional[float] = None,
+    ) -> None:
+        info, records = _load_session(path, session)
+        super().__init__(
+            port=f"replay:{path}",
+            sampling_hz=float(info.get('sampling_hz', 50.0)),
+            zero_offset_ml_min=(
+                float(info.get('zero_offset_ml_min', 0.0))
+                if zero_offset_ml_min is None
+                else zero_offset_ml_min
+            ),
+            span_scale=float(info.get('span_scale', 1.0)) if span_scale is None else span_scale,
+            binary_frames=bool(info.get('binary_frames', True)),
+        )
+        self.clock = clock or VirtualClock()
+        self.session_info = info
+        self.events: List[Tuple[float, dict]] = []  # (replay time, recorded event)
+        self._records = records
+        self._position = 0
+        self._offset = 0.0
+        self._recorded_start = records[0].host_time if records else 0.0
+
+    # ----- lifecycle: no port, no thread -----
+
+    def start(self) -> None:
+        """Start playback at the clock's current time (restarts continue)."""
+        if self._frame_decoder is None:
+            self._offset = self.clock.monotonic() - self._recorded_start
+            self._frame_decoder = FrameDecoder()
+        self._connected = True
+        self._running = True
+        self._last_frame_time = self.clock.monotonic()
+
+    def stop(self) -> None:
+        self._running = False
+        self._connected = False
+
+    def close(self) -> None:
+        self.stop()
+
+    @property
+    def exhausted(self) -> bool:
+        return self._position >= len(self._records)
+
+    @property
+    def duration_s(self) -> float:
+        if not self._records:
+            return 0.0
+        return self._records[-1].host_time - self._recorded_start
+
+    # ----- delivery of recorded bytes -----
+
+    def _pump(self) -> None:
+        """Process every recorded chunk received by the current virtual time."""
+        if not self._running or self._frame_decoder is None:
+            return
+        now = self.clock.monotonic()
+        records = self._records
+        while self._position < len(records):
+            record = records[self._position]
+            at = record.host_time + self._offset
+            if at > now:
+                break
+            self._position += 1
+            if record.kind == RX:
+                lines, frames = self._frame_decoder.feed(record.payload)
+                if len(frames):
+                    self._process_frames(frames, at)
+                for line in lines:
+                    self._process_message(line, at)
+            elif record.kind == EVENT:
+                self.events.append((at, record.json()))
+
+    def _consume(self, limit: Optional[int] = None):
+        self._pump()
+        return super()._consume(limit)
+
+    def clear_queue(self) -> int:
+        self._pump()
+        return super().clear_queue()
+
+    @property
+    def ring(self):
+        self._pump()
+        return self._ring
+
+    def wait_for_frames(self, min_frames: int = 3, timeout_s: float = 5.0) -> bool:
+        """Advance the clock until ``min_frames`` more arrive (or timeout)."""
+        start_count = self._sample_count
+        deadline = self.clock.monotonic() + timeout_s
+        step = 1.0 / max(1.0, self.sampling_hz)
+        while True:
+            self._pump()
+            if self._sample_count - start_count >= min_frames:
+                return True
+            if self.clock.monotonic() >= deadline or self.exhausted:
+                return False
+            self.clock.advance(min(step, deadline - self.clock.monotonic()))
+
+    # ----- the recording already holds the Teensy's answers -----
+
+    def _send_command(self, command: dict) -> None:
+        self._logger.debug(f"Replay ignores command: {command}")
+
+    def _start_sensor(self) -> None:
+        pass
+
+    def _recover_i2c_error(self) -> None:
+        self._logger.debug("Replay: recorded stream already contains the recovery")
+
+    def suspend_reads(self, suspend: bool) -> None:
+        # Recorded receive times already include any suspension.
+        self._reads_suspended = suspend
+
+    def backend_mode(self) -> str:
+        return "replay"
+
+    def get_status(self) -> dict:
+        self._pump()
+        status = super().get_status()
+        status["replay_position"] = self._position
+        status["replay_records"] = len(self._records)
+        return status
+
+
+def _load_session(path: str, session: int):
+    """The configuration and records of one session (records before the
+    first session marker count as session 0)."""
+    info: Optional[dict] = None
+    records = []
+    index = -1
+    for record in read_recording(path):
+        if record.kind == SESSION:
+            index += 1
+            if index > session:
+                break
+            if index == session:
+                info = json.loads(record.payload)
+        elif index == session or (index == -1 and session == 0):
+            records.append(record)
+    if info is None and not (session == 0 and records):
+        raise ValueError(f"{path} has no session {session}")
+    return info or {}, records
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Callable, Dict, List
 
 
 class SolenoidController:
@@ -26,21 +26,37 @@ class SolenoidController:
         self._relay_handler = relay_handler
         self._master = int(master_relay_id)
         self._cage_map = {int(k): int(v) for k, v in cage_to_relay_id.items()}
+        # Called as listener("valve", target=..., relays=[...], state=0|1)
+        # after every relay write, e.g. UARTFlowSensor.record_event.
+        self._listeners: List[Callable[..., None]] = []
 
         # Diagnostic: Print configuration on init
         print(f"[SolenoidController] Initialized with master_relay={self._master}")
         print(f"[SolenoidController] Cage-to-relay map: {self._cage_map}")
 
+    def add_listener(self, listener: Callable[..., None]) -> None:
+        """Register a callback for valve switching (recordings, diagnostics)."""
+        self._listeners.append(listener)
+
+    def _notify(self, target: str, relays: list, state: int) -> None:
+        for listener in self._listeners:
+            try:
+                listener("valve", target=target, relays=list(relays), state=state)
+            except Exception as e:
+                print(f"[SOLENOID] Valve listener failed: {e}")
+
     def open_master(self) -> bool:
         print(f"[SOLENOID] OPEN MASTER (relay {self._master})")
         result = self._relay_handler.set_relays([self._master], 1)
         print(f"[SOLENOID] OPEN MASTER result: {result}")
+        self._notify("master", [self._master], 1)
         return result
 
     def close_master(self) -> bool:
         print(f"[SOLENOID] CLOSE MASTER (relay {self._master})")
         result = self._relay_handler.set_relays([self._master], 0)
         print(f"[SOLENOID] CLOSE MASTER result: {result}")
+        self._notify("master", [self._master], 0)
         return result
 
     def open_cage(self, cage_id: int) -> bool:
@@ -53,6 +69,7 @@ class SolenoidController:
         print(f"[SOLENOID] OPEN CAGE {cage_id} → relay {relay}")
         result = self._relay_handler.set_relays([relay], 1)
         print(f"[SOLENOID] OPEN CAGE {cage_id} result: {result}")
+        self._notify(f"cage {cage_id}", [relay], 1)
         return result
 
     def close_cage(self, cage_id: int) -> bool:
@@ -65,16 +82,48 @@ class SolenoidController:
         print(f"[SOLENOID] CLOSE CAGE {cage_id} → relay {relay}")
         result = self._relay_handler.set_relays([relay], 0)
         print(f"[SOLENOID] CLOSE CAGE {cage_id} result: {result}")
+        self._notify(f"cage {cage_id}", [relay], 0)
+        return result
+
+    def _relays_for(self, cage_ids) -> list:
+        relays = []
+        for cage_id in cage_ids:
+            relay = self._cage_map.get(int(cage_id))
+            if relay is None:
+                raise ValueError(f"Unknown cage_id {cage_id}")
+            relays.append(relay)
+        return relays
+
+    def open_cages(self, cage_ids) -> bool:
+        """Open several cage solenoids with one relay write (parallel pulses)."""
+        relays = self._relays_for(cage_ids)
+        print(f"[SOLENOID] OPEN CAGES {list(cage_ids)} → relays {relays}")
+        result = self._relay_handler.set_relays(relays, 1)
+        self._notify(f"cages {list(cage_ids)}", relays, 1)
+        return result
+
+    def close_cages(self, cage_ids) -> bool:
+        """Close several cage solenoids with one relay write (parallel pulses)."""
+        relays = self._relays_for(cage_ids)
+        print(f"[SOLENOID] CLOSE CAGES {list(cage_ids)} → relays {relays}")
+        result = self._relay_handler.set_relays(relays, 0)
+        self._notify(f"cages {list(cage_ids)}", relays, 0)
         return result
 
     def close_all_cages(self) -> bool:
         print(f"[SOLENOID] CLOSE ALL CAGES (relays {list(self._cage_map.values())})")
         result = self._relay_handler.set_relays(list(self._cage_map.values()), 0)
         print(f"[SOLENOID] CLOSE ALL CAGES result: {result}")
+        self._notify("all cages", list(self._cage_map.values()), 0)
         return result
 
     def all_closed(self) -> bool:
-        # The underlying RelayHandler does not expose readback; for now we assume
-        # commands succeed and the HAT is stateless. If readback becomes available,
-        # use it here.
-        return True
+        """True if the master and every cage relay were last written OFF.
+
+        The HATs have no readback; this checks RelayHandler's shadow state
+        (what was last written), or assumes success without one.
+        """
+        relay_state = getattr(self._relay_handler, 'relay_state', None)
+        if relay_state is None:
+            return True
+        return not any(relay_state(relay) for relay in [self._master, *self._cage_map.values()])
@@ -0,0 +1,80 @@
+"""Readiness-probed Teensy connection, with per-phase timings.
+
+Connecting used to sleep a fixed 3.5 s for USB CDC enumeration (2 s more
+before a reconnect), then ping. Most of that was dead time: a Teensy that is
+already running answers a ping within milliseconds of the port opening, and
+one that is re-enumerating answers as soon as its firmware is up. The
+drivers now walk the phases below in short polls under one overall deadline
+and move on the moment each completes:
+
+``device``  the device node exists (it vanishes while USB re-enumerates)
+``open``    the port opens (it can exist but refuse while udev settles)
+``ready``   the firmware answers a ping (re-sent every ``PROBE_INTERVAL_S``)
+
+:class:`PhaseTimer` records how long each phase actually took so startup
+and recovery cost shows up in ``get_status()`` and the logs.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+POLL_S = 0.02  # device node / open retry interval
+PROBE_INTERVAL_S = 0.1  # ping re-send interval while waiting for firmware
+
+
+@dataclass
+class ConnectTimings:
+    """How long each connection phase took (seconds), in order."""
+
+    phases: Dict[str, float] = field(default_factory=dict)
+    attempts: int = 0
+    ok: bool = False
+
+    @property
+    def total_s(self) -> float:
+        return sum(self.phases.values())
+
+    def as_dict(self) -> dict:
+        return {
+            'ok': self.ok,
+            'attempts': self.attempts,
+            'total_s': round(self.total_s, 4),
+            **{f'{name}_s': round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+
+    def __str__(self) -> str:
+        parts = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in self.phases.items())
+        return f'{self.total_s:.2f}s ({parts})'
+
+
+class PhaseTimer:
+    """Attributes elapsed time to named phases; repeated phases accumulate."""
+
+    def __init__(self) -> None:
+        self.timings = ConnectTimings()
+        self._mark = time.monotonic()
+
+    def mark(self, phase: str) -> None:
+        now = time.monotonic()
+        phases = self.timings.phases
+        phases[phase] = phases.get(phase, 0.0) + (now - self._mark)
+        self._mark = now
+
+    def finish(self, ok: bool, attempts: int) -> ConnectTimings:
+        self.timings.ok = ok
+        self.timings.attempts = attempts
+        return self.timings
+
+
+def wait_for_device(port: str, deadline: float, poll_s: float = POLL_S) -> bool:
+    """Poll until the device node at ``port`` exists or ``deadline`` passes."""
+    while not os.path.exists(port):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(poll_s, remaining))
+    return True
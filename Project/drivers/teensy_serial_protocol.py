@@ -20,9 +20,13 @@ Serial Protocol:
 - Format: JSON lines (newline-terminated)
 - Commands: {"cmd": "start|stop|status|ping|reset", "rate": float}
 - Responses: {"type": "measurement|error|status|pong", ...}
+- Optional: {"cmd": "format", "mode": "binary"} switches measurements to
+  16-byte binary frames (see drivers/teensy_frames.py); read_message()
+  returns them as the equivalent "measurement" dicts either way.
 
 Best Practices (validated against hardware):
-1. Wait 3.5s after serial.Serial() for Teensy USB CDC enumeration (Pi-specific)
+1. Ping until the Teensy answers instead of sleeping for USB CDC enumeration
+   (3.5s on a cold Pi boot; milliseconds when the firmware is already up)
 2. Flush input buffer before sending commands to avoid stale data
 3. Allow 100ms+ after "start" command before expecting first measurement
 4. Ignore transient "0 bytes" errors during sensor warm-up
@@ -32,9 +36,19 @@ Best Practices (validated against hardware):
 import json
 import logging
 import time
+from collections import deque
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, Optional
 
+from drivers.teensy_connect import (
+    POLL_S,
+    PROBE_INTERVAL_S,
+    ConnectTimings,
+    PhaseTimer,
+    wait_for_device,
+)
+from drivers.teensy_frames import FORMAT_COMMAND, FrameDecoder
+
 try:
     import serial
 
@@ -81,8 +95,10 @@ class TeensySerialProtocol:
     SENSOR_SOFT_RESET_MS = 25  # t_SR max
     SENSOR_WARMUP_MS = 60  # t_w typical
 
-    # Teensy 4.1 USB CDC timing (empirically validated on Raspberry Pi)
-    TEENSY_CDC_ENUMERATION_S = 3.5  # Pi needs longer than Mac (2.5s)
+    # Deadline for device node + open + first pong (see teensy_connect);
+    # a cold Pi boot has taken ~3.5 s of it for USB CDC enumeration.
+    CONNECT_TIMEOUT_S = 8.0
+    STOP_ACK_TIMEOUT_S = 0.15
 
     def __init__(
         self,
@@ -90,6 +106,7 @@ class TeensySerialProtocol:
         baud_rate: int = 115200,
         timeout: float = 2.0,
         logger: Optional[logging.Logger] = None,
+        binary_frames: bool = True,
     ):
         if not SERIAL_AVAILABLE:
             raise ImportError("pyserial not available. Install with: pip install pyserial")
@@ -97,17 +114,23 @@ class TeensySerialProtocol:
         self.port = port
         self.baud_rate = baud_rate
         self.timeout = timeout
+        self.binary_frames = binary_frames  # negotiate before each start
         self._serial: Optional[serial.Serial] = None
         self._logger = logger or logging.getLogger(__name__)
         self._connected = False
+        self._decoder = FrameDecoder()
+        self._pending: deque = deque()  # decoded messages not yet returned
+        self.frame_format = 'json'
+        self.connect_timings: Optional[ConnectTimings] = None
 
     def connect(self) -> bool:
         """
         Establish serial connection to Teensy.
 
         Implements best practices validated against hardware:
-        - Extended wait for Teensy USB CDC enumeration
-        - Ping test to verify connection before proceeding
+        - Wait for the device node and the port to open (USB re-enumeration)
+        - Ping every PROBE_INTERVAL_S until the firmware answers, all within
+          CONNECT_TIMEOUT_S; per-phase timings end up in ``connect_timings``
 
         Returns:
             True if connection successful and ping verified
@@ -115,70 +138,90 @@ class TeensySerialProtocol:
         Raises:
             ConnectionError: If Teensy not responding
         """
+        timer = PhaseTimer()
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT_S
+        attempts = 0
         try:
             # Close existing connection if any
             if self._serial and self._serial.is_open:
                 self._serial.close()
-                time.sleep(0.5)
-
-            # Open serial port
-            self._serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baud_rate,
-                timeout=self.timeout,
-                write_timeout=self.timeout,
-            )
-
-            # Critical: Wait for Teensy USB CDC re-enumeration
-            # When serial port opens, Teensy resets and re-enumerates USB
-            # Pi requires longer wait than MacOS (3.5s vs 2.5s empirically)
-            self._logger.debug(
-                f"Waiting {self.TEENSY_CDC_ENUMERATION_S}s for Teensy USB enumeration..."
-            )
-            time.sleep(self.TEENSY_CDC_ENUMERATION_S)
-
-            # Flush any startup messages
-            self._flush_input_buffer()
-
-            # Test connection with ping
-            if not self._test_ping():
-                raise ConnectionError("Teensy not responding to ping")
+            self._connected = False
 
-            self._connected = True
-            self._logger.info(f"✓ Connected to Teensy on {self.port}")
+            while not self._connected:
+                attempts += 1
+                if not wait_for_device(self.port, deadline):
+                    raise ConnectionError(f"{self.port} did not appear")
+                timer.mark('device')
+
+                try:
+                    self._serial = serial.Serial(
+                        port=self.port,
+                        baudrate=self.baud_rate,
+                        timeout=self.timeout,
+                        write_timeout=self.timeout,
+                    )
+                except OSError as e:
+                    if time.monotonic() >= deadline:
+                        raise
+                    self._logger.debug(f"Open failed, retrying: {e}")
+                    time.sleep(POLL_S)
+                    timer.mark('open')
+                    continue
+                timer.mark('open')
+
+                self._connected = self._test_ping(deadline)
+                timer.mark('ready')
+                if not self._connected:
+                    if time.monotonic() >= deadline:
+                        raise ConnectionError("Teensy not responding to ping")
+                    self._serial.close()  # went away while probing; start over
+
+            self.connect_timings = timer.finish(True, attempts)
+            self._logger.info(f"✓ Connected to Teensy on {self.port} in {self.connect_timings}")
             return True
 
         except Exception as e:
-            self._logger.error(f"Connection failed: {e}")
+            self.connect_timings = timer.finish(False, attempts)
+            self._logger.error(f"Connection failed after {self.connect_timings}: {e}")
             self._connected = False
             raise ConnectionError(f"Failed to connect to Teensy on {self.port}: {e}")
 
     def _flush_input_buffer(self) -> None:
         """Flush input buffer to discard stale data."""
+        self._decoder.clear()
+        self._pending.clear()
         try:
             if self._serial:
                 self._serial.reset_input_buffer()
         except Exception as e:
             self._logger.debug(f"Buffer flush warning: {e}")
 
-    def _test_ping(self) -> bool:
+    def _test_ping(self, deadline: Optional[float] = None) -> bool:
         """
-        Test Teensy connection with ping/pong.
+        Test Teensy connection with ping/pong, re-pinging every
+        PROBE_INTERVAL_S until ``deadline`` (default: 1 s from now).
 
         Returns:
-            True if ping successful within timeout
+            True if ping successful within timeout; False if it timed out or
+            the port failed
         """
+        start_time = time.monotonic()
+        if deadline is None:
+            deadline = start_time + 1.0
         try:
-            self._send_command({"cmd": "ping"})
-
-            # Wait for pong response
-            start_time = time.time()
-            while time.time() - start_time < 1.0:
-                msg = self.read_message(timeout_s=0.1)
-                if msg and msg.get('type') == 'pong':
-                    latency_ms = (time.time() - start_time) * 1000
-                    self._logger.debug(f"Ping successful (latency: {latency_ms:.1f}ms)")
-                    return True
+            while time.monotonic() < deadline:
+                # _send_command flushes stale startup output first
+                if not self._send_command({"cmd": "ping"}):
+                    return False
+
+                # Wait for pong response
+                probe_end = min(deadline, time.monotonic() + PROBE_INTERVAL_S)
+                while time.monotonic() < probe_end:
+                    msg = self.read_message(timeout_s=max(0.0, probe_end - time.monotonic()))
+                    if msg and msg.get('type') == 'pong':
+                        latency_ms = (time.monotonic() - start_time) * 1000
+                        self._logger.debug(f"Ping successful (latency: {latency_ms:.1f}ms)")
+                        return True
 
             self._logger.warning("Ping timeout - no pong received")
             return False
@@ -232,14 +275,14 @@ class TeensySerialProtocol:
         if not (1.0 <= rate_hz <= 500.0):
             raise ValueError(f"Invalid rate {rate_hz} Hz. Must be 1-500 Hz per SLF3S datasheet.")
 
+        if self.binary_frames:
+            self.negotiate_binary_frames()
+
         if not self._send_command({"cmd": "start", "rate": rate_hz}):
             return False
 
-        # Wait for sensor initialization per datasheet timing
-        init_time_s = (self.SENSOR_SOFT_RESET_MS + self.SENSOR_WARMUP_MS) / 1000.0
-        time.sleep(init_time_s)
-
-        # Read and verify status message
+        # Read and verify status message; the firmware answers after the
+        # sensor's soft reset and warm-up, so read_message() does the waiting
         for _ in range(5):  # Try up to 5 messages
             msg = self.read_message(timeout_s=0.5)
             if msg:
@@ -247,6 +290,11 @@ class TeensySerialProtocol:
                 if msg_type == 'status':
                     self._logger.info(f"Sensor started: {msg.get('message', '')}")
                     return True
+                elif msg_type == 'measurement':
+                    # Input was flushed before "start", so this is fresh data;
+                    # at high rates a whole burst can decode ahead of the status.
+                    self._logger.info("Sensor started: measurements streaming")
+                    return True
                 elif msg_type == 'error':
                     # Ignore transient "0 bytes" errors during warm-up (common)
                     error_msg = msg.get('error', '')
@@ -261,11 +309,37 @@ class TeensySerialProtocol:
         self._logger.warning("Start command sent but status not confirmed")
         return True
 
+    def negotiate_binary_frames(self) -> bool:
+        """Ask the firmware for binary measurement frames.
+
+        Returns True if it switched; older firmware answers "Unknown command"
+        and keeps streaming JSON lines, which read_message() handles the same.
+        """
+        if not self._send_command(FORMAT_COMMAND):
+            return False
+        for _ in range(5):
+            msg = self.read_message(timeout_s=0.5)
+            if not msg:
+                continue
+            if msg.get('type') == 'status' and 'format' in msg:
+                self.frame_format = str(msg['format'])
+                return self.frame_format == 'binary'
+            if msg.get('type') == 'error' and 'unknown command' in msg.get('error', '').lower():
+                break
+        self.frame_format = 'json'
+        self._logger.info("Firmware has no binary frames; using JSON lines")
+        return False
+
     def send_stop_command(self) -> bool:
         """Send stop command to halt sensor streaming."""
         if not self._send_command({"cmd": "stop"}):
             return False
-        time.sleep(0.1)  # Brief delay for sensor to stop
+        # Wait (briefly) for the firmware to confirm the sensor stopped
+        deadline = time.monotonic() + self.STOP_ACK_TIMEOUT_S
+        while time.monotonic() < deadline:
+            msg = self.read_message(timeout_s=max(0.0, deadline - time.monotonic()))
+            if msg and msg.get('type') == 'status' and 'stopped' in msg.get('message', '').lower():
+                break
         return True
 
     def send_status_request(self) -> Optional[Dict[str, Any]]:
@@ -288,46 +362,54 @@ class TeensySerialProtocol:
 
     def read_message(self, timeout_s: float = 1.0) -> Optional[Dict[str, Any]]:
         """
-        Read one JSON message from Teensy.
+        Read one message from Teensy.
 
         Implements best practices validated against hardware:
-        - Handles newline-delimited JSON
-        - Validates JSON before returning
+        - Handles newline-delimited JSON and binary measurement frames
+        - Validates JSON (and frame CRC) before returning
         - Returns None on timeout (not an error)
 
         Args:
             timeout_s: Read timeout in seconds
 
         Returns:
-            Parsed JSON message dict or None if timeout/error
+            Parsed message dict or None if timeout/error
         """
+        if self._pending:
+            return self._pending.popleft()
         if not self._serial or not self._serial.is_open:
             return None
 
+        original_timeout = self._serial.timeout
+        deadline = time.monotonic() + timeout_s
         try:
-            # Temporarily override timeout
-            original_timeout = self._serial.timeout
-            self._serial.timeout = timeout_s
-
-            line = self._serial.readline().decode('utf-8', errors='ignore').strip()
-
-            # Restore original timeout
-            self._serial.timeout = original_timeout
-
-            if not line:
-                return None
-
-            # Parse JSON
-            try:
-                msg = json.loads(line)
-                return msg
-            except json.JSONDecodeError:
-                self._logger.debug(f"Invalid JSON received: {line[:50]}")
-                return None
-
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Block for the first byte, then take whatever else is waiting
+                self._serial.timeout = remaining
+                chunk = self._serial.read(1)
+                if not chunk:
+                    break
+                waiting = self._serial.in_waiting
+                if waiting:
+                    chunk += self._serial.read(waiting)
+                lines, frames = self._decoder.feed(chunk)
+                self._pending.extend(frames.as_messages())
+                for line in lines:
+                    try:
+                        self._pending.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        self._logger.debug(f"Invalid JSON received: {line[:50]}")
         except Exception as e:
             self._logger.error(f"Read error: {e}")
-            return None
+        finally:
+            try:
+                self._serial.timeout = original_timeout
+            except Exception:
+                pass
+        return self._pending.popleft() if self._pending else None
 
     def read_measurement(self, timeout_s: float = 1.0) -> Optional[FlowMeasurement]:
         """
@@ -13,7 +13,33 @@ Hardware Setup:
 
 Protocol:
 Pi → Teensy: {"cmd":"start","rate":50}
-Teensy → Pi: {"flow":123.4,"temp":25.1,"time":1234567890}
+Teensy → Pi: {"type":"measurement","flow":123.4,"temp":25.1,"time":1234567890,"count":42}
+
+With ``binary_frames`` (default) the driver first sends
+{"cmd":"format","mode":"binary"}; firmware that supports it then sends
+measurements as 16-byte CRC-checked frames (drivers/teensy_frames.py) and
+older firmware keeps sending the JSON lines above.
+
+``time`` (Teensy millis()) and ``count`` (frame sequence number) are kept on
+every FlowSample so integration can use the device clock and detect dropped
+frames (see utils/flow_integration.py).
+
+Samples go into a preallocated FlowSampleRing (utils/flow_ring.py). The
+read_one()/read_sample()/drain_samples() consumers advance a cursor through
+it; ``sensor.ring`` gives whole time windows without consuming anything.
+
+With ``record_path`` set, the raw byte stream, the commands sent and valve
+events are appended to a recording (drivers/flow_recording.py) that
+ReplayFlowSensor can play back through this same code.
+
+Connecting polls the device node, the open and a ping in short intervals
+under one deadline instead of sleeping for USB CDC enumeration; how long
+each phase took is kept in ``connect_timings`` (drivers/teensy_connect.py).
+
+Stream telemetry (effective rate, jitter percentiles, dropped frames, parse
+errors, overflow drops, reconnects and recovery time) is kept in a
+StreamStats (utils/stream_stats.py): ``get_status()["stream"]`` is current,
+``stream_snapshot`` is the reader loop's rolling snapshot.
 """
 
 from __future__ import annotations
@@ -22,12 +48,15 @@ import asyncio
 import fcntl
 import json
 import logging
+import math
 import os
+import re
+import select
 import threading
 import time
+from collections import deque
 from dataclasses import dataclass
-from queue import Empty, Queue
-from typing import AsyncIterator, Optional, Tuple
+from typing import AsyncIterator, Callable, Deque, List, Optional, Tuple
 
 try:
     import serial
@@ -38,6 +67,27 @@ except ImportError:
     serial = None
 
 
+from drivers.flow_recording import FlowRecorder
+from drivers.teensy_connect import (
+    POLL_S,
+    PROBE_INTERVAL_S,
+    ConnectTimings,
+    PhaseTimer,
+    wait_for_device,
+)
+from drivers.teensy_frames import FORMAT_COMMAND, FrameBatch, FrameDecoder
+from drivers.uart_reader import Wakeup, read_available
+from utils.flow_ring import FlowSampleRing
+from utils.sensor_health import SensorHealth
+from utils.stream_stats import SNAPSHOT_INTERVAL_S, StreamStats
+
+# ~80 s of history at 50 Hz (two float64 columns per field: 320 KiB).
+RING_CAPACITY = 4096
+
+# "Sensor read failed: received 0 bytes (consecutive:50)"
+_CONSECUTIVE_RE = re.compile(r'consecutive:(\d+)')
+
+
 class TeensyUnavailableError(ConnectionError):
     """Raised when Teensy is not responding to communication attempts."""
 
@@ -48,6 +98,9 @@ class TeensyUnavailableError(ConnectionError):
 class FlowSample:
     flow_ml_min: float
     temperature_c: float
+    timestamp_ms: Optional[int] = None  # Teensy millis() when the frame was read
+    count: Optional[int] = None  # Teensy frame sequence number
+    host_time: float = 0.0  # time.monotonic() when the Pi received it
 
 
 class UARTFlowSensor:
@@ -58,6 +111,13 @@ class UARTFlowSensor:
     Handles serial communication, JSON protocol, and data buffering.
     """
 
+    # Deadlines, not delays: each wait ends as soon as the Teensy answers.
+    # A cold Pi boot has taken ~3.5 s from port open to the first pong.
+    CONNECT_TIMEOUT_S = 8.0
+    RECONNECT_TIMEOUT_S = 15.0  # includes USB re-enumeration after a loss
+    START_ACK_TIMEOUT_S = 0.5  # "Sensor started" status or the first frame
+    STOP_ACK_TIMEOUT_S = 0.15  # "Sensor stopped" before closing the port
+
     def __init__(
         self,
         port: str = '/dev/ttyACM0',
@@ -66,6 +126,8 @@ class UARTFlowSensor:
         span_scale: float = 1.0,
         baud_rate: int = 115200,
         timeout: float = 1.0,
+        binary_frames: bool = True,
+        record_path: Optional[str] = None,
     ) -> None:
         if not SERIAL_AVAILABLE:
             raise ImportError("pyserial not available. Install with: pip install pyserial")
@@ -76,14 +138,33 @@ class UARTFlowSensor:
         self.span_scale = span_scale
         self.baud_rate = baud_rate
         self.timeout = timeout
+        # Ask the firmware for compact binary measurement frames; older
+        # firmware refuses and keeps sending JSON lines (see teensy_frames).
+        self.binary_frames = binary_frames
+        self._frame_format = "json"
+        self._frame_decoder: Optional[FrameDecoder] = None
+        # Optional field recording of the raw stream (see flow_recording)
+        self.record_path = record_path
+        self._recorder: Optional[FlowRecorder] = None
+        # Phase timings of the last connect/reconnect (see teensy_connect)
+        self.connect_timings: Optional[ConnectTimings] = None
+        # Recent non-measurement messages for _read_until waiters
+        self._replies: Deque[Tuple[int, dict]] = deque(maxlen=16)
+        self._reply_seq = 0
 
         self._serial = None
         self._running = False
         self._reader_thread = None
-        self._data_queue = Queue(maxsize=100)
+        # Written by the reader thread only; consumers share one cursor.
+        self._ring = FlowSampleRing(capacity=RING_CAPACITY)
+        self._read_seq = 0
+        self._read_lock = threading.Lock()
+        self._overrun_count = 0
         self._latest_sample = None
         self._sample_count = 0
         self._error_count = 0
+        # Stream telemetry; frame counters are written by the reader thread
+        self._stats = StreamStats(sampling_hz)
 
         self._logger = logging.getLogger(self.__class__.__name__)
 
@@ -94,10 +175,18 @@ class UARTFlowSensor:
         self._pings_suspended = False
         self._reads_suspended = False
         self._recovering = False
+        # Wakes the reader thread out of select() (stop, suspend/resume)
+        self._wakeup: Optional[Wakeup] = None
         self._i2c_error_count = 0
+        # Firmware-reported stream health (see health() / sensor_health)
+        self._fw_errors = 0  # I2C errors since the sensor was last started
+        self._fw_consecutive_errors = 0
+        self._fw_halted = False
+        self._fw_status_seq = 0
+        self._stream_started_at = 0.0
 
         # Frame activity monitoring (detect firmware hangs)
-        self._last_frame_time = 0
+        self._last_frame_time = 0.0  # time.monotonic() of the last frame
         self._frame_timeout_s = (
             10.0  # No frames for 10s = potential hang (increased for rapid pulse testing)
         )
@@ -118,6 +207,7 @@ class UARTFlowSensor:
             self._logger.info(
                 f"[UART] Starting flow sensor on {self.port} at {self.sampling_hz} Hz"
             )
+            self._open_recording()
 
             self._connect()
             self._logger.info(f"[UART] Connection established to {self.port}")
@@ -126,6 +216,8 @@ class UARTFlowSensor:
             self._logger.info(f"[UART] Sensor start command sent")
 
             self._running = True
+            if self._wakeup is None:
+                self._wakeup = Wakeup()
 
             # Start reader thread
             self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
@@ -169,6 +261,10 @@ class UARTFlowSensor:
     def stop(self) -> None:
         """Stop sensor and close connection."""
         self._running = False
+        if self._wakeup is not None:
+            self._wakeup.notify()
+        if self._reader_thread and self._reader_thread.is_alive():
+            self._reader_thread.join(timeout=1.0)
 
         if self._serial and self._serial.is_open:
             try:
@@ -180,16 +276,12 @@ class UARTFlowSensor:
 
                 self._send_command({"cmd": "stop"})
 
-                # CRITICAL: Wait for firmware to process stop and turn off LED
-                # At 20 Hz sampling, worst case is 50ms between loop iterations
-                # Plus 10ms sensor settling time = 60ms minimum
-                time.sleep(0.15)  # 150ms to ensure complete stop
+                # Wait for the firmware to confirm (and turn off the LED) before
+                # closing: within one loop pass, ~60 ms worst case at 20 Hz.
+                self._read_until(_is_stop_reply, self.STOP_ACK_TIMEOUT_S)
             except Exception:
                 pass
 
-        if self._reader_thread and self._reader_thread.is_alive():
-            self._reader_thread.join(timeout=1.0)
-
         if self._serial:
             try:
                 self._serial.close()
@@ -203,126 +295,174 @@ class UARTFlowSensor:
         self._release_lock()
 
     def _connect(self) -> None:
-        """Establish serial connection to Teensy with robust retry logic.
+        """Open the port and wait until the Teensy firmware answers a ping.
 
-        Based on Teensy CDC and PySerial best practices:
-        - Teensy resets when serial port opens (USB re-enumeration)
-        - Allow 2-3 seconds for firmware initialization
-        - Retry ping commands with backoff
-        - Auto-detect port changes if initial connection fails
+        The Teensy re-enumerates on USB when the port opens and answers once
+        its firmware is up; rather than sleeping a fixed enumeration delay,
+        poll for that under CONNECT_TIMEOUT_S (see :meth:`_open_when_ready`).
+        Falls back to auto-detecting the port if it never answers.
         """
-        max_retries = 3
-        retry_delay = 0.5
-
         self._logger.info(
-            f"[UART] Attempting connection to {self.port} (max {max_retries} retries)"
+            f"[UART] Connecting to {self.port} (deadline {self.CONNECT_TIMEOUT_S:.1f}s)"
         )
+        # Acquire cross-process lock to avoid multiple access on port
+        try:
+            self._acquire_lock()
+        except ConnectionError as e:
+            raise TeensyUnavailableError(str(e)) from e
 
-        for attempt in range(max_retries):
-            try:
-                # Close any existing connection
-                if self._serial and self._serial.is_open:
-                    self._serial.close()
-                    time.sleep(0.5)
+        if self._open_when_ready(self.port, self.CONNECT_TIMEOUT_S):
+            return
 
-                self._logger.info(
-                    f"[UART] Connection attempt {attempt + 1}/{max_retries} on {self.port}"
-                )
+        # Try auto-detection as last resort
+        self._logger.warning("Primary connection failed, attempting auto-detection...")
+        if self._try_auto_detection():
+            return
 
-                # Acquire cross-process lock to avoid multiple access on port
-                self._logger.debug(f"[UART] Acquiring file lock for {self.port}")
-                self._acquire_lock()
-                self._logger.debug(f"[UART] Lock acquired")
+        # Connection completely failed
+        raise TeensyUnavailableError(
+            f"Teensy not responding on {self.port} within {self.CONNECT_TIMEOUT_S:.1f}s"
+        )
 
-                # Open serial connection
-                self._logger.info(
-                    f"[UART] Opening serial port {self.port} at {self.baud_rate} baud"
-                )
+    def _open_when_ready(self, port: str, timeout_s: float) -> bool:
+        """Open ``port`` and return once the firmware answers, within ``timeout_s``.
+
+        Walks the device → open → ready phases in short polls. A port that
+        fails while probing (stale node from before a re-enumeration) is
+        closed and the sequence starts over. Phase timings are stored in
+        ``connect_timings``.
+        """
+        timer = PhaseTimer()
+        deadline = time.monotonic() + timeout_s
+        attempts = 0
+        ready = False
+        self._close_serial()
+        if self._frame_decoder is not None:
+            self._frame_decoder.clear()
+
+        while not ready and time.monotonic() < deadline:
+            attempts += 1
+            found = wait_for_device(port, deadline)
+            timer.mark("device")
+            if not found:
+                break
+
+            try:
                 self._serial = serial.Serial(
-                    port=self.port,
+                    port=port,
                     baudrate=self.baud_rate,
                     timeout=self.timeout,
                     write_timeout=self.timeout,
                 )
-                self._logger.info(f"[UART] Serial port opened successfully")
-
-                # Teensy USB CDC reset delay (critical for stable communication)
-                # Pi requires longer wait than Mac due to slower USB enumeration
-                self._logger.debug(f"[UART] Waiting 3.5s for Teensy USB CDC enumeration...")
-                time.sleep(3.5)  # Extended wait for Teensy firmware initialization
-                self._logger.debug(f"[UART] CDC enumeration wait complete")
-
-                # Test connection with multiple ping attempts
-                self._logger.info(f"[UART] Testing connection with ping...")
-                if self._test_connection_robust():
-                    self._connected = True
-                    self._logger.info(f"[UART] Connected to Teensy on {self.port}")
-                    return
-                else:
-                    self._logger.warning(
-                        f"[UART] Ping test failed on {self.port}, attempt {attempt + 1}/{max_retries}"
-                    )
-
-            except Exception as e:
-                self._logger.warning(f"Connection attempt {attempt + 1} failed: {e}")
+            except (OSError, ValueError) as e:  # SerialException is an OSError
+                self._logger.debug(f"[UART] Opening {port} failed: {e}")
+                time.sleep(POLL_S)
+                timer.mark("open")
+                continue
+            timer.mark("open")
 
-            # Wait before retry
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-
-        # All attempts failed - try auto-detection as last resort
-        self._logger.warning("Primary connection failed, attempting auto-detection...")
-        if self._try_auto_detection():
-            return
+            try:
+                ready = self._probe_ready(deadline)
+            except OSError as e:
+                self._logger.debug(f"[UART] {port} went away while probing: {e}")
+                self._close_serial()
+            timer.mark("ready")
+
+        self.connect_timings = timer.finish(ready, attempts)
+        if ready:
+            self._connected = True
+            self._logger.info(f"[UART] Connected to Teensy on {port} in {self.connect_timings}")
+        else:
+            self._close_serial()
+            self._logger.warning(
+                f"[UART] No answer from Teensy on {port} after {self.connect_timings}"
+            )
+        return ready
 
-        # Connection completely failed
-        raise TeensyUnavailableError(
-            f"Teensy not responding on {self.port} after {max_retries} attempts"
-        )
+    def _probe_ready(self, deadline: float) -> bool:
+        """Ping every PROBE_INTERVAL_S until a pong arrives or ``deadline`` passes."""
+        # Clear any existing buffered data to avoid stale frames interfering
+        try:
+            self._serial.reset_input_buffer()
+        except Exception:
+            pass
 
-    def _test_connection_robust(self) -> bool:
-        """Test connection with multiple ping attempts and extended timeout."""
-        max_ping_attempts = 5
-        ping_timeout = 1.0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._send_command({"cmd": "ping"})
+            if self._read_until(_is_pong, min(PROBE_INTERVAL_S, remaining)):
+                return True
 
-        for ping_attempt in range(max_ping_attempts):
+    def _close_serial(self) -> None:
+        if self._serial is not None:
             try:
-                # Send ping command
-                # Clear any existing buffered data to avoid stale frames interfering
-                try:
-                    if self._serial:
-                        self._serial.reset_input_buffer()
-                except Exception:
-                    pass
+                self._serial.close()
+            except Exception:
+                pass
+            self._serial = None
 
-                self._send_command({"cmd": "ping"})
-
-                # Wait for pong response with timeout
-                start_time = time.time()
-                while time.time() - start_time < ping_timeout:
-                    if self._serial.in_waiting:
-                        line = self._serial.readline().decode('utf-8').strip()
-                        if line:
-                            try:
-                                response = json.loads(line)
-                                if response.get("type") == "pong":
-                                    self._logger.debug(
-                                        f"Ping successful on attempt {ping_attempt + 1}"
-                                    )
-                                    return True
-                            except json.JSONDecodeError:
-                                continue
-                    time.sleep(0.01)
-
-                self._logger.debug(f"Ping attempt {ping_attempt + 1} timeout")
-                time.sleep(0.2)  # Brief delay between ping attempts
+    def _owns_reads(self) -> bool:
+        """True if the calling thread may read the port (no reader thread running)."""
+        thread = self._reader_thread
+        return thread is None or not thread.is_alive() or thread is threading.current_thread()
 
-            except Exception as e:
-                self._logger.debug(f"Ping attempt {ping_attempt + 1} error: {e}")
-                time.sleep(0.2)
+    def _read_until(
+        self, predicate: Callable[[dict], bool], timeout_s: float, frames: bool = False
+    ) -> bool:
+        """Wait until a Teensy message satisfies ``predicate`` (or, with
+        ``frames``, a measurement arrives), for at most ``timeout_s``.
 
-        return False
+        Everything received meanwhile is processed as usual. Without the
+        reader thread (connecting, stopping) the port is read here; otherwise
+        this watches what the reader thread processes.
+        """
+        deadline = time.monotonic() + timeout_s
+        start_count = self._sample_count
+
+        if not self._owns_reads():
+            seen = self._reply_seq
+            while True:
+                if frames and self._sample_count > start_count:
+                    return True
+                for seq, message in list(self._replies):
+                    if seq > seen:
+                        seen = seq
+                        if predicate(message):
+                            return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(POLL_S, remaining))
+
+        if self._frame_decoder is None:
+            self._frame_decoder = FrameDecoder()
+        decoder = self._frame_decoder
+        serial_fd = self._serial.fileno()
+        while True:
+            if frames and self._sample_count > start_count:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([serial_fd], [], [], remaining)
+            if not readable:
+                continue
+            data = read_available(serial_fd)
+            received = time.monotonic()
+            if self._recorder is not None:
+                self._recorder.rx(data, received)
+            lines, batch = decoder.feed(data)
+            if len(batch):
+                self._process_frames(batch, received)
+            matched = False
+            for line in lines:
+                message = self._process_message(line, received)
+                if message is not None and predicate(message):
+                    matched = True
+            if matched:
+                return True
 
     def _try_auto_detection(self) -> bool:
         """Attempt to auto-detect Teensy on different port as fallback."""
@@ -376,36 +516,37 @@ class UARTFlowSensor:
     def _connect_to_port(self, port: str) -> bool:
         """Connect to a specific port (helper for auto-detection)."""
         try:
-            if self._serial and self._serial.is_open:
-                self._serial.close()
-                time.sleep(0.5)
-
-            self._serial = serial.Serial(
-                port=port,
-                baudrate=self.baud_rate,
-                timeout=self.timeout,
-                write_timeout=self.timeout,
-            )
-
-            time.sleep(3.5)  # Teensy initialization time (Pi needs longer than Mac)
-
-            if self._test_connection_robust():
-                self._connected = True
+            if self._open_when_ready(port, self.CONNECT_TIMEOUT_S):
                 self._logger.info(f"Connected to Teensy on auto-detected port {port}")
                 return True
-
         except Exception as e:
             self._logger.debug(f"Failed to connect to auto-detected port {port}: {e}")
 
         return False
 
     def _start_sensor(self) -> None:
-        """Send start command to Teensy."""
+        """Send start command to Teensy and wait for it to confirm."""
+        if self.binary_frames:
+            try:
+                self._send_command(FORMAT_COMMAND)
+            except Exception as e:
+                self._logger.debug(f"Frame format negotiation failed: {e}")
         command = {"cmd": "start", "rate": self.sampling_hz}
         self._send_command(command)
+        self._stream_started_at = time.monotonic()
+        self._stats.stream_started(self.sampling_hz)
 
-        # Wait for confirmation
-        time.sleep(0.5)
+        # Wait for confirmation: the "Sensor started" status, a start error or
+        # the first frame. A silent sensor is caught by the stream checks.
+        try:
+            if not self._read_until(_is_start_reply, self.START_ACK_TIMEOUT_S, frames=True):
+                self._logger.debug(
+                    f"No start confirmation within {self.START_ACK_TIMEOUT_S}s; continuing"
+                )
+        except OSError:
+            raise
+        except Exception as e:
+            self._logger.debug(f"Waiting for start confirmation failed: {e}")
 
     def _send_command(self, command: dict) -> None:
         """Send JSON command to Teensy."""
@@ -416,6 +557,8 @@ class UARTFlowSensor:
             command_str = json.dumps(command) + '\n'
             self._serial.write(command_str.encode('utf-8'))
             self._serial.flush()
+            if self._recorder is not None:
+                self._recorder.tx(command_str.encode('utf-8'))
         except Exception as e:
             if "Input/output error" in str(e) or "write failed" in str(e):
                 raise ConnectionError(f"USB connection lost during command: {e}")
@@ -425,75 +568,90 @@ class UARTFlowSensor:
     def _reader_loop(self) -> None:
         """Background thread to read data from Teensy.
 
+        Blocks in ``select`` on the serial descriptor and the wakeup pipe
+        until bytes arrive, another thread pokes it (stop, suspend/resume),
+        or the next ping / stats / frame-timeout deadline is due.
+
         Best Practices:
         - Defensive programming: Handle all exception types gracefully
         - Observability: Log key metrics (sample rate, queue depth, errors)
         - Resource management: Monitor frame timeouts for hang detection
         """
-        self._last_frame_time = time.time()  # Initialize frame activity monitor
-        last_stats_log = time.time()  # For periodic health logging
-        stats_interval_s = 10.0  # Log stats every 10 seconds
+        now = time.monotonic()
+        self._last_frame_time = now  # Initialize frame activity monitor
+        last_snapshot = now  # For the periodic stream telemetry snapshot
+        # Keep bytes the connect probe already buffered
+        if self._frame_decoder is None:
+            self._frame_decoder = FrameDecoder()
+        decoder = self._frame_decoder
+        wakeup = self._wakeup
+        wakeup_fd = wakeup.fileno()
 
         while self._running:
             try:
                 if not self._serial or not self._serial.is_open:
-                    time.sleep(0.1)
+                    self._wait_for_wakeup(0.1)
                     continue
-                # Allow strategy to temporarily suspend reads during noisy valve switching
+                # Allow strategy to temporarily suspend reads during noisy valve
+                # switching; bytes wait in the kernel buffer until resumed.
                 if self._reads_suspended:
-                    time.sleep(0.01)
+                    self._wait_for_wakeup(1.0)
                     continue
 
+                now = time.monotonic()
+                frame_deadline = self._last_frame_time + self._frame_timeout_s
+
                 # Check for frame activity timeout (detects firmware hangs)
-                if not self._recovering and (
-                    time.time() - self._last_frame_time > self._frame_timeout_s
-                ):
+                if not self._recovering and now > frame_deadline:
                     self._logger.error(
                         f"No frames received for {self._frame_timeout_s}s - firmware may be hung, attempting recovery..."
                     )
+                    decoder.clear()
                     if self._attempt_reconnection():
                         self._logger.info("Frame stream restored after recovery")
-                        self._last_frame_time = time.time()
+                        self._last_frame_time = time.monotonic()
                     else:
                         self._logger.error("Recovery failed, will retry")
-                        time.sleep(1.0)
+                        self._wait_for_wakeup(1.0)
                     continue
 
-                # Periodic health stats logging (observability best practice)
-                now = time.time()
-                if now - last_stats_log >= stats_interval_s:
-                    queue_depth = self._data_queue.qsize()
-                    time_since_last_frame = now - self._last_frame_time
-                    avg_rate = (
-                        self._sample_count / (now - last_stats_log + stats_interval_s)
-                        if self._sample_count > 0
-                        else 0
-                    )
-                    self._logger.debug(
-                        f"Stream health: samples={self._sample_count}, errors={self._error_count}, "
-                        f"queue={queue_depth}/100, last_frame={time_since_last_frame:.1f}s ago, "
-                        f"rate={avg_rate:.1f} Hz"
-                    )
-                    last_stats_log = now
+                # Periodic stream telemetry snapshot (observability best practice)
+                if now - last_snapshot >= SNAPSHOT_INTERVAL_S:
+                    self._log_stream_snapshot()
+                    last_snapshot = now
+
+                deadlines = [last_snapshot + SNAPSHOT_INTERVAL_S]
+                if not self._recovering:
+                    deadlines.append(frame_deadline)
 
                 # Check for periodic ping
-                if (not self._pings_suspended) and (
-                    time.time() - self._last_ping > self._ping_interval
-                ):
-                    self._send_command({"cmd": "status"})
-                    self._last_ping = time.time()
-
-                # Read data
-                if self._serial.in_waiting:
-                    line = self._serial.readline().decode('utf-8').strip()
-                    if line:
-                        self._process_message(line)
-                else:
-                    time.sleep(0.001)  # Small delay to prevent CPU spinning
+                if not self._pings_suspended:
+                    if now - self._last_ping > self._ping_interval:
+                        self._send_command({"cmd": "status"})
+                        self._last_ping = now
+                    deadlines.append(self._last_ping + self._ping_interval)
+
+                # Sleep until data, a wakeup, or the next deadline
+                serial_fd = self._serial.fileno()
+                timeout = max(0.0, min(deadlines) - now)
+                readable, _, _ = select.select([serial_fd, wakeup_fd], [], [], timeout)
+                if wakeup_fd in readable:
+                    wakeup.drain()
+                if serial_fd in readable:
+                    data = read_available(serial_fd)
+                    received = time.monotonic()
+                    if self._recorder is not None:
+                        self._recorder.rx(data, received)
+                    lines, frames = decoder.feed(data)
+                    if len(frames):
+                        self._process_frames(frames, received)
+                    for line in lines:
+                        self._process_message(line, received)
 
             except Exception as e:
                 self._logger.error(f"Reader loop error: {e}")
                 self._error_count += 1
+                decoder.clear()
 
                 # Attempt to recover connection on I/O errors
                 if "Input/output error" in str(e) or "write failed" in str(e):
@@ -501,67 +659,60 @@ class UARTFlowSensor:
                     if self._attempt_reconnection():
                         self._logger.info("USB connection restored")
                         self._error_count = 0  # Reset error count on successful reconnection
-                        self._last_frame_time = time.time()  # Reset activity monitor
+                        self._last_frame_time = time.monotonic()  # Reset activity monitor
                     else:
                         self._logger.error("USB reconnection failed")
-                        time.sleep(1.0)  # Longer delay on connection failure
+                        self._wait_for_wakeup(1.0)  # Longer delay on connection failure
                 else:
-                    time.sleep(0.1)
+                    self._wait_for_wakeup(0.1)
+
+    def _wait_for_wakeup(self, timeout: float) -> None:
+        """Sleep up to ``timeout`` seconds, returning early on a wakeup."""
+        wakeup = self._wakeup
+        if wakeup is None:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select([wakeup.fileno()], [], [], timeout)
+        if readable:
+            wakeup.drain()
 
     def suspend_reads(self, suspend: bool) -> None:
         """Suspend or resume reading frames from the serial port."""
         self._reads_suspended = suspend
+        if self._wakeup is not None:
+            self._wakeup.notify()
         if suspend:
             self._logger.debug("Serial reads suspended.")
         else:
             self._logger.debug("Serial reads resumed.")
 
     def _attempt_reconnection(self) -> bool:
-        """Attempt to reconnect to Teensy after connection loss."""
-        try:
-            # Close existing connection
-            if self._serial and self._serial.is_open:
-                try:
-                    self._serial.close()
-                except:
-                    pass
+        """Attempt to reconnect to Teensy after connection loss.
 
-            # Wait for device to settle
-            time.sleep(2.0)
-
-            # Try to reopen connection
-            self._serial = serial.Serial(self.port, self.baud_rate, timeout=self.timeout)
-            time.sleep(3.5)  # Allow Teensy to initialize fully (Pi needs longer than Mac)
+        Waits (up to RECONNECT_TIMEOUT_S) for the device node to come back
+        and the firmware to answer, then restarts streaming.
+        """
+        self._stats.recovery_started(reconnect=True)
+        try:
+            if not self._open_when_ready(self.port, self.RECONNECT_TIMEOUT_S):
+                # Attempt auto-detection on alternate port (e.g., ACM0 -> ACM1)
+                self._logger.info("Primary reconnection failed; attempting port auto-detection...")
+                return self._try_auto_detection()
 
-            # Test connection with ping
-            test_successful = self._test_connection_robust()
-            if test_successful:
-                # Attempt a clean stop->start sequence to clear Teensy I2C state
-                try:
-                    self._send_command({"cmd": "stop"})
-                    time.sleep(0.1)
-                except Exception:
-                    pass
-                # Retry start up to 3 times with small backoff
-                for attempt in range(3):
-                    try:
-                        self._start_sensor()
-                        break
-                    except Exception:
-                        time.sleep(0.2 * (attempt + 1))
-                return True
-            else:
-                # Close and attempt auto-detection on alternate port (e.g., ACM0 -> ACM1)
+            # Attempt a clean stop->start sequence to clear Teensy I2C state
+            try:
+                self._send_command({"cmd": "stop"})
+                self._read_until(_is_stop_reply, self.STOP_ACK_TIMEOUT_S)
+            except Exception:
+                pass
+            # Retry start up to 3 times with small backoff
+            for attempt in range(3):
                 try:
-                    self._serial.close()
+                    self._start_sensor()
+                    break
                 except Exception:
-                    pass
-
-                # Attempt auto-detection fallback
-                self._logger.info("Primary reconnection failed; attempting port auto-detection...")
-                if self._try_auto_detection():
-                    return True
-                return False
+                    time.sleep(0.2 * (attempt + 1))
+            return True
 
         except Exception as e:
             self._logger.error(f"Reconnection attempt failed: {e}")
@@ -573,51 +724,74 @@ class UARTFlowSensor:
             except Exception:
                 pass
             return False
+        finally:
+            self._stats.recovery_finished()
+
+    def _process_message(self, line: str, host_time: Optional[float] = None) -> Optional[dict]:
+        """Process JSON message from Teensy (received at ``host_time``).
 
-    def _process_message(self, line: str) -> None:
-        """Process JSON message from Teensy."""
+        Returns the decoded message, or None if it was not valid JSON.
+        """
+        if host_time is None:
+            host_time = time.monotonic()
         try:
             message = json.loads(line)
             msg_type = message.get("type")
+            if msg_type != "measurement":
+                self._reply_seq += 1
+                self._replies.append((self._reply_seq, message))
 
             if msg_type == "measurement":
                 flow_raw = message.get("flow", 0.0)
                 temp = message.get("temp", 0.0)
+                device_time = message.get("time")
+                count = message.get("count")
 
                 # Apply calibration
                 flow_calibrated = (flow_raw - self.zero_offset) * self.span_scale
 
-                sample = FlowSample(flow_ml_min=flow_calibrated, temperature_c=temp)
+                sample = FlowSample(
+                    flow_ml_min=flow_calibrated,
+                    temperature_c=temp,
+                    timestamp_ms=int(device_time) if device_time is not None else None,
+                    count=int(count) if count is not None else None,
+                    host_time=host_time,
+                )
                 self._latest_sample = sample
                 self._sample_count += 1
+                self._stats.frame(sample.count, sample.timestamp_ms)
 
                 # Update frame activity timestamp (for hang detection)
-                self._last_frame_time = time.time()
+                self._last_frame_time = host_time
 
-                # Add to queue (non-blocking)
-                try:
-                    self._data_queue.put_nowait(sample)
-                except:
-                    # Queue full, drop oldest
-                    try:
-                        self._data_queue.get_nowait()
-                        self._data_queue.put_nowait(sample)
-                    except:
-                        pass
+                # Lock-free for the writer; never blocks the reader thread
+                self._ring.append(sample)
 
             elif msg_type == "error":
                 error_msg = message.get("error", "Unknown error")
 
                 # Handle partial/empty frames as benign idle/transient conditions
+                run = _CONSECUTIVE_RE.search(error_msg)
+                if run:
+                    # Reported on the 1st and every 50th failed read in a row
+                    self._fw_consecutive_errors = int(run.group(1))
+                    self._fw_errors = max(self._fw_errors, self._fw_consecutive_errors)
+                    self._fw_status_seq += 1
                 if "received" in error_msg.lower() and "bytes" in error_msg.lower():
                     # This is normal when no flow is present (idle state)
                     self._logger.debug(f"Sensor transient frame: {error_msg}")
+                elif "unknown command" in error_msg.lower() and "format" in error_msg.lower():
+                    # Older firmware: no binary framing, keep decoding JSON lines
+                    self._frame_format = "json"
+                    self._logger.info("Teensy firmware has no binary frames; using JSON lines")
                 else:
                     # Other errors are more significant
                     self._logger.warning(f"Teensy error: {error_msg}")
                     self._error_count += 1
                     # Attempt recovery on I2C NACK or start failure
                     eml = error_msg.lower()
+                    if "max consecutive errors" in eml:
+                        self._fw_halted = True
                     if "i2c error" in eml or "nack" in eml or "failed to start sensor" in eml:
                         try:
                             self._recover_i2c_error()
@@ -631,14 +805,75 @@ class UARTFlowSensor:
                             pass
 
             elif msg_type == "status":
+                if "format" in message:
+                    self._frame_format = str(message["format"])
+                    self._logger.info(f"Teensy frame format: {self._frame_format}")
+                if "started" in str(message.get("message", "")).lower():
+                    self._fw_halted = False  # the firmware cleared its counters
+                    self._fw_consecutive_errors = 0
+                self._update_fw_errors(message)
                 self._logger.debug(f"Teensy status: {message.get('message', '')}")
 
+            elif msg_type == "sensor_status":
+                if "consecutive_errors" in message:
+                    self._fw_consecutive_errors = int(message["consecutive_errors"])
+                self._update_fw_errors(message)
+
+            return message
+
         except json.JSONDecodeError:
             self._logger.warning(f"Invalid JSON from Teensy: {line}")
             self._error_count += 1
+            self._stats.parse_errors += 1
         except Exception as e:
             self._logger.error(f"Message processing error: {e}")
             self._error_count += 1
+        return None
+
+    def _update_fw_errors(self, message: dict) -> None:
+        if "errors" in message:
+            self._fw_errors = int(message["errors"])
+            self._fw_status_seq += 1
+
+    def request_health(self) -> None:
+        """Ask the firmware for its error counters; the reply updates health()."""
+        self._send_command({"cmd": "status"})
+
+    def health(self, window_s: float = 1.0) -> SensorHealth:
+        """Firmware error counters and the frame rate received over ``window_s``."""
+        now = time.monotonic()
+        expected = self.sampling_hz if self._running else 0.0
+        window_s = min(window_s, now - self._stream_started_at)
+        if window_s < 0.25:
+            frame_rate = expected  # too soon after start to judge
+        else:
+            frame_rate = len(self._ring.samples_between(now - window_s, now)) / window_s
+        return SensorHealth(
+            fw_errors=self._fw_errors,
+            fw_consecutive_errors=self._fw_consecutive_errors,
+            fw_halted=self._fw_halted,
+            frame_rate_hz=frame_rate,
+            expected_rate_hz=expected,
+            last_frame_age_s=now - self._last_frame_time if self._sample_count else math.inf,
+            status_seq=self._fw_status_seq,
+        )
+
+    def _process_frames(self, batch: FrameBatch, host_time: Optional[float] = None) -> None:
+        """Store a batch of decoded binary measurement frames."""
+        if host_time is None:
+            host_time = time.monotonic()
+        flow = batch.scaled_flow(self.zero_offset, self.span_scale)
+        self._ring.extend(host_time, batch.time_ms, flow, batch.temp_c, batch.count)
+        self._latest_sample = FlowSample(
+            flow_ml_min=float(flow[-1]),
+            temperature_c=float(batch.temp_c[-1]),
+            timestamp_ms=int(batch.time_ms[-1]),
+            count=int(batch.count[-1]),
+            host_time=host_time,
+        )
+        self._sample_count += len(batch)
+        self._stats.batch(batch.count, batch.time_ms)
+        self._last_frame_time = host_time
 
     def _recover_i2c_error(self) -> None:
         """Attempt to recover from I2C NACK/start failures per SLF3x best practices.
@@ -647,6 +882,7 @@ class UARTFlowSensor:
         if self._recovering:
             return
         self._recovering = True
+        self._stats.recovery_started()
         try:
             # Suspend pings during recovery
             self._pings_suspended = True
@@ -670,6 +906,7 @@ class UARTFlowSensor:
         finally:
             self._pings_suspended = False
             self._recovering = False
+            self._stats.recovery_finished()
 
     # Public reset hook for strategies/tests
     def reset(self) -> bool:
@@ -704,13 +941,10 @@ class UARTFlowSensor:
         Returns:
             Number of measurements cleared
         """
-        cleared_count = 0
-        try:
-            while not self._data_queue.empty():
-                self._data_queue.get_nowait()
-                cleared_count += 1
-        except Empty:
-            pass
+        with self._read_lock:
+            end = self._ring.written
+            cleared_count = min(end - self._read_seq, self._ring.capacity)
+            self._read_seq = end
 
         if cleared_count > 0:
             self._logger.debug(f"Cleared {cleared_count} stale measurements from queue")
@@ -750,17 +984,13 @@ class UARTFlowSensor:
                 return False
 
         # Recovery path: Sensor running but not streaming (firmware hung)
-        # Adopt test file pattern: explicit stop → wait → start
+        # Adopt test file pattern: explicit stop → start. stop() waits for the
+        # firmware's confirmation and start() for streaming frames, so no
+        # fixed shutdown or warm-up sleeps are needed.
         self._logger.warning("Sensor running but not streaming, attempting restart recovery...")
         try:
-            # Stop sensor cleanly
-            self._send_command({"cmd": "stop"})
-            time.sleep(0.5)  # Critical: wait for clean shutdown
-            self._running = False
-
-            # Fresh start
+            self.stop()
             self.start()
-            time.sleep(0.5)  # Critical: wait for sensor warm-up (datasheet: 60ms typical)
 
             # Verify streaming
             if self.wait_for_frames(min_frames=min_frames, timeout_s=timeout_s):
@@ -786,8 +1016,11 @@ class UARTFlowSensor:
             return None
 
         try:
-            # Try to get latest sample from queue
-            sample = self._data_queue.get_nowait()
+            # Oldest unread sample
+            samples = self._consume(1)
+            if not samples:
+                return None
+            sample = samples[0]
 
             # Convert mL/min to μL/min for interface compatibility
             flow_ul_min = sample.flow_ml_min * 1000.0
@@ -796,13 +1029,46 @@ class UARTFlowSensor:
 
             return (flow_ul_min, temp_c, flags)
 
-        except Empty:
-            # No new data available
-            return None
         except Exception as e:
             self._logger.error(f"Error reading sample: {e}")
             return None
 
+    @property
+    def ring(self) -> FlowSampleRing:
+        """The sample ring buffer, for window queries that consume nothing."""
+        return self._ring
+
+    def _consume(self, limit: Optional[int] = None) -> List[FlowSample]:
+        """Advance the read cursor over up to ``limit`` unread samples."""
+        with self._read_lock:
+            window, lost = self._ring.since(self._read_seq, copy=True)
+            if lost:
+                self._overrun_count += lost
+                self._stats.overflow_drops += lost
+                self._logger.warning(f"Flow consumer fell behind: {lost} samples overwritten")
+            if limit is not None:
+                window = window.head(limit)
+            self._read_seq = window.end_seq
+        return [FlowSample(**vars(sample)) for sample in window.to_samples()]
+
+    def read_sample(self) -> Optional[FlowSample]:
+        """Take the oldest unread FlowSample (with device time and count), or None."""
+        if not self._running:
+            return None
+        samples = self._consume(1)
+        return samples[0] if samples else None
+
+    def drain_samples(self) -> List[FlowSample]:
+        """Take every unread FlowSample, oldest first.
+
+        Delivery loops call this once per iteration and integrate the batch
+        on the device timestamps, so a stretched loop iteration costs no
+        accuracy (as long as it stays within the ring's capacity).
+        """
+        if not self._running:
+            return []
+        return self._consume()
+
     async def read(self) -> AsyncIterator[FlowSample]:
         """
         Async generator for continuous flow readings.
@@ -811,11 +1077,9 @@ class UARTFlowSensor:
             FlowSample objects with calibrated flow data
         """
         while self._running:
-            sample = self.read_one()
+            sample = self.read_sample()
             if sample:
-                flow_ul_min, temp_c, _ = sample
-                flow_ml_min = flow_ul_min / 1000.0
-                yield FlowSample(flow_ml_min=flow_ml_min, temperature_c=temp_c)
+                yield sample
             else:
                 await asyncio.sleep(1.0 / self.sampling_hz)
 
@@ -841,9 +1105,75 @@ class UARTFlowSensor:
         """Return port identifier."""
         return self.port
 
+    def _open_recording(self) -> None:
+        """Open ``record_path`` (if set) and mark the start of a session."""
+        if not self.record_path:
+            return
+        try:
+            if self._recorder is None or self._recorder.closed:
+                self._recorder = FlowRecorder(self.record_path)
+            self._recorder.session(
+                port=self.port,
+                sampling_hz=self.sampling_hz,
+                zero_offset_ml_min=self.zero_offset,
+                span_scale=self.span_scale,
+                binary_frames=self.binary_frames,
+            )
+        except OSError as e:
+            self._logger.error(f"Cannot record flow stream to {self.record_path}: {e}")
+            self._recorder = None
+
+    def record_event(self, name: str, **fields) -> None:
+        """Add an annotation (e.g. a valve switching) to the recording, if any."""
+        if self._recorder is not None:
+            self._recorder.event(name, **fields)
+
     def close(self) -> None:
         """Close sensor connection."""
         self.stop()
+        if self._wakeup is not None:
+            self._wakeup.close()
+            self._wakeup = None
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def stream_stats(self, roll: bool = False) -> dict:
+        """Stream telemetry (see utils/stream_stats.py), plus queue and CRC counts."""
+        decoder = self._frame_decoder
+        return self._stats.snapshot(
+            roll=roll,
+            crc_errors=decoder.crc_errors if decoder else 0,
+            resync_bytes=decoder.discarded if decoder else 0,
+            queue_depth=min(self._ring.written - self._read_seq, self._ring.capacity),
+            last_frame_age_s=(
+                round(time.monotonic() - self._last_frame_time, 3) if self._sample_count else None
+            ),
+        )
+
+    @property
+    def stream_snapshot(self) -> Optional[dict]:
+        """The reader loop's last periodic telemetry snapshot, if any yet."""
+        return self._stats.last_snapshot
+
+    def _log_stream_snapshot(self) -> None:
+        previous = self._stats.last_snapshot or {}
+        snapshot = self.stream_stats(roll=True)
+        jitter = snapshot['jitter_ms']
+        message = (
+            f"Stream: {snapshot['rate_hz']:.1f}/{snapshot['expected_hz']:.0f} Hz, "
+            f"jitter p50/p99={jitter['p50']}/{jitter['p99']} ms, "
+            f"dropped={snapshot['dropped_frames']}, parse_errors={snapshot['parse_errors']}, "
+            f"crc_errors={snapshot['crc_errors']}, overflow={snapshot['overflow_drops']}, "
+            f"queue={snapshot['queue_depth']}/{self._ring.capacity}, "
+            f"reconnects={snapshot['reconnects']}, recovery={snapshot['recovery_s']:.1f}s"
+        )
+        # Anything lost since the last snapshot is worth an INFO line
+        lost = ('dropped_frames', 'parse_errors', 'crc_errors', 'overflow_drops', 'reconnects')
+        if any(snapshot[key] > previous.get(key, 0) for key in lost):
+            self._logger.info(message)
+        else:
+            self._logger.debug(message)
 
     def get_status(self) -> dict:
         """Get sensor status information."""
@@ -855,4 +1185,26 @@ class UARTFlowSensor:
             "errors": self._error_count,
             "latest_flow": self._latest_sample.flow_ml_min if self._latest_sample else None,
             "latest_temp": self._latest_sample.temperature_c if self._latest_sample else None,
+            "frame_format": self._frame_format,
+            "crc_errors": self._frame_decoder.crc_errors if self._frame_decoder else 0,
+            "recording": self._recorder.path if self._recorder is not None else None,
+            "fw_errors": self._fw_errors,
+            "fw_halted": self._fw_halted,
+            "connect_timings": (
+                self.connect_timings.as_dict() if self.connect_timings is not None else None
+            ),
+            "stream": self.stream_stats(),
         }
+
+
+def _is_pong(message: dict) -> bool:
+    return message.get("type") == "pong"
+
+
+def _is_start_reply(message: dict) -> bool:
+    text = str(message.get("message", message.get("error", ""))).lower()
+    return message.get("type") in ("status", "error") and "start" in text
+
+
+def _is_stop_reply(message: dict) -> bool:
+    return message.get("type") == "status" and "stopped" in str(message.get("message", "")).lower()
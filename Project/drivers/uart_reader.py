@@ -0,0 +1,131 @@
+"""Event-driven building blocks for reading the Teensy's line protocol.
+
+``UARTFlowSensor._reader_loop`` used to poll ``serial.in_waiting`` and sleep
+1 ms between checks (10 ms while reads were suspended), which costs CPU on a
+Pi and adds up to a millisecond of latency per frame. The reader now blocks
+in ``select`` on the serial file descriptor plus a :class:`Wakeup` pipe, so
+it sleeps until bytes arrive or another thread wants its attention (stop,
+suspend/resume, ping schedule changes), reads whatever is available in one
+``os.read`` and splits it into JSON lines and binary measurement frames with
+:class:`drivers.teensy_frames.FrameDecoder`.
+
+:class:`AsyncLineReader` is the same reader for code that already runs an
+asyncio loop: it registers the descriptor with ``loop.add_reader`` and calls
+back per complete line (and per batch of frames), with no thread of its own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+
+from drivers.teensy_frames import FrameBatch, FrameDecoder
+
+READ_CHUNK = 4096
+
+
+class Wakeup:
+    """A self-pipe another thread writes to so a ``select`` returns early."""
+
+    def __init__(self) -> None:
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def notify(self) -> None:
+        try:
+            os.write(self._write_fd, b'\0')
+        except (BlockingIOError, OSError):
+            pass  # pipe full (a wakeup is already pending) or closed
+
+    def drain(self) -> None:
+        try:
+            while os.read(self._read_fd, 512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self) -> None:
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def read_available(fd: int) -> bytes:
+    """One non-blocking read of whatever is waiting on ``fd``.
+
+    Raises ConnectionError on EOF, which for a tty means the device went away
+    (USB unplugged, Teensy rebooting).
+    """
+    try:
+        data = os.read(fd, READ_CHUNK)
+    except BlockingIOError:
+        return b''
+    if not data:
+        raise ConnectionError("Input/output error: serial device closed")
+    return data
+
+
+class AsyncLineReader:
+    """Deliver lines from ``fd`` to ``on_line`` via ``loop.add_reader``.
+
+    Binary measurement frames go to ``on_frames`` (dropped if it is None).
+    """
+
+    def __init__(
+        self,
+        fd: int,
+        on_line: Callable[[str], None],
+        on_error: Optional[Callable[[Exception], None]] = None,
+        on_frames: Optional[Callable[[FrameBatch], None]] = None,
+    ) -> None:
+        self._fd = fd
+        self._on_line = on_line
+        self._on_error = on_error
+        self._on_frames = on_frames
+        self._decoder = FrameDecoder()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def attached(self) -> bool:
+        return self._loop is not None
+
+    def attach(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Start reading on ``loop`` (default: the running loop)."""
+        if self._loop is not None:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+    def detach(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            self._loop.remove_reader(self._fd)
+        finally:
+            self._loop = None
+            self._decoder.clear()
+
+    def _on_readable(self) -> None:
+        try:
+            data = read_available(self._fd)
+        except (ConnectionError, OSError) as e:
+            self.detach()
+            if self._on_error is not None:
+                self._on_error(e)
+            else:
+                self._logger.error(f"Serial reader stopped: {e}")
+            return
+        lines, frames = self._decoder.feed(data)
+        if len(frames) and self._on_frames is not None:
+            self._on_frames(frames)
+        for line in lines:
+            self._on_line(line)
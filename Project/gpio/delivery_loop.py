@@ -0,0 +1,112 @@
+"""Long-lived asyncio loop thread that runs DeliveryStrategy coroutines.
+
+RelayWorker used to build a fresh ``asyncio.new_event_loop()`` for every
+delivery and retry, then block its own Qt thread in ``run_until_complete``
+until the valve closed. While blocked it could not run its scheduler, service
+queued slots (``stop()``), or do anything but wait. :class:`DeliveryLoop`
+replaces that with one loop on a dedicated daemon thread for the life of the
+schedule:
+
+- :meth:`DeliveryLoop.submit` hands a coroutine to the loop with
+  ``asyncio.run_coroutine_threadsafe`` and returns its
+  ``concurrent.futures.Future`` immediately;
+- :meth:`DeliveryLoop.submit_serial` does the same but holds a loop-side
+  ``asyncio.Lock`` around the coroutine, so deliveries that share the master
+  valve and flow sensor never overlap, while other coroutines (cancellation,
+  sensor I/O) still run concurrently;
+- :meth:`DeliveryLoop.close` cancels whatever is still running, which lets
+  the strategies' ``finally`` blocks close their valves, then stops the loop.
+
+The caller reports completion back to its own thread (RelayWorker does this
+with a queued Qt signal from a future done-callback).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Awaitable, Callable, Optional
+
+_logger = logging.getLogger(__name__)
+
+
+class DeliveryLoop:
+    """An asyncio event loop running forever on its own thread."""
+
+    def __init__(self, name: str = 'DeliveryLoop') -> None:
+        self._loop = asyncio.new_event_loop()
+        self._serial: Optional[asyncio.Lock] = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._serial = asyncio.Lock()
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    # ------------------------------------------------------------------ API
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def thread(self) -> threading.Thread:
+        return self._thread
+
+    @property
+    def is_running(self) -> bool:
+        return not self._closed and self._thread.is_alive()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule ``coro`` on the loop; returns its future immediately."""
+        if self._closed:
+            coro.close()
+            raise RuntimeError("DeliveryLoop is closed")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def submit_serial(self, coro_fn: Callable[[], Awaitable]) -> concurrent.futures.Future:
+        """Like :meth:`submit`, but one serial coroutine runs at a time.
+
+        ``coro_fn`` is called on the loop thread once the previous serial
+        coroutine has finished, so its arguments are evaluated then.
+        """
+
+        async def _serialised():
+            async with self._serial:
+                return await coro_fn()
+
+        return self.submit(_serialised())
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """Cancel outstanding coroutines and stop the loop thread. Idempotent.
+
+        Returns False if the thread did not exit within ``timeout``.
+        """
+        if self._closed:
+            return not self._thread.is_alive()
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result(timeout)
+        except Exception as exc:
+            _logger.warning("Delivery loop shutdown did not finish cleanly: %s", exc)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    async def _cancel_all(self) -> None:
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._loop.shutdown_asyncgens()
@@ -0,0 +1,167 @@
+"""Priority-queue scheduler for RelayWorker deliveries.
+
+RelayWorker used to create one QTimer per delivery and per retry, keep every
+one of them in ``self.timers`` for the life of the schedule, and poll
+``isActive()`` over the whole list once a second to notice it was done. A
+multi-week instant schedule meant thousands of live timers and a scan that
+never got shorter. :class:`DeliveryScheduler` replaces that with:
+
+- a binary heap of pending calls ordered by ``(deadline, seq)`` — O(log n)
+  insert; :meth:`cancel` marks the entry, and it is discarded when it reaches
+  the top. The heap is rebuilt whenever cancelled entries outnumber live ones,
+  so memory tracks what is actually pending;
+- one single-shot ``QTimer`` armed for the earliest live deadline. Long waits
+  are armed in chunks of at most :data:`MAX_ARM_MS`, so multi-week delays
+  never hit Qt's 32-bit millisecond limit;
+- a live :attr:`pending` count and a :attr:`drained` signal emitted when the
+  last pending call has run, so completion is event-driven.
+
+Callbacks run on the thread that owns the scheduler (the worker thread once
+RelayWorker is moved there), one at a time, in deadline order; calls with
+equal deadlines run in the order they were scheduled.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Callable, List
+
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+
+# Longest single QTimer interval we arm; later deadlines re-arm on wakeup.
+MAX_ARM_MS = 24 * 60 * 60 * 1000
+
+_logger = logging.getLogger(__name__)
+
+
+class ScheduledCall:
+    """Handle for one pending call, returned by :meth:`DeliveryScheduler.call_later`."""
+
+    __slots__ = ('deadline', 'seq', 'callback', 'cancelled', 'done')
+
+    def __init__(self, deadline: float, seq: int, callback: Callable[[], object]) -> None:
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.cancelled = False
+        self.done = False
+
+    def __lt__(self, other: 'ScheduledCall') -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    @property
+    def active(self) -> bool:
+        """True until the call has run or been cancelled."""
+        return not (self.cancelled or self.done)
+
+
+class DeliveryScheduler(QObject):
+    """Runs callbacks at their deadlines from a heap and one QTimer."""
+
+    # Emitted after a wakeup that ran the last pending call. Cancelling
+    # calls never emits it — cancellation is teardown, not completion.
+    drained = pyqtSignal()
+
+    def __init__(self, parent=None, clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__(parent)
+        self._clock = clock
+        self._heap: List[ScheduledCall] = []
+        self._seq = itertools.count()
+        self._pending = 0
+        self._cancelled = 0
+        # Bumped by cancel_all() so a wakeup that was interrupted by it
+        # (a callback calling RelayWorker.stop()) does not report drained.
+        self._epoch = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        # One timer for everything: ask for ms accuracy rather than Qt's
+        # default 5% coarse slack (minutes, on an hours-long wait).
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._run_due)
+
+    @property
+    def pending(self) -> int:
+        """Calls scheduled and neither run nor cancelled yet."""
+        return self._pending
+
+    def call_later(self, delay_s: float, callback: Callable[[], object]) -> ScheduledCall:
+        """Run ``callback()`` once ``delay_s`` seconds from now."""
+        entry = ScheduledCall(self._clock() + max(0.0, delay_s), next(self._seq), callback)
+        heapq.heappush(self._heap, entry)
+        self._pending += 1
+        if self._heap[0] is entry:
+            self._arm()
+        return entry
+
+    def call_at(self, when: datetime, callback: Callable[[], object]) -> ScheduledCall:
+        """Run ``callback()`` at wall-clock time ``when`` (immediately if past)."""
+        return self.call_later((when - datetime.now()).total_seconds(), callback)
+
+    def cancel(self, entry: ScheduledCall) -> bool:
+        """Cancel a pending call. False if it already ran or was cancelled."""
+        if not entry.active:
+            return False
+        entry.cancelled = True
+        self._pending -= 1
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) // 2:
+            self._compact()
+        if self._heap and self._heap[0].cancelled:
+            self._arm()
+        return True
+
+    def cancel_all(self) -> int:
+        """Cancel every pending call and stop the timer. Returns how many."""
+        count = self._pending
+        for entry in self._heap:
+            entry.cancelled = True
+        self._heap.clear()
+        self._pending = 0
+        self._cancelled = 0
+        self._epoch += 1
+        self._timer.stop()
+        return count
+
+    # ------------------------------------------------------------- internals
+
+    def _compact(self) -> None:
+        self._heap = [entry for entry in self._heap if not entry.cancelled]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def _pop_cancelled(self) -> None:
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+    def _arm(self) -> None:
+        self._pop_cancelled()
+        if not self._heap:
+            self._timer.stop()
+            return
+        delay_ms = math.ceil((self._heap[0].deadline - self._clock()) * 1000)
+        self._timer.start(min(max(0, delay_ms), MAX_ARM_MS))
+
+    def _run_due(self) -> None:
+        epoch = self._epoch
+        ran = False
+        while True:
+            self._pop_cancelled()
+            if not self._heap or self._heap[0].deadline > self._clock():
+                break
+            entry = heapq.heappop(self._heap)
+            entry.done = True
+            self._pending -= 1
+            ran = True
+            try:
+                entry.callback()
+            except Exception:
+                _logger.exception("Scheduled delivery callback failed")
+        self._arm()
+        if ran and self._pending == 0 and epoch == self._epoch:
+            self.drained.emit()
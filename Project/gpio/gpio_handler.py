@@ -2,10 +2,12 @@
 
 import logging
 import os
-import time
+import threading
 
 from models.relay_unit import RelayUnit
 
+from gpio.pump_timeline import build_timeline, run_timeline
+
 # Prefer the vendor's standard module by default. Only use the custom module
 # when explicitly enabled via environment (to avoid multi-bus side effects).
 USE_CUSTOM_SM16 = os.getenv('RRR_USE_CUSTOM_SM16', '0') == '1'
@@ -63,18 +65,27 @@ if not USE_CUSTOM_SM16 or not 'USING_CUSTOM_MODULE' in globals() or not USING_CU
             SM16relind = MockSM16relind
             USING_CUSTOM_MODULE = False
 
+RELAYS_PER_HAT = 16
+ALL_RELAYS_ON = (1 << RELAYS_PER_HAT) - 1  # 65535
+# The vendor module always opens /dev/i2c-1; only the custom module takes a bus.
+STANDARD_MODULE_BUS = 1
+
 
 class RelayHandler:
     def __init__(self, relay_unit_manager, num_hats=1):
         """Initialize RelayHandler with relay unit manager and hats"""
         self.num_hats = num_hats
         self.relay_hats = []
-
-        # Initialize I2C coordinator for hardware-level conflict prevention
-        if I2C_COORDINATION_AVAILABLE:
-            self._coordinator = get_i2c_coordinator()
-        else:
-            self._coordinator = None
+        # Last state written to each HAT (bit n = relay n + 1). The boards
+        # are write-only, so every change is applied to this shadow and the
+        # whole HAT is written with one set_all(mask). The lock makes the
+        # read-modify-write atomic across threads (GUI, delivery loop).
+        self._shadow = []
+        self._shadow_lock = threading.Lock()
+        # I2C bus of each HAT, and the coordinator arbitrating each bus in
+        # use (hardware-level conflict prevention); filled by _initialize_hats.
+        self._hat_buses = []
+        self._coordinators = {}
 
         # Initialize relay units dictionary from manager
         self.relay_units = {}
@@ -132,6 +143,9 @@ class RelayHandler:
           - Supports bus_id; iterate detected I2C buses and stacks.
         """
         self.relay_hats = []
+        self._shadow = []
+        self._hat_buses = []
+        self._coordinators = {}
 
         success = False
 
@@ -145,6 +159,8 @@ class RelayHandler:
                         hat = SM16relind(stack=stack, bus_id=bus)
                         hat.set_all(0)
                         self.relay_hats.append(hat)
+                        self._shadow.append(0)
+                        self._hat_buses.append(bus)
                         print(f"Initialized relay hat stack={stack} on I2C bus {bus}")
                         success = True
                     except Exception as e:
@@ -153,6 +169,7 @@ class RelayHandler:
                 error_msg = "Failed to initialize relay hats via custom module on preferred buses."
                 print(error_msg)
                 logging.error(error_msg)
+            self._init_coordinators()
             return
 
         # Standard module path: use stack indices only
@@ -164,6 +181,8 @@ class RelayHandler:
                 hat = ctor(stack)
                 hat.set_all(0)
                 self.relay_hats.append(hat)
+                self._shadow.append(0)
+                self._hat_buses.append(STANDARD_MODULE_BUS)
                 print(f"Initialized relay hat stack={stack}")
                 success = True
             except Exception as e:
@@ -176,36 +195,118 @@ class RelayHandler:
             )
             print(error_msg)
             logging.error(error_msg)
+        self._init_coordinators()
+
+    def _init_coordinators(self):
+        """One I2C coordinator per bus with a HAT on it."""
+        if I2C_COORDINATION_AVAILABLE:
+            self._coordinators = {bus: get_i2c_coordinator(bus) for bus in set(self._hat_buses)}
 
     def set_all_relays(self, state):
         """Set all relays to given state (0 or 1) with I2C coordination"""
+        mask = 0 if state == 0 else ALL_RELAYS_ON
 
         def _hardware_set_all_operation():
-            for hat in self.relay_hats:
-                try:
-                    hat.set_all(0 if state == 0 else 65535)  # 65535 = all relays ON
-                except Exception as e:
-                    print(f"Error setting all relays: {e}")
-                    logging.error(f"Relay state error: {str(e)}")
-
-        # Use I2C coordination if available
-        if self._coordinator:
-            try:
-                self._coordinator.sync_exclusive_access('relay', _hardware_set_all_operation)
-            except Exception as e:
-                logging.error(f"I2C coordination failed for set_all operation: {e}")
-                _hardware_set_all_operation()
-        else:
-            _hardware_set_all_operation()
+            with self._shadow_lock:
+                for hat_index, hat in enumerate(self.relay_hats):
+                    self._shadow[hat_index] = mask
+                    try:
+                        hat.set_all(mask)
+                    except Exception as e:
+                        print(f"Error setting all relays: {e}")
+                        logging.error(f"Relay state error: {str(e)}")
+
+        self._with_bus(_hardware_set_all_operation, 'set_all')
+
+    def apply_states(self, states):
+        """Set several relays at once: ``{relay_id: 0 or 1, ...}``.
+
+        The changes are applied to each HAT's shadow state and every HAT
+        addressed gets a single ``set_all(mask)`` write, all within one I2C
+        coordinator access: closing or opening any number of relays costs
+        one bus transaction per HAT instead of one (plus the coordinator's
+        stabilisation delay) per relay. A HAT is written even when its mask
+        is unchanged, so a close always reaches the hardware.
+
+        Returns:
+            True if every write succeeded. A failed write still records the
+            requested state, so later writes keep carrying it.
+        """
+        masks = {}
+        for relay_id, state in states.items():
+            hat_index, bit = divmod(int(relay_id) - 1, RELAYS_PER_HAT)
+            if not 0 <= hat_index < len(self.relay_hats):
+                logging.error(f"Relay {relay_id} is not on an initialized HAT")
+                continue
+            set_bits, clear_bits = masks.get(hat_index, (0, 0))
+            if state:
+                masks[hat_index] = (set_bits | 1 << bit, clear_bits & ~(1 << bit))
+            else:
+                masks[hat_index] = (set_bits & ~(1 << bit), clear_bits | 1 << bit)
+        if not masks:
+            return not states
+
+        ok = [True]
+
+        def _hardware_relay_operation():
+            with self._shadow_lock:
+                for hat_index, (set_bits, clear_bits) in sorted(masks.items()):
+                    mask = (self._shadow[hat_index] | set_bits) & ~clear_bits
+                    self._shadow[hat_index] = mask
+                    try:
+                        self.relay_hats[hat_index].set_all(mask)
+                    except Exception as e:
+                        ok[0] = False
+                        print(f"Error writing relay mask {mask:#06x} to HAT {hat_index}: {e}")
+                        logging.error(f"Relay state change error: {str(e)}")
+
+        self._with_bus(_hardware_relay_operation, 'relay', masks)
+        return ok[0]
+
+    def relay_state(self, relay_id):
+        """Last state written to ``relay_id`` (0 or 1), or None if it has no HAT."""
+        hat_index, bit = divmod(int(relay_id) - 1, RELAYS_PER_HAT)
+        if not 0 <= hat_index < len(self._shadow):
+            return None
+        return (self._shadow[hat_index] >> bit) & 1
+
+    def _with_bus(self, operation, name, hat_indices=None):
+        """Run ``operation`` holding the buses of ``hat_indices`` (default: all HATs).
 
-    def trigger_relays(self, selected_units, num_triggers, stagger):
-        """Triggers the specified relay units with verification"""
+        Only those buses' coordinators are taken, in bus order so two
+        multi-bus writes cannot deadlock; HATs on other buses are not held up.
+        """
+        if hat_indices is None:
+            hat_indices = range(len(self._hat_buses))
+        buses = sorted({self._hat_buses[i] for i in hat_indices})
+        coordinators = [self._coordinators[bus] for bus in buses if bus in self._coordinators]
+
+        def _locked(remaining):
+            if not remaining:
+                return operation()
+            return remaining[0].sync_exclusive_access('relay', _locked, remaining[1:])
+
+        if not coordinators:
+            operation()
+            return
+        try:
+            _locked(coordinators)
+        except Exception as e:
+            logging.error(f"I2C coordination failed for {name} operation: {e}")
+            # Fall back to direct control
+            operation()
+
+    def trigger_relays(
+        self, selected_units, num_triggers, stagger, min_interval_s=0.0, cancel=None
+    ):
+        """Triggers the specified relay units together (see trigger_units)"""
         relay_info = []
 
         if not self.relay_hats:
             logging.error("Trigger requested but no relay hats are initialized")
             return []
 
+        unit_triggers = {}
         for unit_id in selected_units:
             # Get relay unit from dictionary
             relay_unit = self.relay_units.get(unit_id)
@@ -216,83 +317,71 @@ class RelayHandler:
                 continue
 
             # Get number of triggers for this specific unit
-            unit_triggers = num_triggers.get(str(unit_id))
-            if unit_triggers is None:
+            unit_triggers_count = num_triggers.get(str(unit_id))
+            if unit_triggers_count is None:
                 print(f"No trigger count specified for relay unit {unit_id}")
                 continue
+            unit_triggers[unit_id] = unit_triggers_count
 
-            success = self._execute_triggers(relay_unit, unit_triggers, stagger)
-
+        results = self.trigger_units(unit_triggers, stagger, min_interval_s, cancel)
+        for unit_id, success in results.items():
             if success:
-                relay_info.append(f"Relay Unit {unit_id} triggered {unit_triggers} times")
+                relay_info.append(f"Relay Unit {unit_id} triggered {unit_triggers[unit_id]} times")
 
         return relay_info
 
-    def _execute_triggers(self, relay_unit, num_triggers, stagger):
-        """Execute the specified number of triggers for a relay unit"""
-        try:
-            for trigger in range(num_triggers):
-                # Log trigger attempt
-                print(
-                    f"Executing trigger {trigger + 1}/{num_triggers} "
-                    f"for relay unit {relay_unit.unit_id}"
-                )
-
-                # Activate relays
-                for relay_id in relay_unit.relay_ids:
-                    self._set_relay_states([relay_id], 1)
-
-                # Wait for activation duration
-                time.sleep(stagger)
-
-                # Deactivate relays
-                for relay_id in relay_unit.relay_ids:
-                    self._set_relay_states([relay_id], 0)
+    def trigger_units(self, unit_triggers, stagger, min_interval_s=0.0, cancel=None):
+        """Trigger several relay units on one merged timeline.
 
-                # Wait between triggers
-                if trigger < num_triggers - 1:  # Don't wait after last trigger
-                    time.sleep(stagger)
-
-            return True
+        ``unit_triggers`` maps unit_id to a trigger count. Each trigger is
+        ``stagger`` seconds on and at least ``stagger`` off, with trigger
+        starts at least ``min_interval_s`` apart; all units run at the same
+        time, every edge written with one apply_states() call, so the call
+        takes about as long as the longest unit. Setting ``cancel`` (a
+        threading.Event) stops early with the units' relays off.
 
+        Returns:
+            {unit_id: True if all its triggers were written}
+        """
+        trains = {}
+        for unit_id, count in unit_triggers.items():
+            relay_unit = self.relay_units.get(unit_id)
+            if relay_unit is None:
+                logging.error(f"Relay unit {unit_id} not found")
+                continue
+            trains[unit_id] = (relay_unit.relay_ids, count)
+            print(f"Triggering relay unit {unit_id} {count} times")
+        results = {unit_id: False for unit_id in unit_triggers}
+        if not trains:
+            return results
+        try:
+            steps = build_timeline(trains, stagger, stagger, min_interval_s)
+            outcome = run_timeline(steps, self.apply_states, cancel=cancel)
         except Exception as e:
             logging.error(f"Trigger execution error: {str(e)}")
-            return False
+            self.apply_states({r: 0 for ids, _count in trains.values() for r in ids})
+            return results
+        if outcome.max_late_s > 0.05:
+            logging.warning(f"Trigger timeline ran up to {outcome.max_late_s * 1000:.0f}ms late")
+        for unit_id, (_relay_ids, count) in trains.items():
+            results[unit_id] = (
+                unit_id not in outcome.failed and outcome.triggers.get(unit_id, 0) == count
+            )
+        return results
 
     def _set_relay_states(self, relay_ids, state):
         """Set the state of specified relay IDs with I2C coordination"""
-
-        def _hardware_relay_operation():
-            for relay_id in relay_ids:
-                hat_index, relay_num = divmod(relay_id - 1, 16)
-                if hat_index < len(self.relay_hats):
-                    try:
-                        self.relay_hats[hat_index].set(relay_num + 1, state)
-                    except Exception as e:
-                        print(f"Error setting relay {relay_id} to state {state}: {e}")
-                        logging.error(f"Relay state change error: {str(e)}")
-
-        # Use I2C coordination if available, otherwise fall back to direct control
-        if self._coordinator:
-            try:
-                self._coordinator.sync_exclusive_access('relay', _hardware_relay_operation)
-            except Exception as e:
-                logging.error(f"I2C coordination failed for relay operation: {e}")
-                # Fall back to direct control
-                _hardware_relay_operation()
-        else:
-            _hardware_relay_operation()
+        return self.apply_states({relay_id: state for relay_id in relay_ids})
 
     def set_relays(self, relay_ids, state):
         """Public method to set one or more relay channels ON (1) or OFF (0).
 
         This wraps the internal `_set_relay_states` and should be preferred by
         higher-level controllers (e.g., solenoid controller) instead of calling
-        `_execute_triggers` when a sustained ON/OFF state is desired.
+        `trigger_units` when a sustained ON/OFF state is desired.
         """
         try:
-            self._set_relay_states(relay_ids, 1 if state else 0)
-            return True
+            return self._set_relay_states(relay_ids, 1 if state else 0)
         except Exception as e:
             logging.error(f"set_relays error: {str(e)}")
             return False
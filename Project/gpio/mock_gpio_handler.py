@@ -5,7 +5,8 @@ class MockSM16relind:
 
     def set_all(self, state):
         print(f"MockSM16relind set all relays to state {state}")
-        self.relay_states = [state] * 16
+        # Bit n of the mask is relay n + 1, as on the board
+        self.relay_states = [(state >> bit) & 1 for bit in range(16)]
 
     def set(self, relay, state):
         print(f"MockSM16relind relay {relay} set to state {state}")
@@ -0,0 +1,147 @@
+"""Precision valve pulses: hybrid sleep/spin timing with the achieved width.
+
+Pulse mode timed a valve's open time with ``asyncio.sleep(pulse_s)``, and
+the calibrator with a 10 ms polling loop, so a 10-50 ms pulse carried
+several milliseconds of scheduler jitter, which is volume error per pulse.
+:func:`precise_pulse` runs one pulse synchronously on the calling thread
+(:func:`precise_pulses` several valves opened together and closed in
+width order):
+
+- the valve is opened, then the thread sleeps until ``SPIN_S`` before the
+  deadline and busy-waits on ``time.perf_counter_ns`` for the rest;
+- the close is started early by the open write's own duration (at most
+  ``MAX_WRITE_LEAD_S``), so the close *completes* about ``width_s`` after
+  the open did;
+- the returned :class:`PulseResult` has the achieved open time (open write
+  completed to close write completed) and both edges on the
+  ``time.monotonic()`` clock the flow samples use.
+
+It blocks for the whole pulse, so it belongs on a dedicated thread: the
+relay I/O thread (``gpio/relay_io.py``), which can opt into ``SCHED_FIFO``
+and a CPU affinity with :func:`enable_realtime`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+_logger = logging.getLogger(__name__)
+
+SPIN_S = 0.002  # busy-wait the last 2 ms; time.sleep overshoots by up to ~1 ms
+# Cap on starting a close early by the open write's duration: a relay write
+# takes well under this, and a stalled open write must not cut the pulse short.
+MAX_WRITE_LEAD_S = 0.002
+
+
+@dataclass
+class PulseResult:
+    """Requested and achieved open time of one pulse (seconds)."""
+
+    requested_s: float
+    achieved_s: float
+    started_at: float  # time.monotonic() when the open write started
+    opened_at: float  # time.monotonic() when the open write completed
+    closed_at: float  # time.monotonic() when the close write completed
+
+    @property
+    def error_s(self) -> float:
+        return self.achieved_s - self.requested_s
+
+
+def sleep_until_ns(deadline_ns: int, spin_s: float = SPIN_S) -> None:
+    """Sleep until ``time.perf_counter_ns() >= deadline_ns``, spinning at the end."""
+    remaining_s = (deadline_ns - time.perf_counter_ns()) / 1e9
+    if remaining_s > spin_s:
+        time.sleep(remaining_s - spin_s)
+    while time.perf_counter_ns() < deadline_ns:
+        pass
+
+
+def precise_pulse(
+    open_fn: Callable[[], object],
+    close_fn: Callable[[], object],
+    width_s: float,
+    spin_s: float = SPIN_S,
+) -> PulseResult:
+    """Open, hold ``width_s``, close; returns the achieved timing.
+
+    The close always runs, even if the wait is interrupted. An exception
+    from ``open_fn`` propagates without a close being written.
+    """
+    return precise_pulses(open_fn, [(width_s, close_fn)], spin_s)[0]
+
+
+def precise_pulses(
+    open_fn: Callable[[], object],
+    closes: Sequence[Tuple[float, Callable[[], object]]],
+    spin_s: float = SPIN_S,
+) -> List[PulseResult]:
+    """One open write, then each ``(width_s, close_fn)`` edge on its own deadline.
+
+    For several valves opened together and closed in width order (parallel
+    pulse delivery). Returns one :class:`PulseResult` per close, in the
+    order given. Every close runs even if a wait or an earlier close raises;
+    the first exception is re-raised once all of them have. An exception
+    from ``open_fn`` propagates without a close being written.
+    """
+    order = sorted(range(len(closes)), key=lambda i: closes[i][0])
+    started_at = time.monotonic()
+    started = time.perf_counter_ns()
+    open_fn()
+    opened = time.perf_counter_ns()
+    # Assume each close write takes as long as the open write did
+    lead = min(opened - started, int(MAX_WRITE_LEAD_S * 1e9))
+    results: List[Optional[PulseResult]] = [None] * len(closes)
+    error: Optional[BaseException] = None
+    for i in order:
+        width_s, close_fn = closes[i]
+        if error is None:
+            try:
+                sleep_until_ns(opened + int(width_s * 1e9) - lead, spin_s)
+            except BaseException as exc:
+                error = exc
+        try:
+            close_fn()
+        except BaseException as exc:
+            error = error or exc
+        closed = time.perf_counter_ns()
+        results[i] = PulseResult(
+            requested_s=width_s,
+            achieved_s=(closed - opened) / 1e9,
+            started_at=started_at,
+            opened_at=started_at + (opened - started) / 1e9,
+            closed_at=started_at + (closed - started) / 1e9,
+        )
+    if error is not None:
+        raise error
+    return results
+
+
+def enable_realtime(priority: int = 0, cpus: Optional[Iterable[int]] = None) -> bool:
+    """Move the calling thread to ``SCHED_FIFO`` ``priority`` and pin it to ``cpus``.
+
+    On Linux both apply to the calling thread only. Either is skipped when
+    not requested (``priority`` 0, no ``cpus``). Failures (no CAP_SYS_NICE,
+    not Linux) are logged and leave the thread as it was.
+
+    Returns:
+        True if everything requested was applied.
+    """
+    ok = True
+    if cpus:
+        try:
+            os.sched_setaffinity(0, set(cpus))
+        except (AttributeError, OSError) as e:
+            _logger.warning(f"Could not pin relay timing thread to CPUs {list(cpus)}: {e}")
+            ok = False
+    if priority:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(int(priority)))
+        except (AttributeError, OSError) as e:
+            _logger.warning(f"Could not enable SCHED_FIFO priority {priority}: {e}")
+            ok = False
+    return ok
@@ -0,0 +1,123 @@
+"""Merged on/off timeline for triggering several pump relay units at once.
+
+``RelayHandler.trigger_relays`` used to run each unit's triggers one after
+another, ``time.sleep(stagger)`` on and off, so sixteen pumps took sixteen
+times as long as one. :func:`build_timeline` merges every unit's trigger
+train into one list of :class:`Step` instants, each carrying the relay
+states to write at that moment; :func:`run_timeline` walks it on a
+monotonic clock, sleeping to absolute deadlines (a slow write does not push
+later edges back) and writing each instant with a single ``apply_states``
+call, i.e. one ``set_all`` mask per HAT however many pumps switch together.
+
+A unit's triggers start at least ``min_interval_s`` apart (on edge to on
+edge) and never closer than ``on_s + off_s``. All units start together, so
+a cycle takes about as long as its longest train.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+
+@dataclass
+class Step:
+    """Relay states to write ``at_s`` seconds into the timeline."""
+
+    at_s: float
+    states: Dict[int, int]
+    # Units with an edge at this step, and those whose trigger ends here
+    units: Set[Any] = field(default_factory=set)
+    ends: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class TimelineResult:
+    completed: bool  # False if cancelled part-way
+    triggers: Dict[Any, int]  # triggers finished per unit
+    failed: Set[Any]  # units with a failed relay write
+    duration_s: float = 0.0
+    max_late_s: float = 0.0  # worst lateness of a write against its deadline
+
+
+def build_timeline(
+    trains: Mapping[Any, Tuple[Sequence[int], int]],
+    on_s: float,
+    off_s: float,
+    min_interval_s: Union[float, Mapping[Any, float]] = 0.0,
+) -> List[Step]:
+    """Merge ``{unit_id: (relay_ids, triggers)}`` into one ordered list of steps.
+
+    Edges falling on the same instant are coalesced into one step. If a relay
+    belongs to two units and one turns it off as the other turns it on, on
+    wins.
+    """
+    if on_s <= 0:
+        raise ValueError("on_s must be positive")
+    offs: Dict[float, Dict[int, int]] = {}
+    ons: Dict[float, Dict[int, int]] = {}
+    ends: Dict[float, List[Any]] = {}
+    units: Dict[float, Set[Any]] = {}
+    for unit_id, (relay_ids, triggers) in trains.items():
+        if isinstance(min_interval_s, Mapping):
+            interval = float(min_interval_s.get(unit_id, 0.0))
+        else:
+            interval = float(min_interval_s)
+        period = max(on_s + off_s, interval)
+        for n in range(int(triggers)):
+            on_at = round(n * period, 6)
+            off_at = round(n * period + on_s, 6)
+            ons.setdefault(on_at, {}).update({int(r): 1 for r in relay_ids})
+            offs.setdefault(off_at, {}).update({int(r): 0 for r in relay_ids})
+            ends.setdefault(off_at, []).append(unit_id)
+            units.setdefault(on_at, set()).add(unit_id)
+            units.setdefault(off_at, set()).add(unit_id)
+    steps = []
+    for at_s in sorted(set(ons) | set(offs)):
+        states = dict(offs.get(at_s, {}))
+        states.update(ons.get(at_s, {}))
+        steps.append(Step(at_s, states, units[at_s], ends.get(at_s, [])))
+    return steps
+
+
+def run_timeline(
+    steps: Sequence[Step],
+    apply_states: Callable[[Dict[int, int]], bool],
+    *,
+    cancel: Optional[threading.Event] = None,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> TimelineResult:
+    """Write ``steps`` at their offsets from now; returns what was done.
+
+    Setting ``cancel`` stops the run at the next deadline and switches every
+    relay in the timeline off. A failed write is recorded against the units
+    with an edge in it and the run carries on, so their off edges still go out.
+    """
+    relays = {relay for step in steps for relay in step.states}
+    result = TimelineResult(completed=True, triggers={}, failed=set())
+    start = clock()
+    for step in steps:
+        deadline = start + step.at_s
+        while True:
+            if cancel is not None and cancel.is_set():
+                result.completed = False
+                apply_states({relay: 0 for relay in relays})
+                result.duration_s = clock() - start
+                return result
+            remaining = deadline - clock()
+            if remaining <= 0:
+                break
+            if cancel is not None:
+                cancel.wait(remaining)
+            else:
+                sleep(remaining)
+        result.max_late_s = max(result.max_late_s, clock() - deadline)
+        if not apply_states(step.states):
+            result.failed.update(step.units)
+        for unit_id in step.ends:
+            result.triggers[unit_id] = result.triggers.get(unit_id, 0) + 1
+    result.duration_s = clock() - start
+    return result
@@ -0,0 +1,163 @@
+"""Relay I/O thread: valve switching off the delivery event loop.
+
+The strategies switched valves with synchronous ``SolenoidController`` calls
+from inside their coroutines, so the delivery loop stalled for the I2C write
+and the coordinator's arbitration right when a valve opened, which is when
+the pulse timing and the sensor drain matter most. :class:`RelayIOThread`
+owns relay writes for a schedule run:
+
+- commands (a callable and its arguments) go into a FIFO queue stamped with
+  the time they were requested, and are executed one at a time, in order,
+  on a dedicated daemon thread; :meth:`RelayIOThread.submit` returns a
+  ``concurrent.futures.Future`` and :meth:`RelayIOThread.run` awaits it
+  without blocking the event loop;
+- each future resolves to an :class:`Actuation` carrying the command's
+  result and when the write started and completed, so volume integration
+  can line valve edges up with the flow sensor's ``host_time`` stamps
+  (both ``time.monotonic()``).
+
+Because commands run in order, a close submitted after an open can never
+overtake it, even if the coroutine that awaited the open was cancelled.
+Whole valve pulses run here too (``gpio/pulse_timing.py``), so the thread
+can be given a ``SCHED_FIFO`` priority and CPUs to keep their timing tight.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from gpio.pulse_timing import enable_realtime
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Actuation:
+    """Outcome and timing of one relay command (``time.monotonic()`` seconds)."""
+
+    result: Any
+    requested_at: float
+    started_at: float
+    actuated_at: float
+
+    @property
+    def queued_s(self) -> float:
+        return self.started_at - self.requested_at
+
+    @property
+    def write_s(self) -> float:
+        return self.actuated_at - self.started_at
+
+
+def actuate(
+    fn: Callable,
+    *args,
+    requested_at: Optional[float] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Actuation:
+    """Call ``fn(*args)`` in place and time it as an :class:`Actuation`.
+
+    ``clock`` lets a caller running on a patched clock (flow replay) stamp
+    the edges on the same clock as its samples.
+    """
+    started_at = clock()
+    result = fn(*args)
+    return Actuation(
+        result=result,
+        requested_at=started_at if requested_at is None else requested_at,
+        started_at=started_at,
+        actuated_at=clock(),
+    )
+
+
+class RelayIOThread:
+    """A daemon thread executing relay commands from a FIFO queue.
+
+    ``realtime_priority`` (``SCHED_FIFO``, 1-99) and ``cpus`` are applied to
+    the thread when it starts; without the privilege they are logged and
+    the thread runs with normal scheduling.
+    """
+
+    def __init__(
+        self,
+        relay_handler=None,
+        name: str = 'RelayIO',
+        *,
+        realtime_priority: int = 0,
+        cpus: Optional[Iterable[int]] = None,
+    ) -> None:
+        self._relay_handler = relay_handler
+        self._realtime_priority = int(realtime_priority or 0)
+        self._cpus = list(cpus or [])
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        if self._realtime_priority or self._cpus:
+            enable_realtime(self._realtime_priority, self._cpus)
+        while True:
+            command = self._queue.get()
+            if command is None:
+                return
+            future, fn, args, requested_at = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(actuate(fn, *args, requested_at=requested_at))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    # ------------------------------------------------------------------ API
+
+    @property
+    def thread(self) -> threading.Thread:
+        return self._thread
+
+    @property
+    def pending(self) -> int:
+        """Commands queued and not yet started (approximate)."""
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable, *args) -> concurrent.futures.Future:
+        """Queue ``fn(*args)``; the future resolves to its :class:`Actuation`."""
+        if self._closed:
+            raise RuntimeError("RelayIOThread is closed")
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._queue.put((future, fn, args, time.monotonic()))
+        return future
+
+    async def run(self, fn: Callable, *args) -> Actuation:
+        """Queue ``fn(*args)`` and await its :class:`Actuation`."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None) -> Actuation:
+        """Queue ``fn(*args)`` and block until it has run (keeps FIFO order)."""
+        return self.submit(fn, *args).result(timeout)
+
+    async def apply(self, states: Dict[int, int]) -> Actuation:
+        """Await ``RelayHandler.apply_states(states)`` on this thread."""
+        if self._relay_handler is None:
+            raise RuntimeError("RelayIOThread has no relay handler")
+        return await self.run(self._relay_handler.apply_states, states)
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """Run the commands already queued, then stop the thread. Idempotent.
+
+        Returns False if the thread did not exit within ``timeout``.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            _logger.warning("Relay I/O thread did not stop within %.1fs", timeout)
+        return not self._thread.is_alive()
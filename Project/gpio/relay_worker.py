@@ -1,4 +1,4 @@
-import asyncio
+import concurrent.futures
 import logging
 import threading
 import time
@@ -6,11 +6,16 @@ from datetime import datetime, timedelta
 from functools import partial
 
 from drivers.solenoid_controller import SolenoidController
+from models.db.delivery_journal import DeliveryJournal
 from PyQt5.QtCore import QMutex, QMutexLocker, QObject, QTimer, pyqtSignal, pyqtSlot
 from strategies.factory import StrategyFactory
 from utils.calibration import CalibrationStore
 from utils.volume_calculator import VolumeCalculator
 
+from gpio.delivery_loop import DeliveryLoop
+from gpio.delivery_scheduler import DeliveryScheduler
+from gpio.relay_io import RelayIOThread
+
 """
 RelayWorker is a QObject-based class that manages the triggering of relays based on a schedule.
 
@@ -29,6 +34,9 @@ Methods:
     
     trigger_relay(relay_unit_id, water_volume):
         Triggers the specified relay unit and sends a notification.
+
+    trigger_pumps(volumes):
+        Triggers several relay units at once on one merged timeline.
     
     stop():
         Stops the relay worker, including all scheduled timers, and emits the finished signal.
@@ -43,6 +51,10 @@ class RelayWorker(QObject):
     progress = pyqtSignal(str)
     volume_updated = pyqtSignal(str, float)  # animal_id, total_volume
     window_progress = pyqtSignal(dict)  # window progress info
+    # Delivery-loop thread -> worker thread: (future, result), where result is
+    # a bool, or {cage_id: bool} for a batch. Queued, so all
+    # bookkeeping after a strategy delivery runs on the worker thread.
+    _delivery_finished = pyqtSignal(object, object)
 
     def __init__(self, settings, relay_handler, notification_handler, system_controller):
         super().__init__()
@@ -71,21 +83,34 @@ class RelayWorker(QObject):
         self.relay_handler = relay_handler
         self.notification_handler = notification_handler
         self.database_handler = settings.get('database_handler')
+        # Write-behind dispensing_history journal; opened in run_cycle() on
+        # the worker thread, flushed and closed by stop().
+        self.delivery_journal = None
         self.pump_controller = settings.get('pump_controller')
         self.timing_calculator = settings.get('timing_calculator')
         self.mutex = QMutex()
         self._is_running = False
         # Worker-level cooperative-cancel flag. Set directly by the GUI
-        # thread via request_cancel() when Stop is pressed (the worker
-        # thread is blocked in run_until_complete and can't service the
-        # queued stop() slot). Checked at the top of the cycle loops and
-        # before each delivery so the worker stops scheduling new work and
-        # returns from run_until_complete promptly — so Stop no longer has
-        # to fall through to thread.terminate(). See the v1.8.2 -> v1.8.3
-        # write-up. threading.Event because the write crosses threads.
+        # thread via request_cancel() when Stop is pressed, before the queued
+        # stop() slot runs. Checked at the top of the cycle loops and before
+        # each delivery so the worker stops scheduling new work — so Stop no
+        # longer has to fall through to thread.terminate(). See the v1.8.2 ->
+        # v1.8.3 write-up. threading.Event because the write crosses threads.
         self._cancel_requested = threading.Event()
-        self.timers = []
-        # Track per-animal retry timers to avoid duplicate scheduling
+        # Strategy deliveries run on one long-lived asyncio loop thread
+        # (created on first use) instead of a new event loop per delivery
+        # blocking this worker's thread. _in_flight maps each submitted
+        # future to its deliveries until _delivery_finished comes back.
+        self.delivery_loop = None
+        self._in_flight = {}
+        # Solenoid strategies switch valves on this thread (created with
+        # the strategy) so relay writes never block the delivery loop.
+        self.relay_io = None
+        self._delivery_finished.connect(self._on_delivery_finished)
+        # Every delivery, retry and cycle wakeup goes through one heap-backed
+        # scheduler (one QTimer). Parented so it moves to the worker thread.
+        self.scheduler = DeliveryScheduler(self)
+        # Track per-animal pending retries to avoid duplicate scheduling
         self.retry_timers = {}
 
         # Initialize main_timer
@@ -94,6 +119,10 @@ class RelayWorker(QObject):
         # Retrieve mode and delivery instants from worker settings
         self.mode = settings.get('mode', 'instant').lower()
         self.delivery_instants = settings.get('delivery_instants', [])
+        if self.mode == 'instant':
+            # Finishes when the scheduler runs its last delivery/retry.
+            # Connected once here: run_instant_cycle may run again on resume.
+            self.scheduler.drained.connect(self.check_completion)
 
         # Window end behavior: allow continuing after window end until targets are met (best-practice for robustness)
         self.enforce_window_end = settings.get('enforce_window_end', False)
@@ -105,6 +134,16 @@ class RelayWorker(QObject):
         # Initialize tracking variables
         self.delivered_volumes = {}
         self.failed_deliveries = {}
+        # Crash-resume: run_program passes the checkpoint a previous process
+        # left for this schedule; _save_checkpoint() rewrites it after every
+        # delivery. Instant deliveries already made are keyed
+        # "<animal_id>@<scheduled time>".
+        self._resume_state = settings.get('resume_state')
+        self._completed_instants = set()
+        self._started_at = None
+        # delivery_totals of this schedule when the run started (None if
+        # unknown), so a resume reads this run's volumes from the aggregate.
+        self._totals_at_start = None
         self.window_start = datetime.fromtimestamp(settings['window_start'])
         self.window_end = datetime.fromtimestamp(settings['window_end'])
 
@@ -200,6 +239,13 @@ class RelayWorker(QObject):
         self._cancel_requested.clear()
         self.progress.emit(f"Starting {self.mode} cycle")
 
+        if self.delivery_journal is None and self.database_handler:
+            try:
+                self.delivery_journal = DeliveryJournal(self.database_handler)
+            except Exception as e:
+                # Fall back to synchronous log_delivery (see _record_delivery).
+                self.progress.emit(f"Delivery journal unavailable, logging synchronously: {e}")
+
         # OPTIMIZATION: Perform deferred hardware init on worker thread
         # This keeps GUI responsive during slow sensor/hardware startup
         if not self._hardware_initialized:
@@ -211,9 +257,20 @@ class RelayWorker(QObject):
                 import traceback
 
                 traceback.print_exc()
+                self._close_journal()
                 self.finished.emit()
                 return
 
+        if self._resume_state:
+            self._restore_checkpoint(self._resume_state)
+            self._resume_state = None
+        elif self._started_at is None:
+            self._started_at = datetime.now().isoformat()
+            if self.database_handler:
+                self._totals_at_start = self.database_handler.get_delivery_totals(self.schedule_id)
+        # Written up front so a crash before the first delivery still resumes.
+        self._save_checkpoint()
+
         # Start monitoring timer (safe to start here in worker thread)
         if not self.monitor_timer.isActive():
             self.monitor_timer.start(10000)
@@ -312,10 +369,20 @@ class RelayWorker(QObject):
         master_id = int(system_settings.get('global_master_relay_id', 16))
         print(f"[DEBUG] Step 3b: master_id={master_id}, cage_map={cage_map}")
         solenoid = SolenoidController(self.relay_handler, master_id, cage_map)
+        if flow_sensor is not None and getattr(flow_sensor, 'record_path', None):
+            # Put valve switching into the flow recording for replay
+            solenoid.add_listener(flow_sensor.record_event)
         print(f"[DEBUG] Step 3b:  SolenoidController created")
 
         print(f"[DEBUG] Step 4: Creating strategy...")
         cal_store = CalibrationStore()
+        if self.relay_io is None:
+            self.relay_io = RelayIOThread(
+                self.relay_handler,
+                name=f"RelayIO-{self.schedule_id}",
+                realtime_priority=int(system_settings.get('relay_io_priority', 0) or 0),
+                cpus=system_settings.get('relay_io_cpus') or None,
+            )
         self.strategy = StrategyFactory.create(
             self.hardware_mode,
             solenoid_controller=solenoid,
@@ -325,6 +392,7 @@ class RelayWorker(QObject):
             pump_controller=self.pump_controller,
             volume_calculator=self.volume_calculator,
             database_handler=self.system_controller.database_handler,
+            relay_io=self.relay_io,
         )
         print(f"[DEBUG] Step 4:  Strategy created: {type(self.strategy)}")
 
@@ -411,6 +479,8 @@ class RelayWorker(QObject):
         with QMutexLocker(self.mutex):
             if not self.delivery_instants:
                 self.progress.emit("No delivery instants configured")
+                self._close_journal()
+                self._clear_checkpoint()
                 self.finished.emit()
                 return
 
@@ -438,7 +508,12 @@ class RelayWorker(QObject):
                             delivery_time.replace('Z', '+00:00')
                         )
 
-                    if delivery_time > current_time:
+                    instant_key = f"{instant['animal_id']}@{delivery_time.isoformat()}"
+                    if instant_key in self._completed_instants:
+                        # Delivered before a crash; the clock (no RTC on a Pi)
+                        # may not have caught up past it yet.
+                        self.progress.emit(f"Skipping delivery already made: {instant_key}")
+                    elif delivery_time > current_time:
                         base_delay = (delivery_time - current_time).total_seconds() * 1000
                         trigger_delay = idx * self.min_trigger_interval
                         total_delay = base_delay + trigger_delay
@@ -461,12 +536,12 @@ class RelayWorker(QObject):
                             'water_volume': instant['water_volume'],
                             'instant_time': delivery_time,
                             'triggers': None,
+                            'instant_key': instant_key,
                         }
-                        timer = QTimer(self)
-                        timer.setSingleShot(True)
-                        timer.timeout.connect(partial(self._handle_delivery, delivery_data.copy()))
-                        timer.start(int(total_delay))
-                        self.timers.append(timer)
+                        self.scheduler.call_later(
+                            total_delay / 1000,
+                            partial(self._handle_delivery, delivery_data.copy()),
+                        )
                         scheduled_count += 1
                     else:
                         self.progress.emit(f"Skipping past delivery time: {delivery_time}")
@@ -476,6 +551,8 @@ class RelayWorker(QObject):
 
         if scheduled_count == 0:
             self.progress.emit("No future deliveries to schedule")
+            self._close_journal()
+            self._clear_checkpoint()
             self.finished.emit()
         else:
             self.progress.emit(f"Scheduled {scheduled_count} deliveries")
@@ -590,13 +667,9 @@ class RelayWorker(QObject):
                     f"Current time ({current_time}) is before window start ({self.window_start})"
                 )
                 delay_seconds = (self.window_start - current_time).total_seconds()
-                # CRITICAL: Cap delay to prevent 32-bit signed int overflow in QTimer.singleShot
-                # Qt uses 32-bit signed int for ms (max 2,147,483,647 ms ≈ 24.8 days).
-                # Cap to 2 weeks (1,209,600,000 ms) which is safely within the limit.
-                # Reference: https://doc.qt.io/qt-5/qtimer.html#singleShot
-                MAX_TIMER_DELAY_MS = 1_209_600_000  # 2 weeks in milliseconds (14 days)
-                delay_ms = min(int(delay_seconds * 1000), MAX_TIMER_DELAY_MS)
-                self.main_timer.singleShot(delay_ms, self.run_staggered_cycle)
+                # The scheduler arms long waits in chunks, so no 32-bit
+                # QTimer overflow cap is needed here.
+                self.scheduler.call_later(delay_seconds, self.run_staggered_cycle)
                 return
 
             if current_time > self.window_end and self.enforce_window_end:
@@ -632,95 +705,14 @@ class RelayWorker(QObject):
                 self.progress.emit("Failed to schedule deliveries")
                 return
 
-            # CRITICAL: Cap cycle interval to prevent 32-bit signed int overflow in QTimer.singleShot
-            # Qt uses 32-bit signed int for ms (max 2,147,483,647 ms ≈ 24.8 days).
-            # For year-long schedules, cycle_interval can be millions of seconds.
-            # Cap to 2 weeks (1,209,600 seconds); timer will reschedule on next cycle.
-            # Reference: https://doc.qt.io/qt-5/qtimer.html#singleShot
-            MAX_CYCLE_INTERVAL_S = 1_209_600  # 2 weeks in seconds (14 days)
-            capped_cycle_interval = min(cycle_interval, MAX_CYCLE_INTERVAL_S)
-            next_cycle_ms = int(capped_cycle_interval * 1000)
-            self.main_timer.singleShot(next_cycle_ms, self.run_staggered_cycle)
+            # Year-long schedules give cycle intervals of millions of
+            # seconds; the scheduler re-arms in chunks, so no cap is needed.
+            self.scheduler.call_later(cycle_interval, self.run_staggered_cycle)
 
         except Exception as e:
             self.progress.emit(f"Error in staggered cycle: {str(e)}")
             self.check_window_completion()
 
-    async def execute_delivery(self, delivery_data):
-        """Execute delivery with volume tracking and compensation"""
-        try:
-            # Cooperative cancel: a delivery QTimer may fire after Stop was
-            # pressed. Don't start a new delivery; return fast so
-            # run_until_complete unwinds and the thread can exit.
-            if self._cancel_requested.is_set():
-                return False
-            animal_id = delivery_data['animal_id']
-            current_delivered = self.delivered_volumes.get(animal_id, 0)
-            failed_count = self.failed_deliveries.get(animal_id, 0)
-            # Window-optional (same as _handle_delivery): staggered has a
-            # cumulative window target + guard + compensation; instant retries
-            # are one-shot and use the delivery's own volume.
-            window = getattr(self, 'animal_windows', None)
-            window = window.get(animal_id) if window else None
-            if window is not None:
-                target_volume = window['target_volume']
-                if current_delivered >= target_volume:
-                    return True
-                if failed_count > 0:
-                    volume_increase = min(failed_count * 0.05, 0.2)
-                    adjusted_volume = delivery_data['water_volume'] * (1 + volume_increase)
-                    delivery_data['water_volume'] = min(
-                        adjusted_volume, target_volume - current_delivered
-                    )
-
-            success = await self.strategy.deliver(
-                relay_unit_id=delivery_data['relay_unit_id'],
-                target_volume_ml=delivery_data['water_volume'],
-                triggers_hint=delivery_data.get('triggers'),
-            )
-
-            if success:
-                with QMutexLocker(self.mutex):
-                    actual_volume = delivery_data['water_volume']
-                    self.delivered_volumes[animal_id] = current_delivered + actual_volume
-                    self.failed_deliveries[animal_id] = 0
-                    self.database_handler.log_delivery(
-                        {
-                            'schedule_id': delivery_data['schedule_id'],
-                            'animal_id': animal_id,
-                            'relay_unit_id': delivery_data['relay_unit_id'],
-                            'volume_delivered': actual_volume,
-                            'timestamp': delivery_data['instant_time'].isoformat(),
-                            'status': 'completed',
-                        }
-                    )
-
-                self.volume_updated.emit(str(animal_id), self.delivered_volumes[animal_id])
-                self.progress.emit(
-                    f"Delivered {actual_volume:.3f}mL to animal {animal_id} "
-                    f"(Total: {self.delivered_volumes[animal_id]:.3f}mL)"
-                )
-            else:
-                with QMutexLocker(self.mutex):
-                    self.failed_deliveries[animal_id] = failed_count + 1
-                    self.database_handler.log_delivery(
-                        {
-                            'schedule_id': delivery_data['schedule_id'],
-                            'animal_id': animal_id,
-                            'relay_unit_id': delivery_data['relay_unit_id'],
-                            'volume_delivered': 0,
-                            'timestamp': delivery_data['instant_time'].isoformat(),
-                            'status': 'failed',
-                        }
-                    )
-                self.schedule_retry(delivery_data)
-
-            return success
-
-        except Exception as e:
-            self.progress.emit(f"Delivery error: {str(e)}")
-            return False
-
     def schedule_retry(self, delivery_data):
         """Schedule a retry for failed delivery"""
         # Cooperative cancel: a delivery that "failed" because the operator
@@ -738,7 +730,7 @@ class RelayWorker(QObject):
         animal_id = delivery_data.get('animal_id')
         if animal_id in self.retry_timers:
             existing_timer = self.retry_timers.get(animal_id)
-            if existing_timer and existing_timer.isActive():
+            if existing_timer and existing_timer.active:
                 self.progress.emit(
                     f"Retry already scheduled for animal {animal_id}; skipping duplicate"
                 )
@@ -746,69 +738,260 @@ class RelayWorker(QObject):
             # Clean up stale mapping
             self.retry_timers.pop(animal_id, None)
         delivery_data['instant_time'] = retry_time
-        timer = QTimer(self)
-        timer.setSingleShot(True)
 
-        # Wrap coroutine execution in a thread-local event loop
+        # Same path as the original delivery (guard, compensation, strategy
+        # on the delivery loop); _handle_delivery returns once it is submitted.
         def _run_retry(d=delivery_data):
             try:
-                loop = asyncio.new_event_loop()
-                try:
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.execute_delivery(d))
-                finally:
-                    loop.close()
-                    asyncio.set_event_loop(None)
+                self._handle_delivery(d)
             except Exception as e:
                 self.progress.emit(f"Retry error: {str(e)}")
             finally:
-                # Remove timer mapping once it fires
-                try:
+                # Remove the mapping once it fires, unless a failed retry
+                # already replaced it with the next one.
+                if self.retry_timers.get(animal_id) is handle:
                     self.retry_timers.pop(animal_id, None)
-                except Exception:
-                    pass
-
-        timer.timeout.connect(_run_retry)
-        timer.start(retry_delay * 1000)
-        self.timers.append(timer)
-        # Track this retry timer
-        self.retry_timers[animal_id] = timer
+
+        # Track this retry
+        handle = self.scheduler.call_later(retry_delay, _run_retry)
+        self.retry_timers[animal_id] = handle
         self.progress.emit(
             f"Scheduled retry for animal {delivery_data['animal_id']} in {retry_delay} seconds"
         )
 
+    def _record_delivery(self, delivery_log):
+        """Queue a dispensing_history row without waiting on the database.
+
+        Goes through the write-behind DeliveryJournal when one is open;
+        otherwise (journal failed to open, or already closed by stop())
+        falls back to a synchronous log_delivery.
+        """
+        journal = getattr(self, 'delivery_journal', None)
+        if journal is not None:
+            try:
+                journal.submit(delivery_log)
+                return
+            except Exception as e:
+                print(f"[JOURNAL] submit failed, logging synchronously: {e}")
+        if self.database_handler:
+            self.database_handler.log_delivery(delivery_log)
+
+    def _close_delivery_loop(self):
+        """Cancel any in-flight strategy delivery and stop the loop thread."""
+        delivery_loop = getattr(self, 'delivery_loop', None)
+        if delivery_loop is None:
+            return
+        self.delivery_loop = None
+        # Results still queued for the worker thread are dropped on arrival.
+        self._in_flight.clear()
+        try:
+            if delivery_loop.close():
+                print("[STOP]  Delivery loop stopped")
+            else:
+                print("[STOP]  Delivery loop did not stop in time")
+        except Exception as e:
+            print(f"[STOP]  Delivery loop close failed: {e}")
+
+    def _close_relay_io(self):
+        """Finish queued valve writes and stop the relay I/O thread."""
+        relay_io = getattr(self, 'relay_io', None)
+        if relay_io is None:
+            return
+        self.relay_io = None
+        try:
+            if relay_io.close():
+                print("[STOP]  Relay I/O thread stopped")
+            else:
+                print("[STOP]  Relay I/O thread did not stop in time")
+        except Exception as e:
+            print(f"[STOP]  Relay I/O thread close failed: {e}")
+
+    def _close_journal(self):
+        """Flush outstanding delivery records and stop the journal writer."""
+        journal = getattr(self, 'delivery_journal', None)
+        if journal is None:
+            return
+        self.delivery_journal = None
+        try:
+            if journal.close():
+                print("[STOP]  Delivery journal flushed")
+            else:
+                print("[STOP]  Delivery journal flush timed out; records kept for replay")
+        except Exception as e:
+            print(f"[STOP]  Delivery journal close failed: {e}")
+
+    def _checkpoint_state(self):
+        """JSON-safe snapshot of this run's progress (call under self.mutex).
+
+        Dicts are stored as [key, value] pairs so animal_id keys keep their
+        type (str for staggered, int for instant) through JSON.
+        """
+        windows = []
+        for animal_id, window in (getattr(self, 'animal_windows', None) or {}).items():
+            windows.append(
+                [
+                    animal_id,
+                    {
+                        key: value.isoformat() if isinstance(value, datetime) else value
+                        for key, value in window.items()
+                    },
+                ]
+            )
+        totals = getattr(self, '_totals_at_start', None)
+        return {
+            'started_at': self._started_at,
+            'totals_at_start': None if totals is None else [[k, v] for k, v in totals.items()],
+            'delivered_volumes': [[k, v] for k, v in self.delivered_volumes.items()],
+            'failed_deliveries': [[k, v] for k, v in self.failed_deliveries.items()],
+            'animal_windows': windows,
+            'completed_instants': sorted(self._completed_instants),
+        }
+
+    def _save_checkpoint(self):
+        """Persist the current progress so a crash can resume from here."""
+        if not self.database_handler or self._cancel_requested.is_set():
+            # After Stop the checkpoint is being cleared; don't resurrect it.
+            return
+        try:
+            with QMutexLocker(self.mutex):
+                state = self._checkpoint_state()
+            self.database_handler.save_worker_checkpoint(
+                self.schedule_id,
+                self.settings.get('mode', self.mode),
+                self.settings['window_start'],
+                self.settings['window_end'],
+                state,
+            )
+        except Exception as e:
+            print(f"[CHECKPOINT] save failed: {e}")
+
+    def _clear_checkpoint(self):
+        """The schedule finished or was stopped: nothing left to resume."""
+        if not self.database_handler:
+            return
+        try:
+            self.database_handler.clear_worker_checkpoint(self.schedule_id)
+        except Exception as e:
+            print(f"[CHECKPOINT] clear failed: {e}")
+
+    def _restore_checkpoint(self, state):
+        """Rehydrate progress saved by a previous process for this schedule.
+
+        Deliveries logged since the run started are reconciled in as well: a
+        crash between a delivery being journalled and its checkpoint being
+        written would otherwise lose that delivery and repeat it. Volumes
+        come from delivery_totals less its value at the start of the run;
+        instant mode (which needs each delivery's instant_key) and
+        checkpoints without that baseline read the history rows instead.
+        """
+        self._started_at = state.get('started_at') or datetime.now().isoformat()
+        self.delivered_volumes = {k: v for k, v in state.get('delivered_volumes', [])}
+        self.failed_deliveries = {k: v for k, v in state.get('failed_deliveries', [])}
+        self._completed_instants = set(state.get('completed_instants', []))
+        windows = {}
+        for animal_id, window in state.get('animal_windows', []):
+            for key in ('start', 'end'):
+                if isinstance(window.get(key), str):
+                    window[key] = datetime.fromisoformat(window[key])
+            windows[animal_id] = window
+        if windows:
+            self.animal_windows = windows
+
+        baseline = state.get('totals_at_start')
+        self._totals_at_start = None if baseline is None else dict(baseline)
+        logged = {}
+        totals = None
+        if self.database_handler and self.mode != 'instant' and baseline is not None:
+            totals = self.database_handler.get_delivery_totals(self.schedule_id)
+        if totals is not None:
+            for animal_id, volume in totals.items():
+                volume -= self._totals_at_start.get(animal_id, 0)
+                if volume > 0:
+                    logged[str(animal_id)] = volume
+        rows = []
+        if self.database_handler and totals is None:
+            rows = (
+                self.database_handler.get_completed_deliveries_since(
+                    self.schedule_id, self._started_at
+                )
+                or []
+            )
+        for animal_id, timestamp, volume, instant_key in rows:
+            logged[str(animal_id)] = logged.get(str(animal_id), 0) + volume
+            # A retry is logged at the retry time; its row carries the key of
+            # the instant it made up for.
+            self._completed_instants.add(instant_key or f"{animal_id}@{timestamp}")
+        keys = {str(k): k for k in list(self.delivered_volumes) + list(windows)}
+        for str_id, volume in logged.items():
+            key = keys.get(str_id, int(str_id) if self.mode == 'instant' else str_id)
+            self.delivered_volumes[key] = max(self.delivered_volumes.get(key, 0), volume)
+
+        self.progress.emit(
+            f"Resuming schedule {self.schedule_id} from checkpoint "
+            f"({sum(self.delivered_volumes.values()):.3f}mL already delivered)"
+        )
+        for animal_id, volume in self.delivered_volumes.items():
+            self.volume_updated.emit(str(animal_id), volume)
+
     def check_completion(self):
-        """Check if all deliveries are complete"""
-        active_timers = [t for t in self.timers if t.isActive()]
-        if not active_timers:
-            self._is_running = False
-            self.finished.emit()
-        else:
-            self.main_timer.singleShot(1000, self.check_completion)
+        """Finish the instant cycle once no delivery or retry is pending.
+
+        Called after scheduling, by ``scheduler.drained`` and after each
+        strategy delivery comes back (a failure may still schedule a retry);
+        nothing polls.
+        """
+        if self.scheduler.pending or self._in_flight or not self._is_running:
+            return
+        self._is_running = False
+        self._close_delivery_loop()
+        self._close_relay_io()
+        self._close_journal()
+        self._clear_checkpoint()
+        self.finished.emit()
 
     def trigger_relay(self, relay_unit_id, water_volume):
+        """Trigger one pump unit for ``water_volume``; True on success."""
+        return self.trigger_pumps({relay_unit_id: water_volume}).get(int(relay_unit_id), False)
+
+    def trigger_pumps(self, volumes):
+        """Trigger several pump units on one merged timeline.
+
+        ``volumes`` maps relay_unit_id to mL. All units run at once (see
+        RelayHandler.trigger_units), so the call takes about as long as the
+        largest volume. The mutex is only held to check that the run is
+        still active, not while the pumps run; Stop's cancel token aborts
+        the timeline with the relays off.
+
+        Returns:
+            {relay_unit_id: True if all its triggers were written}
+        """
         with QMutexLocker(self.mutex):
             if not self._is_running:
-                return
-            try:
-                relay_unit_id = int(relay_unit_id)
-                required_triggers = self.volume_calculator.calculate_triggers(water_volume)
-                triggers_dict = {str(relay_unit_id): required_triggers}
-                self.progress.emit(
-                    f"Triggering relay unit {relay_unit_id} for {water_volume}ml ({required_triggers} triggers)"
-                )
-                relay_info = self.relay_handler.trigger_relays(
-                    [relay_unit_id], triggers_dict, self.stagger_interval
-                )
-                if relay_info:
-                    success_msg = f"Successfully triggered relay unit {relay_unit_id} {required_triggers} times"
-                    self.progress.emit(success_msg)
-                    if self.notification_handler:
-                        self.notification_handler.send_slack_notification(success_msg)
-                return relay_info
-            except Exception as e:
-                self.progress.emit(f"Error triggering relay {relay_unit_id}: {str(e)}")
-                return None
+                return {}
+        triggers = {}
+        for relay_unit_id, water_volume in volumes.items():
+            relay_unit_id = int(relay_unit_id)
+            triggers[relay_unit_id] = self.volume_calculator.calculate_triggers(water_volume)
+            self.progress.emit(
+                f"Triggering relay unit {relay_unit_id} for {water_volume}ml ({triggers[relay_unit_id]} triggers)"
+            )
+        try:
+            results = self.relay_handler.trigger_units(
+                triggers,
+                self.stagger_interval,
+                min_interval_s=self.min_trigger_interval / 1000.0,
+                cancel=self._cancel_requested,
+            )
+        except Exception as e:
+            self.progress.emit(f"Error triggering relays {sorted(triggers)}: {str(e)}")
+            return {relay_unit_id: False for relay_unit_id in triggers}
+        for relay_unit_id, success in results.items():
+            if success:
+                success_msg = f"Successfully triggered relay unit {relay_unit_id} {triggers[relay_unit_id]} times"
+                self.progress.emit(success_msg)
+                if self.notification_handler:
+                    self.notification_handler.send_slack_notification(success_msg)
+        return results
 
     def update_window_progress(self):
         """Update window progress information"""
@@ -919,17 +1102,16 @@ class RelayWorker(QObject):
 
                     # Log all incomplete deliveries as failed
                     for animal_id, info in incomplete_animals.items():
-                        if self.database_handler:
-                            self.database_handler.log_delivery(
-                                {
-                                    'schedule_id': self.schedule_id,
-                                    'animal_id': animal_id,
-                                    'relay_unit_id': self.animal_windows[animal_id]['relay_unit'],
-                                    'volume_delivered': 0,
-                                    'timestamp': datetime.now().isoformat(),
-                                    'status': 'sensor_failure',
-                                }
-                            )
+                        self._record_delivery(
+                            {
+                                'schedule_id': self.schedule_id,
+                                'animal_id': animal_id,
+                                'relay_unit_id': self.animal_windows[animal_id]['relay_unit'],
+                                'volume_delivered': 0,
+                                'timestamp': datetime.now().isoformat(),
+                                'status': 'sensor_failure',
+                            }
+                        )
 
                         self.progress.emit(
                             f"  Animal {animal_id}: INCOMPLETE - {info['delivered']:.3f}/{info['target']:.3f}mL "
@@ -979,7 +1161,7 @@ class RelayWorker(QObject):
                 success = self.schedule_deliveries(active_animals)
                 if success:
                     # Check again after deliveries complete (give time for execution)
-                    self.main_timer.singleShot(5000, self.check_final_completion)
+                    self.scheduler.call_later(5.0, self.check_final_completion)
                 else:
                     self.progress.emit("Failed to schedule final deliveries, stopping")
                     self.stop()
@@ -1014,16 +1196,14 @@ class RelayWorker(QObject):
         """Signal the worker AND the active strategy to cancel cooperatively.
 
         Safe to call from the GUI thread (both flags are threading.Events).
-        This is the path that actually breaks a mid-delivery loop: the
-        worker thread is blocked inside run_until_complete and cannot
-        process the queued stop() slot, so the GUI thread pokes these
-        flags directly.
+        The in-flight delivery runs on the delivery loop thread, so the GUI
+        thread pokes these flags directly rather than waiting for the queued
+        stop() slot.
 
         Two levels, both required:
           - worker flag (_cancel_requested): the cycle loops and
-            execute_delivery check it and stop scheduling/starting NEW
-            deliveries, so run_until_complete returns and the thread
-            can exit.
+            _handle_delivery check it and stop scheduling/starting NEW
+            deliveries.
           - strategy flag: the in-flight delivery loop bails fast into
             its valve-closing finally block.
         """
@@ -1071,37 +1251,20 @@ class RelayWorker(QObject):
         except Exception as e:
             print(f"[STOP]  Main timer stop failed: {e}")
 
-        # Stop and clear all delivery timers
-        timer_count = len(self.timers)
-        if timer_count > 0:
-            print(f"[STOP] Stopping {timer_count} delivery timer(s)...")
-            for i, timer in enumerate(self.timers):
-                try:
-                    if timer.isActive():
-                        timer.stop()
-                        print(f"[STOP]    Timer {i+1}/{timer_count} stopped")
-                except RuntimeError as ex:
-                    print(f"[STOP]    Timer {i+1}/{timer_count} already deleted: {ex}")
-                except Exception as e:
-                    print(f"[STOP]    Timer {i+1}/{timer_count} error: {e}")
-            self.timers.clear()
-            print(f"[STOP]  All {timer_count} timer(s) cleared")
-        else:
-            print("[STOP] No active delivery timers to stop")
+        # Cancel every pending delivery, retry and cycle wakeup
+        try:
+            cancelled = self.scheduler.cancel_all()
+            if cancelled:
+                print(f"[STOP]  Cancelled {cancelled} scheduled delivery/retry call(s)")
+            else:
+                print("[STOP] No scheduled deliveries to cancel")
+        except Exception as e:
+            print(f"[STOP]  Scheduler cancel failed: {e}")
+        self.retry_timers.clear()
 
-        # Clear retry timers
-        if hasattr(self, 'retry_timers') and self.retry_timers:
-            retry_count = len(self.retry_timers)
-            print(f"[STOP] Clearing {retry_count} retry timer(s)...")
-            for animal_id, timer in self.retry_timers.items():
-                try:
-                    if timer and timer.isActive():
-                        timer.stop()
-                        print(f"[STOP]    Retry timer for animal {animal_id} stopped")
-                except Exception as e:
-                    print(f"[STOP]    Retry timer for animal {animal_id} error: {e}")
-            self.retry_timers.clear()
-            print(f"[STOP]  All {retry_count} retry timer(s) cleared")
+        # Let the in-flight delivery close its valves before the sensor stops
+        self._close_delivery_loop()
+        self._close_relay_io()
 
         # Stop flow sensor if running in solenoid mode
         if self.hardware_mode == 'solenoid' and hasattr(self, 'strategy'):
@@ -1139,6 +1302,10 @@ class RelayWorker(QObject):
         else:
             print(f"[STOP] Flow sensor stop not needed (hardware_mode={self.hardware_mode})")
 
+        # Flush journalled delivery records before reporting finished
+        self._close_journal()
+        self._clear_checkpoint()
+
         # Final status report
         print("[STOP] ========== CLEANUP COMPLETE ==========")
         self.progress.emit("✅ Schedule stopped - All resources cleaned up")
@@ -1267,6 +1434,12 @@ class RelayWorker(QObject):
             )
             base_time = datetime.now()
             cumulative_delay = 0
+            # Solenoid strategies take the whole cycle as one deliver_many()
+            # batch: one primed manifold session, cages back to back (or
+            # pulsed together on calibration-only rigs) instead of staggered.
+            # Pumps are batched too and triggered on one merged timeline.
+            batched = self.hardware_mode == 'pump' or hasattr(self.strategy, 'deliver_many')
+            batch = []
             for animal_id, data in sorted_animals:
                 volume_per_cycle = self.animal_windows[animal_id]['volume_per_cycle']
                 cycle_volume = min(data['remaining'], volume_per_cycle)
@@ -1282,131 +1455,229 @@ class RelayWorker(QObject):
                     'instant_time': base_time + timedelta(seconds=cumulative_delay),
                     'triggers': triggers,
                 }
-                timer = QTimer()
-                timer.setSingleShot(True)
+                if batched:
+                    batch.append(delivery_data)
+                    continue
                 # Use partial with a copy to avoid closure over loop variable and later mutation
-                timer.timeout.connect(partial(self._handle_delivery, delivery_data.copy()))
-                timer.start(int(cumulative_delay * 1000))
-                self.timers.append(timer)
+                self.scheduler.call_later(
+                    cumulative_delay, partial(self._handle_delivery, delivery_data.copy())
+                )
                 print(
                     f"Scheduled delivery for animal {animal_id}: {cycle_volume}mL in {cumulative_delay}s"
                 )
                 cumulative_delay += trigger_time + 0.1
+            if batch:
+                self.scheduler.call_later(0, partial(self._handle_delivery_batch, batch))
+                print(f"Scheduled batched delivery for {len(batch)} animals")
             return True
         except Exception as e:
             logging.error(f"Error scheduling deliveries: {str(e)}")
             return False
 
     def _handle_delivery(self, delivery_data):
-        """Synchronously handle a delivery"""
+        """Start one delivery.
+
+        Pump mode runs synchronously through trigger_relay and returns its
+        success. Other modes submit ``strategy.deliver`` to the delivery loop
+        thread and return the future at once; the result comes back through
+        ``_delivery_finished`` and is recorded by ``_finish_delivery``.
+        """
         try:
-            # Cooperative cancel: a delivery QTimer may fire after Stop.
-            # Don't start a new run_until_complete(deliver()) — that's the
-            # blocking call that made Stop fall through to terminate().
+            # Cooperative cancel: a scheduled delivery may fire after Stop.
+            # Don't start a new delivery.
             if self._cancel_requested.is_set():
                 return False
-            if 'schedule_id' not in delivery_data:
-                delivery_data['schedule_id'] = self.schedule_id
-            animal_id = delivery_data['animal_id']
-            current_delivered = self.delivered_volumes.get(animal_id, 0)
-            failed_count = self.failed_deliveries.get(animal_id, 0)
-            # Staggered deliveries carry a cumulative per-animal window with a
-            # target volume + over-delivery guard + failed-retry compensation.
-            # Instant deliveries (run_instant_cycle reuses this method) are
-            # one-shot events with no window — deliver the delivery's own volume
-            # and skip the cumulative guard/compensation.
-            window = getattr(self, 'animal_windows', None)
-            window = window.get(animal_id) if window else None
-            if window is not None:
-                target_volume = window['target_volume']
-                if current_delivered >= target_volume:
-                    return True
-                if failed_count > 0:
-                    volume_increase = min(failed_count * 0.05, 0.2)
-                    adjusted_volume = delivery_data['water_volume'] * (1 + volume_increase)
-                    delivery_data['water_volume'] = min(
-                        adjusted_volume, target_volume - current_delivered
-                    )
+            if not self._prepare_delivery(delivery_data):
+                return True
             # In pump mode, keep legacy synchronous path via trigger_relay to avoid behavior change.
-            # For other modes, delivery is handled asynchronously by strategy at schedule time.
             if self.hardware_mode == 'pump':
                 success = self.trigger_relay(
                     delivery_data['relay_unit_id'], delivery_data['water_volume']
                 )
-            else:
-                # Non-pump modes should not use trigger_relay; run coroutine in a private loop
-                try:
-                    # CRITICAL DEBUG: Log delivery attempt
-                    self.progress.emit(
-                        f"[DEBUG] Attempting delivery: animal={animal_id}, "
-                        f"cage={delivery_data['relay_unit_id']}, "
-                        f"volume={delivery_data['water_volume']:.3f}mL"
-                    )
-
-                    loop = asyncio.new_event_loop()
-                    try:
-                        asyncio.set_event_loop(loop)
-                        success = loop.run_until_complete(
-                            self.strategy.deliver(
-                                relay_unit_id=delivery_data['relay_unit_id'],
-                                target_volume_ml=delivery_data['water_volume'],
-                                triggers_hint=delivery_data.get('triggers'),
-                            )
-                        )
+                self._finish_delivery(delivery_data, success)
+                return success
+
+            # CRITICAL DEBUG: Log delivery attempt
+            self.progress.emit(
+                f"[DEBUG] Attempting delivery: animal={delivery_data['animal_id']}, "
+                f"cage={delivery_data['relay_unit_id']}, "
+                f"volume={delivery_data['water_volume']:.3f}mL"
+            )
+            return self._submit_delivery(
+                [delivery_data],
+                partial(
+                    self.strategy.deliver,
+                    relay_unit_id=delivery_data['relay_unit_id'],
+                    target_volume_ml=delivery_data['water_volume'],
+                    triggers_hint=delivery_data.get('triggers'),
+                ),
+            )
+        except Exception as e:
+            self.progress.emit(f"Delivery error: {str(e)}")
+            return False
 
-                        # CRITICAL DEBUG: Log delivery result
-                        self.progress.emit(
-                            f"[DEBUG] Delivery completed: animal={animal_id}, success={success}"
-                        )
-                    finally:
-                        loop.close()
-                        asyncio.set_event_loop(None)
-                except Exception as e:
-                    # CRITICAL DEBUG: Log full exception details
-                    import traceback
+    def _handle_delivery_batch(self, deliveries):
+        """Start several cages' deliveries as one ``strategy.deliver_many`` session.
 
-                    error_details = traceback.format_exc()
-                    self.progress.emit(f"Delivery error for animal {animal_id}: {str(e)}")
-                    self.progress.emit(f"[DEBUG] Exception traceback:\n{error_details}")
-                    success = False
-            if success:
-                with QMutexLocker(self.mutex):
-                    actual_volume = delivery_data['water_volume']
-                    self.delivered_volumes[animal_id] = current_delivered + actual_volume
-                    self.failed_deliveries[animal_id] = 0
-                    delivery_log = {
-                        'schedule_id': self.schedule_id,
-                        'animal_id': animal_id,
-                        'relay_unit_id': delivery_data['relay_unit_id'],
-                        'volume_delivered': actual_volume,
-                        'timestamp': delivery_data['instant_time'].isoformat(),
-                        'status': 'completed',
-                    }
-                    if self.database_handler:
-                        self.database_handler.log_delivery(delivery_log)
-                self.volume_updated.emit(str(animal_id), self.delivered_volumes[animal_id])
+        Same guard and compensation as _handle_delivery. A second delivery
+        for a cage already in the batch goes through _handle_delivery after
+        it (the delivery loop runs them in turn). In pump mode the batch is
+        triggered synchronously with trigger_pumps instead.
+        """
+        try:
+            if self._cancel_requested.is_set():
+                return False
+            batch, targets, extra = [], {}, []
+            for delivery_data in deliveries:
+                cage_id = int(delivery_data['relay_unit_id'])
+                if cage_id in targets:
+                    extra.append(delivery_data)
+                elif self._prepare_delivery(delivery_data):
+                    batch.append(delivery_data)
+                    targets[cage_id] = delivery_data['water_volume']
+            future = None
+            if batch and self.hardware_mode == 'pump':
+                results = self.trigger_pumps(targets)
+                for delivery_data in batch:
+                    cage_id = int(delivery_data['relay_unit_id'])
+                    self._finish_delivery(delivery_data, results.get(cage_id, False))
+            elif batch:
                 self.progress.emit(
-                    f"Delivered {actual_volume:.3f}mL to animal {animal_id} (Total: {self.delivered_volumes[animal_id]:.3f}mL)"
+                    f"[DEBUG] Attempting batched delivery to {len(batch)} cages: {targets}"
                 )
-            else:
-                with QMutexLocker(self.mutex):
-                    self.failed_deliveries[animal_id] = failed_count + 1
-                    if self.database_handler:
-                        delivery_log = {
-                            'schedule_id': self.schedule_id,
-                            'animal_id': animal_id,
-                            'relay_unit_id': delivery_data['relay_unit_id'],
-                            'volume_delivered': 0,
-                            'timestamp': delivery_data['instant_time'].isoformat(),
-                            'status': 'failed',
-                        }
-                        self.database_handler.log_delivery(delivery_log)
-                self.schedule_retry(delivery_data)
-            return success
+                future = self._submit_delivery(batch, partial(self.strategy.deliver_many, targets))
+            for delivery_data in extra:
+                self._handle_delivery(delivery_data)
+            return future
         except Exception as e:
             self.progress.emit(f"Delivery error: {str(e)}")
             return False
 
+    def _prepare_delivery(self, delivery_data):
+        """Apply the window guard and failed-retry compensation.
+
+        Returns False when the animal's window target is already met, so
+        there is nothing to deliver.
+        """
+        if 'schedule_id' not in delivery_data:
+            delivery_data['schedule_id'] = self.schedule_id
+        animal_id = delivery_data['animal_id']
+        # Deliveries still on the delivery loop count towards the target.
+        current_delivered = self.delivered_volumes.get(animal_id, 0) + sum(
+            d['water_volume']
+            for batch in self._in_flight.values()
+            for d in batch
+            if d['animal_id'] == animal_id
+        )
+        failed_count = self.failed_deliveries.get(animal_id, 0)
+        # Staggered deliveries carry a cumulative per-animal window with a
+        # target volume + over-delivery guard + failed-retry compensation.
+        # Instant deliveries (run_instant_cycle reuses this method) are
+        # one-shot events with no window — deliver the delivery's own volume
+        # and skip the cumulative guard/compensation.
+        window = getattr(self, 'animal_windows', None)
+        window = window.get(animal_id) if window else None
+        if window is not None:
+            target_volume = window['target_volume']
+            if current_delivered >= target_volume:
+                return False
+            if failed_count > 0:
+                volume_increase = min(failed_count * 0.05, 0.2)
+                adjusted_volume = delivery_data['water_volume'] * (1 + volume_increase)
+                delivery_data['water_volume'] = min(
+                    adjusted_volume, target_volume - current_delivered
+                )
+        return True
+
+    def _submit_delivery(self, deliveries, coro_fn):
+        """Run ``coro_fn()`` on the delivery loop on behalf of ``deliveries``."""
+        if self.delivery_loop is None:
+            self.delivery_loop = DeliveryLoop(name=f"DeliveryLoop-{self.schedule_id}")
+        # One session at a time: they share the master valve and sensor.
+        future = self.delivery_loop.submit_serial(coro_fn)
+        self._in_flight[future] = deliveries
+        future.add_done_callback(self._on_delivery_done)
+        return future
+
+    def _on_delivery_done(self, future):
+        """Delivery loop thread: report a finished strategy delivery."""
+        try:
+            result = future.result()
+            if not isinstance(result, dict):
+                result = bool(result)
+        except concurrent.futures.CancelledError:
+            result = False
+        except Exception as e:
+            # CRITICAL DEBUG: Log full exception details
+            import traceback
+
+            self.progress.emit(f"Delivery error: {str(e)}")
+            self.progress.emit(f"[DEBUG] Exception traceback:\n{traceback.format_exc()}")
+            result = False
+        self._delivery_finished.emit(future, result)
+
+    @pyqtSlot(object, object)
+    def _on_delivery_finished(self, future, result):
+        """Worker thread: record the deliveries behind a finished future."""
+        deliveries = self._in_flight.pop(future, None)
+        if deliveries is None:
+            # Cancelled by stop(); the delivery loop is already gone.
+            return
+        for delivery_data in deliveries:
+            if isinstance(result, dict):
+                success = bool(result.get(int(delivery_data['relay_unit_id']), False))
+            else:
+                success = result
+            self.progress.emit(
+                f"[DEBUG] Delivery completed: animal={delivery_data['animal_id']}, "
+                f"success={success}"
+            )
+            self._finish_delivery(delivery_data, success)
+        if self.mode == 'instant':
+            self.check_completion()
+
+    def _finish_delivery(self, delivery_data, success):
+        """Record a delivery outcome; a failure schedules a retry."""
+        animal_id = delivery_data['animal_id']
+        if success:
+            with QMutexLocker(self.mutex):
+                actual_volume = delivery_data['water_volume']
+                self.delivered_volumes[animal_id] = (
+                    self.delivered_volumes.get(animal_id, 0) + actual_volume
+                )
+                self.failed_deliveries[animal_id] = 0
+                if delivery_data.get('instant_key'):
+                    self._completed_instants.add(delivery_data['instant_key'])
+                delivery_log = {
+                    'schedule_id': self.schedule_id,
+                    'animal_id': animal_id,
+                    'relay_unit_id': delivery_data['relay_unit_id'],
+                    'volume_delivered': actual_volume,
+                    'timestamp': delivery_data['instant_time'].isoformat(),
+                    'status': 'completed',
+                    'instant_key': delivery_data.get('instant_key'),
+                }
+                self._record_delivery(delivery_log)
+            self._save_checkpoint()
+            self.volume_updated.emit(str(animal_id), self.delivered_volumes[animal_id])
+            self.progress.emit(
+                f"Delivered {actual_volume:.3f}mL to animal {animal_id} (Total: {self.delivered_volumes[animal_id]:.3f}mL)"
+            )
+        else:
+            with QMutexLocker(self.mutex):
+                self.failed_deliveries[animal_id] = self.failed_deliveries.get(animal_id, 0) + 1
+                delivery_log = {
+                    'schedule_id': self.schedule_id,
+                    'animal_id': animal_id,
+                    'relay_unit_id': delivery_data['relay_unit_id'],
+                    'volume_delivered': 0,
+                    'timestamp': delivery_data['instant_time'].isoformat(),
+                    'status': 'failed',
+                }
+                self._record_delivery(delivery_log)
+            self._save_checkpoint()
+            self.schedule_retry(delivery_data)
+
     def update_system_settings(self, settings):
         """Update worker settings when system settings change"""
         self.min_trigger_interval = settings.get(
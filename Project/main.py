@@ -15,7 +15,7 @@ from models.database_handler import DatabaseHandler
 from models.login_system import LoginSystem
 from models.relay_unit_manager import RelayUnitManager
 from notifications.notifications import NotificationHandler
-from PyQt5.QtCore import QObject, Qt, QThread, pyqtSignal
+from PyQt5.QtCore import QObject, Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QGuiApplication
 from PyQt5.QtNetwork import QLocalServer, QLocalSocket
 from PyQt5.QtWidgets import QApplication, QInputDialog
@@ -108,6 +108,7 @@ class StreamRedirector(QObject):
 # =============================================================================
 thread = None
 worker = None
+database_handler = None
 
 
 class ControlSignals(QObject):
@@ -137,7 +138,9 @@ def _selftest():
         from models.database_handler import DatabaseHandler
         from ui.gui import RodentRefreshmentGUI  # noqa: F401
 
-        DatabaseHandler().connect().close()
+        handler = DatabaseHandler()
+        handler.connect().execute("SELECT 1")
+        handler.close()
         print("rrr selftest: OK")
         sys.exit(0)
     except Exception as exc:
@@ -226,7 +229,7 @@ def setup():
 # =============================================================================
 # run_program() – create a new worker and thread and start it.
 # =============================================================================
-def run_program(schedule, mode, window_start, window_end):
+def run_program(schedule, mode, window_start, window_end, resume_state=None):
     global thread, worker, notification_handler, controller, system_controller, database_handler
     try:
         print("\nDEBUG - run_program:")
@@ -248,6 +251,8 @@ def run_program(schedule, mode, window_start, window_end):
                 'database_handler': database_handler,
                 'pump_controller': controller.pump_controller,
                 'schedule_id': schedule.schedule_id,
+                # Checkpoint from an interrupted run (resume_inflight_schedule).
+                'resume_state': resume_state,
             }
         )
 
@@ -544,6 +549,7 @@ def stop_program():
     hardware. See the v1.8.0 incident write-up there.
     """
     global thread, worker, relay_handler
+    schedule_id = getattr(worker, 'schedule_id', None)
     try:
         return stop_sequence.execute_stop_sequence(
             relay_handler,
@@ -556,6 +562,53 @@ def stop_program():
         print(f"[ERROR] Stop sequence failed: {exc}")
         traceback.print_exc()
         return False
+    finally:
+        # The worker clears its checkpoint in stop(), but not if the thread
+        # had to be terminated — an operator Stop must never be resumed.
+        if schedule_id is not None and database_handler is not None:
+            database_handler.clear_worker_checkpoint(schedule_id)
+
+
+# =============================================================================
+# resume_inflight_schedule() – restart a schedule interrupted by a crash.
+# =============================================================================
+def resume_inflight_schedule():
+    """Resume the schedule that was still running when the app last died.
+
+    RelayWorker checkpoints its progress after every delivery and clears the
+    checkpoint when the schedule finishes or is stopped, so a row left in
+    worker_checkpoints means a crash or power loss. Only one schedule runs
+    at a time: the newest checkpoint is resumed, any older ones discarded.
+    """
+    if database_handler is None or gui is None:
+        return
+    checkpoints = database_handler.get_worker_checkpoints()
+    if not checkpoints:
+        return
+    latest = checkpoints[0]
+    for stale in checkpoints[1:]:
+        print(f"[RESUME] Discarding older checkpoint for schedule {stale['schedule_id']}")
+        database_handler.clear_worker_checkpoint(stale['schedule_id'])
+
+    schedule_id = latest['schedule_id']
+    if datetime.now().timestamp() > latest['window_end']:
+        print(f"[RESUME] Schedule {schedule_id} was interrupted but its window has ended")
+        database_handler.clear_worker_checkpoint(schedule_id)
+        return
+    schedules = database_handler.query_schedules(schedule_id=schedule_id)
+    if not schedules:
+        print(f"[RESUME] Interrupted schedule {schedule_id} no longer exists")
+        database_handler.clear_worker_checkpoint(schedule_id)
+        return
+
+    print(f"[RESUME] Resuming interrupted schedule {schedule_id} ({latest['mode']})")
+    gui.run_stop_section.resume_schedule(
+        schedules[0],
+        latest['mode'],
+        latest['window_start'],
+        latest['window_end'],
+        latest['state'],
+    )
 
 
 # =============================================================================
@@ -749,6 +802,9 @@ def main():
     except Exception:
         pass
 
+    # Close the pooled SQLite connections (checkpoints the WAL) on exit.
+    app.aboutToQuit.connect(_close_database)
+
     # Choose startup mode
     if USE_SPLASH_SCREEN:
         _main_with_splash(app, instance_key)
@@ -758,6 +814,16 @@ def main():
     sys.exit(app.exec_())
 
 
+def _close_database():
+    """Shutdown hook: release the DatabaseHandler's per-thread connections."""
+    if database_handler is None:
+        return
+    try:
+        database_handler.close()
+    except Exception as exc:
+        print(f"[WARNING] Failed to close database connections: {exc}")
+
+
 def _main_with_splash(app, instance_key):
     """
     Startup with splash screen for instant visual feedback.
@@ -856,6 +922,9 @@ def _main_with_splash(app, instance_key):
 
         _state['server'].newConnection.connect(_handle_new_connection)
 
+        # Pick up a schedule interrupted by a crash, once the loop is running.
+        QTimer.singleShot(0, resume_inflight_schedule)
+
     # Connect splash completion to GUI creation
     splash.initialization_complete.connect(on_initialization_complete)
 
@@ -948,6 +1017,9 @@ def _main_without_splash(app, instance_key):
 
     server.newConnection.connect(_handle_new_connection)
 
+    # Pick up a schedule interrupted by a crash, once the loop is running.
+    QTimer.singleShot(0, resume_inflight_schedule)
+
 
 if __name__ == "__main__":
     if "--selftest" in sys.argv:
@@ -8,6 +8,9 @@ import traceback
 from datetime import datetime
 
 from models.animal import Animal
+from models.db.connection import ConnectionPool
+from models.db.delivery_journal import recover_spill_file
+from models.db.schema import apply_migrations
 from models.relay_unit import RelayUnit
 from models.Schedule import Schedule
 from utils import paths
@@ -17,45 +20,52 @@ class DatabaseHandler:
     def __init__(self, db_path=None):
         # db_path=None -> resolve via paths (RRR_DATA, or legacy location).
         self.db_path = db_path or paths.database_path()
+        self._pool = ConnectionPool(self.db_path)
         self.create_tables()
+        # Replay delivery records a crashed run left in the write-behind
+        # journal's spill file (see models/db/delivery_journal.py). A bad
+        # journal must not stop the application from starting.
+        try:
+            recover_spill_file(self)
+        except Exception as e:
+            print(f"Error recovering delivery journal: {e}")
+            traceback.print_exc()
 
     def connect(self):
-        """Establish a new connection to the SQLite database."""
-        return sqlite3.connect(self.db_path)
+        """Return this thread's pooled connection to the SQLite database.
+
+        The connection is persistent (one per thread, WAL + tuned pragmas,
+        see models/db/connection.py). Use it as ``with self.connect() as
+        conn:`` — the block commits or rolls back but does not close it.
+        """
+        return self._pool.connection()
+
+    def close(self):
+        """Close every pooled connection. Call once at application exit."""
+        self._pool.close_all()
 
     def create_tables(self):
-        """Create necessary tables if they don't exist."""
+        """Create necessary tables if they don't exist, then run pending migrations."""
         try:
             with self.connect() as conn:
                 cursor = conn.cursor()
 
-                # First, check if dispensing_history exists and get its columns
-                cursor.execute("PRAGMA table_info(dispensing_history)")
-                existing_columns = {col[1] for col in cursor.fetchall()}
-
-                # If table doesn't exist, create it
-                if not existing_columns:
-                    cursor.execute('''
-                        CREATE TABLE dispensing_history (
-                            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            schedule_id INTEGER NOT NULL,
-                            animal_id INTEGER NOT NULL,
-                            relay_unit_id INTEGER NOT NULL,
-                            timestamp TEXT NOT NULL,
-                            volume_dispensed REAL NOT NULL,
-                            status TEXT NOT NULL,
-                            cycle_index INTEGER DEFAULT NULL,
-                            FOREIGN KEY(schedule_id) REFERENCES schedules(schedule_id),
-                            FOREIGN KEY(animal_id) REFERENCES animals(animal_id),
-                            FOREIGN KEY(relay_unit_id) REFERENCES relay_units(relay_unit_id)
-                        )
-                    ''')
-                # If table exists but needs cycle_index column
-                elif 'cycle_index' not in existing_columns:
-                    cursor.execute('''
-                        ALTER TABLE dispensing_history 
-                        ADD COLUMN cycle_index INTEGER DEFAULT NULL
-                    ''')
+                # Create dispensing_history table
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS dispensing_history (
+                        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        schedule_id INTEGER NOT NULL,
+                        animal_id INTEGER NOT NULL,
+                        relay_unit_id INTEGER NOT NULL,
+                        timestamp TEXT NOT NULL,
+                        volume_dispensed REAL NOT NULL,
+                        status TEXT NOT NULL,
+                        cycle_index INTEGER DEFAULT NULL,
+                        FOREIGN KEY(schedule_id) REFERENCES schedules(schedule_id),
+                        FOREIGN KEY(animal_id) REFERENCES animals(animal_id),
+                        FOREIGN KEY(relay_unit_id) REFERENCES relay_units(relay_unit_id)
+                    )
+                ''')
 
                 # Create trainers table
                 cursor.execute('''
@@ -259,17 +269,12 @@ class DatabaseHandler:
                     )
                 ''')
 
-                # Add sex column to animals table if it doesn't exist
-                cursor.execute("PRAGMA table_info(animals)")
-                columns = [col[1] for col in cursor.fetchall()]
-
-                if 'sex' not in columns:
-                    cursor.execute('''
-                        ALTER TABLE animals
-                        ADD COLUMN sex TEXT CHECK(sex IN ('male', 'female')) DEFAULT NULL
-                    ''')
-
                 conn.commit()
+
+                # Column additions, indexes and later schema changes are
+                # versioned migrations (models/db/schema.py).
+                for version in apply_migrations(conn):
+                    print(f"Applied database migration {version}.")
                 print("Database schema created/updated successfully.")
 
         except sqlite3.Error as e:
@@ -541,106 +546,73 @@ class DatabaseHandler:
             traceback.print_exc()
 
     def get_all_schedules(self):
-        schedules = []
-        try:
-            with self.connect() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT schedule_id, name, water_volume, 
-                           start_time, end_time, created_by, is_super_user, 
-                           delivery_mode
-                    FROM schedules
-                ''')
-                rows = cursor.fetchall()
-                for row in rows:
-                    schedule = Schedule(
-                        schedule_id=row[0],
-                        name=row[1],
-                        water_volume=row[2],
-                        start_time=row[3],
-                        end_time=row[4],
-                        created_by=row[5],
-                        is_super_user=row[6],
-                        delivery_mode=row[7],
-                    )
+        return self.query_schedules()
 
-                    # Get associated data based on delivery mode
-                    if schedule.delivery_mode == 'instant':
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, delivery_datetime, water_volume, relay_unit_id
-                            FROM schedule_instant_deliveries 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        schedule.instant_deliveries = [
-                            {
-                                'animal_id': row[0],
-                                'datetime': row[1],
-                                'volume': row[2],
-                                'relay_unit_id': row[3],
-                            }
-                            for row in cursor.fetchall()
-                        ]
-                        # Populate the animal roster (distinct, in order) so UIs
-                        # that read schedule.animals — e.g. the schedule card's
-                        # animal count — are correct for instant schedules too.
-                        for d in schedule.instant_deliveries:
-                            aid = d['animal_id']
-                            if aid not in schedule.animals:
-                                schedule.animals.append(aid)
-                                schedule.relay_unit_assignments[str(aid)] = d['relay_unit_id']
-                    else:
-                        # Get animals and desired outputs for staggered mode
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, relay_unit_id FROM schedule_animals 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        for animal_id, relay_unit_id in cursor.fetchall():
-                            schedule.animals.append(animal_id)
-                            schedule.relay_unit_assignments[str(animal_id)] = relay_unit_id
+    def get_schedules_by_trainer(self, trainer_id):
+        """Get all schedules created by a specific trainer."""
+        return self.query_schedules(trainer_id=trainer_id)
 
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, desired_output 
-                            FROM schedule_desired_outputs 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        schedule.desired_water_outputs = {
-                            str(row[0]): row[1] for row in cursor.fetchall()
-                        }
+    def query_schedules(
+        self,
+        trainer_id=None,
+        delivery_mode=None,
+        status=None,
+        limit=None,
+        offset=0,
+        schedule_id=None,
+    ):
+        """
+        Fetch fully hydrated Schedule objects, optionally filtered and paged.
 
-                    schedules.append(schedule)
-                return schedules
-        except sqlite3.Error as e:
-            print(f"Error retrieving all schedules: {e}")
-            traceback.print_exc()
-            return []
+        Child rows (instant deliveries, animals/relay assignments, desired
+        outputs) for the whole page are loaded in at most three extra queries
+        and assembled in memory, instead of one or two queries per schedule.
+
+        Args:
+            trainer_id: Only schedules created by this trainer.
+            delivery_mode: 'instant' or 'staggered'.
+            status: Match on schedules.dispensing_status.
+            limit: Maximum number of schedules (None = all).
+            offset: Number of schedules to skip (with limit, for paging).
+            schedule_id: Only this schedule.
+
+        Returns:
+            list[Schedule] ordered by schedule_id; [] on error.
+        """
+        clauses = []
+        params = []
+        if schedule_id is not None:
+            clauses.append('schedule_id = ?')
+            params.append(schedule_id)
+        if trainer_id is not None:
+            clauses.append('created_by = ?')
+            params.append(trainer_id)
+        if delivery_mode is not None:
+            clauses.append('delivery_mode = ?')
+            params.append(delivery_mode)
+        if status is not None:
+            clauses.append('dispensing_status = ?')
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # SQLite: LIMIT -1 means "no limit".
+        params.extend([-1 if limit is None else limit, offset])
 
-    def get_schedules_by_trainer(self, trainer_id):
-        """Get all schedules created by a specific trainer."""
-        schedules = []
         try:
             with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    '''
-                    SELECT schedule_id, name, water_volume, start_time, end_time, 
+                    f'''
+                    SELECT schedule_id, name, water_volume, start_time, end_time,
                            created_by, is_super_user, delivery_mode
-                    FROM schedules 
-                    WHERE created_by = ?
+                    FROM schedules
+                    {where}
+                    ORDER BY schedule_id
+                    LIMIT ? OFFSET ?
                 ''',
-                    (trainer_id,),
+                    params,
                 )
-                rows = cursor.fetchall()
-                for row in rows:
-                    schedule = Schedule(
+                schedules = [
+                    Schedule(
                         schedule_id=row[0],
                         name=row[1],
                         water_volume=row[2],
@@ -650,66 +622,84 @@ class DatabaseHandler:
                         is_super_user=row[6],
                         delivery_mode=row[7],
                     )
-
-                    # Get associated data based on delivery mode
-                    if schedule.delivery_mode == 'instant':
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, delivery_datetime, water_volume, relay_unit_id
-                            FROM schedule_instant_deliveries 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        schedule.instant_deliveries = [
-                            {
-                                'animal_id': row[0],
-                                'datetime': row[1],
-                                'volume': row[2],
-                                'relay_unit_id': row[3],
-                            }
-                            for row in cursor.fetchall()
-                        ]
-                        # Populate the animal roster (distinct, in order) so UIs
-                        # that read schedule.animals — e.g. the schedule card's
-                        # animal count — are correct for instant schedules too.
-                        for d in schedule.instant_deliveries:
-                            aid = d['animal_id']
-                            if aid not in schedule.animals:
-                                schedule.animals.append(aid)
-                                schedule.relay_unit_assignments[str(aid)] = d['relay_unit_id']
-                    else:
-                        # Get animals and relay unit assignments for staggered mode
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, relay_unit_id FROM schedule_animals 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        for animal_id, relay_unit_id in cursor.fetchall():
-                            schedule.animals.append(animal_id)
-                            schedule.relay_unit_assignments[str(animal_id)] = relay_unit_id
-
-                        cursor.execute(
-                            '''
-                            SELECT animal_id, desired_output 
-                            FROM schedule_desired_outputs 
-                            WHERE schedule_id = ?
-                        ''',
-                            (schedule.schedule_id,),
-                        )
-                        schedule.desired_water_outputs = {
-                            str(row[0]): row[1] for row in cursor.fetchall()
-                        }
-
-                    schedules.append(schedule)
+                    for row in cursor.fetchall()
+                ]
+                self._hydrate_schedules(cursor, schedules)
                 return schedules
         except sqlite3.Error as e:
-            print(f"Error retrieving schedules for trainer_id {trainer_id}: {e}")
+            print(f"Error retrieving schedules: {e}")
             traceback.print_exc()
             return []
 
+    def _hydrate_schedules(self, cursor, schedules):
+        """Attach child rows to ``schedules`` in a constant number of queries.
+
+        The schedule IDs are bound as one JSON array and expanded with
+        ``json_each`` so the statement text (and its cached prepared form)
+        never depends on how many schedules are on the page. Each child query
+        orders its rows as the old per-schedule ``WHERE schedule_id = ?``
+        lookups returned them (primary-key order), since ``json_each`` would
+        otherwise let the planner pick any order.
+        """
+        by_id = {s.schedule_id: s for s in schedules}
+        instant_ids = [s.schedule_id for s in schedules if s.delivery_mode == 'instant']
+        other_ids = [s.schedule_id for s in schedules if s.delivery_mode != 'instant']
+
+        if instant_ids:
+            cursor.execute(
+                '''
+                SELECT schedule_id, animal_id, delivery_datetime, water_volume, relay_unit_id
+                FROM schedule_instant_deliveries
+                WHERE schedule_id IN (SELECT value FROM json_each(?))
+                ORDER BY schedule_id, delivery_id
+            ''',
+                (json.dumps(instant_ids),),
+            )
+            for schedule_id, animal_id, when, volume, relay_unit_id in cursor.fetchall():
+                schedule = by_id[schedule_id]
+                schedule.instant_deliveries.append(
+                    {
+                        'animal_id': animal_id,
+                        'datetime': when,
+                        'volume': volume,
+                        'relay_unit_id': relay_unit_id,
+                    }
+                )
+                # Populate the animal roster (distinct, in order) so UIs
+                # that read schedule.animals — e.g. the schedule card's
+                # animal count — are correct for instant schedules too.
+                if animal_id not in schedule.animals:
+                    schedule.animals.append(animal_id)
+                    schedule.relay_unit_assignments[str(animal_id)] = relay_unit_id
+
+        if other_ids:
+            id_list = json.dumps(other_ids)
+            cursor.execute(
+                '''
+                SELECT schedule_id, animal_id, relay_unit_id
+                FROM schedule_animals
+                WHERE schedule_id IN (SELECT value FROM json_each(?))
+                ORDER BY schedule_id, animal_id
+            ''',
+                (id_list,),
+            )
+            for schedule_id, animal_id, relay_unit_id in cursor.fetchall():
+                schedule = by_id[schedule_id]
+                schedule.animals.append(animal_id)
+                schedule.relay_unit_assignments[str(animal_id)] = relay_unit_id
+
+            cursor.execute(
+                '''
+                SELECT schedule_id, animal_id, desired_output
+                FROM schedule_desired_outputs
+                WHERE schedule_id IN (SELECT value FROM json_each(?))
+                ORDER BY schedule_id, animal_id
+            ''',
+                (id_list,),
+            )
+            for schedule_id, animal_id, desired_output in cursor.fetchall():
+                by_id[schedule_id].desired_water_outputs[str(animal_id)] = desired_output
+
     # Modify existing methods to handle user roles
     def get_animals(self, trainer_id, role):
         if role == 'super':
@@ -1455,7 +1445,12 @@ class DatabaseHandler:
             return False
 
     def get_staggered_window_status(self, window_id):
-        """Get the current status of a staggered delivery window"""
+        """Get the current status of a staggered delivery window
+
+        ``actual_delivered`` is the animal's completed volume in the window's
+        schedule, from the trigger-maintained delivery_totals (each animal
+        has one window spanning its schedule).
+        """
         try:
             with self.connect() as conn:
                 cursor = conn.cursor()
@@ -1465,19 +1460,15 @@ class DatabaseHandler:
                         w.*,
                         s.water_volume as base_volume,
                         sa.relay_unit_id,
-                        COALESCE(
-                            (SELECT SUM(volume_dispensed) 
-                             FROM dispensing_history 
-                             WHERE schedule_id = w.schedule_id 
-                             AND animal_id = w.animal_id
-                             AND timestamp BETWEEN w.start_time AND w.end_time),
-                            0
-                        ) as actual_delivered
+                        COALESCE(dt.delivered_volume, 0) as actual_delivered
                     FROM schedule_staggered_windows w
                     JOIN schedules s ON w.schedule_id = s.schedule_id
                     JOIN schedule_animals sa 
                         ON w.schedule_id = sa.schedule_id 
                         AND w.animal_id = sa.animal_id
+                    LEFT JOIN delivery_totals dt
+                        ON w.schedule_id = dt.schedule_id
+                        AND w.animal_id = dt.animal_id
                     WHERE w.window_id = ?
                 ''',
                     (window_id,),
@@ -1537,14 +1528,7 @@ class DatabaseHandler:
                         a.animal_id,
                         a.name as animal_name,
                         COALESCE(sdo.desired_output, s.water_volume) as target_volume,
-                        COALESCE(
-                            (SELECT SUM(volume_dispensed) 
-                             FROM dispensing_history 
-                             WHERE schedule_id = s.schedule_id 
-                             AND animal_id = a.animal_id
-                             AND status = 'completed'),
-                            0
-                        ) as total_delivered,
+                        COALESCE(dt.delivered_volume, 0) as total_delivered,
                         sa.relay_unit_id
                     FROM schedules s
                     JOIN schedule_animals sa ON s.schedule_id = sa.schedule_id
@@ -1552,6 +1536,9 @@ class DatabaseHandler:
                     LEFT JOIN schedule_desired_outputs sdo 
                         ON s.schedule_id = sdo.schedule_id 
                         AND a.animal_id = sdo.animal_id
+                    LEFT JOIN delivery_totals dt
+                        ON s.schedule_id = dt.schedule_id
+                        AND a.animal_id = dt.animal_id
                     WHERE s.schedule_id = ?
                 ''',
                     (schedule_id,),
@@ -1561,6 +1548,151 @@ class DatabaseHandler:
             print(f"Error getting schedule progress: {e}")
             return None
 
+    def get_delivery_totals(self, schedule_id):
+        """
+        Completed volume delivered so far per animal in a schedule.
+
+        Reads the trigger-maintained delivery_totals aggregate, so the cost
+        is one row per animal regardless of how much history exists.
+
+        Returns:
+            dict: {animal_id: delivered_volume}, or None on error.
+        """
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''
+                    SELECT animal_id, delivered_volume
+                    FROM delivery_totals
+                    WHERE schedule_id = ?
+                ''',
+                    (schedule_id,),
+                )
+                return {animal_id: volume for animal_id, volume in cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error getting delivery totals: {e}")
+            return None
+
+    def save_worker_checkpoint(self, schedule_id, mode, window_start, window_end, state):
+        """
+        Persist the running RelayWorker's state for crash resume.
+
+        One row per schedule, replaced in a single statement, so a crash
+        leaves either the previous checkpoint or this one — never a mix.
+
+        Args:
+            schedule_id: Schedule being executed.
+            mode: Mode string passed to run_program ('Staggered'/'Instant').
+            window_start, window_end: Epoch seconds passed to run_program.
+            state: JSON-serialisable dict from RelayWorker.
+
+        Returns:
+            bool: True on success.
+        """
+        try:
+            with self.connect() as conn:
+                conn.execute(
+                    '''
+                    INSERT INTO worker_checkpoints (
+                        schedule_id, mode, window_start, window_end, state, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (schedule_id) DO UPDATE SET
+                        mode = excluded.mode,
+                        window_start = excluded.window_start,
+                        window_end = excluded.window_end,
+                        state = excluded.state,
+                        updated_at = excluded.updated_at
+                ''',
+                    (
+                        schedule_id,
+                        mode,
+                        window_start,
+                        window_end,
+                        json.dumps(state),
+                        datetime.now().isoformat(),
+                    ),
+                )
+                return True
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Error saving worker checkpoint: {e}")
+            return False
+
+    def get_worker_checkpoints(self):
+        """
+        In-flight schedules left behind by a previous run, newest first.
+
+        Returns:
+            list[dict]: keys schedule_id, mode, window_start, window_end,
+            state (decoded), updated_at. Unreadable rows are skipped.
+        """
+        try:
+            with self.connect() as conn:
+                rows = conn.execute(
+                    '''
+                    SELECT schedule_id, mode, window_start, window_end, state, updated_at
+                    FROM worker_checkpoints
+                    ORDER BY updated_at DESC
+                '''
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading worker checkpoints: {e}")
+            return []
+        checkpoints = []
+        for schedule_id, mode, window_start, window_end, state, updated_at in rows:
+            try:
+                state = json.loads(state)
+            except ValueError:
+                print(f"Ignoring unreadable checkpoint for schedule {schedule_id}")
+                continue
+            checkpoints.append(
+                {
+                    'schedule_id': schedule_id,
+                    'mode': mode,
+                    'window_start': window_start,
+                    'window_end': window_end,
+                    'state': state,
+                    'updated_at': updated_at,
+                }
+            )
+        return checkpoints
+
+    def get_completed_deliveries_since(self, schedule_id, since):
+        """
+        Completed dispensing_history rows of a schedule logged at or after
+        ``since`` (ISO timestamp), for reconciling a resumed run.
+
+        Returns:
+            list: [(animal_id, timestamp, volume_dispensed, instant_key)], or
+            None on error. ``instant_key`` is NULL outside instant mode.
+        """
+        try:
+            with self.connect() as conn:
+                return conn.execute(
+                    '''
+                    SELECT animal_id, timestamp, volume_dispensed, instant_key
+                    FROM dispensing_history
+                    WHERE schedule_id = ? AND status = 'completed' AND timestamp >= ?
+                    ORDER BY timestamp
+                ''',
+                    (schedule_id, since),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading deliveries since {since}: {e}")
+            return None
+
+    def clear_worker_checkpoint(self, schedule_id):
+        """Forget a schedule's checkpoint (it finished or was stopped)."""
+        try:
+            with self.connect() as conn:
+                conn.execute(
+                    'DELETE FROM worker_checkpoints WHERE schedule_id = ?', (schedule_id,)
+                )
+                return True
+        except sqlite3.Error as e:
+            print(f"Error clearing worker checkpoint: {e}")
+            return False
+
     def track_cycle_progress(self, schedule_id, animal_id, cycle_data):
         """Track cycle progress in database"""
         try:
@@ -1680,45 +1812,67 @@ class DatabaseHandler:
                 - volume_delivered: Amount of water delivered
                 - timestamp: Time of delivery
                 - status: Status of delivery ('completed' or 'failed')
+                - journal_id: Optional idempotency key (see log_deliveries)
+                - instant_key: Optional instant-mode delivery this fulfils
+                  ("<animal_id>@<instant time>"), for resuming a schedule
+        """
+        return self.log_deliveries([delivery_data])
+
+    def log_deliveries(self, records):
+        """
+        Log a group of delivery attempts in one transaction.
+
+        Same record shape as log_delivery. Used by the write-behind
+        DeliveryJournal (models/db/delivery_journal.py) to group-commit.
+        A record whose ``journal_id`` is already present is skipped, so
+        replaying a journal after a crash never duplicates history rows;
+        any other constraint failure (e.g. a NULL ``relay_unit_id``) still
+        fails the whole group.
+
+        Returns:
+            True on success, False on a database error (nothing committed).
         """
         try:
             with self.connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    '''
-                    INSERT INTO dispensing_history 
-                    (schedule_id, animal_id, relay_unit_id, timestamp, 
-                     volume_dispensed, status)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''',
-                    (
-                        delivery_data['schedule_id'],
-                        delivery_data['animal_id'],
-                        delivery_data['relay_unit_id'],
-                        delivery_data['timestamp'],
-                        delivery_data['volume_delivered'],
-                        delivery_data['status'],
-                    ),
-                )
-
-                # If delivery was successful, update animal's last watering info
-                if (
-                    delivery_data['status'] == 'completed'
-                    and delivery_data['volume_delivered'] > 0
-                ):
+                for record in records:
                     cursor.execute(
                         '''
-                        UPDATE animals
-                        SET last_watering = ?,
-                            last_water_volume = ?
-                        WHERE animal_id = ?
+                        INSERT INTO dispensing_history
+                        (schedule_id, animal_id, relay_unit_id, timestamp,
+                         volume_dispensed, status, journal_id, instant_key)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(journal_id) DO NOTHING
                     ''',
                         (
-                            delivery_data['timestamp'],
-                            delivery_data['volume_delivered'],
-                            delivery_data['animal_id'],
+                            record['schedule_id'],
+                            record['animal_id'],
+                            record['relay_unit_id'],
+                            record['timestamp'],
+                            record['volume_delivered'],
+                            record['status'],
+                            record.get('journal_id'),
+                            record.get('instant_key'),
                         ),
                     )
+                    if cursor.rowcount == 0:
+                        continue  # journal replay of an already-committed row
+
+                    # If delivery was successful, update animal's last watering info
+                    if record['status'] == 'completed' and record['volume_delivered'] > 0:
+                        cursor.execute(
+                            '''
+                            UPDATE animals
+                            SET last_watering = ?,
+                                last_water_volume = ?
+                            WHERE animal_id = ?
+                        ''',
+                            (
+                                record['timestamp'],
+                                record['volume_delivered'],
+                                record['animal_id'],
+                            ),
+                        )
 
                 conn.commit()
                 return True
@@ -0,0 +1,128 @@
+"""Per-thread persistent SQLite connections for :class:`DatabaseHandler`.
+
+Before this module every ``DatabaseHandler`` method opened a brand-new
+``sqlite3.connect(self.db_path)``. On the Pi that meant every delivery
+(``log_delivery``) and every calibration read-through from
+``SolenoidFlowStrategy`` paid for opening the file, re-reading the schema
+pages and re-preparing its statements — a cost that grows with the DB.
+
+:class:`ConnectionPool` keeps exactly **one connection per thread** (the
+GUI thread, the delivery worker's ``QThread``, the splash-screen init
+thread) and hands it back on every call. Connections are never shared
+between threads: SQLite connections are not safe for concurrent use, and
+WAL mode already lets one writer and many readers coexist across them.
+
+The ``with pool.connection() as conn:`` contract is unchanged — sqlite3's
+context manager only commits/rolls back, it never closes — so every
+existing ``with self.connect() as conn:`` block keeps its transaction
+semantics.
+
+Pragmas applied once per connection (see docs/DATABASE.md §3):
+
+- ``journal_mode=WAL`` — readers never block the worker's writes.
+- ``synchronous=NORMAL`` — safe under WAL (a power cut can lose the last
+  transaction, never corrupt the file) and avoids an fsync per commit.
+- ``busy_timeout`` — wait for a competing writer instead of failing.
+- ``cache_size`` / ``temp_store`` — keep hot pages and temp b-trees in RAM.
+
+``PRAGMA foreign_keys`` is deliberately left OFF: the delete paths do not
+cascade yet (docs/DATABASE.md §7), so enabling it would break them.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import List
+
+# Prepared statements kept per connection (sqlite3's default is 128). The
+# handler has ~150 distinct statements; keep all of them hot.
+CACHED_STATEMENTS = 256
+
+# Milliseconds to wait for a competing writer before raising "locked".
+BUSY_TIMEOUT_MS = 5000
+
+# Negative => KiB. 8 MiB of page cache per connection.
+CACHE_SIZE_KIB = 8192
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KIB}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """One long-lived, pragma-tuned ``sqlite3.Connection`` per thread."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._local = threading.local()
+        # Every connection ever handed out, so close_all() can reach the
+        # ones owned by other (possibly finished) threads at shutdown.
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use.
+
+        A connection that was closed behind the pool's back (e.g. a caller
+        doing ``handler.connect().close()``) is transparently replaced.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and _is_open(conn):
+            return conn
+        return self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close_all() may close it from the
+        # shutdown thread; in normal use each connection stays on its owner.
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        self._local.conn = conn
+        with self._lock:
+            self._connections = [c for c in self._connections if _is_open(c)]
+            self._connections.append(conn)
+        return conn
+
+    def close_all(self) -> None:
+        """Close every pooled connection. Idempotent; safe at shutdown.
+
+        Runs ``PRAGMA optimize`` on the way out so the query planner's
+        statistics stay fresh, and lets the last connection checkpoint the
+        WAL back into the main database file.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    @property
+    def open_connections(self) -> int:
+        """Number of live pooled connections (diagnostics / tests)."""
+        with self._lock:
+            return sum(1 for c in self._connections if _is_open(c))
+
+
+def _is_open(conn: sqlite3.Connection) -> bool:
+    """True unless ``conn.close()`` has been called."""
+    try:
+        conn.in_transaction  # raises ProgrammingError once closed
+        return True
+    except sqlite3.ProgrammingError:
+        return False
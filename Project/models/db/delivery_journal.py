@@ -0,0 +1,326 @@
+"""Write-behind journal for ``dispensing_history`` rows.
+
+``RelayWorker`` used to call ``DatabaseHandler.log_delivery`` synchronously,
+under its mutex, right after a valve closed: one INSERT + one ``animals``
+UPDATE + one commit (and its fsync on the SD card) per delivery, on the
+delivery thread. :class:`DeliveryJournal` takes that off the hot path:
+
+- :meth:`DeliveryJournal.submit` appends the record as one JSON line to a
+  spill file next to the database (a buffered ``write`` + ``flush`` — no
+  fsync) and queues it. That is all the delivery thread pays.
+- A writer thread drains the queue and commits records in groups through
+  ``DatabaseHandler.log_deliveries`` — one transaction per group, flushed
+  when ``max_batch`` records are waiting or ``flush_interval_s`` after the
+  first one arrived, whichever comes first.
+- Once every submitted record is committed, the spill file is truncated.
+
+Crash safety: a record is in the OS page cache the moment ``submit``
+returns, so a process crash loses nothing — the next
+:func:`recover_spill_file` (run by ``DatabaseHandler.__init__``) replays it.
+Every record carries a ``journal_id`` stored in a UNIQUE column, so a replay
+of rows that *did* commit before the crash is ignored rather than
+duplicated. Only a power cut inside the flush window can lose records.
+
+Bad records: a line that does not parse, or a record missing a field
+``dispensing_history`` needs, is moved to a side file
+(:func:`bad_path_for`) and logged instead of being replayed. A group that
+keeps failing is committed one record at a time after ``MAX_ATTEMPTS``
+tries, and the records that still fail go to the side file too, so one bad
+row cannot hold back every delivery logged after it.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+# Group-commit thresholds.
+FLUSH_INTERVAL_S = 0.5
+MAX_BATCH = 64
+
+# Back-off between attempts when a group commit fails (e.g. DB locked).
+RETRY_DELAY_S = 1.0
+# Failed group attempts before the group is committed record by record.
+MAX_ATTEMPTS = 3
+
+# Fields log_deliveries() needs in every record.
+REQUIRED_FIELDS = (
+    'schedule_id',
+    'animal_id',
+    'relay_unit_id',
+    'timestamp',
+    'volume_delivered',
+    'status',
+)
+
+_FLUSH = object()
+_STOP = object()
+
+_logger = logging.getLogger(__name__)
+
+
+def spill_path_for(db_path: str) -> str:
+    """Spill file that belongs to the database at ``db_path``."""
+    return f"{db_path}.journal"
+
+
+def bad_path_for(db_path: str) -> str:
+    """Side file for journal records that could not be committed."""
+    return f"{spill_path_for(db_path)}.bad"
+
+
+def _is_valid(record) -> bool:
+    if not isinstance(record, dict):
+        return False
+    if any(record.get(key) is None for key in REQUIRED_FIELDS):
+        return False
+    volume = record['volume_delivered']
+    return isinstance(volume, (int, float)) and not isinstance(volume, bool)
+
+
+def _quarantine(bad_path: str, entries: List, reason: str) -> None:
+    """Append ``entries`` (records or raw lines) to ``bad_path`` and log them."""
+    if not entries:
+        return
+    _logger.error(
+        "Moving %d delivery journal record(s) to %s (%s)", len(entries), bad_path, reason
+    )
+    try:
+        with open(bad_path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write((entry if isinstance(entry, str) else json.dumps(entry)) + '\n')
+    except OSError as exc:
+        _logger.error("Could not write %s: %s; records: %r", bad_path, exc, entries)
+
+
+def _read_spill(path: str) -> Tuple[List[Dict], List[str]]:
+    """Records in the spill file, and the lines that are not valid records."""
+    records, bad_lines = [], []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Usually a torn final line from a crash mid-write.
+                    bad_lines.append(line)
+                    continue
+                if _is_valid(record):
+                    records.append(record)
+                else:
+                    bad_lines.append(line)
+    except FileNotFoundError:
+        pass
+    return records, bad_lines
+
+
+def _log_deliveries(database_handler, records: List[Dict]) -> bool:
+    try:
+        return bool(database_handler.log_deliveries(records))
+    except Exception as exc:
+        _logger.error("Delivery journal commit failed: %s", exc)
+        return False
+
+
+def _commit_each(database_handler, records: List[Dict]) -> List[Dict]:
+    """Commit ``records`` one by one; returns the ones that failed."""
+    return [record for record in records if not _log_deliveries(database_handler, [record])]
+
+
+def recover_spill_file(database_handler, spill_path: Optional[str] = None) -> int:
+    """Commit any records a previous run left in the spill file.
+
+    Safe to call at any time no journal is writing to ``spill_path``.
+    If the group fails, records are committed one at a time. Unreadable
+    records and those that still fail are moved to the side file (the spill
+    file is truncated by the next journal commit, so they cannot stay).
+
+    Returns:
+        Number of records replayed (already-committed ones are ignored by
+        the UNIQUE ``journal_id``).
+    """
+    path = spill_path or spill_path_for(database_handler.db_path)
+    bad_path = f"{path}.bad"
+    records, bad_lines = _read_spill(path)
+    if not records and not bad_lines:
+        return 0
+    failed = []
+    if records and not _log_deliveries(database_handler, records):
+        failed = _commit_each(database_handler, records)
+    _quarantine(bad_path, bad_lines, "unreadable on recovery")
+    _quarantine(bad_path, failed, "failed to commit on recovery")
+    with open(path, 'w', encoding='utf-8'):
+        pass
+    replayed = len(records) - len(failed)
+    if replayed:
+        print(f"Recovered {replayed} journalled delivery record(s).")
+    return replayed
+
+
+class DeliveryJournal:
+    """Asynchronous, group-committing writer for delivery log records."""
+
+    def __init__(
+        self,
+        database_handler,
+        *,
+        spill_path: Optional[str] = None,
+        flush_interval_s: float = FLUSH_INTERVAL_S,
+        max_batch: int = MAX_BATCH,
+    ) -> None:
+        self._db = database_handler
+        self._spill_path = spill_path or spill_path_for(database_handler.db_path)
+        self._bad_path = f"{self._spill_path}.bad"
+        self._flush_interval_s = flush_interval_s
+        self._max_batch = max_batch
+
+        # Anything a crashed predecessor left behind goes in first.
+        recover_spill_file(database_handler, self._spill_path)
+
+        self._queue: queue.Queue = queue.Queue()
+        # Guards the spill file and the pending count; _idle is signalled
+        # whenever pending drops to zero.
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._closed = False
+        self._spill = open(self._spill_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='DeliveryJournal', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ API
+
+    def submit(self, delivery_data: Dict) -> None:
+        """Journal one ``log_delivery``-shaped record. Never touches SQLite.
+
+        ``timestamp`` must already be a string (ISO format). A record missing
+        one of ``REQUIRED_FIELDS`` goes straight to the side file.
+        """
+        record = dict(delivery_data)
+        record.setdefault('journal_id', uuid.uuid4().hex)
+        if not _is_valid(record):
+            _quarantine(self._bad_path, [record], "missing or invalid fields")
+            return
+        line = json.dumps(record)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DeliveryJournal is closed")
+            self._spill.write(line + '\n')
+            self._spill.flush()
+            self._pending += 1
+        self._queue.put(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Commit everything submitted so far. True once nothing is pending."""
+        self._queue.put(_FLUSH)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """Flush, stop the writer thread and close the spill file. Idempotent.
+
+        Returns False if records were still pending at the deadline; they stay
+        in the spill file and are replayed on the next start.
+        """
+        with self._lock:
+            if self._closed:
+                return self._pending == 0
+            self._closed = True
+        drained = self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        with self._lock:
+            self._spill.close()
+        return drained
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    # --------------------------------------------------------------- writer
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        attempts = 0
+        stopping = False
+        while not stopping:
+            if not batch:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                if item is not _FLUSH:
+                    batch.append(item)
+            deadline = time.monotonic() + self._flush_interval_s
+            # A retry commits the failed group as it is, without waiting.
+            while batch and not attempts and len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            if self._commit(batch):
+                batch = []
+                attempts = 0
+                continue
+            attempts += 1
+            if stopping:
+                # Leave them in the spill file for recover_spill_file().
+                break
+            if attempts >= MAX_ATTEMPTS:
+                self._commit_isolated(batch)
+                batch = []
+                attempts = 0
+            else:
+                time.sleep(RETRY_DELAY_S)
+
+    def _commit(self, batch: List[Dict]) -> bool:
+        if not _log_deliveries(self._db, batch):
+            return False
+        self._settle(len(batch))
+        return True
+
+    def _commit_isolated(self, batch: List[Dict]) -> None:
+        """Commit a group that keeps failing one record at a time."""
+        _logger.warning(
+            "Delivery journal group of %d failed %d times; committing records one by one",
+            len(batch),
+            MAX_ATTEMPTS,
+        )
+        failed = _commit_each(self._db, batch)
+        _quarantine(self._bad_path, failed, f"failed {MAX_ATTEMPTS} group commits and alone")
+        self._settle(len(batch))
+
+    def _settle(self, count: int) -> None:
+        """Mark ``count`` records as committed or moved to the side file."""
+        with self._idle:
+            self._pending -= count
+            if self._pending == 0 and not self._spill.closed:
+                # Every journalled record is in SQLite or the side file now.
+                self._spill.seek(0)
+                self._spill.truncate()
+                self._idle.notify_all()
@@ -0,0 +1,336 @@
+"""Versioned, idempotent schema migrations for the RRR database.
+
+``DatabaseHandler.create_tables()`` still owns the baseline DDL (``CREATE
+TABLE IF NOT EXISTS`` for every table). Everything that *changes* an existing
+schema — new columns, indexes, new derived tables — is a numbered
+:class:`Migration` in :data:`MIGRATIONS`, recorded in the ``schema_version``
+table once applied:
+
+    schema_version(version INTEGER PRIMARY KEY, description, applied_at)
+
+Rules for adding a migration (see docs/DATABASE.md §4):
+
+1. Append it with the next version number; never renumber or edit a shipped one.
+2. Make ``apply`` idempotent (``IF NOT EXISTS``, column checks) — a device DB
+   may already carry the change from before it was tracked.
+3. Each migration runs in its own transaction together with its
+   ``schema_version`` row, so a failure leaves the DB at the previous version.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Sequence
+
+SCHEMA_VERSION_DDL = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+'''
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> set:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {col[1] for col in cursor.fetchall()}
+
+
+def _add_dispensing_cycle_index(cursor: sqlite3.Cursor) -> None:
+    if 'cycle_index' not in _columns(cursor, 'dispensing_history'):
+        cursor.execute(
+            'ALTER TABLE dispensing_history ADD COLUMN cycle_index INTEGER DEFAULT NULL'
+        )
+
+
+def _add_animal_sex(cursor: sqlite3.Cursor) -> None:
+    if 'sex' not in _columns(cursor, 'animals'):
+        cursor.execute('''
+            ALTER TABLE animals
+            ADD COLUMN sex TEXT CHECK(sex IN ('male', 'female')) DEFAULT NULL
+        ''')
+
+
+def _add_hot_path_indexes(cursor: sqlite3.Cursor) -> None:
+    # Covering index for the per-animal SUM(volume_dispensed) in
+    # get_schedule_progress (status filter) and get_staggered_window_status
+    # (timestamp range) — both are answered from the index alone.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dispensing_history_schedule_animal
+        ON dispensing_history (schedule_id, animal_id, status, timestamp, volume_dispensed)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_staggered_windows_schedule_animal
+        ON schedule_staggered_windows (schedule_id, animal_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_staggered_windows_status_start
+        ON schedule_staggered_windows (status, start_time)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cycle_tracking_schedule_animal_cycle
+        ON cycle_tracking (schedule_id, animal_id, cycle_index)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_instant_deliveries_schedule
+        ON schedule_instant_deliveries (schedule_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_schedules_created_by
+        ON schedules (created_by)
+    ''')
+    cursor.execute('ANALYZE')
+
+
+def _add_dispensing_journal_id(cursor: sqlite3.Cursor) -> None:
+    # Idempotency key for write-behind journal replays (models/db/
+    # delivery_journal.py). NULL for rows logged directly; UNIQUE ignores
+    # NULLs, so those are unaffected.
+    if 'journal_id' not in _columns(cursor, 'dispensing_history'):
+        cursor.execute('ALTER TABLE dispensing_history ADD COLUMN journal_id TEXT DEFAULT NULL')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_dispensing_history_journal_id
+        ON dispensing_history (journal_id)
+    ''')
+
+
+def _add_delivery_totals(cursor: sqlite3.Cursor) -> None:
+    # Running aggregates of dispensing_history so progress and resume reads
+    # cost O(animals) rather than O(history rows). Maintained by triggers,
+    # which also covers the direct INSERTs in log_staggered_delivery.
+    # Only 'completed' rows add volume, matching get_schedule_progress.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_totals (
+            schedule_id INTEGER NOT NULL,
+            animal_id INTEGER NOT NULL,
+            delivered_volume REAL NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            last_delivery TEXT,
+            PRIMARY KEY (schedule_id, animal_id)
+        ) WITHOUT ROWID
+    ''')
+    # Per-day rollup keyed animal-first: "how much did this animal get on
+    # this day" is answered across schedules from one index range.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_daily_totals (
+            animal_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            schedule_id INTEGER NOT NULL,
+            delivered_volume REAL NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (animal_id, day, schedule_id)
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_dispensing_history_totals_insert
+        AFTER INSERT ON dispensing_history
+        BEGIN
+            INSERT INTO delivery_totals (
+                schedule_id, animal_id, delivered_volume,
+                completed_count, failed_count, last_delivery
+            ) VALUES (
+                NEW.schedule_id, NEW.animal_id,
+                CASE WHEN NEW.status = 'completed' THEN NEW.volume_dispensed ELSE 0 END,
+                NEW.status = 'completed', NEW.status != 'completed', NEW.timestamp
+            )
+            ON CONFLICT (schedule_id, animal_id) DO UPDATE SET
+                delivered_volume = delivered_volume + excluded.delivered_volume,
+                completed_count = completed_count + excluded.completed_count,
+                failed_count = failed_count + excluded.failed_count,
+                last_delivery = MAX(COALESCE(last_delivery, ''), excluded.last_delivery);
+
+            INSERT INTO delivery_daily_totals (
+                animal_id, day, schedule_id, delivered_volume, completed_count
+            ) SELECT NEW.animal_id, substr(NEW.timestamp, 1, 10), NEW.schedule_id,
+                     NEW.volume_dispensed, 1
+              WHERE NEW.status = 'completed'
+            ON CONFLICT (animal_id, day, schedule_id) DO UPDATE SET
+                delivered_volume = delivered_volume + excluded.delivered_volume,
+                completed_count = completed_count + 1;
+        END
+    ''')
+    # History rows are not deleted by the app, but keep the aggregates
+    # honest if someone prunes the table by hand.
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_dispensing_history_totals_delete
+        AFTER DELETE ON dispensing_history
+        BEGIN
+            UPDATE delivery_totals SET
+                delivered_volume = delivered_volume
+                    - CASE WHEN OLD.status = 'completed' THEN OLD.volume_dispensed ELSE 0 END,
+                completed_count = completed_count - (OLD.status = 'completed'),
+                failed_count = failed_count - (OLD.status != 'completed')
+            WHERE schedule_id = OLD.schedule_id AND animal_id = OLD.animal_id;
+
+            UPDATE delivery_daily_totals SET
+                delivered_volume = delivered_volume - OLD.volume_dispensed,
+                completed_count = completed_count - 1
+            WHERE OLD.status = 'completed'
+              AND animal_id = OLD.animal_id
+              AND day = substr(OLD.timestamp, 1, 10)
+              AND schedule_id = OLD.schedule_id;
+        END
+    ''')
+
+    # Backfill from existing history (a no-op on a fresh DB).
+    cursor.execute('DELETE FROM delivery_totals')
+    cursor.execute('''
+        INSERT INTO delivery_totals (
+            schedule_id, animal_id, delivered_volume,
+            completed_count, failed_count, last_delivery
+        )
+        SELECT schedule_id, animal_id,
+               TOTAL(CASE WHEN status = 'completed' THEN volume_dispensed END),
+               SUM(status = 'completed'), SUM(status != 'completed'), MAX(timestamp)
+        FROM dispensing_history
+        GROUP BY schedule_id, animal_id
+    ''')
+    cursor.execute('DELETE FROM delivery_daily_totals')
+    cursor.execute('''
+        INSERT INTO delivery_daily_totals (
+            animal_id, day, schedule_id, delivered_volume, completed_count
+        )
+        SELECT animal_id, substr(timestamp, 1, 10), schedule_id,
+               TOTAL(volume_dispensed), COUNT(*)
+        FROM dispensing_history
+        WHERE status = 'completed'
+        GROUP BY animal_id, substr(timestamp, 1, 10), schedule_id
+    ''')
+
+
+def _add_worker_checkpoints(cursor: sqlite3.Cursor) -> None:
+    # RelayWorker state for resuming a schedule after a crash or power loss;
+    # a row exists only while its schedule is in flight.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS worker_checkpoints (
+            schedule_id INTEGER PRIMARY KEY,
+            mode TEXT NOT NULL,
+            window_start REAL NOT NULL,
+            window_end REAL NOT NULL,
+            state TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+
+def _add_dispensing_instant_key(cursor: sqlite3.Cursor) -> None:
+    # The instant-mode delivery a row fulfils ("<animal_id>@<instant time>").
+    # A retried delivery is logged at the retry time, so the timestamp alone
+    # cannot tell a resumed worker which instant it already made.
+    if 'instant_key' not in _columns(cursor, 'dispensing_history'):
+        cursor.execute('ALTER TABLE dispensing_history ADD COLUMN instant_key TEXT DEFAULT NULL')
+
+
+def _rebuild_delivery_totals_triggers(cursor: sqlite3.Cursor) -> None:
+    # delivery_daily_totals (migration 5) had no readers, so its trigger
+    # writes were pure cost; drop it. The delete trigger also left
+    # last_delivery pointing at a deleted row; it now recomputes it.
+    cursor.execute('DROP TRIGGER IF EXISTS trg_dispensing_history_totals_insert')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_dispensing_history_totals_delete')
+    cursor.execute('DROP TABLE IF EXISTS delivery_daily_totals')
+    cursor.execute('''
+        CREATE TRIGGER trg_dispensing_history_totals_insert
+        AFTER INSERT ON dispensing_history
+        BEGIN
+            INSERT INTO delivery_totals (
+                schedule_id, animal_id, delivered_volume,
+                completed_count, failed_count, last_delivery
+            ) VALUES (
+                NEW.schedule_id, NEW.animal_id,
+                CASE WHEN NEW.status = 'completed' THEN NEW.volume_dispensed ELSE 0 END,
+                NEW.status = 'completed', NEW.status != 'completed', NEW.timestamp
+            )
+            ON CONFLICT (schedule_id, animal_id) DO UPDATE SET
+                delivered_volume = delivered_volume + excluded.delivered_volume,
+                completed_count = completed_count + excluded.completed_count,
+                failed_count = failed_count + excluded.failed_count,
+                last_delivery = MAX(COALESCE(last_delivery, ''), excluded.last_delivery);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_dispensing_history_totals_delete
+        AFTER DELETE ON dispensing_history
+        BEGIN
+            UPDATE delivery_totals SET
+                delivered_volume = delivered_volume
+                    - CASE WHEN OLD.status = 'completed' THEN OLD.volume_dispensed ELSE 0 END,
+                completed_count = completed_count - (OLD.status = 'completed'),
+                failed_count = failed_count - (OLD.status != 'completed'),
+                last_delivery = (
+                    SELECT MAX(timestamp) FROM dispensing_history
+                    WHERE schedule_id = OLD.schedule_id AND animal_id = OLD.animal_id
+                )
+            WHERE schedule_id = OLD.schedule_id AND animal_id = OLD.animal_id;
+        END
+    ''')
+
+
+MIGRATIONS: Sequence[Migration] = (
+    # 1 and 2 were the ad-hoc inline ALTERs in create_tables(); they are
+    # idempotent, so pre-framework DBs that already have the columns just
+    # get their version rows recorded.
+    Migration(1, 'dispensing_history.cycle_index', _add_dispensing_cycle_index),
+    Migration(2, 'animals.sex', _add_animal_sex),
+    Migration(3, 'hot-path indexes on dispensing_history and child tables', _add_hot_path_indexes),
+    Migration(4, 'dispensing_history.journal_id', _add_dispensing_journal_id),
+    Migration(5, 'delivery_totals and delivery_daily_totals aggregates', _add_delivery_totals),
+    Migration(6, 'worker_checkpoints', _add_worker_checkpoints),
+    Migration(7, 'dispensing_history.instant_key', _add_dispensing_instant_key),
+    Migration(
+        8,
+        'drop delivery_daily_totals; recompute last_delivery on delete',
+        _rebuild_delivery_totals_triggers,
+    ),
+)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration version (0 for a DB with none)."""
+    conn.execute(SCHEMA_VERSION_DDL)
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(
+    conn: sqlite3.Connection, migrations: Sequence[Migration] = MIGRATIONS
+) -> List[int]:
+    """Apply every pending migration in version order.
+
+    Each migration and its ``schema_version`` row commit together; on error
+    that migration is rolled back and the exception propagates.
+
+    Returns:
+        The versions applied by this call (empty when already up to date).
+    """
+    if conn.in_transaction:
+        conn.commit()
+    version = current_version(conn)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            migration.apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (migration.version, migration.description, datetime.now().isoformat()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
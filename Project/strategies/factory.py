@@ -16,6 +16,7 @@ class StrategyFactory:
     - solenoid_controller: required for solenoid mode
     - flow_sensor: required for solenoid mode
     - calibration_store: optional for solenoid mode
+    - relay_io: optional gpio.relay_io.RelayIOThread for solenoid mode
     - settings: required for all modes
 
     Best Practices:
@@ -37,6 +38,7 @@ class StrategyFactory:
         calibration_store=None,
         settings=None,
         database_handler=None,
+        relay_io=None,
         **kwargs,
     ):
         mode = (hardware_mode or "pump").strip().lower()
@@ -56,6 +58,7 @@ class StrategyFactory:
                 calibration_store=calibration_store,
                 settings=settings,
                 database_handler=database_handler,  # For per-valve calibration
+                relay_io=relay_io,  # Valve writes off the delivery loop
             )
 
         # Fallback to pump mode for unknown values to preserve current behavior.
@@ -1,10 +1,34 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import copy
+import functools
+import itertools
 import logging
+import math
 import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from drivers.flow_sensor_pool import FlowSensorPool
+from gpio.pulse_timing import PulseResult, precise_pulse, precise_pulses
+from gpio.relay_io import Actuation, actuate
+from utils.flow_integration import (
+    FlowIntegrator,
+    host_sample,
+    integrate_flow,
+    read_new_samples,
+)
+from utils.flow_ring import FlowSampleRing
+from utils.sensor_health import RestartPolicy, SensorHealth
+
+# Fixed restart cadence for sensor drivers that report no firmware health
+LEGACY_RESTART_EVERY_PULSES = 5
+# How long a cleanup-path valve close waits behind the relay I/O queue
+# before writing directly
+RELAY_IO_CLOSE_TIMEOUT_S = 2.0
 
 
 @dataclass
@@ -15,6 +39,104 @@ class DeliveryResult:
     warning: Optional[str] = None
 
 
+@dataclass
+class _PulseBudget:
+    """One cage's share of a parallel pulse timeline (see deliver_many)."""
+
+    pulse_width_ms: int
+    volume_per_pulse_ml: float
+    remaining_ml: float
+    pulses_left: int
+    pulses: int = 0
+    delivered_ml: float = 0.0
+    failed: bool = False
+
+    @property
+    def done(self) -> bool:
+        """Budget used up (or within 10% of a pulse) without a valve failure."""
+        return self.pulses_left == 0 and not self.failed
+
+
+class ManifoldSession:
+    """Master valve primed once and held open across consecutive deliveries.
+
+    Returned by :meth:`SolenoidFlowStrategy.manifold_session` and used as
+    ``async with strategy.manifold_session(): ...``. While it is open,
+    pulse-mode and calibration-only continuous deliveries skip their own
+    prime (master open, ``prime_ms``, close, 50 ms) and 300 ms stabilise, and
+    leave the master open when they finish. Exiting the session closes the
+    master.
+
+    Safety is unchanged: a failed or cancelled delivery closes the master and
+    ends the session (later deliveries prime themselves again), and the
+    master is closed and re-primed once it has been open ``max_open_s``.
+    A ``shared`` session (deliveries on several flow sensors at once) is
+    never re-primed under a running delivery; its owner stops starting
+    deliveries once it has :attr:`expired` instead.
+    """
+
+    def __init__(self, strategy: 'SolenoidFlowStrategy', max_open_s: float) -> None:
+        self._strategy = strategy
+        self._max_open_s = float(max_open_s)
+        self._opened_at: Optional[float] = None
+        self.active = False
+        self.shared = False
+
+    async def __aenter__(self) -> 'ManifoldSession':
+        await self._open()
+        self._strategy._session = self
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        if self._strategy._session is self:
+            self._strategy._session = None
+        self.close()
+        return False
+
+    async def _open(self) -> None:
+        strategy = self._strategy
+        await strategy._switch('open_master')
+        await asyncio.sleep(strategy._prime_ms / 1000.0)
+        await strategy._switch('close_master')
+        await asyncio.sleep(0.05)
+        await strategy._switch('open_master')
+        await asyncio.sleep(0.3)  # Let manifold stabilize
+        self._opened_at = asyncio.get_running_loop().time()
+        self.active = True
+
+    async def ensure_open(self) -> bool:
+        """True if the master is open for the next delivery (re-primed if stale)."""
+        if not self.active:
+            return False
+        if self.shared or not self.expired:
+            return True
+        self._strategy._logger.info(
+            f"Manifold open {self._max_open_s:.0f}s; closing and re-priming"
+        )
+        self.close()
+        try:
+            await self._open()
+        except Exception as e:
+            self._strategy._logger.error(f"Failed to re-prime manifold: {e}")
+            self.close()
+        return self.active
+
+    @property
+    def expired(self) -> bool:
+        """True once the master has been open ``max_open_s``."""
+        return asyncio.get_running_loop().time() - self._opened_at >= self._max_open_s
+
+    def close(self) -> None:
+        """Close the master valve and end the session. Idempotent."""
+        if not self.active:
+            return
+        self.active = False
+        try:
+            self._strategy._switch_now('close_master')
+        except Exception as e:
+            self._strategy._logger.error(f"Failed to close master: {e}")
+
+
 class SolenoidFlowStrategy:
     """Volume-based delivery using a global master + per-cage solenoids.
 
@@ -60,8 +182,12 @@ class SolenoidFlowStrategy:
         *,
         prime_ms: int = 200,
         database_handler=None,
+        relay_io=None,
     ) -> None:
         self._valves = solenoid_controller
+        # gpio.relay_io.RelayIOThread, if any: valve calls then run on its
+        # thread instead of blocking this loop (see _switch()).
+        self._relay_io = relay_io
         self._sensor = flow_sensor  # Can be None for calibration-only mode
         self._cal = calibration_store
         self._settings = settings
@@ -71,15 +197,27 @@ class SolenoidFlowStrategy:
         # Cooperative-cancellation token. Set from the GUI thread by
         # request_cancel() when the operator presses Stop; polled by the
         # delivery loops after every await so they exit fast (and their
-        # finally-blocks close the master valve) instead of relying on
-        # the worker thread's Qt event loop — which is blocked inside
-        # run_until_complete and cannot process a queued stop slot. A
+        # finally-blocks close the master valve) instead of waiting for
+        # the worker's queued stop slot. The delivery itself runs on
+        # RelayWorker's delivery loop thread (gpio/delivery_loop.py). A
         # threading.Event is used because the write crosses threads.
         # See the v1.8.0 incident write-up in utils/stop_sequence.py.
         self._cancel_event = threading.Event()
+        # Open ManifoldSession, if any (see manifold_session()).
+        self._session: Optional[ManifoldSession] = None
+        # Several flow sensors: each cage is delivered by a copy of this
+        # strategy holding its sensor (see _for_cage()), keyed by sensor name.
+        self._pool = flow_sensor if isinstance(flow_sensor, FlowSensorPool) else None
+        self._routed: Dict[str, 'SolenoidFlowStrategy'] = {}
+        # Set while deliver_many runs several sensors' cages at once; any
+        # failure sets it and stops the others (see _deliver_concurrently()).
+        self._batch_abort: Optional[threading.Event] = None
         # Per-run calibration snapshot (cage_id -> {pulse_width_ms: {id, volume_per_pulse_ml}})
         self._cal_snapshot: Dict[int, Dict[int, Dict[str, float]]] = {}
 
+        # Learned per-rig sensor restart budget, loaded on first use
+        self._restart_policy: Optional[RestartPolicy] = None
+
         # NEW: Track if sensor is available for guardrail mode
         self._sensor_available = flow_sensor is not None
         if not self._sensor_available:
@@ -263,9 +401,129 @@ class SolenoidFlowStrategy:
         """
         self._cancel_event.clear()
 
+    async def _switch(self, method: str, *args) -> Actuation:
+        """Call ``self._valves.<method>(*args)`` and return its Actuation.
+
+        With a relay I/O thread the call runs there and is awaited, so the
+        loop keeps draining the sensor during the I2C write; otherwise it
+        runs in place. Either way the Actuation says when the write started
+        and completed.
+        """
+        fn = getattr(self._valves, method)
+        if self._relay_io is None:
+            return actuate(fn, *args, clock=time.monotonic)
+        return await self._relay_io.run(fn, *args)
+
+    def _switch_now(self, method: str, *args):
+        """Blocking :meth:`_switch` for cleanup paths (except/finally).
+
+        Goes through the relay I/O queue too, so a close can never overtake
+        an open still queued by a cancelled coroutine. If the queue does not
+        get to it within ``RELAY_IO_CLOSE_TIMEOUT_S``, writes directly.
+        """
+        fn = getattr(self._valves, method)
+        if self._relay_io is None:
+            return fn(*args)
+        try:
+            return self._relay_io.call(fn, *args, timeout=RELAY_IO_CLOSE_TIMEOUT_S).result
+        except (concurrent.futures.TimeoutError, RuntimeError) as e:
+            self._logger.error(
+                f"Relay I/O thread unavailable for {method} ({e!r}); writing directly"
+            )
+            return fn(*args)
+
+    async def _pulse(self, cage_id: int, width_s: float) -> PulseResult:
+        """Hold ``cage_id`` open for ``width_s`` and return the achieved timing.
+
+        With a relay I/O thread the whole pulse runs there as one command
+        (sleep, then spin to the close deadline; see gpio/pulse_timing.py),
+        and it completes, closing the valve, even if this coroutine is
+        cancelled. Otherwise the open time is an ``asyncio.sleep`` on this
+        loop, as under flow replay where the loop's clock is virtual.
+        """
+        if self._relay_io is not None:
+            actuation = await self._relay_io.run(
+                precise_pulse,
+                functools.partial(self._valves.open_cage, cage_id),
+                functools.partial(self._valves.close_cage, cage_id),
+                width_s,
+            )
+            return actuation.result
+        opened = await self._switch('open_cage', cage_id)
+        try:
+            await asyncio.sleep(width_s)
+        except BaseException:
+            self._switch_now('close_cage', cage_id)
+            raise
+        closed = await self._switch('close_cage', cage_id)
+        return PulseResult(
+            requested_s=width_s,
+            achieved_s=closed.actuated_at - opened.actuated_at,
+            started_at=opened.started_at,
+            opened_at=opened.actuated_at,
+            closed_at=closed.actuated_at,
+        )
+
+    def _width_corrected_volume(self, volume_ml: float, pulse: PulseResult) -> float:
+        """Scale a calibrated pulse volume to the open time actually achieved.
+
+        Uses the slope of the global pulse-width/volume profile around the
+        requested width; with fewer than two calibrated widths there is no
+        slope to go by and ``volume_ml`` is returned unchanged. Measured
+        profiles are noisy, so volumes are taken as a running maximum: a
+        longer open time never credits less.
+        """
+        profile = sorted(getattr(self, '_empirical_pulse_volumes', {}).items())
+        if len(profile) < 2 or volume_ml <= 0:
+            return volume_ml
+        widths = [width for width, _volume in profile]
+        volumes = [volume for _width, volume in profile]
+        profile = list(zip(widths, itertools.accumulate(volumes, max)))
+
+        def volume_at(width_ms: float) -> float:
+            # Piecewise-linear, extrapolating the end segments
+            for (w0, v0), (w1, v1) in zip(profile, profile[1:]):
+                if width_ms <= w1 or (w1, v1) == profile[-1]:
+                    return v0 + (v1 - v0) * (width_ms - w0) / (w1 - w0)
+            return profile[-1][1]
+
+        requested = volume_at(pulse.requested_s * 1000.0)
+        if requested <= 0:
+            return volume_ml
+        return max(0.0, volume_ml * volume_at(pulse.achieved_s * 1000.0) / requested)
+
     def _check_cancelled(self) -> bool:
+        if self._batch_abort is not None and self._batch_abort.is_set():
+            return True
         return self._cancel_event.is_set()
 
+    def _for_cage(self, cage_id: int) -> 'SolenoidFlowStrategy':
+        """The strategy metering ``cage_id``: self, or its sensor's copy on a pool.
+
+        The copy shares the valves, settings, calibration snapshot and
+        cancellation token, and has its own sensor, sensor availability and
+        restart policy, so a sensor that fails only degrades its own cages.
+        """
+        if self._pool is None:
+            return self
+        name = self._pool.name_for(cage_id)
+        routed = self._routed.get(name)
+        if routed is None:
+            routed = copy.copy(self)
+            routed._pool = None
+            routed._routed = {}
+            routed._sensor = self._pool.sensor_for(cage_id)
+            routed._sensor_available = routed._sensor is not None
+            routed._restart_policy = None
+            if not routed._sensor_available:
+                self._logger.info(
+                    f"Flow sensor {name} unavailable; its cages run CALIBRATION-ONLY"
+                )
+            self._routed[name] = routed
+        routed._session = self._session
+        routed._batch_abort = self._batch_abort
+        return routed
+
     async def deliver(
         self,
         relay_unit_id: int,
@@ -287,12 +545,365 @@ class SolenoidFlowStrategy:
         if self._check_cancelled():
             return False
 
+        strategy = self._for_cage(cage_id)
+        if strategy is not self:
+            return await strategy.deliver(cage_id, target_volume_ml, triggers_hint)
+
         # Route to mode-specific delivery method
         if self._use_pulse_mode:
             return await self._deliver_pulse_mode(cage_id, target_volume_ml)
         else:
             return await self._deliver_continuous_mode(cage_id, target_volume_ml)
 
+    def manifold_session(self, max_open_s: Optional[float] = None) -> ManifoldSession:
+        """Prime the manifold once for a run of back-to-back deliveries.
+
+        ``max_open_s`` (default ``max_manifold_open_s``, 300 s) bounds how
+        long the master stays open before it is closed and re-primed.
+        """
+        if max_open_s is None:
+            max_open_s = float(self._settings.get('max_manifold_open_s', 300.0))
+        return ManifoldSession(self, max_open_s)
+
+    async def _session_master_open(self) -> bool:
+        """True when an open ManifoldSession already holds the master open."""
+        session = self._session
+        return session is not None and await session.ensure_open()
+
+    def _end_session(self) -> None:
+        """A delivery in the session failed: close the master, prime per delivery."""
+        if self._batch_abort is not None:
+            # The master is shared with other sensors' running deliveries
+            self._batch_abort.set()
+        if self._session is not None:
+            self._session.close()
+
+    @property
+    def supports_parallel(self) -> bool:
+        """True when :meth:`deliver_many` pulses cages together.
+
+        Pulse mode only, and only where no per-cage flow reading is needed:
+        the flow sensor is unavailable (calibration-only), or the cages are on
+        independent lines (``independent_cage_lines``). ``parallel_delivery:
+        False`` in settings turns it off.
+        """
+        if not (self._use_pulse_mode and self._settings.get('parallel_delivery', True)):
+            return False
+        if not self._sensor_available or self._sensor is None:
+            return True
+        return bool(self._settings.get('independent_cage_lines', False))
+
+    @staticmethod
+    def _pulse_budget(target_volume_ml: float, volume_per_pulse_ml: float) -> float:
+        """Pulses the sequential loop would fire for this target.
+
+        It stops once the remainder is within 10% of one pulse, so the
+        budget is ``ceil(target / per_pulse - 0.1)`` (at least one).
+        """
+        if volume_per_pulse_ml <= 0:
+            return math.inf
+        return max(1, math.ceil(target_volume_ml / volume_per_pulse_ml - 0.1 - 1e-9))
+
+    async def deliver_many(self, targets: Dict[int, float]) -> Dict[int, bool]:
+        """Deliver to several cages in one master-open session.
+
+        ``targets`` maps cage_id -> volume (mL). Each cage gets a pulse budget
+        from its own calibration. On every tick of the shared timeline all
+        cages with pulses left open together, each closes after its
+        calibrated pulse width, and the manifold settles. Each cage is
+        credited for the open time it achieved and topped up if that fell
+        short. A full HAT then takes about as long as its largest single
+        delivery rather than the sum of all of them.
+
+        Without :attr:`supports_parallel` the cages get one :meth:`deliver`
+        each, back to back in one :class:`ManifoldSession`; with several flow
+        sensors, each sensor's cages run back to back and the sensors run
+        concurrently (see :meth:`_deliver_concurrently`). Returns
+        cage_id -> success.
+        """
+        results = {int(cage_id): False for cage_id in targets}
+        if self._check_cancelled() or not targets:
+            return results
+        if not self.supports_parallel:
+            groups = self._sensor_groups(targets)
+            if len(groups) > 1:
+                return await self._deliver_concurrently(groups, targets)
+            results.update(await self._deliver_sequentially(targets))
+            return results
+
+        max_pulses = int(self._settings.get('max_pulses_per_delivery', 100))
+        max_time_s = float(self._settings.get('max_pulse_delivery_time_s', 120.0))
+
+        budgets: Dict[int, _PulseBudget] = {}
+        for cage_id, volume in targets.items():
+            cage_id = int(cage_id)
+            cage_pw_ms, vol_per_pulse = await self._get_cage_calibration(cage_id)
+            pulses = self._pulse_budget(float(volume), vol_per_pulse)
+            if pulses > max_pulses:
+                self._logger.error(
+                    f"Cage {cage_id}: {volume:.3f}mL needs {pulses} pulses, over the safety "
+                    f"limit ({max_pulses}). Target volume too large or calibration invalid."
+                )
+                continue
+            budgets[cage_id] = _PulseBudget(cage_pw_ms, vol_per_pulse, float(volume), pulses)
+        if not budgets:
+            return results
+
+        self._logger.info(
+            "Starting parallel pulse delivery: "
+            + ", ".join(
+                f"cage {c}={b.pulses_left}x{b.pulse_width_ms}ms"
+                for c, b in sorted(budgets.items())
+            )
+        )
+
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        try:
+            async with self.manifold_session():
+                await self._run_pulse_timeline(budgets, max_time_s, max_pulses)
+        except Exception as e:
+            self._logger.error(f"Parallel pulse delivery failed: {e}", exc_info=True)
+
+        # Cages that finished their budget before a cancel, timeout or error
+        # were delivered; reporting them failed would get them delivered again.
+        for cage_id, budget in budgets.items():
+            results[cage_id] = budget.done
+        self._logger.info(
+            f"Parallel pulse delivery: {sum(results.values())}/{len(targets)} "
+            f"cages in {loop.time() - start_time:.1f}s ("
+            + ", ".join(
+                f"cage {c}={b.delivered_ml:.3f}mL/{b.pulses}" for c, b in sorted(budgets.items())
+            )
+            + ")"
+        )
+        return results
+
+    def _primes_per_delivery(self, cage_ids) -> bool:
+        """True when a continuous delivery to one of ``cage_ids`` reads a flow sensor.
+
+        That path ends any ManifoldSession and primes for itself (its
+        residual-flow check needs the master closed), so a session opened
+        for it would only add a prime and settle.
+        """
+        if self._use_pulse_mode:
+            return False
+        for cage_id in cage_ids:
+            strategy = self._for_cage(int(cage_id))
+            if strategy._sensor_available and strategy._sensor is not None:
+                return True
+        return False
+
+    async def _deliver_sequentially(self, targets: Dict[int, float]) -> Dict[int, bool]:
+        """One :meth:`deliver` per cage, back to back in one ManifoldSession.
+
+        No session is opened when the deliveries prime themselves anyway
+        (see :meth:`_primes_per_delivery`).
+        """
+        results = {int(cage_id): False for cage_id in targets}
+        if self._primes_per_delivery(targets):
+            for cage_id, volume in targets.items():
+                if self._check_cancelled():
+                    break
+                results[int(cage_id)] = await self.deliver(cage_id, volume)
+            return results
+        try:
+            async with self.manifold_session():
+                for cage_id, volume in targets.items():
+                    if self._check_cancelled():
+                        break
+                    results[int(cage_id)] = await self.deliver(cage_id, volume)
+        except Exception as e:
+            self._logger.error(f"Failed to prime manifold: {e}")
+        return results
+
+    def _sensor_groups(self, targets: Dict[int, float]) -> Dict[str, List[int]]:
+        """Pulse-mode cages split by flow sensor; {} without a sensor pool."""
+        if self._pool is None or not self._use_pulse_mode:
+            return {}
+        return self._pool.groups(targets)
+
+    async def _deliver_concurrently(
+        self, groups: Dict[str, List[int]], targets: Dict[int, float]
+    ) -> Dict[int, bool]:
+        """Meter each flow sensor's cages back to back, all sensors at once.
+
+        Every sensor reads only its own manifold, so cages on different
+        sensors can pulse at the same time under one master-open session:
+        the run takes about as long as the busiest sensor's share rather
+        than the sum. A failed delivery closes the shared master, so it
+        stops the other sensors' runs too; cages that were interrupted are
+        reported failed (never delivered twice), and cages that had not
+        started yet are delivered one by one afterwards, priming again.
+        The same happens to cages left when the session has been open
+        ``max_open_s``.
+        """
+        volumes = {int(cage_id): float(volume) for cage_id, volume in targets.items()}
+        results = {cage_id: False for cage_id in volumes}
+        started = set()
+        primed = False
+        self._logger.info(
+            "Starting concurrent delivery on "
+            + ", ".join(f"{name}: cages {cages}" for name, cages in groups.items())
+        )
+
+        async def run(session: ManifoldSession, cages: List[int]) -> None:
+            for cage_id in cages:
+                if self._check_cancelled() or session.expired:
+                    return
+                started.add(cage_id)
+                results[cage_id] = await self.deliver(cage_id, volumes[cage_id])
+
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        self._batch_abort = threading.Event()
+        try:
+            async with self.manifold_session() as session:
+                session.shared = True
+                primed = True
+                outcomes = await asyncio.gather(
+                    *(run(session, cages) for cages in groups.values()), return_exceptions=True
+                )
+                for outcome in outcomes:
+                    if isinstance(outcome, Exception):
+                        self._logger.error(f"Concurrent delivery failed: {outcome}")
+        except Exception as e:
+            self._logger.error(f"Failed to prime manifold: {e}")
+        finally:
+            self._batch_abort = None
+        self._logger.info(
+            f"Concurrent delivery: {sum(results.values())}/{len(started)} cages "
+            f"in {loop.time() - start_time:.1f}s"
+        )
+
+        pending = {c: v for c, v in volumes.items() if c not in started}
+        if primed and pending and not self._check_cancelled():
+            self._logger.info(f"Delivering remaining cages {sorted(pending)} one by one")
+            results.update(await self._deliver_sequentially(pending))
+        return results
+
+    async def _run_pulse_timeline(
+        self, budgets: Dict[int, _PulseBudget], max_time_s: float, max_pulses: int
+    ):
+        """Fire every cage's pulse budget on one shared timeline (master open).
+
+        Each tick opens every cage with pulses left in one write and closes
+        them in pulse-width order (see :meth:`_pulse_tick`). Every cage is
+        credited the calibrated volume scaled to the open time it achieved,
+        and stops, like the sequential loop, once what is left is within
+        10% of a pulse; a cage that came up short gets another pulse, up to
+        ``max_pulses``. A cage whose valve write fails is marked
+        ``failed``; the rest carry on.
+
+        Returns the cages that did not finish (see ``_PulseBudget.done``):
+        failed ones, and on a cancel or timeout those with pulses left.
+        """
+        loop = asyncio.get_running_loop()
+        settling_s = self._pulse_settling_ms / 1000.0
+        start_time = loop.time()
+        try:
+            while True:
+                active = [c for c, b in budgets.items() if b.pulses_left > 0 and not b.failed]
+                if not active:
+                    break
+                if self._check_cancelled():
+                    self._logger.info("Parallel pulse delivery cancelled; closing valves")
+                    break
+                if loop.time() - start_time >= max_time_s:
+                    self._logger.error(f"Max time ({max_time_s}s) exceeded, aborting")
+                    break
+
+                # Close in pulse-width order; cages sharing a width close together.
+                groups = {}
+                for c in active:
+                    groups.setdefault(budgets[c].pulse_width_ms, []).append(c)
+                close_failed = set()
+                try:
+                    pulses = await self._pulse_tick(active, groups, close_failed)
+                except Exception as e:
+                    self._logger.error(f"Failed to open cages {active}: {e}")
+                    for c in active:
+                        budgets[c].failed = True
+                    continue
+                for closing, pulse in zip(groups.values(), pulses):
+                    for c in closing:
+                        self._credit_pulse(budgets[c], pulse, max_pulses)
+                for c in close_failed:
+                    budgets[c].failed = True
+                await asyncio.sleep(settling_s)
+                await asyncio.sleep(0.1)  # Same inter-pulse gap as the sequential loop
+        finally:
+            # CRITICAL: Always close valves (the session closes the master)
+            try:
+                self._switch_now('close_cages', list(budgets))
+            except Exception as e:
+                self._logger.error(f"Failed to close cages: {e}")
+        return {c for c, b in budgets.items() if not b.done}
+
+    async def _pulse_tick(
+        self, active: List[int], groups: Dict[int, List[int]], close_failed: set
+    ) -> List[PulseResult]:
+        """Open ``active`` together, close each ``{width_ms: cages}`` group on time.
+
+        Returns one PulseResult per group, in ``groups`` order. A group whose
+        close write raised is added to ``close_failed``; the others still
+        close. With a relay I/O thread the whole tick is one command timed
+        by sleep-then-spin (precise_pulses); otherwise it is timed with
+        ``asyncio.sleep`` on this loop, as in :meth:`_pulse`.
+        """
+
+        def close(cages):
+            try:
+                self._valves.close_cages(cages)
+            except Exception as e:
+                self._logger.error(f"Failed to close cages {cages}: {e}")
+                close_failed.update(cages)
+
+        if self._relay_io is not None:
+            actuation = await self._relay_io.run(
+                precise_pulses,
+                functools.partial(self._valves.open_cages, active),
+                [
+                    (width_ms / 1000.0, functools.partial(close, cages))
+                    for width_ms, cages in groups.items()
+                ],
+            )
+            return actuation.result
+
+        opened = await self._switch('open_cages', active)
+        results = {}
+        try:
+            for width_ms in sorted(groups):
+                delay = opened.actuated_at + width_ms / 1000.0 - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                closed = actuate(close, groups[width_ms], clock=time.monotonic)
+                results[width_ms] = PulseResult(
+                    requested_s=width_ms / 1000.0,
+                    achieved_s=closed.actuated_at - opened.actuated_at,
+                    started_at=opened.started_at,
+                    opened_at=opened.actuated_at,
+                    closed_at=closed.actuated_at,
+                )
+        except BaseException:
+            self._switch_now('close_cages', active)
+            raise
+        return [results[width_ms] for width_ms in groups]
+
+    def _credit_pulse(self, budget: _PulseBudget, pulse: PulseResult, max_pulses: int) -> None:
+        """Credit one achieved pulse to ``budget`` and recount the pulses left."""
+        credited = self._width_corrected_volume(budget.volume_per_pulse_ml, pulse)
+        budget.delivered_ml += credited
+        budget.remaining_ml -= credited
+        budget.pulses += 1
+        if budget.remaining_ml <= budget.volume_per_pulse_ml * 0.1:
+            budget.pulses_left = 0
+        else:
+            budget.pulses_left = min(
+                self._pulse_budget(budget.remaining_ml, budget.volume_per_pulse_ml),
+                max_pulses - budget.pulses,
+            )
+
     async def _deliver_continuous_mode(
         self,
         cage_id: int,
@@ -338,18 +949,21 @@ class SolenoidFlowStrategy:
                 f"valve open time: {valve_open_s:.2f}s for {target_volume_ml:.3f}mL"
             )
 
+            in_session = await self._session_master_open()
             try:
-                # Prime manifold
-                self._valves.open_master()
-                await asyncio.sleep(self._prime_ms / 1000.0)
+                # Prime manifold (already open in a ManifoldSession)
+                if not in_session:
+                    await self._switch('open_master')
+                    await asyncio.sleep(self._prime_ms / 1000.0)
 
                 # Deliver
-                self._valves.open_cage(cage_id)
+                await self._switch('open_cage', cage_id)
                 await asyncio.sleep(valve_open_s)
-                self._valves.close_cage(cage_id)
+                await self._switch('close_cage', cage_id)
 
                 # Close master
-                self._valves.close_master()
+                if not in_session:
+                    await self._switch('close_master')
 
                 self._logger.info(
                     f"[CALIBRATION-ONLY] Delivery complete: "
@@ -360,10 +974,11 @@ class SolenoidFlowStrategy:
             except Exception as e:
                 self._logger.error(f"[CALIBRATION-ONLY] Delivery failed: {e}")
                 try:
-                    self._valves.close_cage(cage_id)
-                    self._valves.close_master()
+                    self._switch_now('close_cage', cage_id)
+                    self._switch_now('close_master')
                 except:
                     pass
+                self._end_session()
                 return False
 
         # ================================================================
@@ -377,12 +992,16 @@ class SolenoidFlowStrategy:
         residual_flow_threshold = float(self._settings.get('residual_flow_threshold_ml_min', 1.0))
         max_sensor_errors = int(self._settings.get('max_consecutive_sensor_errors', 10))
 
+        # The residual-flow check below needs the master closed after every
+        # delivery, so this path always primes for itself.
+        self._end_session()
+
         # Prime path (master only)
         await asyncio.sleep(0)  # yield once
         try:
-            self._valves.open_master()
+            await self._switch('open_master')
             await asyncio.sleep(self._prime_ms / 1000.0)
-            self._valves.close_master()
+            await self._switch('close_master')
             await asyncio.sleep(0.05)
         except Exception:
             # Hardware or mapping issue – fail fast
@@ -460,9 +1079,9 @@ class SolenoidFlowStrategy:
             # Quiet period before switching relays to reduce collisions
             quiet_ms = float(self._settings.get('valve_switch_quiet_ms', 800.0))
             await asyncio.sleep(max(0.0, quiet_ms) / 1000.0)
-            self._valves.open_master()
+            await self._switch('open_master')
             self._logger.debug(f"Opening cage {cage_id} solenoid...")
-            self._valves.open_cage(cage_id)
+            await self._switch('open_cage', cage_id)
             self._logger.info(f"Solenoids opened successfully for cage {cage_id}")
 
             # CRITICAL: Rescjume reads IMMEDIATELY after valve switching completes!
@@ -479,7 +1098,7 @@ class SolenoidFlowStrategy:
             self._logger.error(f"Failed to open solenoids for cage {cage_id}: {e}")
             # Ensure master is closed on any opening failure
             try:
-                self._valves.close_master()
+                self._switch_now('close_master')
             except Exception:
                 pass
             return False
@@ -487,6 +1106,10 @@ class SolenoidFlowStrategy:
         loop_ref = asyncio.get_event_loop()
         start = loop_ref.time()
         last_log = start
+        last_iteration = start
+        # Integrates on the Teensy frame timestamps, so a stretched loop
+        # iteration (loaded Pi) does not change the measured volume.
+        integrator = FlowIntegrator(gap_s=3.0 / max(1.0, sampling_hz))
         try:
             while True:
                 # Cooperative cancellation: operator pressed Stop. Bail into
@@ -495,10 +1118,10 @@ class SolenoidFlowStrategy:
                     self._logger.info(f"Delivery cancelled for cage {cage_id}; closing valves")
                     return False
 
-                # Read measurement with robust error handling (Sensirion best practices)
-                meas = await self._read_sensor_robust(cage_id, max_sensor_errors)
+                # Every frame received since the last iteration
+                batch = await self._next_flow_samples(cage_id, max_sensor_errors)
 
-                if meas is None:
+                if not batch:
                     sensor_errors += 1
                     if sensor_errors == 1:  # Log first sensor error
                         self._logger.warning(
@@ -515,8 +1138,8 @@ class SolenoidFlowStrategy:
                         )
                         # Ensure all valves are closed on sensor failure
                         try:
-                            self._valves.close_cage(cage_id)
-                            self._valves.close_master()
+                            self._switch_now('close_cage', cage_id)
+                            self._switch_now('close_master')
                         except Exception as e:
                             self._logger.error(
                                 f"Failed to close valves during sensor error recovery: {e}"
@@ -527,35 +1150,29 @@ class SolenoidFlowStrategy:
 
                 sensor_errors = 0
 
-                # Normalize to ml/min, guard NaNs
-                if isinstance(meas, tuple) and len(meas) >= 1:
-                    flow_ml_min = float(meas[0]) / 1000.0  # tuple from raw backend in uL/min
-                else:
-                    flow_ml_min = float(getattr(meas, 'flow_ml_min', 0.0))
-                if flow_ml_min != flow_ml_min:  # NaN check
-                    flow_ml_min = 0.0
+                integrator.add(batch)
+                delivered_ul = integrator.volume_ml * 1000.0
+                flow_ml_min = integrator.last_flow_ml_min
 
                 # No-flow detection window (occlusion/EMI stall)
+                now = loop_ref.time()
                 if abs(flow_ml_min) < no_flow_threshold_ml_min:
-                    no_flow_accum_s += sample_period_s
+                    no_flow_accum_s += now - last_iteration
                 else:
                     no_flow_accum_s = 0.0
+                last_iteration = now
                 if no_flow_accum_s >= no_flow_timeout_s:
                     self._logger.error(
                         f"No flow detected for {no_flow_accum_s:.1f}s (< {no_flow_threshold_ml_min:.3f} mL/min). Aborting delivery."
                     )
                     try:
-                        self._valves.close_cage(cage_id)
-                        self._valves.close_master()
+                        self._switch_now('close_cage', cage_id)
+                        self._switch_now('close_master')
                     except Exception:
                         pass
                     return False
 
                 # Predictive cutoff
-                if last_flow_ml_min is not None:
-                    avg_flow_ml_min = 0.5 * (last_flow_ml_min + flow_ml_min)
-                    dt_min = sample_period_s / 60.0
-                    delivered_ul += (avg_flow_ml_min * 1000.0) * dt_min
                 last_flow_ml_min = flow_ml_min
 
                 # Remaining, lag est
@@ -564,10 +1181,12 @@ class SolenoidFlowStrategy:
                 if delivered_ul >= (target_ul - v_lag_ul):
                     # Initiate close sequence
                     self._logger.info(
-                        f"Target reached for cage {cage_id}: {delivered_ul:.1f}µL delivered, closing valves"
+                        f"Target reached for cage {cage_id}: {delivered_ul:.1f}µL delivered, "
+                        f"closing valves ({integrator.samples} frames, "
+                        f"{integrator.dropped} dropped, {integrator.gaps} gaps)"
                     )
-                    self._valves.close_cage(cage_id)
-                    self._valves.close_master()
+                    await self._switch('close_cage', cage_id)
+                    await self._switch('close_master')
                     break
 
                 # Max-open safety cutoff
@@ -577,8 +1196,8 @@ class SolenoidFlowStrategy:
                         f"Max valve open time {max_valve_open_s:.1f}s exceeded. Delivered {delivered_ul/1000.0:.3f}mL; aborting."
                     )
                     try:
-                        self._valves.close_cage(cage_id)
-                        self._valves.close_master()
+                        self._switch_now('close_cage', cage_id)
+                        self._switch_now('close_master')
                     except Exception:
                         pass
                     return False
@@ -621,11 +1240,11 @@ class SolenoidFlowStrategy:
             return True
         finally:
             try:
-                self._valves.close_cage(cage_id)
+                self._switch_now('close_cage', cage_id)
             except Exception:
                 pass
             try:
-                self._valves.close_master()
+                self._switch_now('close_master')
             except Exception:
                 pass
             # Note: Flow sensor runs continuously, don't stop after each delivery
@@ -652,11 +1271,12 @@ class SolenoidFlowStrategy:
         2. **WITHOUT SENSOR**: Pure calibration-based delivery
 
         Algorithm:
-        1. Verify sensor health (if available)
+        1. Verify sensor health, restarting it only if needed (if available)
         2. Open master valve (prime manifold)
         3. Calculate estimated pulses from calibration
         4. Execute pulses until target reached or max exceeded
-        5. Restart sensor every 5 pulses to prevent firmware hang (if available)
+        5. Restart the sensor when its I2C error budget is about to run out
+           or the stream is failing (see utils/sensor_health.py)
         6. Close all valves
         7. Log delivery summary
 
@@ -672,29 +1292,34 @@ class SolenoidFlowStrategy:
             f"Starting pulse delivery for cage {cage_id}: {target_volume_ml:.3f}mL ({mode_str})"
         )
 
-        # Step 1: Restart sensor to reset firmware error counter (only if sensor available)
+        # Step 1: Restart sensor only if its health calls for it (only if sensor available)
         if self._sensor_available and self._sensor is not None:
-            if not await self._restart_sensor():
-                self._logger.warning("Sensor restart failed, switching to CALIBRATION-ONLY mode")
-                self._sensor_available = False
+            reason = self._sensor_restart_reason(0, at_start=True)
+            if reason:
+                await self._restart_for(reason)
 
             # Step 2: Verify sensor health (fail-fast, but don't abort if optional)
-            if self._sensor_available and not await self._verify_sensor_health():
+            elif not await self._verify_sensor_health():
                 self._logger.warning(
                     "Sensor health check failed, switching to CALIBRATION-ONLY mode"
                 )
                 self._sensor_available = False
 
-        # Step 3: Prime manifold (master valve only)
-        try:
-            self._logger.debug("Priming manifold...")
-            self._valves.open_master()
-            await asyncio.sleep(self._prime_ms / 1000.0)
-            self._valves.close_master()
-            await asyncio.sleep(0.05)
-        except Exception as e:
-            self._logger.error(f"Failed to prime manifold: {e}")
+        # Step 3: Prime manifold (master valve only), unless a ManifoldSession
+        # already holds it primed and open.
+        if self._check_cancelled():
             return False
+        in_session = await self._session_master_open()
+        if not in_session:
+            try:
+                self._logger.debug("Priming manifold...")
+                await self._switch('open_master')
+                await asyncio.sleep(self._prime_ms / 1000.0)
+                await self._switch('close_master')
+                await asyncio.sleep(0.05)
+            except Exception as e:
+                self._logger.error(f"Failed to prime manifold: {e}")
+                return False
 
         # Step 4: Calculate estimated pulses from cage-specific calibration
         cage_pw_ms, expected_vol_per_pulse = await self._get_cage_calibration(cage_id)
@@ -726,12 +1351,13 @@ class SolenoidFlowStrategy:
         pulse_count = 0
         start_time = asyncio.get_event_loop().time()
         pulses_since_restart = 0
-        max_pulses_before_restart = 5  # Restart sensor every 5 pulses to prevent firmware hang
+        keep_master_open = False
 
         try:
             # Open master valve for delivery (stays open during pulses)
-            self._valves.open_master()
-            await asyncio.sleep(0.3)  # Let manifold stabilize
+            if not in_session:
+                await self._switch('open_master')
+                await asyncio.sleep(0.3)  # Let manifold stabilize
 
             while delivered_ml < target_volume_ml:
                 # Cooperative cancellation: operator pressed Stop. Bail into
@@ -752,28 +1378,16 @@ class SolenoidFlowStrategy:
                     self._logger.error(f"Max time ({max_time_s}s) exceeded, aborting")
                     return False
 
-                # CRITICAL: Restart sensor periodically to reset firmware error counter
-                # Each pulse accumulates ~10-15 I²C errors from EMI
-                # After ~200 errors, firmware stops streaming
-                # Restart every N pulses to keep error count low
+                # Each pulse adds I²C errors from valve EMI and the firmware
+                # stops streaming once they pile up. Restart the sensor (which
+                # clears its counters) only when the next pulse would run out
+                # the rig's error budget or the stream is already failing.
                 # ONLY if sensor is available!
-                if self._sensor_available and pulses_since_restart >= max_pulses_before_restart:
-                    self._logger.info(f"Periodic restart after {pulses_since_restart} pulses...")
-                    if not await self._restart_sensor():
-                        self._logger.warning(
-                            "Periodic sensor restart failed, continuing without sensor"
-                        )
-                        self._sensor_available = False
-                    else:
-                        # Verify health after restart
-                        if not await self._verify_sensor_health():
-                            self._logger.warning(
-                                "Sensor health check failed after restart, continuing without sensor"
-                            )
-                            self._sensor_available = False
-                        else:
-                            self._logger.info("Sensor restarted successfully, resuming delivery")
-                    pulses_since_restart = 0
+                if self._sensor_available and pulses_since_restart > 0:
+                    reason = self._sensor_restart_reason(pulses_since_restart)
+                    if reason:
+                        await self._restart_for(reason)
+                        pulses_since_restart = 0
 
                 # Execute single pulse
                 try:
@@ -785,6 +1399,7 @@ class SolenoidFlowStrategy:
                     delivered_ml += pulse_volume
                     pulse_count += 1
                     pulses_since_restart += 1
+                    self._after_sensor_pulse()
 
                     # Log progress every 10 pulses
                     if pulse_count % 10 == 0:
@@ -821,6 +1436,7 @@ class SolenoidFlowStrategy:
                 f"duration={duration_s:.1f}s"
             )
 
+            keep_master_open = in_session
             return True
 
         except Exception as e:
@@ -828,13 +1444,17 @@ class SolenoidFlowStrategy:
             return False
 
         finally:
-            # CRITICAL: Always close valves
+            # CRITICAL: Always close valves (the master stays open only for
+            # the next delivery of a ManifoldSession after a success)
             try:
-                self._valves.close_cage(cage_id)
-                self._valves.close_master()
+                self._switch_now('close_cage', cage_id)
+                if not keep_master_open:
+                    self._switch_now('close_master')
+                    self._end_session()
                 self._logger.debug("Valves closed")
             except Exception as e:
                 self._logger.error(f"Failed to close valves: {e}")
+                self._end_session()
 
     async def _execute_single_pulse(self, cage_id: int) -> float:
         """
@@ -873,20 +1493,20 @@ class SolenoidFlowStrategy:
                 f"[CALIBRATION-ONLY PULSE] cage={cage_id}, pulse={cage_pw_ms}ms ({pulse_duration_s:.3f}s)"
             )
 
+            delivered_ml = expected_vol_ml
             try:
-                print(f"[VALVE] Opening cage {cage_id}...")
-                self._valves.open_cage(cage_id)
-                print(f"[VALVE] Cage {cage_id} OPEN, sleeping {pulse_duration_s:.3f}s")
-
-                await asyncio.sleep(pulse_duration_s)
-
-                print(f"[VALVE] Closing cage {cage_id}...")
-                self._valves.close_cage(cage_id)
-                print(f"[VALVE] Cage {cage_id} CLOSED, settling {settling_ms}ms")
+                print(f"[VALVE] Pulsing cage {cage_id} for {pulse_duration_s:.3f}s...")
+                pulse = await self._pulse(cage_id, pulse_duration_s)
+                # Blind delivery: credit the volume of the open time achieved
+                delivered_ml = self._width_corrected_volume(expected_vol_ml, pulse)
+                print(
+                    f"[VALVE] Cage {cage_id} CLOSED after {pulse.achieved_s * 1000.0:.2f}ms, "
+                    f"settling {settling_ms}ms"
+                )
 
                 await asyncio.sleep(settling_ms / 1000.0)  # Settling time
 
-                print(f"[CALIBRATION-ONLY PULSE] Complete, returning {expected_vol_ml:.4f}mL")
+                print(f"[CALIBRATION-ONLY PULSE] Complete, returning {delivered_ml:.4f}mL")
             except Exception as e:
                 self._logger.error(f"Pulse execution error (calibration-only): {e}")
                 print(f"[VALVE ERROR] Exception during pulse: {e}")
@@ -894,11 +1514,11 @@ class SolenoidFlowStrategy:
 
                 print(f"[VALVE ERROR] Traceback:\n{traceback.format_exc()}")
                 try:
-                    self._valves.close_cage(cage_id)
+                    self._switch_now('close_cage', cage_id)
                 except:
                     pass
 
-            return expected_vol_ml  # Return calibrated volume
+            return delivered_ml  # Calibrated volume, corrected for the achieved width
 
         # FULL PATH: Sensor available - measure actual flow
         # Step 2: Clear sensor queue for fresh data
@@ -920,63 +1540,60 @@ class SolenoidFlowStrategy:
         total_measurement_s = pulse_duration_s + settling_duration_s + 0.3  # +300ms buffer
 
         start_time = asyncio.get_event_loop().time()
+        # Ring-buffered sensors keep every frame; read the whole window after
+        # settling instead of polling during the pulse.
+        ring = self._sample_ring()
+        window_t0 = time.monotonic()
+        # Calibrated volume for the open time achieved (set once the pulse
+        # returns); every fallback and comparison below uses it.
+        expected_ml = expected_vol_ml
 
         try:
             # Step 4: Execute pulse while collecting samples
             # DO NOT suspend reads - we need continuous measurement!
 
-            self._valves.open_cage(cage_id)
-            valve_open_time = asyncio.get_event_loop().time()
-
-            # Schedule precise close independent of sampling cadence
-            async def _close_after():
-                await asyncio.sleep(pulse_duration_s)
-                try:
-                    self._valves.close_cage(cage_id)
-                except Exception:
-                    pass
+            pulse_task = asyncio.create_task(self._pulse(cage_id, pulse_duration_s))
 
-            close_task = asyncio.create_task(_close_after())
-
-            # Collect samples during pulse (high cadence)
-            while (asyncio.get_event_loop().time() - valve_open_time) < pulse_duration_s:
+            # Collect samples during pulse (high cadence). Samples carry the
+            # Teensy frame time, so a late iteration only delays the drain.
+            while not pulse_task.done():
                 try:
-                    sample = self._sensor.read_one()
-                    if sample and len(sample) >= 2:
-                        elapsed = asyncio.get_event_loop().time() - start_time
-                        flow_ul_min = float(sample[0])
-                        flow_ml_min = flow_ul_min / 1000.0
-                        samples.append({'time_s': elapsed, 'flow_ml_min': flow_ml_min})
+                    if ring is None:
+                        samples.extend(self._drain_flow_samples())
                 except Exception as e:
                     self._logger.debug(f"Sample read error during pulse: {e}")
                 # Use the computed period; for very short pulses this is already high (e.g., 200Hz)
                 await asyncio.sleep(sample_period_s)
 
-            # Ensure close has happened
-            try:
-                await close_task
-            except Exception:
-                pass
+            pulse = await pulse_task
+            # The sample window starts when the open write did (not when it
+            # was queued), on the same monotonic clock as the frames.
+            window_t0 = pulse.started_at
+            expected_ml = self._width_corrected_volume(expected_vol_ml, pulse)
+            self._logger.debug(
+                f"Cage {cage_id} valve open {pulse.achieved_s * 1000.0:.2f}ms between write "
+                f"completions (requested {cage_pw_ms}ms, expected {expected_ml:.4f}mL)"
+            )
 
             # Step 6: Continue collecting during settling
             while (asyncio.get_event_loop().time() - start_time) < total_measurement_s:
                 try:
-                    sample = self._sensor.read_one()
-                    if sample and len(sample) >= 2:
-                        elapsed = asyncio.get_event_loop().time() - start_time
-                        flow_ul_min = float(sample[0])
-                        flow_ml_min = flow_ul_min / 1000.0
-                        samples.append({'time_s': elapsed, 'flow_ml_min': flow_ml_min})
+                    if ring is None:
+                        samples.extend(self._drain_flow_samples())
                 except Exception as e:
                     self._logger.debug(f"Sample read error during settling: {e}")
-
-            await asyncio.sleep(sample_period_s)
+                await asyncio.sleep(sample_period_s)
+            if ring is None:
+                samples.extend(self._drain_flow_samples())
+            else:
+                window = ring.samples_between(window_t0, time.monotonic(), copy=True)
+                samples = self._valid_samples(window.to_samples())
 
         except Exception as e:
             self._logger.error(f"Pulse execution error: {e}")
             # Ensure valve is closed
             try:
-                self._valves.close_cage(cage_id)
+                self._switch_now('close_cage', cage_id)
             except:
                 pass
 
@@ -984,24 +1601,17 @@ class SolenoidFlowStrategy:
         delivered_ml = 0.0
 
         if len(samples) >= 2:
-            # Calculate flow statistics for debugging
-            flow_rates = [s['flow_ml_min'] for s in samples]
-            min_flow = min(flow_rates)
-            max_flow = max(flow_rates)
-            avg_flow = sum(flow_rates) / len(flow_rates)
-
-            # Trapezoidal integration
-            for i in range(1, len(samples)):
-                dt_s = samples[i]['time_s'] - samples[i - 1]['time_s']
-                dt_min = dt_s / 60.0
-                avg_flow_segment = (
-                    samples[i]['flow_ml_min'] + samples[i - 1]['flow_ml_min']
-                ) / 2.0
-                delivered_ml += avg_flow_segment * dt_min
-
-            # Calculate actual vs expected sample rate
-            actual_duration_s = samples[-1]['time_s'] if samples else 0.0
-            expected_samples = sampling_hz * actual_duration_s
+            # Trapezoidal integration over the sample timestamps
+            integration = integrate_flow(samples)
+            delivered_ml = integration.volume_ml
+            min_flow = integration.min_flow_ml_min
+            max_flow = integration.max_flow_ml_min
+            avg_flow = integration.mean_flow_ml_min
+
+            # Calculate actual vs expected sample rate. Drained samples arrive
+            # at the sensor's stream rate, not the polling cadence above.
+            actual_duration_s = integration.duration_s
+            expected_samples = base_sampling_hz * actual_duration_s + 1
             sample_rate_pct = (
                 (len(samples) / expected_samples * 100.0) if expected_samples > 0 else 0.0
             )
@@ -1010,10 +1620,12 @@ class SolenoidFlowStrategy:
             self._logger.info(
                 f"[PULSE DEBUG] Cage={cage_id} | "
                 f"Samples={len(samples)} (expected ~{expected_samples:.0f}, {sample_rate_pct:.0f}% rate) | "
-                f"Duration={actual_duration_s:.3f}s | "
+                f"Duration={actual_duration_s:.3f}s "
+                f"({'device' if integration.device_clock else 'host'} clock) | "
+                f"Dropped={integration.dropped}, gaps={integration.gaps} | "
                 f"Flow: min={min_flow:.3f}, max={max_flow:.3f}, avg={avg_flow:.3f} mL/min | "
                 f"Integrated volume={delivered_ml:.4f}mL | "
-                f"Expected (calibration)={expected_vol_ml:.4f}mL @ {cage_pw_ms}ms"
+                f"Expected (calibration)={expected_ml:.4f}mL @ {cage_pw_ms}ms"
             )
 
             # Check for potential issues
@@ -1022,6 +1634,12 @@ class SolenoidFlowStrategy:
                     f"[PULSE WARNING] Only {len(samples)} samples collected "
                     f"(expected ~{expected_samples:.0f}). Sensor may be unresponsive or sampling rate too low."
                 )
+            if integration.dropped or integration.gaps:
+                self._logger.warning(
+                    f"[PULSE WARNING] {integration.dropped} sensor frames dropped, "
+                    f"{integration.gaps} gaps (longest {integration.max_gap_s * 1000:.0f}ms); "
+                    f"volume interpolated across them."
+                )
 
             if max_flow >= 3.2:
                 self._logger.warning(
@@ -1039,52 +1657,50 @@ class SolenoidFlowStrategy:
             # Fallback: No flow measurements, use per-valve calibration
             self._logger.warning(
                 f"[PULSE FALLBACK] No flow measurements during pulse (0-{len(samples)} samples), "
-                f"using calibrated value: {expected_vol_ml:.4f}mL. "
+                f"using calibrated value: {expected_ml:.4f}mL. "
                 f"Check sensor connection and streaming status."
             )
-            delivered_ml = expected_vol_ml
+            delivered_ml = expected_ml
 
         # Step 8: Adaptive correction - compare sensor vs calibration
         # If sensor measurement seems reasonable, trust it
         # If sensor fails or reads nonsense, use calibration
         deviation_pct = (
-            abs(delivered_ml - expected_vol_ml) / expected_vol_ml * 100.0
-            if expected_vol_ml > 0
-            else 0.0
+            abs(delivered_ml - expected_ml) / expected_ml * 100.0 if expected_ml > 0 else 0.0
         )
 
         if len(samples) >= 5 and deviation_pct > 50.0:
             # Sensor reading differs too much from calibration - likely sensor error
             self._logger.warning(
                 f"[ADAPTIVE CORRECTION] Sensor measurement ({delivered_ml:.4f}mL) differs >50% from "
-                f"calibration ({expected_vol_ml:.4f}mL, deviation={deviation_pct:.1f}%). "
+                f"calibration ({expected_ml:.4f}mL, deviation={deviation_pct:.1f}%). "
                 f"Using calibration. REASON: Large discrepancy suggests sensor integration issue, "
                 f"missing flow peak, or incorrect calibration. Run valve calibration wizard to update."
             )
-            delivered_ml = expected_vol_ml
+            delivered_ml = expected_ml
         elif len(samples) >= 5:
             # Good sensor data - use it with adaptive weighting
             # Trust sensor more when deviation is small
             weight_sensor = min(1.0, 1.0 / (1.0 + deviation_pct / 100.0))
             weight_cal = 1.0 - weight_sensor
 
-            adaptive_volume = (delivered_ml * weight_sensor) + (expected_vol_ml * weight_cal)
+            adaptive_volume = (delivered_ml * weight_sensor) + (expected_ml * weight_cal)
 
             if deviation_pct > 20.0:
                 self._logger.info(
                     f"[ADAPTIVE CORRECTION] sensor={delivered_ml:.4f}mL, "
-                    f"cal={expected_vol_ml:.4f}mL, deviation={deviation_pct:.1f}%, "
+                    f"cal={expected_ml:.4f}mL, deviation={deviation_pct:.1f}%, "
                     f"using={adaptive_volume:.4f}mL (dev={deviation_pct:.1f}%)"
                 )
 
             delivered_ml = adaptive_volume
         else:
             # Too few samples - use calibration
-            delivered_ml = expected_vol_ml
+            delivered_ml = expected_ml
 
         self._logger.debug(
             f"Pulse delivered: {delivered_ml:.4f}mL "
-            f"(calibration: {expected_vol_ml:.4f}mL, {len(samples)} samples)"
+            f"(calibration: {expected_ml:.4f}mL, {len(samples)} samples)"
         )
 
         return delivered_ml
@@ -1161,17 +1777,13 @@ class SolenoidFlowStrategy:
         self._logger.debug("Restarting sensor to reset firmware state...")
 
         try:
-            # Stop sensor
+            # Stop sensor (waits for the firmware to confirm)
             if hasattr(self._sensor, 'stop'):
-                self._sensor.stop()
-                await asyncio.sleep(0.5)  # Allow clean shutdown
+                await self._sensor_io(self._sensor.stop)
 
-            # Start sensor
+            # Start sensor (returns once frames are streaming)
             if hasattr(self._sensor, 'start'):
-                self._sensor.start()
-                await asyncio.sleep(
-                    1.0
-                )  # Allow firmware initialization (60ms sensor warm-up + margin)
+                await self._sensor_io(self._sensor.start)
                 self._logger.info("✓ Sensor restarted successfully")
                 return True
             else:
@@ -1182,6 +1794,75 @@ class SolenoidFlowStrategy:
             self._logger.error(f"Sensor restart failed: {e}")
             return False
 
+    async def _sensor_io(self, fn, *args, **kwargs):
+        """Call a blocking sensor method (stop, start, stream checks).
+
+        While other sensors' deliveries share the event loop it runs on an
+        executor thread, so their valves still close on time.
+        """
+        if self._batch_abort is None:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    def _sensor_health(self) -> Optional[SensorHealth]:
+        """The sensor's firmware health report, if its driver provides one."""
+        health = getattr(self._sensor, 'health', None)
+        if health is None:
+            return None
+        try:
+            report = health()
+        except Exception as e:
+            self._logger.debug(f"Sensor health unavailable: {e}")
+            return None
+        return report if isinstance(report, SensorHealth) else None
+
+    def _sensor_policy(self) -> RestartPolicy:
+        if self._restart_policy is None:
+            self._restart_policy = RestartPolicy.load()
+        return self._restart_policy
+
+    def _sensor_restart_reason(
+        self, pulses_since_restart: int, at_start: bool = False
+    ) -> Optional[str]:
+        """Why the sensor should be restarted before the next pulse, or None."""
+        health = self._sensor_health()
+        if health is None:
+            # No firmware health from this driver: fixed cadence as before
+            if at_start:
+                return "start of delivery"
+            if pulses_since_restart >= LEGACY_RESTART_EVERY_PULSES:
+                return f"periodic restart after {pulses_since_restart} pulses"
+            return None
+        return self._sensor_policy().restart_reason(health)
+
+    async def _restart_for(self, reason: str) -> None:
+        """Restart and re-verify the sensor; on failure continue without it."""
+        self._logger.info(f"Restarting flow sensor: {reason}")
+        health = self._sensor_health()
+        if not await self._restart_sensor():
+            self._logger.warning("Sensor restart failed, continuing without sensor")
+            self._sensor_available = False
+        elif not await self._verify_sensor_health():
+            self._logger.warning(
+                "Sensor health check failed after restart, continuing without sensor"
+            )
+            self._sensor_available = False
+        else:
+            self._logger.info("Sensor restarted successfully, resuming delivery")
+        if health is not None:
+            self._sensor_policy().restarted(health)
+
+    def _after_sensor_pulse(self) -> None:
+        """Count the pulse and ask the firmware for its error count."""
+        if not self._sensor_available or self._sensor_health() is None:
+            return
+        self._sensor_policy().pulse_done()
+        try:
+            self._sensor.request_health()
+        except Exception as e:
+            self._logger.debug(f"Sensor status request failed: {e}")
+
     async def _verify_sensor_health(self) -> bool:
         """
         Verify flow sensor is streaming and healthy.
@@ -1210,7 +1891,9 @@ class SolenoidFlowStrategy:
 
         # Step 2: Verify streaming
         if hasattr(self._sensor, 'ensure_streaming'):
-            stream_ok = self._sensor.ensure_streaming(min_frames=5, timeout_s=3.0)
+            stream_ok = await self._sensor_io(
+                self._sensor.ensure_streaming, min_frames=5, timeout_s=3.0
+            )
 
             if not stream_ok:
                 self._logger.warning("Stream health check failed, attempting recovery...")
@@ -1218,14 +1901,16 @@ class SolenoidFlowStrategy:
                 # Attempt recovery via reset
                 if hasattr(self._sensor, 'reset'):
                     try:
-                        self._sensor.reset()
+                        await self._sensor_io(self._sensor.reset)
                         self._logger.info("Sensor reset completed, re-verifying stream...")
                         await asyncio.sleep(0.5)
                     except Exception as e:
                         self._logger.warning(f"Sensor reset failed: {e}")
 
                     # Re-verify after reset
-                    stream_ok = self._sensor.ensure_streaming(min_frames=5, timeout_s=5.0)
+                    stream_ok = await self._sensor_io(
+                        self._sensor.ensure_streaming, min_frames=5, timeout_s=5.0
+                    )
 
                 if not stream_ok:
                     error_msg = (
@@ -1238,6 +1923,38 @@ class SolenoidFlowStrategy:
         self._logger.info("✓ Sensor health verified")
         return True
 
+    def _sample_ring(self) -> Optional[FlowSampleRing]:
+        """The sensor's sample ring buffer, if its driver keeps one."""
+        ring = getattr(self._sensor, 'ring', None)
+        return ring if isinstance(ring, FlowSampleRing) else None
+
+    def _valid_samples(self, samples: list) -> list:
+        return [
+            s
+            for s in samples
+            if self._is_measurement_valid(s.flow_ml_min * 1000.0, s.temperature_c)
+        ]
+
+    def _drain_flow_samples(self) -> list:
+        """Valid flow samples the sensor produced since the last call."""
+        return self._valid_samples(read_new_samples(self._sensor))
+
+    async def _next_flow_samples(self, cage_id: int, max_errors: int) -> list:
+        """New samples for the continuous loop; [] if none arrived.
+
+        Sensors without ``drain_samples`` go through :meth:`_read_sensor_robust`
+        and get host-clock timestamps.
+        """
+        if not hasattr(self._sensor, 'drain_samples'):
+            meas = await self._read_sensor_robust(cage_id, max_errors)
+            return [] if meas is None else [host_sample(meas[0], meas[1])]
+        for _attempt in range(3):
+            batch = self._drain_flow_samples()
+            if batch:
+                return batch
+            await asyncio.sleep(0.02)
+        return []
+
     async def _read_sensor_robust(self, cage_id: int, max_errors: int) -> Optional[Tuple]:
         """
         Robust sensor reading with Sensirion SLF3x best practices.
@@ -20,6 +20,12 @@
  * Communication Protocol:
  * Pi → Teensy: {"cmd":"start","rate":50}
  * Teensy → Pi: {"type":"measurement","flow":123.4,"temp":25.1}
+ *
+ * Binary frames (Pi → Teensy: {"cmd":"format","mode":"binary"}):
+ * measurements become 16-byte frames, everything else stays JSON.
+ *   A5 5A | ver u8 | count u32 LE | millis u32 LE | flow raw i16 LE |
+ *   temp raw i16 LE | CRC-8 (0x31, init 0xFF) over bytes 2..14
+ * Matches Project/drivers/teensy_frames.py.
  * 
  * Best Practices:
  * - Follows Sensirion SLF3x datasheet timing specs
@@ -43,6 +49,12 @@ const uint8_t RESET_CMD = 0x06;     // Soft reset command
 const unsigned long BAUD_RATE = 115200;
 const size_t JSON_BUFFER_SIZE = 256;
 
+// Binary measurement frames (see header)
+const uint8_t FRAME_SYNC0 = 0xA5;
+const uint8_t FRAME_SYNC1 = 0x5A;
+const uint8_t FRAME_VERSION = 1;
+const size_t FRAME_SIZE = 16;
+
 // Timing & Safety (per SLF3x datasheet and best practices)
 const unsigned long I2C_TIMEOUT_MS = 300;        // Max time for I2C operation
 const unsigned long RESET_WAIT_MS = 30;          // Wait after soft reset (datasheet: min 25ms)
@@ -68,6 +80,7 @@ uint32_t consecutive_errors = 0;
 unsigned long last_watchdog_feed = 0;
 unsigned long last_led_toggle = 0;
 bool led_state = false;
+bool binary_frames = false;  // JSON lines until the Pi asks for binary
 
 // Hardware watchdog
 Watchdog watchdog;
@@ -229,6 +242,11 @@ void processCommands() {
   else if (cmd == "reset") {
     resetSensor();
   }
+  else if (cmd == "format") {
+    String mode = command_doc["mode"] | "json";
+    binary_frames = (mode == "binary");
+    sendFormatStatus();
+  }
   else {
     sendError("Unknown command: " + cmd);
   }
@@ -418,7 +436,11 @@ void sampleSensor() {
   float temp_c = temp_raw / 200.0;           // °C (scale factor from datasheet)
   
   // ===== Send measurement =====
-  sendMeasurement(flow_ml_min, temp_c);
+  if (binary_frames) {
+    sendMeasurementFrame(flow_raw, temp_raw);
+  } else {
+    sendMeasurement(flow_ml_min, temp_c);
+  }
   sample_count++;
   
   // Reset consecutive error counter on successful read
@@ -461,6 +483,37 @@ void sendMeasurement(float flow_ml_min, float temp_c) {
   Serial.println();
 }
 
+void sendMeasurementFrame(int16_t flow_raw, int16_t temp_raw) {
+  // Same back-pressure rule as sendMeasurement(): skip rather than block
+  if (Serial.availableForWrite() < (int)FRAME_SIZE) {
+    return;
+  }
+
+  uint8_t frame[FRAME_SIZE];
+  uint32_t count = sample_count;
+  uint32_t now_ms = millis();
+  frame[0] = FRAME_SYNC0;
+  frame[1] = FRAME_SYNC1;
+  frame[2] = FRAME_VERSION;
+  memcpy(frame + 3, &count, 4);   // Teensy 4.1 is little-endian
+  memcpy(frame + 7, &now_ms, 4);
+  memcpy(frame + 11, &flow_raw, 2);
+  memcpy(frame + 13, &temp_raw, 2);
+  frame[15] = calculateCRC8(frame + 2, 13);
+
+  Serial.write(frame, FRAME_SIZE);
+}
+
+void sendFormatStatus() {
+  response_doc.clear();
+  response_doc["type"] = "status";
+  response_doc["message"] = binary_frames ? "Frame format: binary" : "Frame format: json";
+  response_doc["format"] = binary_frames ? "binary" : "json";
+
+  serializeJson(response_doc, Serial);
+  Serial.println();
+}
+
 void sendStatus(String message) {
   response_doc.clear();
   response_doc["type"] = "status";
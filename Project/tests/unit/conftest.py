@@ -33,11 +33,14 @@ def database_handler(isolated_data_dir: Path):
     """A ``DatabaseHandler`` bound to the isolated ``RRR_DATA``.
 
     The handler creates a fresh SQLite database with the full RRR schema in
-    the per-test temp directory; no production DB is touched.
+    the per-test temp directory; no production DB is touched. Its pooled
+    connections are closed on teardown.
     """
     from models.database_handler import DatabaseHandler  # noqa: PLC0415
 
-    return DatabaseHandler()
+    handler = DatabaseHandler()
+    yield handler
+    handler.close()
 
 
 @pytest.fixture
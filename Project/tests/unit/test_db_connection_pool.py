@@ -0,0 +1,83 @@
+"""Tests for the per-thread pooled SQLite connections (models/db/connection.py).
+
+``DatabaseHandler.connect()`` used to open a fresh connection per call. It
+now returns one persistent, pragma-tuned connection per thread. These tests
+pin the contract the 150-odd ``with self.connect() as conn:`` call sites
+rely on: same connection per thread, distinct across threads, the ``with``
+block still commits without closing, and ``close()`` is a clean shutdown
+hook after which the handler transparently reconnects.
+"""
+
+from __future__ import annotations
+
+import threading
+
+
+def test_connect_reuses_one_connection_per_thread(database_handler):
+    assert database_handler.connect() is database_handler.connect()
+
+
+def test_connections_are_distinct_across_threads(database_handler):
+    main_conn = database_handler.connect()
+    seen = {}
+
+    def _worker():
+        seen["conn"] = database_handler.connect()
+        seen["again"] = database_handler.connect()
+
+    t = threading.Thread(target=_worker)
+    t.start()
+    t.join()
+
+    assert seen["conn"] is seen["again"]
+    assert seen["conn"] is not main_conn
+
+
+def test_pragmas_applied(database_handler):
+    conn = database_handler.connect()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # 1 == NORMAL
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+
+def test_with_block_commits_and_leaves_connection_open(database_handler):
+    with database_handler.connect() as conn:
+        conn.execute("INSERT INTO trainers (trainer_name, salt, password) VALUES ('t', 's', 'p')")
+    # Still usable after the block, and the insert is visible from another
+    # thread's connection (i.e. it was committed, not just buffered).
+    assert conn.execute("SELECT COUNT(*) FROM trainers").fetchone()[0] >= 1
+    counts = []
+    t = threading.Thread(
+        target=lambda: counts.append(
+            database_handler.connect()
+            .execute("SELECT COUNT(*) FROM trainers WHERE trainer_name = 't'")
+            .fetchone()[0]
+        )
+    )
+    t.start()
+    t.join()
+    assert counts == [1]
+
+
+def test_close_closes_everything_and_handler_reconnects(database_handler):
+    first = database_handler.connect()
+    t = threading.Thread(target=database_handler.connect)
+    t.start()
+    t.join()
+    assert database_handler._pool.open_connections == 2
+
+    database_handler.close()
+    assert database_handler._pool.open_connections == 0
+
+    second = database_handler.connect()
+    assert second is not first
+    assert second.execute("SELECT 1").fetchone() == (1,)
+    database_handler.close()  # idempotent
+
+
+def test_externally_closed_connection_is_replaced(database_handler):
+    """The old ``handler.connect().close()`` idiom must not poison the pool."""
+    database_handler.connect().close()
+    assert database_handler.get_system_settings() is not None
+    assert database_handler.connect().execute("SELECT 1").fetchone() == (1,)
@@ -0,0 +1,177 @@
+"""Write-behind delivery journal (models/db/delivery_journal.py).
+
+``RelayWorker`` no longer commits each ``dispensing_history`` row on the
+delivery thread; it hands records to a ``DeliveryJournal`` whose writer
+thread group-commits them. These tests pin the three properties the worker
+relies on: records are committed in groups, ``close()`` (called from
+``stop()``) leaves nothing pending, and a crash between ``submit`` and the
+commit is recovered on the next start without duplicating rows.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from models.db import delivery_journal
+from models.db.delivery_journal import (
+    DeliveryJournal,
+    bad_path_for,
+    recover_spill_file,
+    spill_path_for,
+)
+
+
+def _record(i, status="completed", volume=0.1):
+    return {
+        "schedule_id": 1,
+        "animal_id": 7,
+        "relay_unit_id": 3,
+        "volume_delivered": volume,
+        "timestamp": f"2026-06-05T10:00:{i:02d}",
+        "status": status,
+    }
+
+
+def _history(database_handler):
+    with database_handler.connect() as conn:
+        return conn.execute(
+            "SELECT timestamp, volume_dispensed, status FROM dispensing_history ORDER BY history_id"
+        ).fetchall()
+
+
+def test_records_are_group_committed(database_handler, monkeypatch):
+    calls = []
+    real = database_handler.log_deliveries
+
+    def _spy(records):
+        calls.append(len(records))
+        return real(records)
+
+    monkeypatch.setattr(database_handler, "log_deliveries", _spy)
+    journal = DeliveryJournal(database_handler, flush_interval_s=5.0, max_batch=100)
+    try:
+        for i in range(10):
+            journal.submit(_record(i))
+        assert journal.flush(timeout=5.0)
+    finally:
+        journal.close()
+
+    assert calls == [10]
+    assert len(_history(database_handler)) == 10
+
+
+def test_batch_size_threshold_triggers_commit(database_handler):
+    journal = DeliveryJournal(database_handler, flush_interval_s=60.0, max_batch=4)
+    try:
+        for i in range(4):
+            journal.submit(_record(i))
+        # No flush(): the size threshold alone must commit the group.
+        rows = []
+        for _ in range(200):
+            rows = _history(database_handler)
+            if len(rows) == 4:
+                break
+            time.sleep(0.01)
+        assert len(rows) == 4
+    finally:
+        journal.close()
+
+
+def test_close_flushes_and_truncates_spill_file(database_handler):
+    journal = DeliveryJournal(database_handler, flush_interval_s=60.0)
+    journal.submit(_record(1))
+    journal.submit(_record(2, status="failed", volume=0))
+    assert journal.close() is True
+
+    assert [row[2] for row in _history(database_handler)] == ["completed", "failed"]
+    with open(spill_path_for(database_handler.db_path)) as f:
+        assert f.read() == ""
+    with pytest.raises(RuntimeError):
+        journal.submit(_record(3))
+
+
+def test_completed_record_updates_animal_last_watering(database_handler):
+    with database_handler.connect() as conn:
+        conn.execute("INSERT INTO animals (animal_id, lab_animal_id, name) VALUES (7, 'A7', 'M')")
+    journal = DeliveryJournal(database_handler)
+    journal.submit(_record(5, volume=0.25))
+    journal.close()
+    with database_handler.connect() as conn:
+        row = conn.execute(
+            "SELECT last_watering, last_water_volume FROM animals WHERE animal_id = 7"
+        ).fetchone()
+    assert row == ("2026-06-05T10:00:05", 0.25)
+
+
+def test_crash_leftovers_are_replayed_once(database_handler):
+    """Simulate a crash: the spill file holds one record that was committed
+    before the crash and one that was not, plus a torn final line."""
+    committed = dict(_record(1), journal_id="already-in-db")
+    database_handler.log_deliveries([committed])
+    uncommitted = dict(_record(2), journal_id="lost-in-crash")
+
+    path = spill_path_for(database_handler.db_path)
+    with open(path, "w") as f:
+        f.write(json.dumps(committed) + "\n")
+        f.write(json.dumps(uncommitted) + "\n")
+        f.write('{"schedule_id": 1, "anim')  # torn write
+
+    assert recover_spill_file(database_handler) == 2
+    with open(bad_path_for(database_handler.db_path)) as f:
+        assert f.read() == '{"schedule_id": 1, "anim\n'
+    assert [row[0] for row in _history(database_handler)] == [
+        "2026-06-05T10:00:01",
+        "2026-06-05T10:00:02",
+    ]
+    # Replaying again is a no-op.
+    assert recover_spill_file(database_handler) == 0
+    assert len(_history(database_handler)) == 2
+
+
+def test_constraint_failures_are_not_mistaken_for_replays(database_handler):
+    bad = dict(_record(1), relay_unit_id=None, journal_id="null-relay")
+    assert database_handler.log_deliveries([_record(2), bad]) is False
+    assert _history(database_handler) == []
+
+
+def test_malformed_leftovers_do_not_stop_startup(isolated_data_dir):
+    from models.database_handler import DatabaseHandler  # noqa: PLC0415
+
+    db_path = str(isolated_data_dir / "rrr.db")
+    with open(spill_path_for(db_path), "w") as f:
+        f.write(json.dumps({"animal_id": 1}) + "\n")
+        f.write(json.dumps(dict(_record(1), journal_id="good")) + "\n")
+
+    handler = DatabaseHandler(db_path)
+    try:
+        assert [row[0] for row in _history(handler)] == ["2026-06-05T10:00:01"]
+        with open(bad_path_for(db_path)) as f:
+            assert [json.loads(line) for line in f] == [{"animal_id": 1}]
+        with open(spill_path_for(db_path)) as f:
+            assert f.read() == ""
+    finally:
+        handler.close()
+
+
+def test_a_failing_record_does_not_block_later_ones(database_handler, monkeypatch):
+    monkeypatch.setattr(delivery_journal, "RETRY_DELAY_S", 0.01)
+    journal = DeliveryJournal(database_handler, flush_interval_s=60.0)
+    try:
+        journal.submit({"animal_id": 1})  # rejected at submit
+        journal.submit(_record(1))
+        journal.submit(dict(_record(2), timestamp=["not", "bindable"]))
+        journal.submit(_record(3))
+        assert journal.flush(timeout=5.0)
+    finally:
+        assert journal.close() is True
+
+    assert [row[0] for row in _history(database_handler)] == [
+        "2026-06-05T10:00:01",
+        "2026-06-05T10:00:03",
+    ]
+    with open(bad_path_for(database_handler.db_path)) as f:
+        bad = [json.loads(line) for line in f]
+    assert [record.get("timestamp") for record in bad] == [None, ["not", "bindable"]]
@@ -0,0 +1,76 @@
+"""Persistent asyncio delivery loop (gpio/delivery_loop.py).
+
+RelayWorker used to create and close a fresh ``asyncio.new_event_loop()`` for
+every delivery and retry and block its Qt thread in ``run_until_complete``.
+Deliveries are now submitted to one long-lived loop thread. These tests pin
+that every submission runs on that same thread, that serial submissions never
+overlap (they share the master valve and flow sensor), and that ``close()``
+cancels an in-flight delivery through its ``finally`` block.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from gpio.delivery_loop import DeliveryLoop
+
+
+@pytest.fixture()
+def delivery_loop():
+    loop = DeliveryLoop()
+    yield loop
+    loop.close()
+
+
+def test_submissions_share_one_loop_thread(delivery_loop):
+    async def where():
+        return threading.current_thread(), asyncio.get_running_loop()
+
+    results = [delivery_loop.submit(where()).result(timeout=5) for _ in range(3)]
+
+    assert {thread for thread, _ in results} == {delivery_loop.thread}
+    assert {loop for _, loop in results} == {delivery_loop.loop}
+    assert delivery_loop.thread is not threading.current_thread()
+
+
+def test_serial_submissions_do_not_overlap(delivery_loop):
+    events = []
+
+    async def deliver(name):
+        events.append(("start", name))
+        await asyncio.sleep(0.01)
+        events.append(("end", name))
+        return name
+
+    futures = [delivery_loop.submit_serial(lambda n=n: deliver(n)) for n in "abc"]
+
+    assert [f.result(timeout=5) for f in futures] == ["a", "b", "c"]
+    assert events == [(edge, n) for n in "abc" for edge in ("start", "end")]
+
+
+def test_close_cancels_in_flight_delivery():
+    delivery_loop = DeliveryLoop()
+    started = threading.Event()
+    valve = {"open": False}
+
+    async def deliver():
+        valve["open"] = True
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        finally:
+            valve["open"] = False
+
+    future = delivery_loop.submit_serial(deliver)
+    assert started.wait(5)
+
+    assert delivery_loop.close(timeout=5) is True
+    assert future.cancelled()
+    assert valve["open"] is False
+    assert not delivery_loop.is_running
+    with pytest.raises(RuntimeError):
+        delivery_loop.submit(asyncio.sleep(0))
+    assert delivery_loop.close() is True  # idempotent
@@ -0,0 +1,136 @@
+"""Heap-based delivery scheduler (gpio/delivery_scheduler.py).
+
+RelayWorker used to allocate one QTimer per delivery/retry, keep them all in
+``self.timers`` and poll ``isActive()`` over the list every second. It now
+schedules everything through one ``DeliveryScheduler``. These tests pin the
+ordering, cancellation and bounded-memory behaviour with a fake clock (calling
+the wakeup handler directly), plus one run through a real Qt event loop.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def qapp():
+    from PyQt5.QtWidgets import QApplication  # noqa: PLC0415
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture()
+def sched(qapp):
+    from gpio.delivery_scheduler import DeliveryScheduler  # noqa: PLC0415
+
+    clock = FakeClock()
+    scheduler = DeliveryScheduler(clock=clock)
+    scheduler.clock = clock
+    yield scheduler
+    scheduler.cancel_all()
+
+
+def test_runs_due_calls_in_deadline_then_fifo_order(sched):
+    ran = []
+    sched.call_later(5, lambda: ran.append("c"))
+    sched.call_later(1, lambda: ran.append("a"))
+    sched.call_later(1, lambda: ran.append("b"))
+    sched.call_later(60, lambda: ran.append("later"))
+
+    sched.clock.now += 5
+    sched._run_due()
+
+    assert ran == ["a", "b", "c"]
+    assert sched.pending == 1
+    assert sched._timer.isActive()
+    assert 0 < sched._timer.remainingTime() <= 55_000
+
+
+def test_cancel_and_drained(sched):
+    drained = []
+    sched.drained.connect(lambda: drained.append(True))
+    ran = []
+    keep = sched.call_later(1, lambda: ran.append("keep"))
+    drop = sched.call_later(1, lambda: ran.append("drop"))
+
+    assert sched.cancel(drop) is True
+    assert sched.cancel(drop) is False
+    assert sched.pending == 1
+
+    sched.clock.now += 1
+    sched._run_due()
+    assert ran == ["keep"]
+    assert not keep.active
+    assert sched.cancel(keep) is False
+    assert sched.pending == 0
+    assert drained == [True]
+    assert not sched._timer.isActive()
+
+
+def test_cancel_all_does_not_report_drained(sched):
+    drained = []
+    sched.drained.connect(lambda: drained.append(True))
+
+    # A callback that tears the scheduler down, like RelayWorker.stop().
+    sched.call_later(0, sched.cancel_all)
+    sched.call_later(0, lambda: pytest.fail("cancelled call ran"))
+    sched.call_later(10, lambda: pytest.fail("cancelled call ran"))
+    sched._run_due()
+
+    assert sched.pending == 0
+    assert drained == []
+
+
+def test_cancelled_entries_do_not_accumulate(sched):
+    handles = [sched.call_later(3600 + i, lambda: None) for i in range(5000)]
+    for handle in handles[:-1]:
+        sched.cancel(handle)
+    assert sched.pending == 1
+    assert len(sched._heap) <= 2
+
+
+def test_long_delays_are_armed_in_chunks(sched):
+    from gpio.delivery_scheduler import MAX_ARM_MS  # noqa: PLC0415
+
+    ran = []
+    sched.call_later(21 * 24 * 3600, lambda: ran.append(True))  # three weeks
+    assert sched._timer.interval() == MAX_ARM_MS
+
+    sched.clock.now += MAX_ARM_MS / 1000
+    sched._run_due()  # chunk boundary: nothing due yet, re-armed
+    assert ran == [] and sched.pending == 1
+
+    sched.clock.now += 20 * 24 * 3600
+    sched._run_due()
+    assert ran == [True]
+
+
+def test_real_event_loop(qapp):
+    from gpio.delivery_scheduler import DeliveryScheduler  # noqa: PLC0415
+    from PyQt5.QtCore import QEventLoop, QTimer  # noqa: PLC0415
+
+    scheduler = DeliveryScheduler()
+    ran = []
+    for i in range(50):
+        scheduler.call_later(0.001 * (i % 5), lambda i=i: ran.append(i))
+    loop = QEventLoop()
+    scheduler.drained.connect(loop.quit)
+    QTimer.singleShot(2000, loop.quit)  # safety net
+    loop.exec_()
+
+    assert sorted(ran) == list(range(50))
+    assert scheduler.pending == 0
@@ -0,0 +1,165 @@
+"""Trigger-maintained delivery aggregates (schema migrations 5 and 8).
+
+``get_schedule_progress`` and ``get_staggered_window_status`` used to
+re-``SUM`` every ``dispensing_history`` row of each animal on every call. The
+``delivery_totals`` table is now kept current by triggers on
+``dispensing_history``, whichever path inserts the row (journal batch,
+``log_delivery`` or ``log_staggered_delivery``), and those readers use it.
+These tests pin that the aggregate always equals a recomputation from history
+(after deletes too), including the backfill of a database that already had
+history before the migration ran.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+from models.db.schema import MIGRATIONS, apply_migrations
+from models.Schedule import Schedule
+
+
+def _record(ts, animal_id=1, status="completed", volume=0.1, schedule_id=1):
+    return {
+        "schedule_id": schedule_id,
+        "animal_id": animal_id,
+        "relay_unit_id": animal_id,
+        "volume_delivered": volume,
+        "timestamp": ts,
+        "status": status,
+    }
+
+
+def _recomputed(conn):
+    return conn.execute(
+        """
+        SELECT schedule_id, animal_id,
+               TOTAL(CASE WHEN status = 'completed' THEN volume_dispensed END),
+               SUM(status = 'completed'), SUM(status != 'completed'), MAX(timestamp)
+        FROM dispensing_history GROUP BY schedule_id, animal_id ORDER BY 1, 2
+        """
+    ).fetchall()
+
+
+def _totals(conn):
+    return conn.execute(
+        """
+        SELECT schedule_id, animal_id, delivered_volume, completed_count, failed_count,
+               last_delivery
+        FROM delivery_totals ORDER BY 1, 2
+        """
+    ).fetchall()
+
+
+def test_totals_track_every_insert_path(database_handler):
+    database_handler.log_deliveries(
+        [
+            _record("2026-06-05T10:00:00"),
+            _record("2026-06-05T10:05:00", volume=0.2),
+            _record("2026-06-05T10:06:00", status="failed", volume=0),
+            _record("2026-06-05T10:07:00", animal_id=2, volume=0.3),
+        ]
+    )
+    database_handler.log_delivery(_record("2026-06-06T08:00:00", volume=0.4))
+    database_handler.log_staggered_delivery(1, 2, 2, 0.5)
+
+    conn = database_handler.connect()
+    assert _totals(conn) == _recomputed(conn)
+    assert database_handler.get_delivery_totals(1) == {1: 0.1 + 0.2 + 0.4, 2: 0.8}
+    assert database_handler.get_delivery_totals(999) == {}
+
+
+def test_deleting_history_reverses_totals(database_handler):
+    database_handler.log_deliveries(
+        [
+            _record("2026-06-05T10:00:00", volume=0.25),
+            _record("2026-06-05T11:00:00", volume=0.5),
+        ]
+    )
+    with database_handler.connect() as conn:
+        conn.execute("DELETE FROM dispensing_history WHERE timestamp = '2026-06-05T11:00:00'")
+    assert database_handler.get_delivery_totals(1) == {1: 0.25}
+    conn = database_handler.connect()
+    # last_delivery falls back to the newest remaining row
+    assert _totals(conn) == _recomputed(conn) == [(1, 1, 0.25, 1, 0, "2026-06-05T10:00:00")]
+
+
+def test_progress_reads_aggregate(database_handler):
+    with database_handler.connect() as conn:
+        conn.execute("INSERT INTO animals (animal_id, lab_animal_id, name) VALUES (1, 'A1', 'M1')")
+    sched = Schedule(
+        schedule_id=None,
+        name="totals",
+        water_volume=1.0,
+        start_time="2026-06-05T09:00:00",
+        end_time="2026-06-05T17:00:00",
+        created_by=1,
+        is_super_user=0,
+        delivery_mode="staggered",
+    )
+    sched.add_animal(animal_id=1, relay_unit_id=1, desired_volume=1.0)
+    sid = database_handler.add_staggered_schedule(sched)
+    database_handler.log_deliveries(
+        [
+            _record("2026-06-05T10:00:00", schedule_id=sid, volume=0.3),
+            _record("2026-06-05T10:01:00", schedule_id=sid, status="failed", volume=0.3),
+        ]
+    )
+
+    statements = []
+    conn = database_handler.connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        rows = database_handler.get_schedule_progress(sid)
+        [window] = database_handler.get_schedule_staggered_windows(sid)
+        status = database_handler.get_staggered_window_status(window["window_id"])
+    finally:
+        conn.set_trace_callback(None)
+    assert [(row[3], row[6]) for row in rows] == [(1, 0.3)]
+    assert status[-1] == 0.3  # actual_delivered
+    assert not any("dispensing_history" in s for s in statements)
+
+
+def test_migration_backfills_existing_history(isolated_data_dir):
+    conn = sqlite3.connect(isolated_data_dir / "pre_totals.db")
+    conn.execute(
+        """
+        CREATE TABLE dispensing_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            animal_id INTEGER NOT NULL,
+            relay_unit_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            volume_dispensed REAL NOT NULL,
+            status TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE TABLE animals (animal_id INTEGER PRIMARY KEY, lab_animal_id TEXT, name TEXT)")
+    for table in ("schedule_staggered_windows", "cycle_tracking", "schedule_instant_deliveries"):
+        conn.execute(
+            f"CREATE TABLE {table} (schedule_id INTEGER, animal_id INTEGER, "
+            "status TEXT, start_time TEXT, cycle_index INTEGER)"
+        )
+    conn.execute("CREATE TABLE schedules (schedule_id INTEGER PRIMARY KEY, created_by INTEGER)")
+    conn.executemany(
+        "INSERT INTO dispensing_history "
+        "(schedule_id, animal_id, relay_unit_id, timestamp, volume_dispensed, status) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (1, 1, 1, "2026-06-04T10:00:00", 0.5, "completed"),
+            (1, 1, 1, "2026-06-05T10:00:00", 0.25, "completed"),
+            (1, 1, 1, "2026-06-05T11:00:00", 0.25, "failed"),
+        ],
+    )
+    conn.commit()
+
+    applied = apply_migrations(conn)
+    try:
+        assert applied[-1] == max(m.version for m in MIGRATIONS)
+        assert _totals(conn) == _recomputed(conn) == [(1, 1, 0.75, 2, 1, "2026-06-05T11:00:00")]
+        # The unread daily rollup is gone (migration 8)
+        assert not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'delivery_daily_totals'"
+        ).fetchall()
+    finally:
+        conn.close()
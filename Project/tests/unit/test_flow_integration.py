@@ -0,0 +1,125 @@
+"""Timestamp-accurate flow integration (utils/flow_integration.py).
+
+The delivery loops used to integrate flow with the loop's nominal sample
+period (continuous mode) or with host timestamps taken whenever the loop got
+round to reading a sample (pulse mode), so volume drifted as soon as the Pi
+was loaded and iterations stretched. ``UARTFlowSensor`` now keeps the Teensy's
+``time``/``count`` fields and the strategies integrate drained batches on the
+device clock. These tests pin the maths (including the NumPy-free path), drop
+and gap detection, and that the driver no longer discards the fields.
+"""
+
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+def _s(flow, t_ms=None, count=None, host=0.0):
+    return SimpleNamespace(flow_ml_min=flow, timestamp_ms=t_ms, count=count, host_time=host)
+
+
+def _stream(n=101, period_ms=10, flow=1.2, start_ms=5_000):
+    return [_s(flow, start_ms + i * period_ms, i, host=0.0) for i in range(n)]
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def fi(request, monkeypatch):
+    from utils import flow_integration  # noqa: PLC0415
+
+    if request.param and not flow_integration.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(flow_integration, "NUMPY_AVAILABLE", request.param)
+    return flow_integration
+
+
+def test_device_clock_ignores_bursty_host_arrival(fi):
+    # One second of 1.2 mL/min, but the host received it all in two bursts.
+    samples = _stream()
+    for i, sample in enumerate(samples):
+        sample.host_time = 100.0 if i < 50 else 100.9
+    result = fi.integrate_flow(samples)
+
+    assert result.device_clock
+    assert result.volume_ml == pytest.approx(1.2 / 60.0)
+    assert result.duration_s == pytest.approx(1.0)
+    assert result.dropped == 0 and result.gaps == 0
+
+
+def test_host_clock_fallback(fi):
+    samples = [_s(0.6, host=10.0 + i * 0.5) for i in range(5)]
+    result = fi.integrate_flow(samples)
+    assert not result.device_clock
+    assert result.volume_ml == pytest.approx(0.6 * 2.0 / 60.0)
+
+
+def test_dropped_frames_and_gaps(fi):
+    samples = _stream()
+    del samples[40:45]  # five frames lost on the wire
+    result = fi.integrate_flow(samples)
+
+    assert result.dropped == 5
+    assert result.gaps == 1
+    assert result.max_gap_s == pytest.approx(0.06)
+    # Constant flow: interpolating across the gap loses nothing.
+    assert result.volume_ml == pytest.approx(1.2 / 60.0)
+
+
+def test_rollover_and_restart(fi):
+    wrap = 2**32
+    rolled = [_s(1.2, (wrap - 20 + i * 10) % wrap, (wrap - 2 + i) % wrap) for i in range(5)]
+    result = fi.integrate_flow(rolled)
+    assert result.duration_s == pytest.approx(0.04)
+    assert result.dropped == 0 and result.gaps == 0
+
+    restarted = _stream(n=3) + [_s(1.2, 3, 0), _s(1.2, 13, 1)]
+    result = fi.integrate_flow(restarted)
+    assert result.gaps == 1
+    assert result.duration_s == pytest.approx(0.03)
+
+
+def test_incremental_matches_batch(fi):
+    samples = _stream()
+    for i, sample in enumerate(samples):
+        sample.flow_ml_min = 0.5 + (i % 7) * 0.1
+    del samples[60]
+
+    integrator = fi.FlowIntegrator()
+    for start in range(0, len(samples), 13):
+        integrator.add(samples[start : start + 13])
+    whole = fi.integrate_flow(samples)
+
+    assert integrator.volume_ml == pytest.approx(whole.volume_ml)
+    assert integrator.samples == len(samples)
+    assert integrator.dropped == whole.dropped == 1
+    assert integrator.last_flow_ml_min == samples[-1].flow_ml_min
+
+
+def test_read_new_samples_wraps_tuple_sensors():
+    from utils.flow_integration import read_new_samples  # noqa: PLC0415
+
+    legacy = SimpleNamespace(read_one=lambda: (1500.0, 22.0, 0))
+    [sample] = read_new_samples(legacy)
+    assert sample.flow_ml_min == pytest.approx(1.5)
+    assert sample.timestamp_ms is None and sample.host_time > 0
+
+
+def test_uart_sensor_keeps_device_time_and_count():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port="/dev/null")
+    sensor._running = True
+    for i in range(3):
+        sensor._process_message(
+            json.dumps(
+                {"type": "measurement", "flow": 1.0, "temp": 22.5, "time": 700 + i, "count": 9 + i}
+            )
+        )
+
+    samples = sensor.drain_samples()
+    assert [(s.timestamp_ms, s.count) for s in samples] == [(700, 9), (701, 10), (702, 11)]
+    assert all(s.host_time > 0 for s in samples)
+    assert sensor.drain_samples() == []
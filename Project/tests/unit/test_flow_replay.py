@@ -0,0 +1,166 @@
+"""Flow stream recording and virtual-clock replay.
+
+With ``record_path`` set, ``UARTFlowSensor`` appends the raw serial bytes,
+its commands and valve events to a compact file (drivers/flow_recording.py);
+``ReplayFlowSensor`` feeds that file back through the same decoding and
+``read_one``/``drain_samples``/ring code on a ``VirtualClock``
+(drivers/replay_flow_sensor.py). These tests pin the file format, replay
+timing, a ``SolenoidFlowStrategy`` delivery re-run faster than real time with
+identical results, and a live recording taken through the pty emulator.
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("serial")
+
+
+def _synthetic_recording(path, seconds=10.0, rate_hz=50.0, flow_from_s=0.0):
+    """A session of binary frames, 1.2 mL/min from ``flow_from_s`` on."""
+    from drivers.flow_recording import FlowRecorder  # noqa: PLC0415
+    from drivers.teensy_frames import encode_frame  # noqa: PLC0415
+
+    recorder = FlowRecorder(str(path))
+    recorder.session(port="/dev/ttyACM0", sampling_hz=rate_hz, zero_offset_ml_min=0.0)
+    recorder.rx(b'{"type":"status","format":"binary"}\r\n', host_time=99.99)
+    for i in range(int(seconds * rate_hz)):
+        t = i / rate_hz
+        flow_raw = 12000 if t >= flow_from_s else 0
+        recorder.rx(encode_frame(i, 5000 + int(t * 1000), flow_raw, 4500), host_time=100.0 + t)
+    recorder.event("valve", host_time=101.0, target="cage 1", relays=[1], state=1)
+    recorder.close()
+
+
+def test_recording_round_trip_tolerates_torn_tail(tmp_path):
+    from drivers import flow_recording  # noqa: PLC0415
+
+    path = tmp_path / "trace.rrrflow"
+    recorder = flow_recording.FlowRecorder(str(path))
+    recorder.session(port="/dev/ttyACM0", sampling_hz=50.0)
+    recorder.rx(b"\xa5\x5a" + bytes(14), host_time=1.5)
+    recorder.tx(b'{"cmd": "start"}\n', host_time=1.25)
+    recorder.event("valve", target="master", relays=[16], state=1)
+    recorder.close()
+    with open(path, "ab") as f:
+        f.write(flow_recording.RECORD.pack(flow_recording.RX, 2.0, 100) + b"partial")
+
+    records = list(flow_recording.read_recording(str(path)))
+    assert [r.kind for r in records] == [
+        flow_recording.SESSION,
+        flow_recording.RX,
+        flow_recording.TX,
+        flow_recording.EVENT,
+    ]
+    assert records[0].json()["sampling_hz"] == 50.0
+    assert records[1].host_time == 1.5 and len(records[1].payload) == 16
+    assert records[3].json() == {"target": "master", "relays": [16], "state": 1, "event": "valve"}
+
+    # Appending a second session keeps the file readable as one stream.
+    flow_recording.FlowRecorder(str(path)).close()
+    with open(path, "rb") as f:
+        assert f.read().count(flow_recording.MAGIC) == 1
+
+
+def test_replay_releases_samples_on_the_virtual_clock(tmp_path):
+    from drivers.replay_flow_sensor import ReplayFlowSensor, VirtualClock  # noqa: PLC0415
+
+    path = tmp_path / "trace.rrrflow"
+    _synthetic_recording(path, seconds=2.0)
+    clock = VirtualClock(start=500.0)
+    sensor = ReplayFlowSensor(str(path), clock, zero_offset_ml_min=0.2)
+    sensor.start()
+
+    assert sensor.get_status()["frame_format"] == "binary"
+    assert sensor.drain_samples() == []  # first frame is 10 ms after the status
+    clock.advance(1.01)
+    samples = sensor.drain_samples()
+    assert [s.count for s in samples] == list(range(51))
+    assert samples[-1].host_time == pytest.approx(501.01)
+    assert samples[-1].flow_ml_min == pytest.approx(1.0)  # overridden zero offset
+
+    assert sensor.wait_for_frames(min_frames=25, timeout_s=5.0)
+    assert clock.monotonic() == pytest.approx(501.51, abs=0.03)
+    assert not sensor.wait_for_frames(min_frames=100, timeout_s=5.0)
+    assert sensor.exhausted
+    assert sensor.events[0][1]["target"] == "cage 1"
+
+
+def _replay_delivery(path, target_ml):
+    from drivers.replay_flow_sensor import ReplayFlowSensor, VirtualClock  # noqa: PLC0415
+    from strategies import solenoid_flow_strategy  # noqa: PLC0415
+
+    clock = VirtualClock()
+    sensor = ReplayFlowSensor(str(path), clock)
+    sensor.start()
+    started = clock.monotonic()
+    valves = MagicMock()
+    switched = {}
+    valves.open_cage.side_effect = lambda cage: switched.setdefault("open", clock.monotonic())
+    valves.close_cage.side_effect = lambda cage: switched.setdefault("close", clock.monotonic())
+    settings = {
+        "use_pulse_delivery": False,
+        "predictive_close_ms": 0.0,
+        "residual_flow_threshold_ml_min": 5.0,  # open loop: flow never stops
+    }
+    strategy = solenoid_flow_strategy.SolenoidFlowStrategy(valves, sensor, MagicMock(), settings)
+    with clock.patch(solenoid_flow_strategy):
+        ok = clock.run(strategy.deliver(relay_unit_id=1, target_volume_ml=target_ml))
+    return ok, switched["open"] - started, switched["close"] - started
+
+
+def test_strategy_replays_faster_than_real_time_and_deterministically(tmp_path):
+    path = tmp_path / "trace.rrrflow"
+    _synthetic_recording(path, seconds=10.0, flow_from_s=3.0)
+
+    started = time.monotonic()
+    result = _replay_delivery(path, target_ml=0.1)
+    assert time.monotonic() - started < 3.0  # ~8 s of recorded delivery
+    ok, opened_at, closed_at = result
+    assert ok is True
+    assert opened_at < 3.0
+    # Flow starts 3.01 s into the trace; 0.1 mL at 1.2 mL/min takes 5 s more.
+    assert closed_at == pytest.approx(8.01, abs=0.03)
+
+    assert _replay_delivery(path, target_ml=0.1) == result
+
+
+def test_live_recording_replays_what_the_sensor_saw(tmp_path):
+    from drivers.replay_flow_sensor import ReplayFlowSensor  # noqa: PLC0415
+    from drivers.solenoid_controller import SolenoidController  # noqa: PLC0415
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+    from tools.teensy_emulator import TeensyEmulator  # noqa: PLC0415
+
+    path = tmp_path / "field" / "trace.rrrflow"
+    with TeensyEmulator(flow_ml_min=0.8, noise_ml_min=0.01, seed=3) as emulator:
+        sensor = UARTFlowSensor(port=emulator.port, sampling_hz=100.0, record_path=str(path))
+        valves = SolenoidController(MagicMock(), 16, {1: 1})
+        valves.add_listener(sensor.record_event)
+        sensor.start()
+        try:
+            valves.open_cage(1)
+            assert sensor.wait_for_frames(min_frames=20, timeout_s=2.0)
+            valves.close_cage(1)
+            live = sensor.ring.latest(copy=True)
+        finally:
+            sensor.close()
+
+    replay = ReplayFlowSensor(str(path))
+    replay.start()
+    replay.clock.advance(replay.duration_s)
+    replayed = replay.ring.latest(copy=True)
+
+    n = len(live)
+    assert n > 20
+    assert list(replayed.count[:n]) == list(live.count)
+    assert list(replayed.flow_ml_min[:n]) == pytest.approx(list(live.flow_ml_min))
+    offset = replayed.host_time[0] - live.host_time[0]
+    assert list(replayed.host_time[:n]) == pytest.approx([t + offset for t in live.host_time])
+    assert [(e["target"], e["state"]) for _t, e in replay.events] == [
+        ("cage 1", 1),
+        ("cage 1", 0),
+    ]
+    assert replay.session_info["sampling_hz"] == 100.0
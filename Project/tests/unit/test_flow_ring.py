@@ -0,0 +1,165 @@
+"""Preallocated flow-sample ring buffer (utils/flow_ring.py).
+
+``UARTFlowSensor`` used to keep samples in a ``Queue(maxsize=100)`` that
+silently dropped the oldest under load, and consumers could only pop one
+sample at a time. Samples now live in a mirrored ``FlowSampleRing`` that
+readers query by time window or sequence cursor. These tests pin window
+queries across the wrap point, zero-copy views, overrun accounting, and the
+sensor's cursor-based ``read_one``/``drain_samples``/``clear_queue``.
+"""
+
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def ring_mod(request, monkeypatch):
+    from utils import flow_integration, flow_ring  # noqa: PLC0415
+
+    if request.param and not flow_ring.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(flow_ring, "NUMPY_AVAILABLE", request.param)
+    monkeypatch.setattr(flow_integration, "NUMPY_AVAILABLE", request.param)
+    return flow_ring
+
+
+def _fill(ring, n, start=0):
+    for i in range(start, start + n):
+        ring.append(
+            SimpleNamespace(
+                flow_ml_min=1.2,
+                temperature_c=22.0,
+                timestamp_ms=1_000 + 10 * i,
+                count=i,
+                host_time=50.0 + 0.01 * i,
+            )
+        )
+
+
+def test_latest_and_window_across_wrap(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=8)
+    _fill(ring, 13)  # wrapped: seq 5..12 retained
+
+    assert len(ring) == 8 and ring.written == 13
+    assert list(ring.latest(3).count) == [10.0, 11.0, 12.0]
+    assert list(ring.latest().count) == [float(i) for i in range(5, 13)]
+
+    window = ring.samples_between(50.065, 50.105)
+    assert list(window.count) == [7.0, 8.0, 9.0, 10.0]
+    assert window.first_seq == 7 and window.end_seq == 11
+    assert window.integrate().volume_ml == pytest.approx(1.2 * 0.03 / 60.0)
+
+
+def test_views_are_zero_copy(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=4)
+    _fill(ring, 6)
+    view = ring.latest(2)
+    snapshot = ring.latest(2, copy=True)
+    _fill(ring, 4, start=6)  # overwrite every slot
+
+    assert list(view.count) != [4.0, 5.0]
+    assert list(snapshot.count) == [4.0, 5.0]
+
+
+class _Watched:
+    """A column that records what readers would see while the ring copies it."""
+
+    def __init__(self, ring, values, seen):
+        self.ring, self.values, self.seen = ring, values, seen
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return _Watched(self.ring, self.values[key], self.seen)
+        self.seen.append((self.ring.written, self.ring._writing_until))
+        return self.values[key]
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy as np  # noqa: PLC0415
+
+        self.seen.append((self.ring.written, self.ring._writing_until))
+        return np.asarray(self.values, dtype=dtype)
+
+
+def test_batches_publish_once_and_mark_the_whole_write(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=4)
+    _fill(ring, 2)
+    seen = []
+    n = 6  # more than the ring holds: only the newest 4 are stored
+    counts = _Watched(ring, [float(i) for i in range(2, 2 + n)], seen)
+    ring.extend(99.0, [0.0] * n, [1.0] * n, [22.0] * n, counts)
+
+    # Nothing is published mid-write, and the whole batch is marked first.
+    assert seen and set(seen) == {(2, 8)}
+    assert ring.written == 8 and ring._writing_until == 8
+    assert list(ring.latest().count) == [4.0, 5.0, 6.0, 7.0]
+
+
+def test_copies_drop_every_slot_a_batch_in_progress_clobbers(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=4)
+    _fill(ring, 4)
+    assert list(ring.latest(copy=True).count) == [0.0, 1.0, 2.0, 3.0]
+    # A 3-sample batch being stored overwrites the slots of seqs 0..2.
+    ring._writing_until = ring.written + 3
+    window = ring.latest(copy=True)
+    assert list(window.count) == [3.0] and window.first_seq == 3
+
+
+def test_since_reports_overrun(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=4)
+    _fill(ring, 10)
+    window, lost = ring.since(3)
+    assert lost == 3
+    assert list(window.count) == [6.0, 7.0, 8.0, 9.0]
+
+    window, lost = ring.since(window.end_seq)
+    assert len(window) == 0 and lost == 0
+
+
+def test_missing_device_time_falls_back_to_host_clock(ring_mod):
+    ring = ring_mod.FlowSampleRing(capacity=8)
+    for i in range(3):
+        ring.append(SimpleNamespace(flow_ml_min=0.6, temperature_c=22.0, host_time=float(i)))
+    result = ring.latest().integrate()
+    assert not result.device_clock
+    assert result.volume_ml == pytest.approx(0.6 * 2 / 60.0)
+    assert ring.latest().to_samples()[0].timestamp_ms is None
+
+
+def test_uart_sensor_consumes_through_cursor():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port="/dev/null")
+    sensor._running = True
+
+    def push(n, start=0):
+        for i in range(start, start + n):
+            sensor._process_message(
+                json.dumps(
+                    {"type": "measurement", "flow": 1.0, "temp": 22.0, "time": i, "count": i}
+                )
+            )
+
+    push(3)
+    assert sensor.read_one()[0] == pytest.approx(1000.0)
+    assert [s.count for s in sensor.drain_samples()] == [1, 2]
+    assert sensor.read_sample() is None
+
+    push(2, start=3)
+    assert sensor.clear_queue() == 2
+    assert sensor.drain_samples() == []
+    # Clearing consumes nothing from the ring itself.
+    assert list(sensor.ring.latest().count) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    capacity = sensor.ring.capacity
+    push(capacity + 5, start=5)
+    samples = sensor.drain_samples()
+    assert len(samples) == capacity  # no write in progress, nothing torn
+    assert sensor._overrun_count == 5
@@ -0,0 +1,211 @@
+"""Several flow sensors routed by cage (drivers/flow_sensor_pool.py).
+
+The factory built exactly one sensor and the strategy metered every cage
+with it, one delivery at a time. With ``flow_sensor_cages`` set the factory
+builds a FlowSensorPool, the strategy meters each cage with its own
+manifold's sensor, and ``deliver_many`` runs cages on different sensors
+concurrently. These tests pin the routing, the concurrent run (about half
+the time of the sequential one for two sensors), what happens to the other
+sensor's cages when one delivery fails, and the factory's settings parsing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from drivers.flow_sensor_pool import FlowSensorPool
+from utils.sensor_health import SensorHealth
+
+
+class _FakeSensor:
+    """Healthy stand-in driver that counts starts and stops.
+
+    No ``ensure_streaming``: the strategy would run it on an executor thread
+    during a concurrent delivery, and real threads skew the virtual clock.
+    """
+
+    def __init__(self, name, fail_start=False):
+        self.port = name
+        self.fail_start = fail_start
+        self.starts = 0
+        self.stops = 0
+        self.seq = 0
+
+    def health(self):
+        return SensorHealth(
+            status_seq=self.seq, frame_rate_hz=50.0, expected_rate_hz=50.0, last_frame_age_s=0.02
+        )
+
+    def request_health(self):
+        self.seq += 1  # no I2C errors to report
+
+    def start(self):
+        if self.fail_start:
+            raise ConnectionError(f"{self.port} not answering")
+        self.starts += 1
+
+    def stop(self):
+        self.stops += 1
+
+    def wait_for_frames(self, min_frames=3, timeout_s=5.0):
+        return True
+
+    def clear_queue(self):
+        return 0
+
+    def get_status(self):
+        return {"port": self.port}
+
+
+def _pool(**sensors):
+    """Pool of fake sensors; ``a=[1, 2]`` puts cages 1 and 2 on sensor a."""
+    fakes = {name: _FakeSensor(name) for name in sensors}
+    cage_map = {cage: name for name, cages in sensors.items() for cage in cages}
+    return FlowSensorPool(fakes, cage_map), fakes
+
+
+class _Rig:
+    """Strategy on a fake valve bank whose pulses are timed on a virtual clock."""
+
+    def __init__(self, flow_sensor, settings=None, pulse_s=None, pulse_ml=None):
+        from strategies.solenoid_flow_strategy import SolenoidFlowStrategy  # noqa: PLC0415
+
+        self.pulse_s = pulse_s or {}
+        self.pulse_ml = pulse_ml or {}
+        self.pulses = {}
+        self.open_now = set()
+        self.peak = 0
+        self.strategy = SolenoidFlowStrategy(
+            MagicMock(),
+            flow_sensor,
+            None,
+            {"use_pulse_delivery": True, **(settings or {})},
+            prime_ms=0,
+        )
+        self.strategy._get_cage_calibration = self._calibration
+        self.strategy._execute_single_pulse = self._pulse
+
+    async def _calibration(self, cage_id):
+        return (20, 0.025)
+
+    async def _pulse(self, cage_id):
+        self.open_now.add(cage_id)
+        self.peak = max(self.peak, len(self.open_now))
+        await asyncio.sleep(self.pulse_s.get(cage_id, 0.025))
+        self.open_now.discard(cage_id)
+        self.pulses[cage_id] = self.pulses.get(cage_id, 0) + 1
+        return self.pulse_ml.get(cage_id, 0.025)
+
+    def deliver_many(self, targets):
+        from drivers.replay_flow_sensor import VirtualClock  # noqa: PLC0415
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            results = await self.strategy.deliver_many(targets)
+            return results, loop.time() - started
+
+        return VirtualClock().run(run())
+
+
+def test_cages_are_routed_to_their_sensor():
+    pool, fakes = _pool(a=[1, 2], b=[16, 17])
+    assert pool.groups([1, 16, 2, 5, 17]) == {"a": [1, 2, 5], "b": [16, 17]}
+    assert pool.sensor_for(16) is fakes["b"]
+    assert pool.sensor_for(5) is fakes["a"]  # unlisted: first sensor
+
+    strategy = _Rig(pool).strategy
+    assert strategy._for_cage(1) is strategy._for_cage(2)
+    assert strategy._for_cage(1)._sensor is fakes["a"]
+    assert strategy._for_cage(17)._sensor is fakes["b"]
+
+    with pytest.raises(ValueError):
+        FlowSensorPool({"a": fakes["a"]}, {1: "c"})
+
+
+def test_a_sensor_that_fails_to_start_leaves_its_cages_calibration_only():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import TeensyUnavailableError  # noqa: PLC0415
+
+    pool, fakes = _pool(a=[1], b=[16])
+    fakes["b"].fail_start = True
+    pool.start()
+    assert list(pool.failed) == ["b"]
+    assert pool.sensor_for(16) is None
+    assert pool.wait_for_frames()
+    assert pool.get_status()["b"]["start_error"] == "b not answering"
+
+    strategy = _Rig(pool).strategy
+    assert strategy._for_cage(1)._sensor_available
+    assert not strategy._for_cage(16)._sensor_available
+
+    fakes["a"].fail_start = True
+    with pytest.raises(TeensyUnavailableError):
+        pool.start()
+
+
+def test_cages_on_different_sensors_are_metered_concurrently(isolated_data_dir):
+    targets = {1: 0.25, 2: 0.25, 16: 0.25, 17: 0.25}
+
+    single, _ = _pool(a=[1, 2, 16, 17])
+    rig = _Rig(single)
+    results, sequential_s = rig.deliver_many(targets)
+    assert all(results.values()) and rig.peak == 1
+
+    pool, fakes = _pool(a=[1, 2], b=[16, 17])
+    rig = _Rig(pool)
+    results, concurrent_s = rig.deliver_many(targets)
+    assert all(results.values())
+    assert rig.peak == 2  # one cage per manifold at a time
+    assert rig.pulses == {1: 10, 2: 10, 16: 10, 17: 10}
+    assert concurrent_s < 0.6 * sequential_s
+    # Each cage's delivery verified its own sensor; none needed a restart
+    assert fakes["a"].starts == fakes["b"].starts == 0
+
+
+def test_failed_delivery_stops_the_other_sensor_without_redelivering(isolated_data_dir):
+    # Cage 16 reads no flow and gives up after 12 pulses (~1.5 s), while
+    # cage 1's slower pulses still have ~3 s to go.
+    rig = _Rig(
+        _pool(a=[1, 2], b=[16, 17])[0],
+        settings={"max_pulses_per_delivery": 12},
+        pulse_s={1: 0.2, 2: 0.2},
+        pulse_ml={16: 0.0},
+    )
+    results, _ = rig.deliver_many({1: 0.25, 2: 0.25, 16: 0.1, 17: 0.1})
+
+    assert results == {1: False, 2: True, 16: False, 17: True}
+    assert rig.pulses[16] == 12
+    assert 0 < rig.pulses[1] < 10  # interrupted, and not delivered again
+    assert rig.pulses[2] == 10 and rig.pulses[17] == 4
+
+
+def test_factory_builds_a_pool_from_the_cage_mapping(tmp_path):
+    pytest.importorskip("serial")
+    from drivers.flow_sensor_factory import (  # noqa: PLC0415
+        create_flow_sensor,
+        create_flow_sensor_pool,
+    )
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    record = str(tmp_path / "flows.jsonl")
+    settings = {
+        "flow_sensor_cages": {"/dev/ttyACM0": [1, 2], "1234567": [16, 17]},
+        "flow_record_path": record,
+    }
+    pool = create_flow_sensor_pool(settings, ports={"1234567": "/dev/ttyACM1"})
+    assert pool.names == ["/dev/ttyACM0", "/dev/ttyACM1"]
+    assert pool.name_for(17) == "/dev/ttyACM1"
+    assert pool.sensor("/dev/ttyACM1").record_path == str(tmp_path / "flows.ttyACM1.jsonl")
+
+    with pytest.raises(ValueError, match="not connected"):
+        create_flow_sensor_pool(settings, ports={})
+    with pytest.raises(ValueError, match="more than one"):
+        create_flow_sensor_pool(
+            {"flow_sensor_cages": {"/dev/ttyACM0": [1, 2], "/dev/ttyACM1": [2]}}, ports={}
+        )
+
+    assert isinstance(create_flow_sensor({"uart_port": "/dev/ttyACM0"}), UARTFlowSensor)
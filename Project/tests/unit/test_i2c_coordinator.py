@@ -0,0 +1,128 @@
+"""I2C bus arbitration (drivers/i2c_coordinator.py).
+
+The coordinator polled every 1 ms for up to 500 ms to get the bus and then
+slept a 10 ms stabilization delay on every release, so each valve toggle
+paid at least 10 ms of dead time; one global instance served every bus.
+It now keeps one arbiter per bus, queues waiters in FIFO order on a
+condition (coroutines on a future) and only inserts the stabilization gap
+when the device type changes. These tests pin the gap rule, the fairness
+and timeout behaviour, the coroutine hand-off and the wait/hold stats.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from drivers.i2c_coordinator import I2CCoordinator, get_i2c_coordinator
+
+
+def _hold_in_thread(coordinator, device_type="relay"):
+    """Hold the bus from another thread until the returned event is set."""
+    held, done = threading.Event(), threading.Event()
+
+    def run():
+        coordinator.sync_exclusive_access(device_type, lambda: (held.set(), done.wait(5.0)))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert held.wait(1.0)
+    return done, thread
+
+
+def _wait_queued(coordinator, n):
+    deadline = time.monotonic() + 1.0
+    while len(coordinator._queue) < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert len(coordinator._queue) == n
+
+
+def test_same_device_pays_no_stabilization_gap_but_a_device_change_does():
+    coordinator = I2CCoordinator()
+    start = time.monotonic()
+    for _ in range(20):
+        coordinator.sync_exclusive_access("relay", lambda: None)
+    assert time.monotonic() - start < 0.05  # was >= 20 x 10 ms
+
+    start = time.monotonic()
+    coordinator.sync_exclusive_access("flow_sensor", lambda: None)
+    assert time.monotonic() - start >= 0.009  # relay's 10 ms gap
+    start = time.monotonic()
+    coordinator.sync_exclusive_access("relay", lambda: None)
+    assert time.monotonic() - start < 0.009  # flow_sensor defines no gap
+
+    stats = coordinator.stats()
+    assert stats["relay"]["acquisitions"] == 21
+    assert stats["flow_sensor"]["wait_ms"]["max"] >= 9.0
+    assert stats["relay"]["hold_ms"]["p50"] is not None
+
+
+def test_waiters_are_served_in_arrival_order_and_the_holder_reenters():
+    coordinator = I2CCoordinator()
+    order = []
+    done, holder = _hold_in_thread(coordinator)
+    waiters = []
+    for i in range(4):
+        thread = threading.Thread(
+            target=coordinator.sync_exclusive_access,
+            args=("relay", order.append, i),
+            daemon=True,
+        )
+        thread.start()
+        _wait_queued(coordinator, i + 1)
+        waiters.append(thread)
+    done.set()
+    for thread in [holder, *waiters]:
+        thread.join(2.0)
+    assert order == [0, 1, 2, 3]
+    assert coordinator.stats()["relay"]["contended"] == 4
+
+    # Nested access from the holding thread does not deadlock
+    nested = coordinator.sync_exclusive_access(
+        "relay", coordinator.sync_exclusive_access, "relay", lambda: "ok"
+    )
+    assert nested == "ok" and coordinator._owner is None
+
+
+def test_timeout_leaves_the_queue_clean():
+    coordinator = I2CCoordinator()
+    done, holder = _hold_in_thread(coordinator)
+    try:
+        with pytest.raises(TimeoutError):
+            coordinator.acquire("relay", timeout=0.05)
+        assert not coordinator._queue
+        assert coordinator.stats()["relay"]["timeouts"] == 1
+    finally:
+        done.set()
+        holder.join(2.0)
+    coordinator.sync_exclusive_access("relay", lambda: None)
+
+
+def test_coroutine_is_handed_the_bus_on_release():
+    coordinator = I2CCoordinator()
+    done, holder = _hold_in_thread(coordinator)
+
+    async def use_bus():
+        async with coordinator.exclusive_access("relay", "test"):
+            return coordinator._owner == threading.get_ident()
+
+    loop = asyncio.new_event_loop()
+    try:
+        task = loop.create_task(use_bus())
+        loop.run_until_complete(asyncio.sleep(0.02))
+        assert not task.done() and len(coordinator._queue) == 1
+        done.set()
+        assert loop.run_until_complete(task) is True
+    finally:
+        loop.close()
+        holder.join(2.0)
+    assert coordinator._owner is None
+
+
+def test_each_bus_has_its_own_arbiter():
+    assert get_i2c_coordinator() is get_i2c_coordinator(1)
+    other = get_i2c_coordinator(0)
+    assert other is not get_i2c_coordinator(1) and other.bus == 0
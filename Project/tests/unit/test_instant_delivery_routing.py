@@ -10,11 +10,15 @@ is also window-optional so the one-shot instant volume is used directly.
 
 We exercise the real ``RelayWorker._handle_delivery`` by calling it with a
 lightweight stand-in ``self`` (a SimpleNamespace) — no QObject construction, so
-only a real ``QMutex`` is needed. Skips cleanly without PyQt5.
+only a real ``QMutex`` is needed. Strategy deliveries run on a real
+``DeliveryLoop``; the queued ``_delivery_finished`` signal is a mock that hands
+its arguments back to the test. Skips cleanly without PyQt5.
 """
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import os
 import threading
 from datetime import datetime
@@ -28,43 +32,71 @@ pytest.importorskip("PyQt5")
 os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
 
-@pytest.fixture(autouse=True)
-def _restore_event_loop():
-    """_handle_delivery's solenoid branch calls asyncio.set_event_loop(None)
-    (correct in the worker thread). Running it on the test's MainThread leaves
-    no current loop, which would break later tests that use
-    asyncio.get_event_loop(). Restore one after each test."""
-    import asyncio
+@pytest.fixture()
+def make_self():
+    created = []
 
-    yield
-    try:
-        asyncio.get_event_loop()
-    except RuntimeError:
-        asyncio.set_event_loop(asyncio.new_event_loop())
+    def _make(hardware_mode, *, animal_windows=None):
+        ns = _self(hardware_mode, animal_windows=animal_windows)
+        created.append(ns)
+        return ns
+
+    yield _make
+    for ns in created:
+        if ns.delivery_loop is not None:
+            ns.delivery_loop.close()
 
 
 def _self(hardware_mode, *, animal_windows=None):
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
     from PyQt5.QtCore import QMutex  # noqa: PLC0415
 
+    finished = []
     ns = SimpleNamespace(
         _cancel_requested=threading.Event(),
         schedule_id=42,
+        mode="instant",
         delivered_volumes={},
         failed_deliveries={},
+        _completed_instants=set(),
+        _in_flight={},
+        delivery_loop=None,
         mutex=QMutex(),
         hardware_mode=hardware_mode,
         strategy=MagicMock(deliver=AsyncMock(return_value=True)),
         trigger_relay=MagicMock(return_value=True),
         database_handler=MagicMock(),
+        _record_delivery=MagicMock(),
+        _save_checkpoint=MagicMock(),
         progress=MagicMock(),
         volume_updated=MagicMock(),
         schedule_retry=MagicMock(),
+        check_completion=MagicMock(),
+        finished_results=finished,
+        _delivery_finished=MagicMock(emit=MagicMock(side_effect=lambda *a: finished.append(a))),
     )
+    for name in ("_prepare_delivery", "_submit_delivery", "_on_delivery_done", "_finish_delivery"):
+        setattr(ns, name, getattr(RelayWorker, name).__get__(ns))
     if animal_windows is not None:
         ns.animal_windows = animal_windows
     return ns
 
 
+def _deliver_back(me, future):
+    """Wait for the loop thread's signal, then run the worker-thread slot."""
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+
+    concurrent.futures.wait([future], timeout=5)
+    for _ in range(500):
+        if me.finished_results:
+            break
+        threading.Event().wait(0.01)
+    [(done_future, success)] = me.finished_results
+    assert done_future is future
+    RelayWorker._on_delivery_finished(me, done_future, success)
+    return success
+
+
 def _delivery(vol=0.5):
     return {
         "schedule_id": 42,
@@ -76,34 +108,92 @@ def _delivery(vol=0.5):
     }
 
 
-def test_instant_solenoid_routes_to_strategy():
+def test_instant_solenoid_routes_to_strategy(make_self):
     from gpio.relay_worker import RelayWorker  # noqa: PLC0415
 
-    me = _self("solenoid")  # no animal_windows -> instant (window-optional)
-    assert RelayWorker._handle_delivery(me, _delivery(0.5)) is True
+    me = make_self("solenoid")  # no animal_windows -> instant (window-optional)
+    future = RelayWorker._handle_delivery(me, _delivery(0.5))
+    assert me._in_flight  # counted until the result comes back
+    assert _deliver_back(me, future) is True
 
     me.strategy.deliver.assert_awaited_once()
     kwargs = me.strategy.deliver.await_args.kwargs
     assert kwargs["relay_unit_id"] == 1
     assert kwargs["target_volume_ml"] == 0.5
     me.trigger_relay.assert_not_called()
+    assert me.delivered_volumes == {1: 0.5}
+    assert me._in_flight == {}
+    me.check_completion.assert_called_once()
 
 
-def test_instant_pump_uses_trigger_relay():
+def test_instant_pump_uses_trigger_relay(make_self):
     from gpio.relay_worker import RelayWorker  # noqa: PLC0415
 
-    me = _self("pump")  # no animal_windows
+    me = make_self("pump")  # no animal_windows
     assert RelayWorker._handle_delivery(me, _delivery(0.5)) is True
 
     me.trigger_relay.assert_called_once_with(1, 0.5)
     me.strategy.deliver.assert_not_called()
+    assert me.delivery_loop is None
+    assert me.delivered_volumes == {1: 0.5}
 
 
-def test_staggered_window_guard_still_holds():
+def test_staggered_window_guard_still_holds(make_self):
     """Window-optional refactor must not weaken the staggered over-delivery guard."""
     from gpio.relay_worker import RelayWorker  # noqa: PLC0415
 
-    me = _self("solenoid", animal_windows={1: {"target_volume": 0.5}})
+    me = make_self("solenoid", animal_windows={1: {"target_volume": 0.5}})
     me.delivered_volumes = {1: 0.5}  # already at target
     assert RelayWorker._handle_delivery(me, _delivery(0.5)) is True
     me.strategy.deliver.assert_not_called()  # guard short-circuits, no delivery
+
+
+def test_guard_counts_deliveries_still_in_flight(make_self):
+    """A delivery still running on the loop thread counts towards the target."""
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+
+    release = threading.Event()
+
+    async def slow_deliver(**_kwargs):
+        while not release.is_set():
+            await asyncio.sleep(0.005)
+        return True
+
+    me = make_self("solenoid", animal_windows={1: {"target_volume": 0.5}})
+    me.strategy.deliver = AsyncMock(side_effect=slow_deliver)
+    first = RelayWorker._handle_delivery(me, _delivery(0.5))
+    assert RelayWorker._handle_delivery(me, _delivery(0.5)) is True  # guarded
+    release.set()
+    assert _deliver_back(me, first) is True
+    me.strategy.deliver.assert_awaited_once()
+    assert me.delivered_volumes == {1: 0.5}
+
+
+def test_failed_strategy_delivery_schedules_retry(make_self):
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+
+    me = make_self("solenoid")
+    me.strategy.deliver = AsyncMock(side_effect=RuntimeError("sensor gone"))
+    future = RelayWorker._handle_delivery(me, _delivery(0.5))
+    assert _deliver_back(me, future) is False
+    assert me.failed_deliveries == {1: 1}
+    me.schedule_retry.assert_called_once()
+
+
+def test_parallel_batch_records_each_cage(make_self):
+    """A parallel strategy session reports {cage: success}; each animal is recorded."""
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+
+    me = make_self("solenoid", animal_windows={1: {"target_volume": 0.5}})
+    me.mode = "staggered"
+    me.strategy.deliver_many = AsyncMock(return_value={1: True, 2: False})
+    second = dict(_delivery(0.25), animal_id=2, relay_unit_id=2)
+    future = RelayWorker._handle_delivery_batch(me, [_delivery(0.5), second])
+    assert _deliver_back(me, future) == {1: True, 2: False}
+
+    me.strategy.deliver_many.assert_awaited_once_with({1: 0.5, 2: 0.25})
+    me.strategy.deliver.assert_not_called()
+    assert me.delivered_volumes == {1: 0.5}
+    assert me.failed_deliveries == {1: 0, 2: 1}
+    me.schedule_retry.assert_called_once()
+    me.check_completion.assert_not_called()
@@ -0,0 +1,125 @@
+"""ManifoldSession: prime the master valve once for back-to-back deliveries.
+
+Every pulse-mode delivery used to prime the manifold (open master,
+``prime_ms``, close, 50 ms), reopen the master, wait 300 ms and close it
+again — even when the next cage was 100 ms away. ``deliver_many`` now runs a
+cycle's cages inside one ``ManifoldSession``. These tests pin the saved
+master cycles, that a cancelled delivery still closes the master and ends the
+session, that a long session is closed and re-primed, and that
+sensor-backed continuous deliveries (which prime for themselves) get no
+session at all.
+
+Qt-free and hardware-free: the strategy takes injected mock collaborators.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+from strategies.solenoid_flow_strategy import SolenoidFlowStrategy
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _make(**settings):
+    valves = MagicMock()
+    strat = SolenoidFlowStrategy(
+        valves,
+        None,
+        None,
+        {
+            "use_pulse_delivery": True,
+            "pulse_settling_ms": 0,
+            "parallel_delivery": False,  # one cage at a time
+            **settings,
+        },
+        prime_ms=0,
+    )
+
+    async def calibration(cage_id):
+        return (20, 0.025)
+
+    strat._get_cage_calibration = calibration
+    return strat, valves
+
+
+def _master_calls(valves):
+    return [c[0] for c in valves.mock_calls if c[0] in ("open_master", "close_master")]
+
+
+def test_cages_share_one_primed_master():
+    strat, valves = _make()
+    results = _run(strat.deliver_many({1: 0.025, 2: 0.025, 3: 0.025}))
+
+    assert results == {1: True, 2: True, 3: True}
+    # Prime once, open once, close once — not twice per cage.
+    assert _master_calls(valves) == ["open_master", "close_master", "open_master", "close_master"]
+    assert valves.mock_calls[-1][0] == "close_master"
+    assert strat._session is None
+
+
+def test_without_session_each_delivery_primes():
+    strat, valves = _make()
+    assert _run(strat.deliver(1, 0.025)) is True
+    assert _master_calls(valves) == ["open_master", "close_master"] * 2
+
+
+def test_cancel_closes_master_and_ends_session():
+    strat, valves = _make()
+
+    def open_cage(cage_id):
+        if cage_id == 2:
+            strat.request_cancel()
+
+    valves.open_cage.side_effect = open_cage
+    results = _run(strat.deliver_many({1: 0.025, 2: 0.05, 3: 0.025}))
+
+    assert results == {1: True, 2: False, 3: False}
+    valves.close_cage.assert_any_call(2)
+    calls = [c[0] for c in valves.mock_calls]
+    # The master closes right after cage 2, and nothing reopens it.
+    assert calls[calls.index("open_cage", calls.index("close_cage")) :].count("open_master") == 0
+    assert calls[-1] == "close_master"
+
+
+def test_long_session_is_reprimed():
+    strat, valves = _make()
+
+    async def two_deliveries():
+        async with strat.manifold_session(max_open_s=0) as session:
+            assert await strat.deliver(1, 0.025)
+            assert await strat.deliver(2, 0.025)
+            return session
+
+    session = _run(two_deliveries())
+    # Initial prime + open, then close and re-prime + open before each delivery.
+    assert valves.open_master.call_count == 6
+    assert not session.active
+    assert valves.mock_calls[-1][0] == "close_master"
+
+
+def test_sensor_backed_continuous_mode_opens_no_session():
+    valves = MagicMock()
+    strat = SolenoidFlowStrategy(
+        valves, MagicMock(), None, {"use_pulse_delivery": False}, prime_ms=0
+    )
+    sessions = []
+
+    async def continuous(cage_id, volume):
+        # The real path ends any session and primes for itself.
+        sessions.append(strat._session)
+        return True
+
+    strat._deliver_continuous_mode = continuous
+    results = _run(strat.deliver_many({1: 0.025, 2: 0.025}))
+
+    assert results == {1: True, 2: True}
+    assert sessions == [None, None]
+    assert _master_calls(valves) == []
@@ -0,0 +1,132 @@
+"""Parallel multi-cage pulse delivery (SolenoidFlowStrategy.deliver_many).
+
+Pulse mode used to deliver to one cage at a time and ``schedule_deliveries``
+staggered the animals serially, so a 16-cage rig spent most of each cycle
+waiting. Without a flow sensor (or with ``independent_cage_lines``) the cages
+are now pulsed together on one shared timeline under a single master-open
+session, each against its own calibrated pulse budget. These tests pin the
+budget, the shared timeline, the fallback to per-cage ``deliver`` when a shared
+flow sensor is in use, that valves are closed on cancel, and that cages which
+finished before a cancel still report success (so they are not delivered again).
+
+Qt-free and hardware-free: the strategy takes injected mock collaborators.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from strategies.solenoid_flow_strategy import SolenoidFlowStrategy
+
+CALIBRATION = {1: (20, 0.025), 2: (20, 0.05), 3: (50, 0.1)}
+
+
+def _run(coro):
+    # A private loop: asyncio.run() would leave no current loop for later tests.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _make(sensor=None, **settings):
+    valves = MagicMock()
+    strat = SolenoidFlowStrategy(
+        valves,
+        sensor,
+        None,
+        {"use_pulse_delivery": True, "pulse_settling_ms": 0, **settings},
+        prime_ms=0,
+    )
+
+    async def calibration(cage_id):
+        return CALIBRATION[cage_id]
+
+    strat._get_cage_calibration = calibration
+    return strat, valves
+
+
+def test_pulse_budget_matches_sequential_stop_rule():
+    # The sequential loop stops once the remainder is within 10% of a pulse.
+    assert SolenoidFlowStrategy._pulse_budget(0.1, 0.025) == 4
+    assert SolenoidFlowStrategy._pulse_budget(0.1024, 0.025) == 4
+    assert SolenoidFlowStrategy._pulse_budget(0.11, 0.025) == 5
+    assert SolenoidFlowStrategy._pulse_budget(0.001, 0.025) == 1
+
+
+def test_cages_share_one_timeline_and_master_session():
+    strat, valves = _make()
+    assert strat.supports_parallel
+
+    results = _run(strat.deliver_many({1: 0.1, 2: 0.1, 3: 0.1}))
+
+    assert results == {1: True, 2: True, 3: True}
+    opened = [sorted(call.args[0]) for call in valves.open_cages.call_args_list]
+    # Budgets 4, 2 and 1: every tick opens every cage with pulses left.
+    assert opened == [[1, 2, 3], [1, 2], [1], [1]]
+    # 20 ms cages close together, before the 50 ms cage.
+    closes = [sorted(call.args[0]) for call in valves.close_cages.call_args_list]
+    assert closes[:2] == [[1, 2], [3]]
+    # Prime, then one master-open session for the whole batch.
+    assert valves.open_master.call_count == 2
+    valves.open_cage.assert_not_called()
+
+
+def test_over_budget_cage_fails_alone():
+    strat, valves = _make(max_pulses_per_delivery=3)
+    results = _run(strat.deliver_many({1: 0.1, 2: 0.1}))
+    assert results == {1: False, 2: True}
+    assert all(1 not in call.args[0] for call in valves.open_cages.call_args_list)
+
+
+def test_shared_flow_sensor_falls_back_to_one_cage_at_a_time():
+    strat, valves = _make(sensor=MagicMock())
+    assert not strat.supports_parallel
+    strat.deliver = AsyncMock(side_effect=[True, False])
+
+    assert _run(strat.deliver_many({1: 0.1, 2: 0.2})) == {1: True, 2: False}
+    assert [call.args for call in strat.deliver.await_args_list] == [(1, 0.1), (2, 0.2)]
+    valves.open_cages.assert_not_called()
+
+    strat, _ = _make(sensor=MagicMock(), independent_cage_lines=True)
+    assert strat.supports_parallel
+    strat, _ = _make(parallel_delivery=False)
+    assert not strat.supports_parallel
+
+
+def test_cancel_mid_session_closes_every_valve():
+    strat, valves = _make()
+    valves.open_cages.side_effect = lambda cages: strat.request_cancel()
+
+    results = _run(strat.deliver_many({1: 0.1, 2: 0.1}))
+
+    assert results == {1: False, 2: False}
+    assert valves.open_cages.call_count == 1
+    assert sorted(valves.close_cages.call_args_list[-1].args[0]) == [1, 2]
+    valves.close_master.assert_called()
+
+
+def test_cages_finished_before_a_cancel_report_success():
+    strat, valves = _make()
+    ticks = []
+
+    def open_cages(cages):
+        ticks.append(sorted(cages))
+        if len(ticks) == 3:  # cages 2 and 3 used up their budgets on ticks 1-2
+            strat.request_cancel()
+
+    valves.open_cages.side_effect = open_cages
+    results = _run(strat.deliver_many({1: 0.1, 2: 0.1, 3: 0.1}))
+
+    assert ticks == [[1, 2, 3], [1, 2], [1]]
+    # Only cage 1 was cut short; the others must not be retried (and overfed)
+    assert results == {1: False, 2: True, 3: True}
+    valves.close_master.assert_called()
+
+
+def test_timeout_before_the_first_tick_fails_every_cage():
+    strat, valves = _make(max_pulse_delivery_time_s=0.0)
+    assert _run(strat.deliver_many({1: 0.1})) == {1: False}
+    valves.open_cages.assert_not_called()
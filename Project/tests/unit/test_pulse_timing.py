@@ -0,0 +1,229 @@
+"""Precision valve pulses (gpio/pulse_timing.py).
+
+Pulse mode held a valve open with ``asyncio.sleep(pulse_s)`` and the
+calibrator closed it from a 10 ms polling loop, so a 20 ms pulse could run
+several milliseconds long (or, in the calibrator, miss its close window and
+stay open until cleanup). Pulses now run on the relay I/O thread, sleeping
+and then spinning to the close deadline, and report the open time achieved.
+These tests pin the pulse width, that the close always runs, the opt-in
+realtime scheduling, and that blind deliveries credit the achieved width.
+
+Hardware-free: the valves are a recording fake.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from gpio import pulse_timing
+from gpio.pulse_timing import PulseResult, enable_realtime, precise_pulse, precise_pulses
+from gpio.relay_io import RelayIOThread
+
+
+def _run(coro):
+    # A private loop: asyncio.run() would leave no current loop for later tests.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class _Valves:
+    """Records (method, args, time.monotonic()) and takes ``write_s`` per call."""
+
+    def __init__(self, write_s=0.0):
+        self.write_s = write_s
+        self.calls = []
+        self.threads = set()
+
+    def __getattr__(self, method):
+        def call(*args):
+            time.sleep(self.write_s)
+            self.calls.append((method, args, time.monotonic()))
+            self.threads.add(threading.current_thread())
+            return True
+
+        return call
+
+
+def test_pulse_holds_the_requested_width():
+    valves = _Valves(write_s=0.002)
+    results = [
+        precise_pulse(lambda: valves.open_cage(1), lambda: valves.close_cage(1), 0.02)
+        for _ in range(5)
+    ]
+    for result in results:
+        assert result.started_at < result.opened_at < result.closed_at
+    # The close write starts early by the open write's duration. The median
+    # rides out a host hiccup (CI VMs can stall a thread for ~10 ms).
+    errors = sorted(abs(result.error_s) for result in results)
+    assert errors[len(errors) // 2] < 0.002
+    (_o, _a, opened), (_c, _b, closed) = valves.calls[:2]
+    assert closed - opened == pytest.approx(results[0].achieved_s, abs=0.001)
+
+
+def test_grouped_closes_run_in_width_order_and_all_run():
+    valves = _Valves(write_s=0.001)
+
+    def failing_close():
+        valves.close_cage(2)
+        raise OSError("I2C write failed")
+
+    with pytest.raises(OSError):
+        precise_pulses(
+            lambda: valves.open_cages([1, 2, 3]),
+            [(0.03, lambda: valves.close_cage(3)), (0.01, failing_close)],
+        )
+    assert [call[:2] for call in valves.calls] == [
+        ("open_cages", ([1, 2, 3],)),
+        ("close_cage", (2,)),
+        ("close_cage", (3,)),
+    ]
+
+    valves.calls.clear()
+    results = precise_pulses(
+        lambda: valves.open_cages([1, 3]),
+        [(0.03, lambda: valves.close_cage(3)), (0.01, lambda: valves.close_cage(1))],
+    )
+    assert [round(r.requested_s, 2) for r in results] == [0.03, 0.01]
+    assert results[1].closed_at < results[0].closed_at
+    assert results[0].achieved_s >= 0.03 - 0.002
+
+
+def test_close_runs_even_if_the_wait_is_interrupted(monkeypatch):
+    valves = _Valves()
+
+    def interrupted(deadline_ns, spin_s):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(pulse_timing, "sleep_until_ns", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        precise_pulse(lambda: valves.open_cage(1), lambda: valves.close_cage(1), 0.02)
+    assert [name for name, *_ in valves.calls] == ["open_cage", "close_cage"]
+
+
+def test_realtime_failures_are_logged_not_raised(monkeypatch, caplog):
+    def denied(*args):
+        raise PermissionError("Operation not permitted")
+
+    monkeypatch.setattr(os, "sched_setscheduler", denied, raising=False)
+    with caplog.at_level(logging.WARNING, logger=pulse_timing.__name__):
+        assert enable_realtime(priority=50) is False
+    assert "SCHED_FIFO" in caplog.text
+    assert enable_realtime() is True  # nothing requested, nothing changed
+
+    applied = []
+    monkeypatch.setattr(
+        "gpio.relay_io.enable_realtime",
+        lambda priority, cpus: applied.append((priority, cpus, threading.current_thread())),
+    )
+    relay_io = RelayIOThread(name="RelayIO-rt", realtime_priority=50, cpus=[0])
+    relay_io.call(time.sleep, 0, timeout=2)
+    relay_io.close()
+    assert applied == [(50, [0], relay_io.thread)]
+
+
+def _strategy(valves, relay_io):
+    from strategies.solenoid_flow_strategy import SolenoidFlowStrategy  # noqa: PLC0415
+
+    strat = SolenoidFlowStrategy(
+        valves,
+        None,
+        None,
+        {"use_pulse_delivery": True, "pulse_settling_ms": 0},
+        prime_ms=0,
+        relay_io=relay_io,
+    )
+    strat._empirical_pulse_volumes = {10: 0.02, 20: 0.03, 50: 0.025}
+
+    async def calibration(cage_id):
+        return (20, 0.05)
+
+    strat._get_cage_calibration = calibration
+    return strat
+
+
+def test_blind_volume_is_scaled_to_the_achieved_width():
+    strat = _strategy(_Valves(), None)
+
+    def pulse(achieved_ms):
+        return PulseResult(0.02, achieved_ms / 1000.0, 0.0, 0.0, 0.0)
+
+    assert strat._width_corrected_volume(0.05, pulse(20)) == pytest.approx(0.05)
+    assert strat._width_corrected_volume(0.05, pulse(15)) == pytest.approx(0.05 * 0.025 / 0.03)
+    # 20 -> 50 ms measured less; a longer open time never credits less
+    assert strat._width_corrected_volume(0.05, pulse(30)) == pytest.approx(0.05)
+    strat._empirical_pulse_volumes = {20: 0.03}
+    assert strat._width_corrected_volume(0.05, pulse(15)) == pytest.approx(0.05)
+
+
+def test_strategy_pulses_on_the_relay_io_thread():
+    valves = _Valves(write_s=0.001)
+    relay_io = RelayIOThread(name="RelayIO-pulse")
+    try:
+        strat = _strategy(valves, relay_io)
+        volume = _run(strat._execute_single_pulse(1))
+    finally:
+        relay_io.close()
+    (_o, _a, opened), (_c, _b, closed) = valves.calls
+    assert [name for name, *_ in valves.calls] == ["open_cage", "close_cage"]
+    # Credited for the width the valves actually saw
+    achieved = PulseResult(0.02, closed - opened, 0.0, 0.0, 0.0)
+    assert volume == pytest.approx(strat._width_corrected_volume(0.05, achieved), rel=0.01)
+
+
+def test_short_parallel_pulses_earn_a_top_up_pulse():
+    from strategies.solenoid_flow_strategy import _PulseBudget  # noqa: PLC0415
+
+    strat = _strategy(_Valves(), None)
+    budget = _PulseBudget(20, 0.05, remaining_ml=0.1, pulses_left=2)
+    short = PulseResult(0.02, 0.015, 0.0, 0.0, 0.0)
+    strat._credit_pulse(budget, short, max_pulses=10)
+    strat._credit_pulse(budget, short, max_pulses=10)
+    assert budget.delivered_ml == pytest.approx(2 * 0.05 * 0.025 / 0.03)
+    assert budget.pulses_left == 1  # 2 x 15 ms fell short of 0.1 mL
+    strat._credit_pulse(budget, PulseResult(0.02, 0.02, 0.0, 0.0, 0.0), max_pulses=10)
+    assert budget.pulses_left == 0 and budget.pulses == 3
+
+
+def test_parallel_ticks_run_on_the_relay_io_thread():
+    valves = _Valves()
+    relay_io = RelayIOThread(name="RelayIO-parallel")
+    try:
+        strat = _strategy(valves, relay_io)
+        # One calibrated width: no correction, so no top-up pulses
+        strat._empirical_pulse_volumes = {20: 0.03}
+        assert _run(strat.deliver_many({1: 0.1, 2: 0.05})) == {1: True, 2: True}
+    finally:
+        relay_io.close()
+    cage_calls = [(name, args, t) for name, args, t in valves.calls if "cages" in name]
+    assert [(name, args) for name, args, _t in cage_calls] == [
+        ("open_cages", ([1, 2],)),
+        ("close_cages", ([1, 2],)),
+        ("open_cages", ([1],)),
+        ("close_cages", ([1],)),
+        ("close_cages", ([1, 2],)),  # the session's final close
+    ]
+    assert valves.threads == {relay_io.thread}
+
+
+def test_sensor_fallbacks_credit_the_achieved_width():
+    strat = _strategy(_Valves(), None)
+    strat._sensor = object()
+    strat._sensor_available = True
+    strat._sample_ring = lambda: None
+    strat._drain_flow_samples = lambda: []  # the sensor saw nothing
+
+    async def short_pulse(cage_id, width_s):
+        return PulseResult(width_s, 0.015, 0.0, 0.0, 0.0)
+
+    strat._pulse = short_pulse
+    volume = _run(strat._execute_single_pulse(1))
+    assert volume == pytest.approx(0.05 * 0.025 / 0.03)
@@ -0,0 +1,153 @@
+"""Pump units triggered on one merged timeline (gpio/pump_timeline.py).
+
+``RelayHandler.trigger_relays`` ran each unit's triggers one after another
+with ``time.sleep(stagger)`` on and off, and ``RelayWorker.trigger_relay``
+held the worker mutex throughout, so sixteen pumps took sixteen times as
+long as one with the worker locked. The units' trigger trains are now
+merged into one timeline written with one ``apply_states`` per instant, on
+absolute monotonic deadlines. These tests pin the merged schedule and the
+minimum trigger interval, failure and cancel handling, the end-to-end
+timing on sixteen units, and that the worker mutex is free while pumping.
+
+Hardware-free: the SM16relind module is replaced by a recording fake.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from gpio.pump_timeline import build_timeline, run_timeline
+
+
+def _steps(steps):
+    return [(step.at_s, step.states, sorted(step.ends)) for step in steps]
+
+
+def test_trains_are_merged_and_respect_the_minimum_interval():
+    trains = {1: ((1, 2), 2), 2: ((3, 4), 3)}
+    assert _steps(build_timeline(trains, on_s=0.5, off_s=0.5)) == [
+        (0.0, {1: 1, 2: 1, 3: 1, 4: 1}, []),
+        (0.5, {1: 0, 2: 0, 3: 0, 4: 0}, [1, 2]),
+        (1.0, {1: 1, 2: 1, 3: 1, 4: 1}, []),
+        (1.5, {1: 0, 2: 0, 3: 0, 4: 0}, [1, 2]),
+        (2.0, {3: 1, 4: 1}, []),
+        (2.5, {3: 0, 4: 0}, [2]),
+    ]
+    steps = build_timeline(trains, on_s=0.5, off_s=0.5, min_interval_s={2: 1.5})
+    assert [step.at_s for step in steps if step.states.get(3) == 1] == [0.0, 1.5, 3.0]
+    with pytest.raises(ValueError):
+        build_timeline(trains, on_s=0.0, off_s=0.5)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_run_writes_each_step_on_its_deadline_and_records_failures():
+    clock = _Clock()
+    steps = build_timeline({1: ((1,), 2), 2: ((2,), 1)}, on_s=0.5, off_s=0.5)
+    writes = []
+
+    def apply_states(states):
+        writes.append((clock.now, dict(states)))
+        clock.now += 0.01  # each write takes 10 ms
+        return states != {1: 1}  # the second trigger of unit 1 fails
+
+    result = run_timeline(steps, apply_states, clock=clock.monotonic, sleep=clock.sleep)
+    # Deadlines are absolute: the write time does not push later edges back
+    assert [t for t, _states in writes] == [100.0, 100.5, 101.0, 101.5]
+    assert result.completed and result.triggers == {1: 2, 2: 1}
+    assert result.failed == {1}
+    assert result.max_late_s == pytest.approx(0.0)
+
+
+def test_cancel_switches_every_relay_off():
+    cancel = threading.Event()
+    steps = build_timeline({1: ((1,), 3), 2: ((2, 3), 3)}, on_s=0.02, off_s=0.02)
+    writes = []
+
+    def apply_states(states):
+        writes.append(dict(states))
+        if len(writes) == 2:
+            cancel.set()
+        return True
+
+    result = run_timeline(steps, apply_states, cancel=cancel)
+    assert not result.completed
+    assert result.triggers == {1: 1, 2: 1}
+    assert writes[-1] == {1: 0, 2: 0, 3: 0}
+
+
+class _FakeHat:
+    def __init__(self, stack):
+        self.writes = []
+
+    def set_all(self, mask):
+        self.writes.append(mask)
+
+
+@pytest.fixture()
+def handler(monkeypatch):
+    from gpio import gpio_handler  # noqa: PLC0415
+    from models.relay_unit import RelayUnit  # noqa: PLC0415
+
+    monkeypatch.setattr(gpio_handler, "SM16relind", SimpleNamespace(SM16relind=_FakeHat))
+    monkeypatch.setattr(gpio_handler, "USING_CUSTOM_MODULE", False)
+    units = [RelayUnit(unit_id=n, relay_ids=(n,)) for n in range(1, 17)]
+    handler = gpio_handler.RelayHandler(units, num_hats=1)
+    handler._coordinators = {}
+    handler.relay_hats[0].writes.clear()
+    return handler
+
+
+def test_sixteen_units_take_as_long_as_one(handler):
+    counts = {unit_id: 3 for unit_id in range(1, 17)}
+    counts[16] = 1
+    started = time.monotonic()
+    info = handler.trigger_relays(list(counts), {str(u): n for u, n in counts.items()}, 0.02)
+    elapsed = time.monotonic() - started
+    assert len(info) == 16
+    assert elapsed < 0.3  # one unit: 3 x 20 ms on with 20 ms gaps; serial: ~1.8 s
+    # One set_all per edge for all sixteen pumps together
+    assert handler.relay_hats[0].writes == [0xFFFF, 0, 0x7FFF, 0, 0x7FFF, 0]
+
+
+def test_worker_mutex_is_free_while_pumps_run():
+    pytest.importorskip("PyQt5")
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+    from PyQt5.QtCore import QMutex  # noqa: PLC0415
+
+    mutex = QMutex()
+    locked_during_run = []
+
+    def trigger_units(triggers, stagger, min_interval_s, cancel):
+        locked_during_run.append(not mutex.tryLock())
+        mutex.unlock()
+        assert min_interval_s == 0.5 and cancel is me._cancel_requested
+        return {unit_id: unit_id != 2 for unit_id in triggers}
+
+    me = SimpleNamespace(
+        mutex=mutex,
+        _is_running=True,
+        _cancel_requested=threading.Event(),
+        volume_calculator=MagicMock(calculate_triggers=lambda volume: int(volume * 10)),
+        relay_handler=MagicMock(trigger_units=trigger_units),
+        stagger_interval=0.5,
+        min_trigger_interval=500,
+        progress=MagicMock(),
+        notification_handler=None,
+    )
+    assert RelayWorker.trigger_pumps(me, {1: 0.2, "2": 0.3}) == {1: True, 2: False}
+    assert locked_during_run == [False]
@@ -0,0 +1,147 @@
+"""Relay I/O thread (gpio/relay_io.py).
+
+The strategies called ``SolenoidController`` synchronously from their
+coroutines, so the delivery loop stalled through every I2C write and
+coordinator wait right as a valve opened. Valve calls now go through a FIFO
+command queue on one daemon thread that the strategy awaits. These tests pin
+the ordering and actuation timestamps, that the loop keeps running during
+a slow write, and that a strategy given a RelayIOThread switches every
+valve on it, including the cleanup close after a cancel.
+
+Qt-free and hardware-free: the valves are a recording fake.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gpio.relay_io import RelayIOThread
+
+
+def _run(coro):
+    # A private loop: asyncio.run() would leave no current loop for later tests.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture()
+def relay_io():
+    relay_io = RelayIOThread(name="RelayIO-test")
+    yield relay_io
+    relay_io.close()
+
+
+class _Valves:
+    """Records (method, args, thread) and takes ``write_s`` per call."""
+
+    def __init__(self, write_s=0.0):
+        self.write_s = write_s
+        self.calls = []
+
+    def __getattr__(self, method):
+        def call(*args):
+            time.sleep(self.write_s)
+            self.calls.append((method, args, threading.current_thread()))
+            return True
+
+        return call
+
+
+def test_commands_run_in_order_with_actuation_times(relay_io):
+    done = []
+    futures = [relay_io.submit(done.append, n) for n in range(5)]
+    actuations = [future.result(timeout=2) for future in futures]
+    assert done == [0, 1, 2, 3, 4]
+    for actuation in actuations:
+        assert actuation.requested_at <= actuation.started_at <= actuation.actuated_at
+    assert [a.started_at for a in actuations] == sorted(a.started_at for a in actuations)
+
+    def fail():
+        raise OSError("I2C write failed")
+
+    with pytest.raises(OSError):
+        relay_io.call(fail, timeout=2)
+
+    queued = [relay_io.submit(time.sleep, 0.01) for _ in range(3)]
+    assert relay_io.close() is True
+    assert all(future.done() for future in queued)  # drained before stopping
+    with pytest.raises(RuntimeError):
+        relay_io.submit(done.append, 5)
+
+
+def test_loop_keeps_running_during_a_slow_write(relay_io):
+    valves = _Valves(write_s=0.05)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        before = ticks
+        actuation = await relay_io.run(valves.open_cage, 1)
+        task.cancel()
+        return ticks - before, actuation
+
+    ticked, actuation = _run(main())
+    assert ticked >= 3  # would be 0 had the write blocked the loop
+    assert actuation.result is True and actuation.write_s >= 0.04
+    assert valves.calls[0][2] is relay_io.thread
+
+
+def _strategy(valves, relay_io):
+    from strategies.solenoid_flow_strategy import SolenoidFlowStrategy  # noqa: PLC0415
+
+    strat = SolenoidFlowStrategy(
+        valves,
+        None,
+        None,
+        {"use_pulse_delivery": True, "pulse_settling_ms": 0},
+        prime_ms=0,
+        relay_io=relay_io,
+    )
+
+    async def calibration(cage_id):
+        return (20, 0.05)
+
+    strat._get_cage_calibration = calibration
+    return strat
+
+
+def test_strategy_switches_valves_on_the_relay_io_thread(relay_io):
+    valves = _Valves()
+    strat = _strategy(valves, relay_io)
+    assert _run(strat.deliver(1, 0.1)) is True
+
+    names = [name for name, _args, _thread in valves.calls]
+    assert names.count("open_cage") == 2 and names[-1] == "close_master"
+    assert {thread for *_rest, thread in valves.calls} == {relay_io.thread}
+
+
+def test_cleanup_close_is_queued_behind_a_cancelled_open(relay_io):
+    valves = _Valves(write_s=0.05)
+    strat = _strategy(valves, relay_io)
+
+    async def main():
+        task = asyncio.create_task(strat.deliver(1, 0.1))
+        while not any(name == "open_cage" for name, *_ in valves.calls):
+            await asyncio.sleep(0.001)
+        strat.request_cancel()
+        return await task
+
+    assert _run(main()) is False
+    names = [name for name, *_ in valves.calls]
+    assert names.index("close_cage", names.index("open_cage")) > names.index("open_cage")
+    assert names[-1] == "close_master"
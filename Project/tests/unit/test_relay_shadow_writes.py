@@ -0,0 +1,147 @@
+"""Shadow-register relay writes (RelayHandler.apply_states).
+
+``_set_relay_states`` wrote one relay at a time, each with ``hat.set()`` in
+its own I2C coordinator access and 10 ms stabilisation sleep, so closing
+all 16 cages cost ~16 bus transactions. RelayHandler now keeps the last
+written 16-bit state of each HAT and applies any number of changes with
+one ``set_all(mask)`` per HAT in one coordinator access. These tests pin
+the masks, the single transaction for multi-relay changes across two HATs,
+that a write takes only the coordinators of the buses it touches, that a
+failed write still records the requested state, and the shadow readback
+behind SolenoidController.all_closed().
+
+Hardware-free: the SM16relind module is replaced by a recording fake.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+
+class _FakeHat:
+    def __init__(self, stack):
+        self.stack = stack
+        self.writes = []
+        self.fail = False
+
+    def set(self, relay, state):
+        raise AssertionError("per-relay writes are coalesced into set_all")
+
+    def set_all(self, mask):
+        if self.fail:
+            raise OSError("I2C write failed")
+        self.writes.append(mask)
+
+
+class _CountingCoordinator:
+    def __init__(self):
+        self.accesses = 0
+
+    def sync_exclusive_access(self, device_type, operation, *args, **kwargs):
+        self.accesses += 1
+        return operation(*args, **kwargs)
+
+
+@pytest.fixture()
+def handler(monkeypatch):
+    from gpio import gpio_handler  # noqa: PLC0415
+
+    monkeypatch.setattr(gpio_handler, "SM16relind", SimpleNamespace(SM16relind=_FakeHat))
+    monkeypatch.setattr(gpio_handler, "USING_CUSTOM_MODULE", False)
+    handler = gpio_handler.RelayHandler([], num_hats=2)
+    assert set(handler._coordinators) == {gpio_handler.STANDARD_MODULE_BUS}
+    handler._coordinators = {1: _CountingCoordinator()}
+    for hat in handler.relay_hats:
+        assert hat.writes == [0]  # cleared at init
+        hat.writes.clear()
+    return handler
+
+
+def test_changes_are_coalesced_into_one_write_per_hat(handler):
+    hat0, hat1 = handler.relay_hats
+
+    assert handler.apply_states({1: 1, 3: 1, 16: 1, 17: 1, 32: 1}) is True
+    assert hat0.writes == [0b1000_0000_0000_0101]
+    assert hat1.writes == [0b1000_0000_0000_0001]
+    assert handler._coordinators[1].accesses == 1
+
+    # Other relays keep their state; untouched HATs are not written
+    assert handler.apply_states({3: 0, 2: 1}) is True
+    assert hat0.writes[-1] == 0b1000_0000_0000_0011
+    assert len(hat1.writes) == 1
+    assert [handler.relay_state(r) for r in (1, 2, 3, 16, 17, 33)] == [1, 1, 0, 1, 1, None]
+
+
+def test_close_all_cages_is_one_transaction(handler):
+    from drivers.solenoid_controller import SolenoidController  # noqa: PLC0415
+
+    cages = {cage: cage for cage in range(1, 16)}
+    valves = SolenoidController(handler, master_relay_id=16, cage_to_relay_id=cages)
+    valves.open_master()
+    valves.open_cages(list(cages))
+    assert handler.relay_hats[0].writes[-1] == 0xFFFF
+    assert not valves.all_closed()
+
+    handler._coordinators[1].accesses = 0
+    assert valves.close_all_cages() is True
+    assert handler._coordinators[1].accesses == 1
+    assert handler.relay_hats[0].writes[-1] == 0x8000  # master still open
+    valves.close_master()
+    assert valves.all_closed()
+
+
+def test_failed_write_still_records_the_requested_state(handler):
+    hat0 = handler.relay_hats[0]
+    handler.apply_states({1: 1, 2: 1})
+    hat0.fail = True
+    assert handler.set_relays([1], 0) is False
+    hat0.fail = False
+    # The next write carries relay 1's close instead of reopening it
+    assert handler.set_relays([5], 1) is True
+    assert hat0.writes[-1] == 0b1_0010
+
+    handler.set_all_relays(0)
+    assert hat0.writes[-1] == 0 and handler.relay_hats[1].writes[-1] == 0
+    assert handler.relay_state(2) == 0
+
+
+def test_writes_take_only_the_buses_they_touch(handler):
+    # HAT 0 on bus 1, HAT 1 on bus 3
+    handler._hat_buses = [1, 3]
+    handler._coordinators = {1: _CountingCoordinator(), 3: _CountingCoordinator()}
+
+    assert handler.apply_states({20: 1}) is True
+    assert [handler._coordinators[bus].accesses for bus in (1, 3)] == [0, 1]
+    assert handler.apply_states({1: 1, 20: 0}) is True
+    assert [handler._coordinators[bus].accesses for bus in (1, 3)] == [1, 2]
+    handler.set_all_relays(0)
+    assert [handler._coordinators[bus].accesses for bus in (1, 3)] == [2, 3]
+
+
+def test_a_busy_bus_does_not_hold_up_hats_on_another(handler):
+    from drivers.i2c_coordinator import I2CCoordinator  # noqa: PLC0415
+
+    handler._hat_buses = [1, 3]
+    handler._coordinators = {1: I2CCoordinator(1), 3: I2CCoordinator(3)}
+    held, release = threading.Event(), threading.Event()
+
+    def hold_bus_1():
+        handler._coordinators[1].acquire("flow_sensor")
+        held.set()
+        release.wait(5)
+        handler._coordinators[1].release()
+
+    holder = threading.Thread(target=hold_bus_1)
+    holder.start()
+    try:
+        assert held.wait(2)
+        started = time.monotonic()
+        assert handler.apply_states({20: 1}) is True
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+        holder.join()
@@ -0,0 +1,159 @@
+"""Batched schedule hydration (``DatabaseHandler.query_schedules``).
+
+``get_all_schedules`` / ``get_schedules_by_trainer`` used to issue one or two
+child-table queries *per schedule* (N+1), which made opening SchedulesHub take
+seconds with a few hundred historical schedules. Both now delegate to
+``query_schedules``, which loads every child row for the page in a constant
+number of statements. These tests pin the statement count, that the hydrated
+objects are unchanged (child rows in the per-schedule queries' order too), and
+the filter/paging arguments.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from models.Schedule import Schedule
+
+
+def _staggered(name, animals, created_by=1) -> Schedule:
+    sched = Schedule(
+        schedule_id=None,
+        name=name,
+        water_volume=sum(v for _, _, v in animals),
+        start_time="2026-06-05T09:00:00",
+        end_time="2026-06-05T17:00:00",
+        created_by=created_by,
+        is_super_user=0,
+        delivery_mode="staggered",
+    )
+    for animal_id, cage_id, volume in animals:
+        sched.add_animal(animal_id=animal_id, relay_unit_id=cage_id, desired_volume=volume)
+    return sched
+
+
+def _instant(name, deliveries, created_by=1) -> Schedule:
+    times = [d for *_, d in deliveries]
+    sched = Schedule(
+        schedule_id=None,
+        name=name,
+        water_volume=sum(v for _, _, v, _ in deliveries),
+        start_time=min(times).isoformat(),
+        end_time=max(times).isoformat(),
+        created_by=created_by,
+        is_super_user=0,
+        delivery_mode="instant",
+    )
+    for animal_id, cage, vol, when in deliveries:
+        sched.add_animal(animal_id, cage, vol)
+        sched.add_instant_delivery(animal_id, when.isoformat(), vol, cage)
+    return sched
+
+
+def _seed(database_handler, count=12):
+    base = datetime(2026, 6, 5, 9, 0, 0)
+    ids = []
+    for i in range(count):
+        if i % 2:
+            ids.append(
+                database_handler.add_schedule(
+                    _instant(
+                        f"inst-{i}",
+                        [(1, 1, 1.0, base), (2, 2, 2.0, base + timedelta(minutes=i))],
+                        created_by=1 + i % 3,
+                    )
+                )
+            )
+        else:
+            ids.append(
+                database_handler.add_staggered_schedule(
+                    _staggered(f"stag-{i}", [(3, 3, 1.5), (4, 4, 2.5)], created_by=1 + i % 3)
+                )
+            )
+    return ids
+
+
+def _count_selects(database_handler, fn):
+    statements = []
+    conn = database_handler.connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        result = fn()
+    finally:
+        conn.set_trace_callback(None)
+    return result, [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def test_statement_count_is_constant(database_handler):
+    _seed(database_handler, count=4)
+    _, few = _count_selects(database_handler, database_handler.get_all_schedules)
+    _seed(database_handler, count=20)
+    loaded, many = _count_selects(database_handler, database_handler.get_all_schedules)
+
+    assert len(loaded) == 24
+    assert len(few) == len(many) == 4  # schedules + 3 child tables
+
+
+def test_hydrated_children_match_each_mode(database_handler):
+    ids = _seed(database_handler, count=2)
+    by_id = {s.schedule_id: s for s in database_handler.get_all_schedules()}
+
+    staggered = by_id[ids[0]]
+    assert staggered.animals == [3, 4]
+    assert staggered.relay_unit_assignments == {"3": 3, "4": 4}
+    assert staggered.desired_water_outputs == {"3": 1.5, "4": 2.5}
+    assert staggered.instant_deliveries == []
+
+    instant = by_id[ids[1]]
+    assert instant.animals == [1, 2]
+    assert instant.relay_unit_assignments == {"1": 1, "2": 2}
+    assert [d["volume"] for d in instant.instant_deliveries] == [1.0, 2.0]
+    assert instant.desired_water_outputs == {}
+
+
+def test_child_rows_keep_the_per_schedule_order(database_handler):
+    base = datetime(2026, 6, 5, 9, 0, 0)
+    staggered_id = database_handler.add_staggered_schedule(
+        _staggered("stag", [(7, 7, 1.0), (3, 3, 1.5), (5, 5, 2.0)])
+    )
+    instant_id = database_handler.add_schedule(
+        _instant(
+            "inst",
+            [
+                (6, 6, 1.0, base + timedelta(minutes=5)),
+                (2, 2, 2.0, base),
+                (4, 4, 3.0, base + timedelta(minutes=1)),
+            ],
+        )
+    )
+    by_id = {s.schedule_id: s for s in database_handler.get_all_schedules()}
+
+    # schedule_animals / schedule_desired_outputs: primary-key (animal) order
+    staggered = by_id[staggered_id]
+    assert staggered.animals == [3, 5, 7]
+    assert list(staggered.relay_unit_assignments) == ["3", "5", "7"]
+    assert list(staggered.desired_water_outputs) == ["3", "5", "7"]
+
+    # schedule_instant_deliveries: insertion (delivery_id) order
+    instant = by_id[instant_id]
+    assert [d["volume"] for d in instant.instant_deliveries] == [1.0, 2.0, 3.0]
+    assert instant.animals == [6, 2, 4]
+
+
+def test_filters_and_paging(database_handler):
+    ids = _seed(database_handler, count=12)
+
+    assert [s.schedule_id for s in database_handler.get_schedules_by_trainer(2)] == [
+        sid for i, sid in enumerate(ids) if 1 + i % 3 == 2
+    ]
+    assert all(
+        s.delivery_mode == "instant"
+        for s in database_handler.query_schedules(delivery_mode="instant")
+    )
+    assert len(database_handler.query_schedules(delivery_mode="instant")) == 6
+    assert len(database_handler.query_schedules(status="pending")) == 12
+    assert database_handler.query_schedules(status="completed") == []
+
+    page = database_handler.query_schedules(limit=5, offset=5)
+    assert [s.schedule_id for s in page] == ids[5:10]
+    assert database_handler.query_schedules(trainer_id=999) == []
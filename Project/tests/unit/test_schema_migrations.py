@@ -0,0 +1,170 @@
+"""Versioned schema migrations (models/db/schema.py) + hot-path query plans.
+
+Pins three things:
+
+1. The ``schema_version`` bookkeeping: a fresh DB lands on the latest
+   version, reopening applies nothing, and a pre-framework device DB (the
+   old inline-ALTER era) is brought forward without data loss.
+2. A failing migration rolls back and leaves the recorded version unchanged.
+3. ``EXPLAIN QUERY PLAN`` regression: the statements the delivery/progress
+   paths actually execute must never full-scan a table. The statements are
+   captured live via ``set_trace_callback`` (bound values expanded), so a
+   query rewrite that loses its index fails here rather than on a Pi with a
+   year of ``dispensing_history``.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from models.db.schema import MIGRATIONS, Migration, apply_migrations, current_version
+from models.Schedule import Schedule
+
+LATEST = max(m.version for m in MIGRATIONS)
+
+
+def _index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_is_at_latest_version(database_handler):
+    conn = database_handler.connect()
+    assert current_version(conn) == LATEST
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version")]
+    assert versions == sorted(m.version for m in MIGRATIONS)
+    assert "idx_dispensing_history_schedule_animal" in _index_names(conn)
+
+
+def test_reopening_applies_nothing(database_handler):
+    assert apply_migrations(database_handler.connect()) == []
+
+
+def test_legacy_database_migrates_in_place(isolated_data_dir):
+    from models.database_handler import DatabaseHandler  # noqa: PLC0415
+
+    path = isolated_data_dir / "legacy.db"
+    legacy = sqlite3.connect(path)
+    legacy.executescript(
+        """
+        CREATE TABLE animals (
+            animal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lab_animal_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE dispensing_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            animal_id INTEGER NOT NULL,
+            relay_unit_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            volume_dispensed REAL NOT NULL,
+            status TEXT NOT NULL
+        );
+        INSERT INTO animals (lab_animal_id, name) VALUES ('A1', 'Mouse');
+        INSERT INTO dispensing_history
+            (schedule_id, animal_id, relay_unit_id, timestamp, volume_dispensed, status)
+            VALUES (1, 1, 1, '2026-01-01T00:00:00', 0.5, 'completed');
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    handler = DatabaseHandler(str(path))
+    try:
+        conn = handler.connect()
+        assert current_version(conn) == LATEST
+        assert "cycle_index" in {c[1] for c in conn.execute("PRAGMA table_info(dispensing_history)")}
+        assert "sex" in {c[1] for c in conn.execute("PRAGMA table_info(animals)")}
+        assert conn.execute("SELECT COUNT(*) FROM dispensing_history").fetchone()[0] == 1
+        assert conn.execute("SELECT name FROM animals").fetchone()[0] == "Mouse"
+    finally:
+        handler.close()
+
+
+def test_failing_migration_rolls_back(database_handler):
+    conn = database_handler.connect()
+
+    def _broken(cursor):
+        cursor.execute("CREATE TABLE half_done (x INTEGER)")
+        raise sqlite3.OperationalError("boom")
+
+    with pytest.raises(sqlite3.OperationalError):
+        apply_migrations(conn, list(MIGRATIONS) + [Migration(LATEST + 1, "broken", _broken)])
+
+    assert current_version(conn) == LATEST
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+# ---------------------------------------------------------------------------
+# EXPLAIN QUERY PLAN regression
+# ---------------------------------------------------------------------------
+
+
+def _seed_staggered(database_handler):
+    with database_handler.connect() as conn:
+        conn.execute("INSERT INTO animals (animal_id, lab_animal_id, name) VALUES (1, 'A1', 'M1')")
+    sched = Schedule(
+        schedule_id=None,
+        name="plan",
+        water_volume=1.0,
+        start_time="2026-06-05T09:00:00",
+        end_time="2026-06-05T17:00:00",
+        created_by=1,
+        is_super_user=0,
+        delivery_mode="staggered",
+    )
+    sched.add_animal(animal_id=1, relay_unit_id=1, desired_volume=1.0)
+    return database_handler.add_staggered_schedule(sched)
+
+
+def _hot_path_statements(database_handler):
+    sid = _seed_staggered(database_handler)
+    conn = database_handler.connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        database_handler.log_delivery(
+            {
+                "schedule_id": sid,
+                "animal_id": 1,
+                "relay_unit_id": 1,
+                "volume_delivered": 0.1,
+                "timestamp": "2026-06-05T10:00:00",
+                "status": "completed",
+            }
+        )
+        database_handler.get_schedule_progress(sid)
+        windows = database_handler.get_schedule_staggered_windows(sid)
+        database_handler.get_staggered_window_status(windows[0]["window_id"])
+        database_handler.get_active_staggered_windows()
+        database_handler.update_cycle_progress(sid, 1, 0, 0.1)
+        database_handler.get_schedule_instant_deliveries(sid)
+        database_handler.get_schedules_by_trainer(1)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        s
+        for s in statements
+        if s.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))
+        and "sqlite_master" not in s
+    ]
+
+
+def _full_scans(conn, sql):
+    scans = []
+    for _id, _parent, _notused, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        if detail.startswith("SCAN ") and "INDEX" not in detail and "VIRTUAL TABLE" not in detail:
+            scans.append(detail)
+    return scans
+
+
+def test_hot_queries_do_not_full_scan(database_handler):
+    statements = _hot_path_statements(database_handler)
+    assert len(statements) >= 8
+
+    conn = database_handler.connect()
+    offenders = {sql.strip(): _full_scans(conn, sql) for sql in statements}
+    offenders = {sql: scans for sql, scans in offenders.items() if scans}
+    assert offenders == {}
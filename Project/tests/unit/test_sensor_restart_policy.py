@@ -0,0 +1,193 @@
+"""Firmware-error-aware flow sensor restarts (utils/sensor_health.py).
+
+Pulse delivery restarted the sensor before every delivery and after every
+5 pulses, whatever the firmware's actual error count. The strategy now
+restarts only when ``RestartPolicy`` predicts the next pulse would run out
+the rig's I2C error budget, or the stream is already failing, and the budget
+is learned per rig. These tests pin the prediction, the learning and its
+persistence, a 20-pulse delivery that needs one restart instead of four,
+and the driver's firmware error tracking against the pty emulator.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.sensor_health import RestartPolicy, SensorHealth
+
+
+def _health(errors, seq, **kwargs):
+    fields = dict(frame_rate_hz=50.0, expected_rate_hz=50.0, last_frame_age_s=0.02)
+    fields.update(kwargs)
+    return SensorHealth(fw_errors=errors, status_seq=seq, **fields)
+
+
+def test_restart_is_predicted_from_the_reported_error_growth():
+    policy = RestartPolicy(budget=100, errors_per_pulse=15.0, smoothing=1.0)
+    assert policy.restart_reason(_health(0, 1)) is None
+    errors, reason = 0, None
+    while reason is None:
+        policy.pulse_done()
+        errors += 8
+        reason = policy.restart_reason(_health(errors, errors))
+    # 8 errors per pulse learned: 88 + 8 still fits the budget, 96 + 8 does not.
+    assert policy.errors_per_pulse == pytest.approx(8.0)
+    assert errors == 96
+    assert reason == "104 I2C errors predicted, budget 100"
+
+    # A pulse without a fresh report still counts toward the prediction.
+    policy = RestartPolicy(budget=100, errors_per_pulse=20.0)
+    assert policy.restart_reason(_health(45, 1)) is None
+    policy.pulse_done()
+    policy.pulse_done()
+    assert policy.restart_reason(_health(45, 1)) is not None  # 45 + 3 * 20
+
+
+@pytest.mark.parametrize(
+    "health, reason",
+    [
+        (_health(10, 1, fw_halted=True), "firmware stopped"),
+        (_health(10, 1, last_frame_age_s=2.5), "no frames for 2.5s"),
+        (_health(10, 1, frame_rate_hz=20.0), "frame rate 20 Hz of 50 Hz"),
+    ],
+)
+def test_failing_stream_restarts_regardless_of_budget(health, reason):
+    policy = RestartPolicy(budget=1000)
+    assert reason in policy.restart_reason(health)
+
+
+def test_budget_is_learned_per_rig_and_persisted(isolated_data_dir):
+    policy = RestartPolicy.load(grow_after=2, grow_step=10.0)
+    assert policy.budget == 150.0
+    assert policy.path == str(isolated_data_dir / "sensor_health.json")
+
+    # The stream failed at 120 errors: back off below that.
+    policy.restart_reason(_health(120, 1))
+    policy.restarted(_health(120, 1, fw_halted=True))
+    assert policy.budget == pytest.approx(96.0)
+    saved = json.loads((isolated_data_dir / "sensor_health.json").read_text())
+    assert saved["budget"] == 96.0 and saved["failures"] == 1
+
+    # Planned restarts that never hit a failure creep back up.
+    for seq in range(2, 6):
+        policy.restarted(_health(90, seq))
+    assert policy.budget == pytest.approx(116.0)
+
+    reloaded = RestartPolicy.load()
+    assert reloaded.budget == pytest.approx(116.0)
+    assert reloaded.errors_per_pulse == pytest.approx(policy.errors_per_pulse, abs=0.01)
+
+
+class _NoisySensor:
+    """Stand-in driver whose firmware gains ``errors_per_pulse`` per pulse."""
+
+    def __init__(self, errors_per_pulse):
+        self.errors_per_pulse = errors_per_pulse
+        self.starts = 0
+        self.fw_errors = 0
+        self.seq = 0
+
+    def health(self):
+        return _health(self.fw_errors, self.seq)
+
+    def request_health(self):
+        self.fw_errors += self.errors_per_pulse
+        self.seq += 1
+
+    def stop(self):
+        pass
+
+    def start(self):
+        self.starts += 1
+        self.fw_errors = 0
+        self.seq += 1
+
+    def clear_queue(self):
+        return 0
+
+    def ensure_streaming(self, min_frames, timeout_s):
+        return True
+
+
+def _deliver_pulses(sensor, pulses):
+    from drivers.replay_flow_sensor import VirtualClock  # noqa: PLC0415
+    from strategies.solenoid_flow_strategy import SolenoidFlowStrategy  # noqa: PLC0415
+
+    strat = SolenoidFlowStrategy(
+        MagicMock(), sensor, None, {"use_pulse_delivery": True}, prime_ms=0
+    )
+
+    async def calibration(cage_id):
+        return (20, 0.025)
+
+    async def pulse(cage_id):
+        return 0.025
+
+    strat._get_cage_calibration = calibration
+    strat._execute_single_pulse = pulse
+    # Virtual time: the 100 ms between pulses cost nothing here.
+    ok = VirtualClock().run(strat.deliver(relay_unit_id=1, target_volume_ml=0.025 * pulses))
+    return ok, strat
+
+
+def test_twenty_pulse_delivery_restarts_only_when_the_budget_runs_out(isolated_data_dir):
+    sensor = _NoisySensor(errors_per_pulse=10)
+    ok, strat = _deliver_pulses(sensor, 20)
+    assert ok is True
+    # Budget 150 at ~10 errors per pulse: one restart, not one per 5 pulses
+    # plus one before the delivery.
+    assert sensor.starts == 1
+    assert strat._restart_policy.restarts == 1
+
+    quiet = _NoisySensor(errors_per_pulse=1)
+    ok, _ = _deliver_pulses(quiet, 20)
+    assert ok is True and quiet.starts == 0
+
+
+def test_drivers_without_health_keep_the_fixed_cadence(isolated_data_dir):
+    sensor = MagicMock()
+    sensor.clear_queue.return_value = 0
+    sensor.ensure_streaming.return_value = True
+    ok, _ = _deliver_pulses(sensor, 12)
+    assert ok is True
+    assert sensor.start.call_count == 3  # before the delivery, after pulses 5 and 10
+
+
+def test_driver_tracks_firmware_error_counts():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+    from tools.teensy_emulator import TeensyEmulator  # noqa: PLC0415
+
+    def wait_for(predicate, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    with TeensyEmulator(flow_ml_min=0.5) as emulator:
+        sensor = UARTFlowSensor(port=emulator.port, sampling_hz=200.0)
+        sensor.start()
+        try:
+            emulator.inject_i2c_errors(30)
+            assert sensor.wait_for_frames(min_frames=20, timeout_s=2.0)
+            sensor.request_health()
+            assert wait_for(lambda: sensor.health().fw_errors == 30)
+            health = sensor.health()
+            assert not health.fw_halted and health.fw_consecutive_errors == 0
+            # The 150 ms dropout shows in the received rate until it ages out.
+            assert wait_for(lambda: sensor.health().frame_rate_hz > 150.0)
+
+            emulator.inject_i2c_errors(200)
+            assert wait_for(lambda: sensor.health().fw_halted)
+            assert RestartPolicy().failure(sensor.health())
+
+            sensor.stop()
+            sensor.start()
+            health = sensor.health()
+            assert not health.fw_halted and health.fw_errors == 0
+        finally:
+            sensor.close()
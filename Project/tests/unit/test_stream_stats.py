@@ -0,0 +1,139 @@
+"""Flow stream telemetry (utils/stream_stats.py).
+
+The reader loop only logged a rough 10 s average rate at debug level, so a
+precision drift could not be traced to the sensor path. UARTFlowSensor now
+keeps fixed-size counters and a jitter histogram and reports them in
+``get_status()["stream"]``. These tests pin the gap and jitter accounting
+for JSON frames and binary batches alike, the percentiles, the driver's
+wiring (CRC and parse counts, queue depth), and the reconnect accounting
+against the pty emulator.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from utils.stream_stats import Histogram, StreamStats
+
+
+def test_histogram_percentiles_use_bin_edges_and_overflow():
+    hist = Histogram(bin_width=0.5, bins=8)
+    assert hist.percentile(50) is None
+    for value in [0.1, 0.2, 0.3, 0.7, 1.2, 3.9, 10.0]:
+        hist.add(value)
+    assert hist.total == 7
+    assert hist.percentile(50) == 1.0  # 4th of 7 (0.7) is in [0.5, 1.0)
+    assert hist.percentile(99) == 10.0  # overflow bin reports the max seen
+    hist.clear()
+    assert hist.total == 0 and hist.percentile(50) is None
+
+
+def _stream(counts, step_ms=20.0, late=()):
+    """Device times for ``counts`` at 50 Hz, with the frames in ``late`` 4 ms late."""
+    return [c * step_ms + (4.0 if c in late else 0.0) for c in counts]
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_gaps_are_dropped_frames_and_intervals_feed_the_jitter(batched):
+    np = pytest.importorskip("numpy") if batched else None
+    counts = [0, 1, 2, 3, 6, 7, 8, 9, 10]  # 4 and 5 never arrived
+    times = _stream(counts, late={8})
+    stats = StreamStats(expected_hz=50.0)
+    if batched:
+        stats.batch(np.array(counts[:5], dtype=float), np.array(times[:5]))
+        stats.batch(np.array(counts[5:], dtype=float), np.array(times[5:]))
+    else:
+        for count, device_ms in zip(counts, times):
+            stats.frame(count, device_ms)
+
+    assert stats.frames == 9
+    assert stats.dropped_frames == 2
+    # 7 one-step intervals: 5 on time, 8 is 4 ms late and 9 is 4 ms early
+    assert stats.jitter_ms.total == 7
+    assert stats.jitter_ms.max == pytest.approx(4.0)
+
+    # The count starting over (firmware restarted) is not a drop
+    stats.resync()
+    stats.frame(0, 5000.0)
+    stats.frame(1, 5020.0)
+    assert stats.dropped_frames == 2
+
+
+def test_snapshot_reports_rate_and_recovery_time(monkeypatch):
+    from utils import stream_stats  # noqa: PLC0415
+
+    now = [100.0]
+    monkeypatch.setattr(stream_stats.time, "monotonic", lambda: now[0])
+    stats = StreamStats(expected_hz=50.0)
+    stats.stream_started(100.0)
+    for count in range(200):
+        stats.frame(count, count * 10.0)
+    now[0] += 2.0
+    snapshot = stats.snapshot(roll=True, crc_errors=3)
+    assert snapshot["rate_hz"] == 100.0 and snapshot["expected_hz"] == 100.0
+    assert snapshot["jitter_ms"]["p99"] == 0.0  # capped at the largest value seen
+    assert snapshot["crc_errors"] == 3
+    assert stats.last_snapshot is snapshot
+
+    stats.recovery_started(reconnect=True)
+    now[0] += 1.5
+    assert stats.snapshot()["recovering"] is True
+    stats.recovery_finished()
+    snapshot = stats.snapshot()
+    assert snapshot["reconnects"] == 1 and snapshot["recovery_s"] == 1.5
+    assert snapshot["rate_hz"] == 0.0  # no frames since the rolling snapshot
+
+
+def test_sensor_reports_stream_telemetry_in_status():
+    pytest.importorskip("serial")
+    from drivers.teensy_frames import FrameDecoder, encode_frame  # noqa: PLC0415
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port="/dev/null", sampling_hz=50.0)
+    sensor._frame_decoder = decoder = FrameDecoder()
+    corrupt = bytearray(encode_frame(3, 60, 100, 5000))
+    corrupt[-1] ^= 0xFF
+    data = b"".join(encode_frame(c, c * 20, 100, 5000) for c in range(3))
+    data += bytes(corrupt) + b"".join(encode_frame(c, c * 20, 100, 5000) for c in range(4, 8))
+    _lines, frames = decoder.feed(data)
+    sensor._process_frames(frames)
+    sensor._process_message('{"type":"measurement","flow":0.1,"temp":25.0,"time":160,"count":8}')
+    sensor._process_message('{"type":"measurement","flow":0.1,"temp"')
+
+    stream = sensor.get_status()["stream"]
+    assert stream["frames"] == 8
+    assert stream["dropped_frames"] == 1
+    assert stream["crc_errors"] == 1
+    assert stream["parse_errors"] == 1
+    assert stream["queue_depth"] == 8
+    assert stream["jitter_ms"]["max"] == 0.0
+
+
+def test_reconnect_is_counted_with_its_recovery_time():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+    from tools.teensy_emulator import TeensyEmulator  # noqa: PLC0415
+
+    with TeensyEmulator(flow_ml_min=0.5) as emulator:
+        sensor = UARTFlowSensor(port=emulator.port, sampling_hz=200.0)
+        sensor.start()
+        try:
+            assert sensor.wait_for_frames(min_frames=50, timeout_s=2.0)
+            stream = sensor.stream_stats()
+            assert stream["dropped_frames"] == 0 and stream["reconnects"] == 0
+            assert stream["jitter_ms"]["p50"] is not None
+
+            emulator.disconnect(down_s=0.3)
+            deadline = time.monotonic() + 5.0
+            while time.monotonic() < deadline and sensor.stream_stats()["reconnects"] == 0:
+                time.sleep(0.01)
+            assert sensor.wait_for_frames(min_frames=20, timeout_s=3.0)
+            stream = sensor.stream_stats()
+            assert stream["reconnects"] == 1 and not stream["recovering"]
+            assert stream["recovery_s"] >= 0.2
+            # The rebooted firmware's count starts over: not a drop
+            assert stream["dropped_frames"] == 0
+        finally:
+            sensor.close()
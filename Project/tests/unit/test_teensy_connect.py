@@ -0,0 +1,123 @@
+"""Readiness-probed Teensy connect (drivers/teensy_connect.py).
+
+Connecting used to sleep a fixed 3.5 s for USB CDC enumeration (plus 2 s
+before every reconnect) whether or not the firmware was already up. The
+drivers now poll the device node, the open and a ping under one deadline
+and record how long each phase took. These tests run against the pty
+emulator: an answering Teensy connects in well under a second, a reconnect
+waits exactly as long as the device node is gone, and a silent port gives
+up at the deadline.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+
+
+@pytest.fixture()
+def emulator():
+    from tools.teensy_emulator import TeensyEmulator  # noqa: PLC0415
+
+    with TeensyEmulator(flow_ml_min=0.5) as emulator:
+        yield emulator
+
+
+def test_phase_timer_accumulates_repeated_phases(monkeypatch):
+    from drivers import teensy_connect  # noqa: PLC0415
+
+    now = [10.0]
+    monkeypatch.setattr(teensy_connect.time, "monotonic", lambda: now[0])
+    timer = teensy_connect.PhaseTimer()
+    for phase, seconds in [("device", 0.5), ("open", 0.1), ("device", 0.25), ("ready", 0.05)]:
+        now[0] += seconds
+        timer.mark(phase)
+    timings = timer.finish(True, attempts=2)
+
+    assert list(timings.phases) == ["device", "open", "ready"]
+    assert timings.phases["device"] == pytest.approx(0.75)
+    assert timings.total_s == pytest.approx(0.9)
+    assert timings.as_dict() == {
+        "ok": True,
+        "attempts": 2,
+        "total_s": 0.9,
+        "device_s": 0.75,
+        "open_s": 0.1,
+        "ready_s": 0.05,
+    }
+
+
+def test_sensor_starts_as_soon_as_the_firmware_answers(emulator):
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port=emulator.port, sampling_hz=100.0)
+    started = time.monotonic()
+    sensor.start()
+    try:
+        assert time.monotonic() - started < 1.0
+        timings = sensor.get_status()["connect_timings"]
+        assert timings["ok"] is True and timings["attempts"] == 1
+        assert set(timings) >= {"device_s", "open_s", "ready_s"}
+        assert timings["total_s"] < 0.5
+    finally:
+        sensor.stop()
+    assert not emulator.streaming  # stop waited for the firmware to confirm
+
+
+def test_reconnect_waits_for_the_device_node_to_return(emulator):
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port=emulator.port, sampling_hz=100.0)
+    sensor.start()
+    try:
+        emulator.disconnect(down_s=0.4)
+        deadline = time.monotonic() + 5.0
+        while time.monotonic() < deadline and not (emulator.boots == 2 and emulator.streaming):
+            time.sleep(0.01)
+        assert sensor.wait_for_frames(min_frames=10, timeout_s=2.0)
+
+        timings = sensor.connect_timings
+        assert timings.ok
+        assert 0.2 < timings.phases["device"] < 1.0
+        assert timings.phases["ready"] < 0.5
+    finally:
+        sensor.stop()
+
+
+def test_connect_gives_up_at_the_deadline(tmp_path):
+    from drivers.teensy_serial_protocol import TeensySerialProtocol  # noqa: PLC0415
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    missing = str(tmp_path / "ttyACM9")
+    sensor = UARTFlowSensor(port=missing)
+    sensor.CONNECT_TIMEOUT_S = 0.2
+    started = time.monotonic()
+    assert sensor._open_when_ready(missing, sensor.CONNECT_TIMEOUT_S) is False
+    assert 0.2 <= time.monotonic() - started < 0.5
+    assert sensor.connect_timings.ok is False
+    assert sensor.connect_timings.phases["device"] >= 0.2
+
+    protocol = TeensySerialProtocol(port=missing)
+    protocol.CONNECT_TIMEOUT_S = 0.2
+    with pytest.raises(ConnectionError):
+        protocol.connect()
+    assert protocol.connect_timings.ok is False
+
+
+def test_protocol_connect_records_phase_timings(emulator):
+    from drivers.teensy_serial_protocol import TeensySerialProtocol  # noqa: PLC0415
+
+    protocol = TeensySerialProtocol(port=emulator.port, timeout=0.5)
+    try:
+        assert protocol.connect()
+        assert protocol.connect_timings.ok
+        assert list(protocol.connect_timings.phases) == ["device", "open", "ready"]
+        assert protocol.connect_timings.total_s < 0.5
+        assert protocol.send_start_command(rate_hz=100.0)
+        assert protocol.read_measurement(timeout_s=0.5) is not None
+    finally:
+        protocol.send_stop_command()
+        protocol.close()
@@ -0,0 +1,131 @@
+"""Pseudo-terminal Teensy emulator (tools/teensy_emulator.py).
+
+Everything that talked to ``UARTFlowSensor`` or ``TeensySerialProtocol``
+needed a Teensy on ``/dev/ttyACM0``. The emulator speaks the firmware's
+command set on a pty and injects I2C errors, hangs and USB disconnects on
+demand. These tests pin its protocol against both host drivers and run the
+sensor's reconnection path end to end without hardware.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture()
+def emulator_factory():
+    from tools.teensy_emulator import TeensyEmulator  # noqa: PLC0415
+
+    started = []
+
+    def make(**kwargs):
+        emulator = TeensyEmulator(**kwargs).start()
+        started.append(emulator)
+        return emulator
+
+    yield make
+    for emulator in started:
+        emulator.close()
+
+
+def _protocol(port):
+    from drivers.teensy_serial_protocol import TeensySerialProtocol  # noqa: PLC0415
+
+    protocol = TeensySerialProtocol(port=port, timeout=0.5)
+    protocol.connect()
+    return protocol
+
+
+@pytest.mark.parametrize("binary", [True, False], ids=["binary", "json-only-firmware"])
+def test_protocol_streams_from_emulator(emulator_factory, binary):
+    emulator = emulator_factory(flow_ml_min=1.2, binary_frames=binary)
+    protocol = _protocol(emulator.port)
+    try:
+        assert protocol.send_start_command(rate_hz=200.0)
+        assert protocol.frame_format == ("binary" if binary else "json")
+        reads = [protocol.read_measurement(timeout_s=0.5) for _ in range(25)]
+        measurements = [m for m in reads if m is not None]  # None: the start status
+        counts = [m.count for m in measurements]
+        assert len(measurements) >= 24
+        assert counts == list(range(counts[0], counts[0] + len(counts)))
+        assert all(m.flow_ml_min == pytest.approx(1.2) for m in measurements)
+        assert measurements[-1].timestamp_ms >= measurements[0].timestamp_ms
+
+        status = protocol.send_status_request()
+        assert status["type"] == "sensor_status" and status["running"] is True
+    finally:
+        protocol.send_stop_command()
+        protocol.close()
+    assert _wait_for(lambda: not emulator.streaming)
+
+
+def test_injected_i2c_errors_are_reported_like_firmware(emulator_factory):
+    emulator = emulator_factory()
+    protocol = _protocol(emulator.port)
+    try:
+        protocol.send_start_command(rate_hz=200.0)
+        emulator.inject_i2c_errors(60)
+        errors, counts = [], []
+        while len(counts) < 5:
+            message = protocol.read_message(timeout_s=1.0)
+            assert message is not None
+            if message["type"] == "error":
+                errors.append(message["error"])
+            elif message["type"] == "measurement" and errors:
+                counts.append(message["count"])
+    finally:
+        protocol.close()
+
+    assert [e.split("(")[-1] for e in errors] == ["consecutive:1)", "consecutive:50)"]
+    # Failed reads do not consume sample numbers.
+    assert counts == list(range(counts[0], counts[0] + 5))
+
+
+def test_hang_outlasting_watchdog_reboots_like_a_replug(emulator_factory):
+    from drivers.uart_reader import read_available  # noqa: PLC0415
+
+    emulator = emulator_factory(watchdog_s=0.2)
+    host = os.open(emulator.port, os.O_RDWR | os.O_NOCTTY)
+    emulator.hang()
+
+    assert _wait_for(lambda: emulator.boots == 2)
+    with pytest.raises(OSError):  # EIO or EOF: the old device node is gone
+        read_available(host)
+    os.close(host)
+    protocol = _protocol(emulator.port)  # the rebooted device answers again
+    protocol.close()
+
+
+def test_sensor_reconnects_after_usb_disconnect(emulator_factory):
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    emulator = emulator_factory(flow_ml_min=0.5)
+    sensor = UARTFlowSensor(port=emulator.port, sampling_hz=100.0)
+    sensor.start()
+    try:
+        assert sensor.get_status()["frame_format"] == "binary"
+        emulator.disconnect(down_s=0.05)
+        assert _wait_for(lambda: emulator.boots == 2 and emulator.streaming, timeout=5.0)
+        sensor.drain_samples()
+        assert sensor.wait_for_frames(min_frames=10, timeout_s=2.0)
+
+        samples = sensor.drain_samples()
+        assert samples and all(s.flow_ml_min == pytest.approx(0.5) for s in samples)
+        # The rebooted firmware came up in JSON and was renegotiated.
+        assert sensor.get_status()["frame_format"] == "binary"
+    finally:
+        sensor.stop()
@@ -0,0 +1,210 @@
+"""Binary measurement frames with JSON fallback (drivers/teensy_frames.py).
+
+Every measurement used to travel as a JSON line decoded with ``json.loads``.
+Firmware that accepts ``{"cmd":"format","mode":"binary"}`` now sends 16-byte
+CRC-checked frames instead; status/error lines stay JSON and old firmware
+keeps sending JSON measurements. These tests pin the wire format, decoding a
+mixed stream split at arbitrary points (NumPy and pure-Python paths), CRC
+rejection and resync, and the sensor/protocol handling of both formats.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import tty
+
+import pytest
+
+STATUS = b'{"type":"status","message":"ok"}\n'
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def frames(request, monkeypatch):
+    from drivers import teensy_frames  # noqa: PLC0415
+
+    if request.param and not teensy_frames.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(teensy_frames, "NUMPY_AVAILABLE", request.param)
+    return teensy_frames
+
+
+def _stream(mod, n=10):
+    parts = []
+    for i in range(n):
+        parts.append(mod.encode_frame(count=i, time_ms=1000 + 2 * i, flow_raw=12000, temp_raw=4500))
+        if i == 4:
+            parts.append(STATUS)
+    return b"".join(parts)
+
+
+def test_wire_format(frames):
+    frame = frames.encode_frame(count=7, time_ms=123456, flow_raw=-25, temp_raw=4400)
+    assert len(frame) == 16
+    assert frame[:3] == b"\xa5\x5a\x01"
+    assert frame[3:7] == (7).to_bytes(4, "little")
+    assert frames.crc8(b"\xbe\xef") == 0x92  # datasheet example
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 16, 4096])
+def test_mixed_stream_any_chunking(frames, chunk):
+    data = _stream(frames)
+    decoder = frames.FrameDecoder()
+    lines, counts, flows, temps = [], [], [], []
+    for start in range(0, len(data), chunk):
+        got_lines, batch = decoder.feed(data[start : start + chunk])
+        lines += got_lines
+        counts += [int(c) for c in batch.count]
+        flows += list(batch.flow_ml_min)
+        temps += list(batch.temp_c)
+
+    assert lines == [STATUS.decode().strip()]
+    assert counts == list(range(10))
+    assert flows == pytest.approx([1.2] * 10)
+    assert temps == pytest.approx([22.5] * 10)
+    assert decoder.crc_errors == 0 and decoder.discarded == 0
+
+
+def test_crc_error_is_dropped_and_stream_resyncs(frames):
+    good = [frames.encode_frame(i, 10 * i, 100, 4000) for i in range(4)]
+    bad = bytearray(good[1])
+    bad[12] ^= 0xFF
+    decoder = frames.FrameDecoder()
+    _lines, batch = decoder.feed(good[0] + bytes(bad) + b"\x01\x02" + good[2] + good[3])
+
+    assert [int(c) for c in batch.count] == [0, 2, 3]
+    assert decoder.crc_errors == 1
+    assert decoder.discarded == 2
+
+
+def test_overlong_and_binary_garbage_lines_are_dropped(frames):
+    decoder = frames.FrameDecoder(max_line=32)
+    assert decoder.feed(b"x" * 40)[0] == []
+    assert decoder.feed(b'\n{"c":3}\n\xff\xfe\n')[0] == ['{"c":3}']
+    assert decoder.discarded == 40 + 3
+
+
+class PtySerial:
+    def __init__(self, fd):
+        self.fd = fd
+        self.is_open = True
+
+    def fileno(self):
+        return self.fd
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def test_sensor_reads_binary_frames_and_tolerates_old_firmware():
+    pytest.importorskip("serial")
+    from drivers.teensy_frames import encode_frame  # noqa: PLC0415
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+    from drivers.uart_reader import Wakeup  # noqa: PLC0415
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(slave, False)
+    sensor = UARTFlowSensor(port="/dev/null", zero_offset_ml_min=0.2)
+    sensor._serial = PtySerial(slave)
+    sensor._wakeup = Wakeup()
+    sensor._running = True
+    sensor._last_ping = time.monotonic()
+    thread = threading.Thread(target=sensor._reader_loop, daemon=True)
+    thread.start()
+    try:
+        os.write(master, b'{"type":"status","message":"Frame format: binary","format":"binary"}\n')
+        os.write(master, b"".join(encode_frame(i, 500 + 2 * i, 12000, 4500) for i in range(50)))
+        deadline = time.monotonic() + 2
+        while sensor._sample_count < 50 and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+        samples = sensor.drain_samples()
+        assert [s.count for s in samples] == list(range(50))
+        assert samples[0].flow_ml_min == pytest.approx(1.0)  # zero offset applied
+        assert samples[-1].timestamp_ms == 598
+        assert sensor.get_status()["frame_format"] == "binary"
+
+        sensor._process_message(json.dumps({"type": "error", "error": "Unknown command: format"}))
+        assert sensor.get_status()["frame_format"] == "json"
+        assert sensor._error_count == 0
+    finally:
+        sensor._running = False
+        sensor._wakeup.notify()
+        thread.join(1.0)
+        sensor._wakeup.close()
+        os.close(master)
+        os.close(slave)
+
+
+class FakeSerial:
+    """Byte-stream stand-in for ``serial.Serial`` (read/in_waiting/timeout)."""
+
+    def __init__(self, data=b""):
+        self.buffer = bytearray(data)
+        self.timeout = 1.0
+        self.is_open = True
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def read(self, n):
+        out = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return out
+
+    def write(self, data):
+        self.written.append(json.loads(data))
+        if self.written[-1].get("cmd") == "format":
+            self.buffer += self.reply
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        self.buffer.clear()
+
+
+def _protocol(reply):
+    pytest.importorskip("serial")
+    from drivers.teensy_serial_protocol import TeensySerialProtocol  # noqa: PLC0415
+
+    protocol = TeensySerialProtocol(port="/dev/null")
+    protocol._serial = FakeSerial()
+    protocol._serial.reply = reply
+    return protocol
+
+
+def test_protocol_negotiates_and_reads_binary_measurements():
+    from drivers.teensy_frames import encode_frame  # noqa: PLC0415
+
+    protocol = _protocol(b'{"type":"status","format":"binary"}\n')
+    assert protocol.negotiate_binary_frames() is True
+
+    protocol._serial.buffer += encode_frame(3, 777, 5000, 4200) + STATUS
+    measurement = protocol.read_measurement(timeout_s=0.1)
+    assert (measurement.count, measurement.timestamp_ms) == (3, 777)
+    assert measurement.flow_ml_min == pytest.approx(0.5)
+    assert protocol.read_message(timeout_s=0.1) == {"type": "status", "message": "ok"}
+    assert protocol.read_message(timeout_s=0.05) is None
+
+
+def test_protocol_falls_back_to_json_for_old_firmware():
+    protocol = _protocol(b'{"type":"error","error":"Unknown command: format"}\n')
+    assert protocol.negotiate_binary_frames() is False
+    assert protocol.frame_format == "json"
+
+    protocol._serial.buffer += (
+        b'{"type":"measurement","flow":0.25,"temp":22.0,"time":5,"count":1}\n'
+    )
+    assert protocol.read_measurement(timeout_s=0.1).flow_ml_min == pytest.approx(0.25)
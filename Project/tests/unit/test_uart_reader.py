@@ -0,0 +1,143 @@
+"""Event-driven UART reader (drivers/uart_reader.py).
+
+``UARTFlowSensor._reader_loop`` used to poll ``in_waiting`` and sleep 1 ms
+(10 ms while suspended) between checks. It now blocks in ``select`` on the
+serial descriptor and a wakeup pipe and decodes bulk reads. These
+tests drive the real reader thread through a pty, and the asyncio variant
+through a pipe on a private loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+import tty
+
+import pytest
+
+
+class PtySerial:
+    """Just enough of ``serial.Serial`` over the slave end of a pty."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.is_open = True
+        self.written = []
+
+    def fileno(self):
+        return self.fd
+
+    def write(self, data):
+        self.written.append(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def _frame(i):
+    return json.dumps(
+        {"type": "measurement", "flow": 1.0, "temp": 22.0, "time": 10 * i, "count": i}
+    ).encode() + b"\n"
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+@pytest.fixture()
+def pty_sensor():
+    pytest.importorskip("serial")
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+    from drivers.uart_reader import Wakeup  # noqa: PLC0415
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(slave, False)
+    sensor = UARTFlowSensor(port="/dev/null")
+    sensor._serial = PtySerial(slave)
+    sensor._wakeup = Wakeup()
+    sensor._running = True
+    sensor._last_ping = time.monotonic()
+    thread = threading.Thread(target=sensor._reader_loop, daemon=True)
+    thread.start()
+    yield sensor, master, thread
+    sensor._running = False
+    sensor._wakeup.notify()
+    thread.join(1.0)
+    sensor._wakeup.close()
+    os.close(master)
+    os.close(slave)
+
+
+def test_reader_thread_reads_bulk_chunks(pty_sensor):
+    sensor, master, _thread = pty_sensor
+    payload = b"".join(_frame(i) for i in range(20))
+    os.write(master, payload[:500])
+    os.write(master, payload[500:])
+
+    assert _wait_for(lambda: sensor._sample_count == 20)
+    assert [s.count for s in sensor.drain_samples()] == list(range(20))
+
+
+def test_suspend_holds_bytes_until_resume(pty_sensor):
+    sensor, master, _thread = pty_sensor
+    sensor.suspend_reads(True)
+    time.sleep(0.05)
+    os.write(master, _frame(1))
+    time.sleep(0.1)
+    assert sensor._sample_count == 0
+
+    sensor.suspend_reads(False)
+    assert _wait_for(lambda: sensor._sample_count == 1, timeout=0.5)
+
+
+def test_stop_wakes_blocked_reader(pty_sensor):
+    sensor, _master, thread = pty_sensor
+    time.sleep(0.05)  # let it block in select (next deadline is seconds away)
+    started = time.monotonic()
+    sensor._running = False
+    sensor._wakeup.notify()
+    thread.join(1.0)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 0.5
+
+
+def test_async_line_reader():
+    from drivers.uart_reader import AsyncLineReader  # noqa: PLC0415
+
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    lines, errors = [], []
+
+    async def scenario():
+        reader = AsyncLineReader(read_fd, lines.append, errors.append)
+        reader.attach()
+        os.write(write_fd, b'{"a":1}\n{"b"')
+        await asyncio.sleep(0.05)
+        os.write(write_fd, b":2}\n")
+        await asyncio.sleep(0.05)
+        os.close(write_fd)  # EOF: device gone
+        await asyncio.sleep(0.05)
+        return reader.attached
+
+    loop = asyncio.new_event_loop()
+    try:
+        still_attached = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+        os.close(read_fd)
+
+    assert lines == ['{"a":1}', '{"b":2}']
+    assert not still_attached
+    assert len(errors) == 1 and isinstance(errors[0], ConnectionError)
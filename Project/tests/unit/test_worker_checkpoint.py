@@ -0,0 +1,316 @@
+"""Crash-resumable schedule execution (worker_checkpoints, schema migration 6).
+
+``RelayWorker`` used to keep ``delivered_volumes`` / ``failed_deliveries`` /
+``animal_windows`` only in memory, so a crash or power cut mid-window started
+the schedule over and re-delivered water. It now writes a checkpoint after
+every delivery and clears it when the schedule finishes or is stopped; at
+launch ``main.resume_inflight_schedule`` hands a leftover checkpoint back to a
+new worker. These tests pin the round trip, that completed work is never
+replayed (including a delivery journalled just before the crash but missing
+from the checkpoint, and a retried instant logged at its retry time), and that
+a Stop never leaves a checkpoint behind.
+
+Like test_instant_delivery_routing, the real ``RelayWorker`` methods are called
+with a SimpleNamespace ``self`` — no QObject construction.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+WINDOW_START = datetime(2026, 6, 5, 9, 0, 0)
+WINDOW_END = datetime(2026, 6, 5, 17, 0, 0)
+
+
+def _worker(database_handler, mode="staggered"):
+    from PyQt5.QtCore import QMutex  # noqa: PLC0415
+
+    return SimpleNamespace(
+        _cancel_requested=threading.Event(),
+        schedule_id=42,
+        mode=mode,
+        settings={
+            "mode": mode.capitalize(),
+            "window_start": WINDOW_START.timestamp(),
+            "window_end": WINDOW_END.timestamp(),
+        },
+        delivered_volumes={},
+        failed_deliveries={},
+        _completed_instants=set(),
+        _started_at="2026-06-05T09:00:00",
+        mutex=QMutex(),
+        database_handler=database_handler,
+        progress=MagicMock(),
+        volume_updated=MagicMock(),
+    )
+
+
+def _bind(me):
+    from gpio.relay_worker import RelayWorker  # noqa: PLC0415
+
+    for name in ("_checkpoint_state", "_save_checkpoint", "_clear_checkpoint"):
+        setattr(me, name, getattr(RelayWorker, name).__get__(me))
+    return RelayWorker
+
+
+def test_staggered_state_round_trips(database_handler):
+    me = _worker(database_handler)
+    _bind(me)
+    me.animal_windows = {
+        "7": {
+            "start": WINDOW_START,
+            "end": WINDOW_END,
+            "last_delivery": None,
+            "relay_unit": 3,
+            "target_volume": 1.0,
+            "volume_per_cycle": 0.2,
+        }
+    }
+    me.delivered_volumes = {"7": 0.4}
+    me.failed_deliveries = {"7": 1}
+    me._save_checkpoint()
+
+    [checkpoint] = database_handler.get_worker_checkpoints()
+    assert checkpoint["schedule_id"] == 42
+    assert checkpoint["mode"] == "Staggered"
+    assert checkpoint["window_end"] == WINDOW_END.timestamp()
+
+    fresh = _worker(database_handler)
+    RelayWorker = _bind(fresh)
+    fresh._started_at = None
+    RelayWorker._restore_checkpoint(fresh, checkpoint["state"])
+
+    assert fresh._started_at == "2026-06-05T09:00:00"
+    assert fresh.delivered_volumes == {"7": 0.4}
+    assert fresh.failed_deliveries == {"7": 1}
+    assert fresh.animal_windows == me.animal_windows
+    fresh.volume_updated.emit.assert_called_once_with("7", 0.4)
+
+
+def test_checkpoint_is_replaced_not_appended(database_handler):
+    me = _worker(database_handler)
+    _bind(me)
+    for volume in (0.1, 0.2, 0.3):
+        me.delivered_volumes = {"7": volume}
+        me._save_checkpoint()
+    checkpoints = database_handler.get_worker_checkpoints()
+    assert len(checkpoints) == 1
+    assert checkpoints[0]["state"]["delivered_volumes"] == [["7", 0.3]]
+
+
+def test_restore_reconciles_deliveries_missing_from_checkpoint(database_handler):
+    """Crash after the delivery was journalled but before its checkpoint."""
+    state = {
+        "started_at": "2026-06-05T09:00:00",
+        "delivered_volumes": [["7", 0.2]],
+        "failed_deliveries": [],
+        "animal_windows": [],
+        "completed_instants": [],
+    }
+    database_handler.log_deliveries(
+        [
+            {
+                "schedule_id": 42,
+                "animal_id": 7,
+                "relay_unit_id": 3,
+                "volume_delivered": 0.2,
+                "timestamp": ts,
+                "status": "completed",
+            }
+            for ts in ("2026-06-05T08:00:00", "2026-06-05T10:00:00", "2026-06-05T10:30:00")
+        ]
+    )
+
+    me = _worker(database_handler)
+    RelayWorker = _bind(me)
+    RelayWorker._restore_checkpoint(me, state)
+
+    # The 08:00 row predates this run and is not counted.
+    assert me.delivered_volumes == {"7": pytest.approx(0.4)}
+
+
+def test_instant_resume_skips_completed_deliveries(database_handler):
+    me = _worker(database_handler, mode="instant")
+    RelayWorker = _bind(me)
+    database_handler.log_delivery(
+        {
+            "schedule_id": 42,
+            "animal_id": 1,
+            "relay_unit_id": 1,
+            "volume_delivered": 0.5,
+            "timestamp": "2026-06-05T10:00:00",
+            "status": "completed",
+        }
+    )
+    RelayWorker._restore_checkpoint(
+        me,
+        {
+            "started_at": "2026-06-05T09:00:00",
+            "delivered_volumes": [],
+            "failed_deliveries": [],
+            "animal_windows": [],
+            "completed_instants": [],
+        },
+    )
+    assert me.delivered_volumes == {1: 0.5}
+    assert "1@2026-06-05T10:00:00" in me._completed_instants
+
+    # run_instant_cycle must not schedule it again even if the clock says
+    # it is still in the future (no RTC on a Pi after a power cut).
+    me.delivery_instants = [
+        {
+            "relay_unit_id": 1,
+            "animal_id": 1,
+            "delivery_time": "2026-06-05T10:00:00",
+            "water_volume": 0.5,
+        }
+    ]
+    me.scheduler = MagicMock()
+    me.min_trigger_interval = 500
+    me._close_journal = MagicMock()
+    me._clear_checkpoint = MagicMock()
+    me.finished = MagicMock()
+    RelayWorker.run_instant_cycle(me)
+    me.scheduler.call_later.assert_not_called()
+    me.finished.emit.assert_called_once()
+    me._clear_checkpoint.assert_called_once()
+
+
+def test_no_checkpoint_after_cancel(database_handler):
+    me = _worker(database_handler)
+    _bind(me)
+    me._save_checkpoint()
+    me._clear_checkpoint()
+    me._cancel_requested.set()
+    me._save_checkpoint()
+    assert database_handler.get_worker_checkpoints() == []
+
+
+def test_unreadable_checkpoint_is_skipped(database_handler):
+    with database_handler.connect() as conn:
+        conn.execute(
+            "INSERT INTO worker_checkpoints VALUES (1, 'Instant', 0, 1, '{not json', 'x')"
+        )
+    database_handler.save_worker_checkpoint(2, "Instant", 0, 1, {"ok": True})
+    assert [c["schedule_id"] for c in database_handler.get_worker_checkpoints()] == [2]
+    assert json.dumps(database_handler.get_worker_checkpoints()[0]["state"]) == '{"ok": true}'
+
+
+def test_retried_instant_is_not_repeated_after_a_crash(database_handler):
+    """Crash after a retry succeeded but before its checkpoint was written."""
+    from datetime import timedelta  # noqa: PLC0415
+
+    me = _worker(database_handler, mode="instant")
+    RelayWorker = _bind(me)
+    me._save_checkpoint = MagicMock()  # the crash: no checkpoint lands
+    me._record_delivery = RelayWorker._record_delivery.__get__(me)
+    instant = datetime(2026, 6, 5, 10, 0, 0)
+    retry = {
+        "schedule_id": 42,
+        "animal_id": 1,
+        "relay_unit_id": 1,
+        "water_volume": 0.5,
+        "instant_time": instant + timedelta(seconds=30),  # set by schedule_retry
+        "triggers": None,
+        "instant_key": f"1@{instant.isoformat()}",
+    }
+    RelayWorker._finish_delivery(me, retry, True)
+
+    fresh = _worker(database_handler, mode="instant")
+    RelayWorker._restore_checkpoint(
+        fresh,
+        {
+            "started_at": "2026-06-05T09:00:00",
+            "delivered_volumes": [],
+            "failed_deliveries": [],
+            "animal_windows": [],
+            "completed_instants": [],
+        },
+    )
+    assert f"1@{instant.isoformat()}" in fresh._completed_instants
+    assert fresh.delivered_volumes == {1: 0.5}
+
+    fresh.delivery_instants = [
+        {
+            "relay_unit_id": 1,
+            "animal_id": 1,
+            "delivery_time": instant.isoformat(),
+            "water_volume": 0.5,
+        }
+    ]
+    fresh.scheduler = MagicMock()
+    fresh.min_trigger_interval = 500
+    fresh._close_journal = MagicMock()
+    fresh._clear_checkpoint = MagicMock()
+    fresh.finished = MagicMock()
+    RelayWorker.run_instant_cycle(fresh)
+    fresh.scheduler.call_later.assert_not_called()
+
+
+def test_rerunning_the_instant_cycle_does_not_stack_completion_handlers(database_handler):
+    me = _worker(database_handler, mode="instant")
+    RelayWorker = _bind(me)
+    me.delivery_instants = [
+        {
+            "relay_unit_id": 1,
+            "animal_id": 1,
+            "delivery_time": datetime(2099, 1, 1).isoformat(),
+            "water_volume": 0.5,
+        }
+    ]
+    me.scheduler = MagicMock()
+    me.min_trigger_interval = 500
+    me.check_completion = MagicMock()
+    me._handle_delivery = MagicMock()
+    me._close_journal = MagicMock()
+    for _ in range(2):
+        RelayWorker.run_instant_cycle(me)
+    assert me.scheduler.call_later.call_count == 2
+    # Connected once in __init__, not per cycle
+    me.scheduler.drained.connect.assert_not_called()
+
+
+def test_staggered_resume_reads_this_runs_volume_from_the_totals(database_handler):
+    def completed(volume, ts):
+        return {
+            "schedule_id": 42,
+            "animal_id": 7,
+            "relay_unit_id": 3,
+            "volume_delivered": volume,
+            "timestamp": ts,
+            "status": "completed",
+        }
+
+    database_handler.log_delivery(completed(0.5, "2026-06-04T10:00:00"))  # earlier run
+    me = _worker(database_handler)
+    _bind(me)
+    me._totals_at_start = database_handler.get_delivery_totals(42)
+    me.delivered_volumes = {"7": 0.2}
+    me._save_checkpoint()
+    database_handler.log_delivery(completed(0.2, "2026-06-05T10:00:00"))
+    database_handler.log_delivery(completed(0.2, "2026-06-05T10:30:00"))  # not checkpointed
+
+    [checkpoint] = database_handler.get_worker_checkpoints()
+    fresh = _worker(database_handler)
+    RelayWorker = _bind(fresh)
+    statements = []
+    conn = database_handler.connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        RelayWorker._restore_checkpoint(fresh, checkpoint["state"])
+    finally:
+        conn.set_trace_callback(None)
+
+    assert fresh.delivered_volumes == {"7": pytest.approx(0.4)}
+    assert not any("dispensing_history" in s for s in statements)
@@ -0,0 +1,618 @@
+"""Pseudo-terminal Teensy emulator for hardware-free flow sensor testing.
+
+Opens a Linux pty and speaks the ``teensy_flow_reader`` firmware protocol on
+it: the same JSON commands (``ping``, ``start``, ``stop``, ``status``,
+``reset``, ``format``), the same status/error wording and counters, and
+measurements as JSON lines or binary frames (drivers/teensy_frames.py).
+``UARTFlowSensor`` and ``TeensySerialProtocol`` open :attr:`TeensyEmulator.port`
+exactly as they would ``/dev/ttyACM0``.
+
+Faults are injected on demand so recovery paths run deterministically:
+
+- I2C read failures (EMI): random with ``i2c_error_rate`` or an exact burst
+  with :meth:`TeensyEmulator.inject_i2c_errors`, reported like the firmware
+  (first failure and every 50th) and stopping the sensor after 200 in a row.
+- Firmware hangs: :meth:`TeensyEmulator.hang` goes silent; if the hang
+  outlasts the 2 s hardware watchdog the "Teensy" reboots, which on USB
+  looks like a disconnect followed by a fresh device.
+- USB disconnects: :meth:`TeensyEmulator.disconnect` closes the pty, so the
+  host's next read fails with EIO and the port disappears until
+  :meth:`TeensyEmulator.reconnect` (or ``down_s`` later).
+
+The port is a symlink to the current pty slave, so it survives reconnects
+the way a udev name does.
+
+Run standalone to get a port for manual testing, or ``--benchmark`` to
+measure UARTFlowSensor reader throughput and latency against it::
+
+    python tools/teensy_emulator.py --rate 200
+    python tools/teensy_emulator.py --benchmark --rate 500 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import select
+import sys
+import tempfile
+import threading
+import time
+import tty
+from collections import deque
+from typing import Callable, Optional, Union
+
+
+def _append_project_to_syspath() -> None:
+    here = os.path.abspath(os.path.dirname(__file__))
+    project_root = os.path.abspath(os.path.join(here, os.pardir))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+
+
+_append_project_to_syspath()
+
+
+from drivers.teensy_frames import encode_frame  # noqa: E402
+from drivers.uart_reader import Wakeup  # noqa: E402
+
+# Firmware constants (teensy_flow_reader.ino)
+MAX_CONSECUTIVE_ERRORS = 200
+WATCHDOG_TIMEOUT_S = 2.0
+I2C_CLOCK_HZ = 400000
+TX_BUFFER_BYTES = 4096  # Teensy USB serial transmit buffer
+TX_HEADROOM_BYTES = 100  # sendMeasurement() skips samples below this
+
+
+class TeensyEmulator:
+    """Teensy 4.1 + SLF3S-0600F running ``teensy_flow_reader``, on a pty.
+
+    Args:
+        flow_ml_min: Constant flow, or a callable of seconds since start.
+        noise_ml_min: Standard deviation of Gaussian flow noise.
+        temperature_c: Reported liquid temperature.
+        rate_hz: Rate used until a ``start`` command sets one.
+        i2c_error_rate: Probability that any one sensor read fails.
+        binary_frames: False emulates firmware without the ``format`` command.
+        watchdog_s: Hangs longer than this reboot the device (None: never).
+        seed: Seed for noise and error injection, for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        flow_ml_min: Union[float, Callable[[float], float]] = 0.0,
+        noise_ml_min: float = 0.0,
+        temperature_c: float = 22.5,
+        rate_hz: float = 50.0,
+        i2c_error_rate: float = 0.0,
+        binary_frames: bool = True,
+        watchdog_s: Optional[float] = WATCHDOG_TIMEOUT_S,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.flow_ml_min = flow_ml_min
+        self.noise_ml_min = noise_ml_min
+        self.temperature_c = temperature_c
+        self.i2c_error_rate = i2c_error_rate
+        self.supports_binary = binary_frames
+        self.watchdog_s = watchdog_s
+        self._random = random.Random(seed)
+        self._default_rate = rate_hz
+
+        self._dir = tempfile.mkdtemp(prefix="teensy-emulator-")
+        self.port = os.path.join(self._dir, "ttyACM0")
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._tx = bytearray()
+        self._wakeup = Wakeup()
+        self._actions: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # Host-visible history, for tests and the benchmark
+        self.commands: list = []
+        self.boots = 0
+        self.sent_samples = 0
+        self.skipped_samples = 0  # dropped for a full transmit buffer
+        self.boot_time = time.monotonic()
+
+        self._reboot_state()
+
+    # ----- lifecycle -----
+
+    def start(self) -> "TeensyEmulator":
+        """Create the pty and run the firmware loop on a daemon thread."""
+        if self._thread is not None:
+            return self
+        self._open_pty()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="teensy-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._running = False
+        self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._close_pty()
+        self._wakeup.close()
+        try:
+            os.rmdir(self._dir)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "TeensyEmulator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ----- fault injection (thread-safe, applied by the firmware loop) -----
+
+    def inject_i2c_errors(self, count: int) -> None:
+        """Fail the next ``count`` sensor reads."""
+        self._call(lambda: setattr(self, "_forced_errors", self._forced_errors + count))
+
+    def hang(self, duration_s: Optional[float] = None) -> None:
+        """Stop answering and streaming, as a firmware lockup would.
+
+        Ends after ``duration_s`` (or :meth:`resume`) unless the watchdog
+        fires first, in which case the device reboots.
+        """
+
+        def apply() -> None:
+            now = time.monotonic()
+            self._hang_started = now
+            self._hang_until = None if duration_s is None else now + duration_s
+
+        self._call(apply)
+
+    def resume(self) -> None:
+        self._call(self._end_hang)
+
+    def disconnect(self, down_s: Optional[float] = None) -> None:
+        """Unplug: close the pty and remove the port; back after ``down_s``."""
+
+        def apply() -> None:
+            self._close_pty()
+            self._reconnect_at = None if down_s is None else time.monotonic() + down_s
+
+        self._call(apply)
+
+    def reconnect(self) -> None:
+        """Plug back in: a rebooted device on a new pty behind the same port."""
+        self._call(self._replug)
+
+    @property
+    def connected(self) -> bool:
+        return self._master is not None
+
+    @property
+    def streaming(self) -> bool:
+        return self._sensor_running
+
+    def millis(self) -> int:
+        """The device's ``millis()`` clock (resets on reboot, wraps at 2**32)."""
+        return int((time.monotonic() - self.boot_time) * 1000) & 0xFFFFFFFF
+
+    def _call(self, fn: Callable[[], None], timeout: float = 2.0) -> None:
+        if self._thread is None or threading.current_thread() is self._thread:
+            fn()
+            return
+        done = threading.Event()
+        self._actions.append((fn, done))
+        self._wakeup.notify()
+        done.wait(timeout)
+
+    # ----- pty plumbing -----
+
+    def _open_pty(self) -> None:
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        self._master, self._slave = master, slave
+        self._tx.clear()
+        self._rx = bytearray()
+        tmp = self.port + ".tmp"
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        os.symlink(os.ttyname(slave), tmp)
+        os.replace(tmp, self.port)
+
+    def _close_pty(self) -> None:
+        try:
+            os.unlink(self.port)
+        except FileNotFoundError:
+            pass
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+        self._tx.clear()
+
+    def _replug(self) -> None:
+        self._close_pty()
+        self._reconnect_at = None
+        self._reboot_state()
+        self._open_pty()
+        self._send_status(
+            f"Teensy flow reader initialized (I2C @ {I2C_CLOCK_HZ // 1000}kHz, "
+            "watchdog enabled, sensor ready)"
+        )
+
+    def _reboot_state(self) -> None:
+        self.boots += 1
+        self.boot_time = time.monotonic()
+        self._sensor_running = False
+        self._binary = False
+        self._rate = self._default_rate
+        self._next_sample = 0.0
+        self._sample_count = 0
+        self._error_count = 0
+        self._consecutive_errors = 0
+        self._forced_errors = 0
+        self._hang_started: Optional[float] = None
+        self._hang_until: Optional[float] = None
+        self._reconnect_at: Optional[float] = None
+        self._started_at = time.monotonic()
+
+    def _end_hang(self) -> None:
+        self._hang_started = None
+        self._hang_until = None
+
+    # ----- firmware loop -----
+
+    def _loop(self) -> None:
+        wakeup_fd = self._wakeup.fileno()
+        while self._running:
+            while self._actions:
+                fn, done = self._actions.popleft()
+                try:
+                    fn()
+                finally:
+                    done.set()
+
+            now = time.monotonic()
+            deadlines = []
+            hung = self._hang_started is not None
+            if hung:
+                if self.watchdog_s is not None and now - self._hang_started >= self.watchdog_s:
+                    self._end_hang()
+                    self._replug()  # watchdog reset re-enumerates USB
+                    continue
+                if self._hang_until is not None and now >= self._hang_until:
+                    self._end_hang()
+                    continue
+                if self.watchdog_s is not None:
+                    deadlines.append(self._hang_started + self.watchdog_s)
+                if self._hang_until is not None:
+                    deadlines.append(self._hang_until)
+            if self._master is None:
+                if self._reconnect_at is not None:
+                    if now >= self._reconnect_at:
+                        self._replug()
+                        continue
+                    deadlines.append(self._reconnect_at)
+                self._wait([wakeup_fd], [], deadlines, now)
+                continue
+
+            if not hung and self._sensor_running:
+                while now >= self._next_sample:
+                    self._sample(now)
+                    self._next_sample += 1.0 / self._rate
+                    if now - self._next_sample > 1.0:
+                        self._next_sample = now  # fell far behind; don't burst
+                deadlines.append(self._next_sample)
+
+            # A hung firmware neither reads commands nor drains its buffer.
+            readers = [wakeup_fd] if hung else [wakeup_fd, self._master]
+            writers = [self._master] if self._tx and not hung else []
+            readable, writable = self._wait(readers, writers, deadlines, now)
+            if self._master is None:
+                continue
+            if writable:
+                self._flush_tx()
+            if self._master in readable:
+                self._read_commands()
+
+    def _wait(self, readers, writers, deadlines, now):
+        timeout = max(0.0, min(deadlines) - now) if deadlines else 0.5
+        try:
+            readable, writable, _ = select.select(readers, writers, [], timeout)
+        except (OSError, ValueError):
+            return [], []
+        if self._wakeup.fileno() in readable:
+            self._wakeup.drain()
+        return readable, writable
+
+    def _read_commands(self) -> None:
+        try:
+            data = os.read(self._master, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""  # EIO: no host has the port open; nothing to read
+        self._rx += data
+        while b"\n" in self._rx:
+            raw, _, rest = bytes(self._rx).partition(b"\n")
+            self._rx = bytearray(rest)
+            line = bytes(c for c in raw if 32 <= c < 127).decode("ascii").strip()
+            if line:
+                self._handle_command(line)
+
+    def _handle_command(self, line: str) -> None:
+        if len(line) > 200:
+            self._send_error("Command too long")
+            return
+        try:
+            command = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._send_error(f"Invalid JSON: {e.msg}")
+            return
+        if not isinstance(command, dict):
+            command = {}
+        cmd = str(command.get("cmd", "null"))
+        self.commands.append(command)
+
+        if cmd == "ping":
+            self._write_json({"type": "pong"})
+        elif cmd == "start":
+            self._rate = min(max(float(command.get("rate", 50.0)), 1.0), 1000.0)
+            now = time.monotonic()
+            self._sensor_running = True
+            self._sample_count = 0
+            self._error_count = 0
+            self._consecutive_errors = 0
+            self._started_at = now
+            self._next_sample = now + 1.0 / self._rate
+            self._send_status(f"Sensor started @ {float(command.get('rate', 50.0)):.2f}Hz")
+        elif cmd == "stop":
+            self._stop_sensor()
+        elif cmd == "status":
+            self._write_json(
+                {
+                    "type": "sensor_status",
+                    "running": self._sensor_running,
+                    "rate": self._rate,
+                    "samples": self._sample_count,
+                    "errors": self._error_count,
+                    "consecutive_errors": self._consecutive_errors,
+                    "uptime": self.millis(),
+                    "i2c_clock": I2C_CLOCK_HZ,
+                }
+            )
+        elif cmd == "reset":
+            if self._sensor_running:
+                self._stop_sensor()
+            self._send_status("Recovering I2C bus...")
+            self._send_status("I2C bus recovery complete")
+            self._sensor_running = False
+            self._sample_count = 0
+            self._error_count = 0
+            self._consecutive_errors = 0
+            self._send_status("Sensor soft reset OK")
+        elif cmd == "format" and self.supports_binary:
+            self._binary = command.get("mode", "json") == "binary"
+            mode = "binary" if self._binary else "json"
+            self._write_json(
+                {"type": "status", "message": f"Frame format: {mode}", "format": mode}
+            )
+        else:
+            self._send_error(f"Unknown command: {cmd}")
+
+    def _stop_sensor(self) -> None:
+        self._sensor_running = False
+        self._send_status(
+            f"Sensor stopped (samples:{self._sample_count}, errors:{self._error_count})"
+        )
+
+    def _sample(self, now: float) -> None:
+        """One ``sampleSensor()`` pass: an I2C read, then a measurement."""
+        failed = False
+        if self._forced_errors > 0:
+            self._forced_errors -= 1
+            failed = True
+        elif self.i2c_error_rate and self._random.random() < self.i2c_error_rate:
+            failed = True
+        if failed:
+            self._consecutive_errors += 1
+            self._error_count += 1
+            n = self._consecutive_errors
+            if n == 1 or n % 50 == 0:
+                self._send_error(f"Sensor read failed: received 0 bytes (consecutive:{n})")
+            if n >= MAX_CONSECUTIVE_ERRORS:
+                self._send_error(
+                    f"Max consecutive errors reached ({MAX_CONSECUTIVE_ERRORS}), stopping sensor"
+                )
+                self._sensor_running = False
+                self._send_status("Recovering I2C bus...")
+                self._send_status("I2C bus recovery complete")
+            return
+
+        flow = self.flow_ml_min
+        if callable(flow):
+            flow = flow(now - self._started_at)
+        if self.noise_ml_min:
+            flow += self._random.gauss(0.0, self.noise_ml_min)
+        # Quantise through the sensor's raw int16 scales
+        flow_raw = max(-32768, min(32767, round(flow * 10000)))
+        temp_raw = max(-32768, min(32767, round(self.temperature_c * 200)))
+
+        if self._binary:
+            needed = 16
+            payload = encode_frame(self._sample_count, self.millis(), flow_raw, temp_raw)
+        else:
+            needed = TX_HEADROOM_BYTES
+            payload = (
+                f'{{"type":"measurement","flow":{flow_raw / 10000:.4f},'
+                f'"temp":{temp_raw / 200:.3f},"time":{self.millis()},'
+                f'"count":{self._sample_count}}}\r\n'
+            ).encode("ascii")
+        if TX_BUFFER_BYTES - len(self._tx) < needed:
+            self.skipped_samples += 1  # host not reading; firmware skips, count still moves
+        else:
+            self._write(payload)
+            self.sent_samples += 1
+        self._sample_count += 1
+        self._consecutive_errors = 0
+
+    # ----- output -----
+
+    def _send_status(self, message: str) -> None:
+        self._write_json(
+            {
+                "type": "status",
+                "message": message,
+                "running": self._sensor_running,
+                "rate": self._rate,
+                "errors": self._error_count,
+            }
+        )
+
+    def _send_error(self, error: str) -> None:
+        self._write_json({"type": "error", "error": error, "time": self.millis()})
+
+    def _write_json(self, message: dict) -> None:
+        self._write(json.dumps(message, separators=(",", ":")).encode("ascii") + b"\r\n")
+
+    def _write(self, data: bytes) -> None:
+        if self._master is None:
+            return
+        if len(self._tx) + len(data) > TX_BUFFER_BYTES:
+            return  # Serial.write would drop it once the USB buffer is full
+        self._tx += data
+        self._flush_tx()
+
+    def _flush_tx(self) -> None:
+        try:
+            written = os.write(self._master, self._tx)
+        except BlockingIOError:
+            return
+        except OSError:
+            written = len(self._tx)  # host side gone; the bytes go nowhere
+        del self._tx[:written]
+
+
+def benchmark_reader(emulator: TeensyEmulator, rate_hz: float, seconds: float) -> dict:
+    """Stream through ``UARTFlowSensor`` and measure what the reader delivers.
+
+    Latency is host receipt time minus the emulated send time, both on this
+    machine's monotonic clock (to within the 1 ms resolution of ``millis()``).
+    """
+    from drivers.uart_flow_sensor import UARTFlowSensor  # noqa: PLC0415
+
+    sensor = UARTFlowSensor(port=emulator.port, sampling_hz=rate_hz)
+    sensor.start()
+    sensor.drain_samples()
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    samples = []
+    try:
+        while time.monotonic() - wall_start < seconds:
+            time.sleep(0.05)
+            samples.extend(sensor.drain_samples())
+    finally:
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        sensor.stop()
+
+    latencies = sorted(
+        s.host_time - (emulator.boot_time + s.timestamp_ms / 1000.0)
+        for s in samples
+        if s.timestamp_ms is not None and s.host_time is not None
+    )
+    counts = [s.count for s in samples if s.count is not None]
+    missing = sum(b - a - 1 for a, b in zip(counts, counts[1:]) if b > a + 1)
+
+    def pct(p: float) -> float:
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000.0
+
+    return {
+        "frame_format": sensor.get_status().get("frame_format"),
+        "samples": len(samples),
+        "rate_hz": len(samples) / wall if wall else 0.0,
+        "missing": missing,
+        "overruns": sensor._overrun_count,
+        "latency_p50_ms": pct(0.50),
+        "latency_p99_ms": pct(0.99),
+        "latency_max_ms": latencies[-1] * 1000.0 if latencies else float("nan"),
+        "cpu_percent": 100.0 * cpu / wall if wall else 0.0,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Emulate the Teensy flow reader on a pseudo-terminal."
+    )
+    parser.add_argument(
+        "--rate", type=float, default=50.0, help="Sampling rate in Hz. Default: 50"
+    )
+    parser.add_argument("--flow", type=float, default=1.2, help="Flow in mL/min. Default: 1.2")
+    parser.add_argument(
+        "--noise", type=float, default=0.005, help="Flow noise (std, mL/min). Default: 0.005"
+    )
+    parser.add_argument(
+        "--i2c-error-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a sensor read fails. Default: 0",
+    )
+    parser.add_argument(
+        "--json-only",
+        action="store_true",
+        help="Emulate firmware without binary frames",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Measure UARTFlowSensor throughput and latency, then exit",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=5.0, help="Benchmark duration. Default: 5"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    emulator = TeensyEmulator(
+        flow_ml_min=args.flow,
+        noise_ml_min=args.noise,
+        rate_hz=args.rate,
+        i2c_error_rate=args.i2c_error_rate,
+        binary_frames=not args.json_only,
+        seed=args.seed,
+    )
+    with emulator:
+        if args.benchmark:
+            result = benchmark_reader(emulator, args.rate, args.seconds)
+            for key, value in result.items():
+                print(
+                    f"{key:>16}: {value:.2f}"
+                    if isinstance(value, float)
+                    else f"{key:>16}: {value}"
+                )
+            return 0
+
+        print(f"Teensy emulator on {emulator.port} (Ctrl+C to quit)")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
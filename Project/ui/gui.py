@@ -52,8 +52,10 @@ class RodentRefreshmentGUI(QWidget):
         self.settings = system_controller.settings
 
         # Store callbacks with correct signatures
-        self.run_program = lambda schedule, mode, window_start, window_end: run_callback(
-            schedule, mode, window_start, window_end
+        self.run_program = (
+            lambda schedule, mode, window_start, window_end, resume_state=None: run_callback(
+                schedule, mode, window_start, window_end, resume_state=resume_state
+            )
         )
         self.stop_program = stop_callback
         self.change_relay_hats = change_relay_callback
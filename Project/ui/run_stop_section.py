@@ -539,6 +539,39 @@ class RunStopSection(QWidget):
             self._reset_run_button()
             QMessageBox.critical(self, "Error", f"Failed to run program: {str(e)}")
 
+    def resume_schedule(self, schedule, mode, window_start, window_end, resume_state):
+        """
+        Restart a schedule interrupted by a crash, from its worker checkpoint.
+
+        Called by main.resume_inflight_schedule at launch. Skips the login
+        and time-window prompts of run_program: the schedule was authorised
+        and validated when it was first started, and no one may be at the
+        Pi to answer a dialog.
+        """
+        if self.job_in_progress:
+            return
+        lock = get_operation_lock()
+        if not lock.try_acquire(SCHEDULE):
+            print(f"[RESUME] Hardware busy ({lock.active_label()}); not resuming")
+            return
+
+        self.job_in_progress = True
+        self.run_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.current_schedule = schedule
+        self.schedule_drop_area.handle_schedule_drop(schedule)
+        self.update_button_states()
+        self.show_progress_tracker(schedule)
+        try:
+            self.run_program_callback(
+                schedule, mode, window_start, window_end, resume_state=resume_state
+            )
+            self.run_button.setText("Running")
+            print(f"[RESUME] Schedule {schedule.schedule_id} resumed")
+        except Exception as e:
+            self._reset_run_button()
+            print(f"[RESUME] Failed to resume schedule: {e}")
+
     def _reset_run_button(self):
         """Reset run button to initial state after error or cancellation."""
         self.job_in_progress = False
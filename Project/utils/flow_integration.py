@@ -0,0 +1,250 @@
+"""Timestamp-accurate flow integration for Teensy flow samples.
+
+The delivery loops used to integrate flow with the host loop's nominal
+``sample_period_s`` (continuous mode) or with host timestamps taken whenever
+the loop got round to reading a sample (pulse mode, calibration). Both drift
+as soon as the Pi is loaded and loop iterations stretch: samples queue up,
+arrive in bursts, and get the wrong dt. The Teensy stamps every frame with
+``time`` (its ``millis()``) and ``count`` (a frame sequence number), so:
+
+- :func:`integrate_flow` integrates a batch of samples with the trapezoidal
+  rule over the *device* clock (vectorised with NumPy when available), and
+  reports frames dropped between them (``count`` jumps) and time gaps;
+- :class:`FlowIntegrator` does the same incrementally for a delivery loop
+  that drains new samples as they arrive.
+
+Samples are duck-typed: anything with ``flow_ml_min`` and either
+``timestamp_ms`` (device clock, preferred) or ``host_time`` (seconds,
+``time.monotonic()``) — i.e. :class:`drivers.uart_flow_sensor.FlowSample`.
+The device clock is used only if every sample in the batch carries it.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional, Sequence
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# Teensy millis() and the frame counter are uint32 and wrap after ~49.7 days.
+_WRAP = 2**32
+# A backwards step within this much of the wrap point is a rollover; any
+# other backwards step is a firmware restart (clock and count reset).
+_WRAP_WINDOW = 60_000
+
+
+@dataclass
+class FlowIntegration:
+    """Result of integrating one batch of flow samples."""
+
+    volume_ml: float = 0.0
+    samples: int = 0
+    duration_s: float = 0.0
+    dropped: int = 0  # frames missing according to ``count``
+    gaps: int = 0  # intervals longer than the gap threshold, or restarts
+    max_gap_s: float = 0.0
+    device_clock: bool = False
+    min_flow_ml_min: float = 0.0
+    max_flow_ml_min: float = 0.0
+    mean_flow_ml_min: float = 0.0
+
+
+def _steps(values: Sequence[float]) -> list:
+    """Successive differences of a uint32 series; None marks a restart."""
+    steps = []
+    for prev, cur in zip(values, values[1:]):
+        d = cur - prev
+        if d < 0:
+            d = d + _WRAP if prev >= _WRAP - _WRAP_WINDOW else None
+        steps.append(d)
+    return steps
+
+
+def _np_steps(values) -> 'np.ndarray':
+    """Vectorised :func:`_steps`; NaN marks a restart."""
+    values = np.asarray(values, dtype=np.float64)
+    d = np.diff(values)
+    backwards = d < 0
+    wrapped = backwards & (values[:-1] >= _WRAP - _WRAP_WINDOW)
+    d[wrapped] += _WRAP
+    d[backwards & ~wrapped] = np.nan
+    return d
+
+
+def _uses_device_clock(samples: Sequence) -> bool:
+    return all(getattr(s, 'timestamp_ms', None) is not None for s in samples)
+
+
+def _counts(samples: Sequence) -> Optional[list]:
+    counts = [getattr(s, 'count', None) for s in samples]
+    return None if any(c is None for c in counts) else counts
+
+
+def integrate_flow(samples: Sequence, gap_s: Optional[float] = None) -> FlowIntegration:
+    """Trapezoidal volume (mL) of ``samples`` (flow in mL/min) over their timestamps.
+
+    Intervals across a firmware restart (clock went backwards) contribute
+    nothing. An interval longer than ``gap_s`` (default: three times the
+    median interval) is still integrated — with device timestamps the linear
+    interpolation is the best estimate — but counted in ``gaps``.
+    """
+    if not samples:
+        return FlowIntegration()
+    device = _uses_device_clock(samples)
+    return integrate_series(
+        [float(s.flow_ml_min) for s in samples],
+        device_ms=[s.timestamp_ms for s in samples] if device else None,
+        host_time=None if device else [float(getattr(s, 'host_time', 0.0)) for s in samples],
+        count=_counts(samples),
+        gap_s=gap_s,
+    )
+
+
+def integrate_series(
+    flow_ml_min: Sequence[float],
+    device_ms: Optional[Sequence[float]] = None,
+    host_time: Optional[Sequence[float]] = None,
+    count: Optional[Sequence[float]] = None,
+    gap_s: Optional[float] = None,
+) -> FlowIntegration:
+    """:func:`integrate_flow` over parallel arrays (e.g. a ring-buffer window).
+
+    ``device_ms`` is used when given, else ``host_time`` (seconds).
+    """
+    flows = flow_ml_min
+    n = len(flows)
+    result = FlowIntegration(samples=n)
+    if not n:
+        return result
+    device = device_ms is not None
+    result.device_clock = device
+    if NUMPY_AVAILABLE:
+        flow = np.asarray(flows, dtype=np.float64)
+        result.min_flow_ml_min = float(flow.min())
+        result.max_flow_ml_min = float(flow.max())
+        result.mean_flow_ml_min = float(flow.mean())
+    else:
+        flows = [float(f) for f in flows]
+        result.min_flow_ml_min = min(flows)
+        result.max_flow_ml_min = max(flows)
+        result.mean_flow_ml_min = sum(flows) / n
+    if n < 2:
+        return result
+    if device:
+        times = device_ms
+        scale = 1000.0
+    else:
+        times = host_time if host_time is not None else [0.0] * n
+        scale = 1.0
+
+    if NUMPY_AVAILABLE:
+        if device:
+            dt = _np_steps(times) / scale
+        else:
+            dt = np.diff(np.asarray(times, dtype=np.float64))
+            dt[dt < 0] = np.nan
+        restarts = int(np.isnan(dt).sum())
+        dt = np.nan_to_num(dt, nan=0.0)
+        result.volume_ml = float(np.dot(flow[1:] + flow[:-1], dt) / 120.0)
+        result.duration_s = float(dt.sum())
+        result.max_gap_s = float(dt.max())
+        positive = dt[dt > 0]
+        median = float(np.median(positive)) if positive.size else 0.0
+        threshold = gap_s if gap_s is not None else 3.0 * median
+        long_steps = int((dt > threshold).sum()) if threshold > 0 else 0
+        if count is not None:
+            dc = _np_steps(count)
+            jumps = dc[dc > 1]
+            result.dropped = int((jumps - 1).sum())
+    else:
+        times = list(times)
+        if device:
+            steps = _steps(times)
+            dts = [None if d is None else d / scale for d in steps]
+        else:
+            dts = [b - a if b >= a else None for a, b in zip(times, times[1:])]
+        restarts = sum(1 for d in dts if d is None)
+        dt = [0.0 if d is None else d for d in dts]
+        result.volume_ml = sum((flows[i + 1] + flows[i]) * dt[i] for i in range(len(dt))) / 120.0
+        result.duration_s = sum(dt)
+        result.max_gap_s = max(dt)
+        positive = sorted(d for d in dt if d > 0)
+        median = positive[len(positive) // 2] if positive else 0.0
+        threshold = gap_s if gap_s is not None else 3.0 * median
+        long_steps = sum(1 for d in dt if d > threshold) if threshold > 0 else 0
+        if count is not None:
+            result.dropped = int(
+                sum(d - 1 for d in _steps(list(count)) if d is not None and d > 1)
+            )
+    result.gaps = long_steps + restarts
+    return result
+
+
+class FlowIntegrator:
+    """Accumulates volume as a delivery loop drains new samples.
+
+    Each :meth:`add` integrates the new batch together with the last sample
+    of the previous one, so nothing is lost at batch boundaries and the
+    result equals :func:`integrate_flow` over the whole stream.
+    """
+
+    def __init__(self, gap_s: Optional[float] = None) -> None:
+        self._gap_s = gap_s
+        self._last = None
+        self.volume_ml = 0.0
+        self.samples = 0
+        self.dropped = 0
+        self.gaps = 0
+        self.max_gap_s = 0.0
+        self.duration_s = 0.0
+        self.last_flow_ml_min: Optional[float] = None
+
+    def add(self, samples: Sequence) -> float:
+        """Integrate newly drained samples; returns the volume they added (mL)."""
+        if not samples:
+            return 0.0
+        batch = ([self._last] if self._last is not None else []) + list(samples)
+        part = integrate_flow(batch, self._gap_s)
+        self.volume_ml += part.volume_ml
+        self.samples += len(samples)
+        self.dropped += part.dropped
+        self.gaps += part.gaps
+        self.max_gap_s = max(self.max_gap_s, part.max_gap_s)
+        self.duration_s += part.duration_s
+        self._last = samples[-1]
+        self.last_flow_ml_min = float(samples[-1].flow_ml_min)
+        return part.volume_ml
+
+
+def host_sample(flow_ul_min: float, temperature_c: float):
+    """A sample from a tuple-returning sensor, stamped with the host clock."""
+    return SimpleNamespace(
+        flow_ml_min=float(flow_ul_min) / 1000.0,
+        temperature_c=float(temperature_c),
+        timestamp_ms=None,
+        count=None,
+        host_time=time.monotonic(),
+    )
+
+
+def read_new_samples(sensor) -> list:
+    """Samples ``sensor`` has produced since the last call, oldest first.
+
+    Uses ``drain_samples()`` (device-timestamped FlowSamples) when the driver
+    has it; otherwise one ``read_one()`` tuple (flow in uL/min, temp C) via
+    :func:`host_sample`.
+    """
+    if hasattr(sensor, 'drain_samples'):
+        return list(sensor.drain_samples() or [])
+    meas = sensor.read_one() if hasattr(sensor, 'read_one') else None
+    if not meas or len(meas) < 2:
+        return []
+    return [host_sample(meas[0], meas[1])]
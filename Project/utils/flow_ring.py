@@ -0,0 +1,267 @@
+"""Preallocated ring buffer of flow samples with time-window queries.
+
+``UARTFlowSensor`` used to push ``FlowSample`` objects into a
+``Queue(maxsize=100)``, dropping the oldest with a get/put dance when full,
+and consumers popped one sample at a time. At 50 Hz and above a stretched
+consumer silently lost data, and nothing could look back at a window it had
+already consumed. :class:`FlowSampleRing` instead stores host time, device
+time, flow, temperature and frame count in contiguous preallocated arrays:
+
+- one writer (the sensor reader thread) calls :meth:`FlowSampleRing.append`
+  or :meth:`FlowSampleRing.extend` without taking a lock; it first marks the
+  sequence numbers it is about to store (``_writing_until``), and publishes
+  them by bumping ``written`` only once every field is stored;
+- readers ask for :meth:`latest`, :meth:`samples_between` (host clock) or
+  :meth:`since` (sequence cursor) and get a :class:`FlowWindow`;
+- every slot is written twice (at ``i`` and ``i + capacity``), so any window
+  of up to ``capacity`` samples is one contiguous slice and the window's
+  arrays are zero-copy views. Views are overwritten once ``capacity`` newer
+  samples arrive; pass ``copy=True`` for a snapshot that is checked against
+  concurrent overwrite (by a single sample or a whole batch).
+
+Arrays are NumPy ``float64`` when NumPy is installed and ``memoryview``s over
+``array('d')`` otherwise. Missing device time / count is stored as NaN.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from array import array
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+from utils.flow_integration import FlowIntegration, integrate_series
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+FIELDS = ('host_time', 'device_ms', 'flow_ml_min', 'temperature_c', 'count')
+_NAN = float('nan')
+
+
+@dataclass
+class FlowWindow:
+    """A contiguous run of samples from a :class:`FlowSampleRing`.
+
+    ``first_seq`` is the sequence number (total samples written before it) of
+    the first sample, so ``first_seq + len(window)`` is the cursor to pass to
+    :meth:`FlowSampleRing.since` next time.
+    """
+
+    host_time: Any
+    device_ms: Any
+    flow_ml_min: Any
+    temperature_c: Any
+    count: Any
+    first_seq: int = 0
+
+    def __len__(self) -> int:
+        return len(self.flow_ml_min)
+
+    @property
+    def end_seq(self) -> int:
+        return self.first_seq + len(self)
+
+    def slice(self, lo: int, hi: int) -> 'FlowWindow':
+        """Samples ``lo:hi`` of the window (still zero-copy)."""
+        lo = max(0, min(lo, len(self)))
+        hi = max(lo, min(hi, len(self)))
+        return FlowWindow(
+            *(getattr(self, name)[lo:hi] for name in FIELDS),
+            first_seq=self.first_seq + lo,
+        )
+
+    def head(self, n: int) -> 'FlowWindow':
+        """The first ``n`` samples of the window."""
+        return self.slice(0, n)
+
+    def _column(self, values) -> Optional[list]:
+        values = list(values)
+        if any(math.isnan(v) for v in values):
+            return None
+        return values
+
+    def integrate(self, gap_s: Optional[float] = None) -> FlowIntegration:
+        """Trapezoidal volume over the window (device clock when every sample has it)."""
+        if NUMPY_AVAILABLE:
+            device = None if np.isnan(self.device_ms).any() else self.device_ms
+            count = None if np.isnan(self.count).any() else self.count
+        else:
+            device = self._column(self.device_ms)
+            count = self._column(self.count)
+        return integrate_series(
+            self.flow_ml_min,
+            device_ms=device,
+            host_time=self.host_time,
+            count=count,
+            gap_s=gap_s,
+        )
+
+    def to_samples(self) -> List[SimpleNamespace]:
+        """The window as per-sample objects shaped like ``FlowSample``."""
+        samples = []
+        for host, device, flow, temp, count in zip(
+            self.host_time, self.device_ms, self.flow_ml_min, self.temperature_c, self.count
+        ):
+            samples.append(
+                SimpleNamespace(
+                    flow_ml_min=float(flow),
+                    temperature_c=float(temp),
+                    timestamp_ms=None if math.isnan(device) else int(device),
+                    count=None if math.isnan(count) else int(count),
+                    host_time=float(host),
+                )
+            )
+        return samples
+
+
+class FlowSampleRing:
+    """Fixed-capacity single-writer ring of flow samples."""
+
+    def __init__(self, capacity: int = 4096) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self._capacity = int(capacity)
+        size = 2 * self._capacity
+        if NUMPY_AVAILABLE:
+            self._data = np.zeros((len(FIELDS), size), dtype=np.float64)
+            self._columns = list(self._data)
+        else:
+            self._columns = [array('d', bytes(8 * size)) for _ in FIELDS]
+        self._written = 0
+        # End of the write in progress (== written when idle). Bumped before
+        # any slot is stored, so a reader can tell which slots may be torn.
+        self._writing_until = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def written(self) -> int:
+        """Total samples ever appended (the next sample's sequence number)."""
+        return self._written
+
+    def __len__(self) -> int:
+        return min(self._written, self._capacity)
+
+    def append(self, sample) -> None:
+        """Store a ``FlowSample``-shaped object. Writer thread only."""
+        device = getattr(sample, 'timestamp_ms', None)
+        count = getattr(sample, 'count', None)
+        values = (
+            float(getattr(sample, 'host_time', 0.0)),
+            _NAN if device is None else float(device),
+            float(sample.flow_ml_min),
+            float(sample.temperature_c),
+            _NAN if count is None else float(count),
+        )
+        seq = self._written
+        self._writing_until = seq + 1
+        i = seq % self._capacity
+        j = i + self._capacity
+        for column, value in zip(self._columns, values):
+            column[i] = value
+            column[j] = value
+        # Publish only once every field is stored.
+        self._written = seq + 1
+
+    def extend(self, host_time: float, device_ms, flow_ml_min, temperature_c, count) -> None:
+        """Store a batch of samples that arrived together. Writer thread only.
+
+        The columns are equal-length sequences (NumPy arrays from the binary
+        frame decoder); ``host_time`` is the batch's arrival time.
+        """
+        n = len(flow_ml_min)
+        if not n:
+            return
+        columns = (None, device_ms, flow_ml_min, temperature_c, count)
+        end = self._written + n
+        if n > self._capacity:
+            # Only the newest ``capacity`` samples fit; the rest are never stored.
+            skip = n - self._capacity
+            columns = tuple(None if c is None else c[skip:] for c in columns)
+            n = self._capacity
+        start = end - n
+        self._writing_until = end
+        if NUMPY_AVAILABLE:
+            index = (start + np.arange(n)) % self._capacity
+            mirror = index + self._capacity
+            for column, values in zip(self._columns, columns):
+                if values is None:
+                    values = host_time
+                column[index] = values
+                column[mirror] = values
+        else:
+            cap = self._capacity
+            for k in range(n):
+                i = (start + k) % cap
+                values = (host_time,) + tuple(float(c[k]) for c in columns[1:])
+                for column, value in zip(self._columns, values):
+                    column[i] = value
+                    column[i + cap] = value
+        # Publish only once every field is stored.
+        self._written = end
+
+    def clear(self) -> None:
+        self._written = 0
+        self._writing_until = 0
+
+    # ------------------------------------------------------------- queries
+
+    def _window(self, first_seq: int, n: int, copy: bool) -> FlowWindow:
+        start = first_seq % self._capacity if n else 0
+        if NUMPY_AVAILABLE:
+            views = [column[start : start + n] for column in self._columns]
+            if copy:
+                views = [view.copy() for view in views]
+        else:
+            views = [memoryview(column)[start : start + n] for column in self._columns]
+            if copy:
+                views = [memoryview(array('d', view)) for view in views]
+        window = FlowWindow(*views, first_seq=first_seq)
+        if copy:
+            # Samples the writer overwrote while we copied are torn; drop them.
+            # A write storing seqs up to ``_writing_until`` clobbers the slots
+            # of every seq below ``_writing_until - capacity``.
+            lost = self._writing_until - self._capacity - first_seq
+            if lost > 0:
+                window = window.slice(lost, n)
+        return window
+
+    def latest(self, n: Optional[int] = None, copy: bool = False) -> FlowWindow:
+        """The newest ``n`` samples (all retained samples if ``n`` is None)."""
+        end = self._written
+        available = min(end, self._capacity)
+        n = available if n is None else max(0, min(int(n), available))
+        return self._window(end - n, n, copy)
+
+    def since(self, seq: int, copy: bool = False) -> Tuple[FlowWindow, int]:
+        """Samples with sequence number >= ``seq``, and how many were lost.
+
+        Samples older than the buffer's reach are counted in the second
+        element instead of being returned.
+        """
+        end = self._written
+        first = max(seq, end - self._capacity, 0)
+        window = self._window(first, end - first, copy)
+        return window, max(0, window.first_seq - seq)
+
+    def samples_between(self, t0: float, t1: float, copy: bool = False) -> FlowWindow:
+        """Samples whose host arrival time lies in ``[t0, t1]`` (``time.monotonic()``)."""
+        window = self.latest(copy=copy)
+        times = window.host_time
+        if NUMPY_AVAILABLE:
+            lo = int(np.searchsorted(times, t0, side='left'))
+            hi = int(np.searchsorted(times, t1, side='right'))
+        else:
+            lo = bisect.bisect_left(times, t0)
+            hi = bisect.bisect_right(times, t1)
+        return window.slice(lo, hi)
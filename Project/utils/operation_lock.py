@@ -5,8 +5,8 @@ Exactly one hardware operation may be active at a time: running a **schedule**,
 solenoid*, and schedule + calibration both consume the *single flow sensor*, so
 they cannot physically overlap. This is operation-level mutual exclusion,
 sitting ABOVE the per-transaction :class:`drivers.i2c_coordinator.I2CCoordinator`
-(which only serialises ~50 ms I²C writes and force-releases — not enough to keep
-two long operations apart).
+(which only serialises short I²C writes — not enough to keep two long
+operations apart).
 
 It is exposed as a ``QObject`` process-wide singleton via
 :func:`get_operation_lock` (mirroring ``get_i2c_coordinator``) so every UI entry
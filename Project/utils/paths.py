@@ -71,6 +71,11 @@ def pump_log_path():
     return os.path.join(_PROJECT_DIR, "pump_log.json")
 
 
+def sensor_health_path():
+    """Absolute path to the learned flow-sensor restart budget (sensor_health.json)."""
+    return os.path.join(data_dir(), "sensor_health.json")
+
+
 def debug_log_path():
     """Absolute path to the runtime debug log."""
     root = _data_root()
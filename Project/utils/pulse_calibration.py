@@ -22,6 +22,7 @@ Originally derived from the valve-characterization bench tests.
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import logging
 import time
@@ -30,6 +31,10 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from gpio.pulse_timing import precise_pulse
+from utils.flow_integration import integrate_flow, read_new_samples
+from utils.flow_ring import FlowSampleRing
+
 
 @dataclass
 class PulseProfile:
@@ -42,6 +47,8 @@ class PulseProfile:
     trials: int
     calibration_date: str
     cage_id: int
+    # Mean open time achieved for the requested width (None in older files)
+    achieved_width_ms: Optional[float] = None
 
     def is_stable(self) -> bool:
         """Check if pulse is stable (CV < 10%)."""
@@ -334,6 +341,7 @@ class PulseCalibrator:
         Logic adapted from the valve-characterization bench tests (Test 4).
         """
         volumes = []
+        achieved_ms = []
 
         for trial in range(trials):
             # Restart sensor to reset error counter (critical fix!)
@@ -364,32 +372,39 @@ class PulseCalibrator:
                 self._sensor.clear_queue()
 
             # Execute pulse
-            start_time = time.perf_counter()
-            self._controller.open_cage(self._cage_id)
+            ring = getattr(self._sensor, 'ring', None)
+            if not isinstance(ring, FlowSampleRing):
+                ring = None
+            # The pulse runs on a worker thread (sleep, then spin to the close
+            # deadline) while this loop keeps draining the sensor.
+            window_t0 = time.monotonic()
+            pulse_task = asyncio.ensure_future(
+                asyncio.to_thread(
+                    precise_pulse,
+                    functools.partial(self._controller.open_cage, self._cage_id),
+                    functools.partial(self._controller.close_cage, self._cage_id),
+                    pulse_ms / 1000.0,
+                )
+            )
 
             # Measure during pulse + settling
             samples = []
             measurement_duration_s = (pulse_ms / 1000.0) + 0.5
 
-            while (time.perf_counter() - start_time) < measurement_duration_s:
-                sample = self._sensor.read_one()
-                if sample:
-                    elapsed = time.perf_counter() - start_time
-                    samples.append({'time_s': elapsed, 'flow_ml_min': sample[0] / 1000.0})
-
-                # Close valve at specified time
-                if (time.perf_counter() - start_time) >= (pulse_ms / 1000.0):
-                    if (time.perf_counter() - start_time) < (pulse_ms / 1000.0) + 0.01:
-                        self._controller.close_cage(self._cage_id)
-
+            while not pulse_task.done() or (time.monotonic() - window_t0) < measurement_duration_s:
+                if ring is None:
+                    samples.extend(read_new_samples(self._sensor))
                 await asyncio.sleep(0.01)
 
-            # Integrate flow to get volume
-            volume_ml = 0.0
-            for i in range(1, len(samples)):
-                dt_min = (samples[i]['time_s'] - samples[i - 1]['time_s']) / 60.0
-                avg_flow = (samples[i]['flow_ml_min'] + samples[i - 1]['flow_ml_min']) / 2.0
-                volume_ml += avg_flow * dt_min
+            pulse = await pulse_task
+            achieved_ms.append(pulse.achieved_s * 1000.0)
+
+            # Integrate flow to get volume (on device timestamps when available)
+            if ring is not None:
+                volume_ml = ring.samples_between(window_t0, time.monotonic()).integrate().volume_ml
+            else:
+                samples.extend(read_new_samples(self._sensor))
+                volume_ml = integrate_flow(samples).volume_ml
 
             volumes.append(volume_ml)
 
@@ -424,4 +439,5 @@ class PulseCalibrator:
             trials=len(volumes),
             calibration_date=datetime.now().isoformat(),
             cage_id=self._cage_id,
+            achieved_width_ms=sum(achieved_ms) / len(achieved_ms),
         )
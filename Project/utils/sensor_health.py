@@ -0,0 +1,204 @@
+"""Firmware-error-aware flow sensor restarts for pulse delivery.
+
+Pulse delivery used to restart the Teensy flow sensor at the start of every
+delivery and again after every 5 pulses: valve switching EMI causes I2C read
+errors, and the firmware stops streaming once they pile up
+(``MAX_CONSECUTIVE_ERRORS`` in teensy_flow_reader.ino). Each restart costs a
+stop, a start and a stream check, so a 0.5 mL delivery of 20 pulses spent
+more time restarting the sensor than dispensing.
+
+:class:`SensorHealth` is what the driver knows about the stream: the I2C
+error count the firmware reports in its status replies, whether it stopped
+streaming, and the frame rate actually received. :class:`RestartPolicy`
+learns how many errors a pulse adds (an exponential average of the reported
+growth) and asks for a restart only when
+
+- the stream is already failing: the firmware halted, frames stopped, or
+  the received rate fell below ``min_rate_ratio`` of the requested rate; or
+- the next pulse is predicted to take the error count past the budget.
+
+The budget is learned per rig and kept in ``sensor_health.json`` in the
+data directory (utils/paths.py). A stream failure cuts it to ``margin``
+times the error count it failed at; every ``grow_after`` planned restarts
+without a failure raise it by ``grow_step`` errors (additive increase,
+multiplicative decrease), so a quiet rig stops paying for restarts it does
+not need and a noisy one backs off after its first failure.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+# teensy_flow_reader.ino stops streaming after this many failed reads
+MAX_CONSECUTIVE_ERRORS = 200
+
+DEFAULT_BUDGET = 150.0  # firmware errors since start; below the ~200 seen to stop it
+DEFAULT_ERRORS_PER_PULSE = 15.0  # bench: 10-15 I2C errors per valve pulse
+MIN_BUDGET = 30.0
+MAX_BUDGET = 5000.0
+
+
+@dataclass
+class SensorHealth:
+    """Snapshot of the flow stream's health (see UARTFlowSensor.health())."""
+
+    fw_errors: int = 0  # I2C errors since the sensor was started (firmware count)
+    fw_consecutive_errors: int = 0  # latest reported run of failed reads
+    fw_halted: bool = False  # firmware stopped streaming after errors
+    frame_rate_hz: float = 0.0  # frames received over the last window
+    expected_rate_hz: float = 0.0  # requested sampling rate (0 if not running)
+    last_frame_age_s: float = math.inf
+    status_seq: int = 0  # bumps with every firmware error-count report
+
+    @property
+    def rate_ratio(self) -> float:
+        if self.expected_rate_hz <= 0:
+            return 1.0
+        return self.frame_rate_hz / self.expected_rate_hz
+
+
+class RestartPolicy:
+    """Decides when pulse delivery should restart the flow sensor."""
+
+    def __init__(
+        self,
+        budget: float = DEFAULT_BUDGET,
+        errors_per_pulse: float = DEFAULT_ERRORS_PER_PULSE,
+        *,
+        path: Optional[str] = None,
+        min_rate_ratio: float = 0.5,
+        max_frame_age_s: float = 1.0,
+        margin: float = 0.8,
+        grow_after: int = 5,
+        grow_step: float = DEFAULT_ERRORS_PER_PULSE,
+        smoothing: float = 0.3,
+    ) -> None:
+        self.budget = float(budget)
+        self.errors_per_pulse = float(errors_per_pulse)
+        self.path = path
+        self.min_rate_ratio = min_rate_ratio
+        self.max_frame_age_s = max_frame_age_s
+        self.margin = margin
+        self.grow_after = grow_after
+        self.grow_step = grow_step
+        self.smoothing = smoothing
+
+        self.restarts = 0
+        self.failures = 0
+        self._clean_restarts = 0
+        self._last_errors: Optional[int] = None
+        self._last_seq: Optional[int] = None
+        self._pulses_since_report = 0
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, **kwargs) -> 'RestartPolicy':
+        """The policy with this rig's learned budget (defaults if none saved)."""
+        if path is None:
+            from utils.paths import sensor_health_path
+
+            path = sensor_health_path()
+        policy = cls(path=path, **kwargs)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            policy.budget = min(MAX_BUDGET, max(MIN_BUDGET, float(data['budget'])))
+            policy.errors_per_pulse = max(0.0, float(data['errors_per_pulse']))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            policy._logger.warning(f"Ignoring unreadable sensor health file {path}: {e}")
+        return policy
+
+    def save(self) -> bool:
+        """Persist the learned budget (atomic write); False on error."""
+        if not self.path:
+            return False
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(
+                    {
+                        'budget': round(self.budget, 1),
+                        'errors_per_pulse': round(self.errors_per_pulse, 2),
+                        'failures': self.failures,
+                    },
+                    f,
+                    indent=2,
+                )
+            os.replace(temp_path, self.path)
+            return True
+        except Exception as e:
+            self._logger.error(f"Failed to save sensor health budget: {e}")
+            return False
+
+    def pulse_done(self) -> None:
+        """Count a pulse toward the next error report."""
+        self._pulses_since_report += 1
+
+    def observe(self, health: SensorHealth) -> None:
+        """Learn the error cost per pulse from a new firmware report."""
+        if health.status_seq == self._last_seq:
+            return
+        if (
+            self._last_errors is not None
+            and self._pulses_since_report > 0
+            and health.fw_errors >= self._last_errors
+        ):
+            per_pulse = (health.fw_errors - self._last_errors) / self._pulses_since_report
+            self.errors_per_pulse += self.smoothing * (per_pulse - self.errors_per_pulse)
+        self._last_errors = health.fw_errors
+        self._last_seq = health.status_seq
+        self._pulses_since_report = 0
+
+    def failure(self, health: SensorHealth) -> Optional[str]:
+        """Why the stream is failing right now, or None if it is healthy."""
+        if health.fw_halted:
+            return "firmware stopped streaming after I2C errors"
+        if health.last_frame_age_s > self.max_frame_age_s:
+            return f"no frames for {health.last_frame_age_s:.1f}s"
+        if health.rate_ratio < self.min_rate_ratio:
+            return f"frame rate {health.frame_rate_hz:.0f} Hz of {health.expected_rate_hz:.0f} Hz"
+        return None
+
+    def restart_reason(self, health: SensorHealth) -> Optional[str]:
+        """Why the sensor should be restarted before the next pulse, or None."""
+        self.observe(health)
+        reason = self.failure(health)
+        if reason:
+            return reason
+        errors = self._last_errors if self._last_errors is not None else health.fw_errors
+        predicted = errors + self.errors_per_pulse * (self._pulses_since_report + 1)
+        if predicted > self.budget:
+            return f"{predicted:.0f} I2C errors predicted, budget {self.budget:.0f}"
+        return None
+
+    def restarted(self, health: SensorHealth) -> None:
+        """Record a restart taken in ``health``'s state and adjust the budget."""
+        self.restarts += 1
+        if self.failure(health):
+            self.failures += 1
+            self._clean_restarts = 0
+            # Errors since the last report are estimated from the pulses since
+            errors = max(
+                health.fw_errors,
+                (self._last_errors or 0) + self.errors_per_pulse * self._pulses_since_report,
+            )
+            self.budget = max(MIN_BUDGET, min(self.budget, errors) * self.margin)
+            self._logger.info(f"Sensor stream failed; I2C error budget now {self.budget:.0f}")
+            self.save()
+        else:
+            self._clean_restarts += 1
+            if self._clean_restarts >= self.grow_after and self.budget < MAX_BUDGET:
+                self._clean_restarts = 0
+                self.budget = min(MAX_BUDGET, self.budget + self.grow_step)
+                self._logger.info(f"No stream failures; I2C error budget now {self.budget:.0f}")
+                self.save()
+        # The firmware clears its counters on start
+        self._last_errors = 0
+        self._pulses_since_report = 0
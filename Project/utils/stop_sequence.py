@@ -73,9 +73,9 @@ def bounded_worker_teardown(worker_obj, thread_obj, signals) -> None:
     """
     if worker_obj is not None:
         # FIRST: poke the cooperative-cancel token directly from this
-        # (GUI) thread. The worker thread is typically blocked inside
-        # run_until_complete and cannot process the queued stop() slot,
-        # so this direct call is what actually breaks the delivery loop.
+        # (GUI) thread. The queued stop() slot only runs once the worker
+        # thread gets back to its event loop, so this direct call is what
+        # actually breaks the in-flight delivery promptly.
         # Thread-safe (the strategy uses a threading.Event).
         if hasattr(worker_obj, "request_cancel"):
             try:
@@ -0,0 +1,215 @@
+"""Streaming telemetry for the Teensy flow stream.
+
+The reader loop used to work out a rough average rate every 10 s and only
+log it at debug level, so when delivery precision drifted nothing showed
+whether the sensor path was to blame. :class:`StreamStats` keeps, in
+fixed-size counters and histograms allocated once:
+
+- frames received, and the effective rate since the previous snapshot;
+- frames dropped, from gaps in the firmware's frame ``count``;
+- inter-frame jitter: how far each interval on the Teensy clock is from the
+  nominal period, as a histogram with percentiles;
+- JSON parse errors (CRC failures are counted by the frame decoder);
+- samples a slow consumer lost to ring overwrite (``overflow_drops``);
+- reconnects and recoveries, and the time spent in them.
+
+The reader thread is the only writer of the frame counters; binary frame
+batches are folded in with one vectorised pass when NumPy is installed.
+:meth:`StreamStats.snapshot` is cheap enough for ``get_status()``; the
+reader loop takes a rolling one every ``SNAPSHOT_INTERVAL_S``.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from typing import Optional
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+SNAPSHOT_INTERVAL_S = 10.0
+JITTER_BIN_MS = 0.5  # Teensy millis() ticks are 1 ms; half-ms bins for host times
+JITTER_BINS = 128  # 0..64 ms in range, plus an overflow bin
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """Fixed-width bins over ``[0, bins * bin_width)`` plus an overflow bin."""
+
+    def __init__(self, bin_width: float, bins: int) -> None:
+        self.bin_width = float(bin_width)
+        self.bins = int(bins)
+        self._counts = array('Q', bytes(8 * (self.bins + 1)))
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        index = int(value / self.bin_width)
+        self._counts[index if index < self.bins else self.bins] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def add_many(self, values) -> None:
+        """Add a NumPy array of values in one pass."""
+        if not len(values):
+            return
+        index = np.minimum((values / self.bin_width).astype(np.int64), self.bins)
+        counts = np.bincount(index, minlength=self.bins + 1)
+        for i in np.flatnonzero(counts):
+            self._counts[i] += int(counts[i])
+        self.total += len(values)
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper edge of the bin holding the ``q``-th percentile, or None if empty.
+
+        Values in the overflow bin report the largest value seen.
+        """
+        if not self.total:
+            return None
+        rank = math.ceil(self.total * q / 100.0)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                if index == self.bins:
+                    return self.max
+                return min((index + 1) * self.bin_width, self.max)
+        return self.max
+
+    def clear(self) -> None:
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+        self.total = 0
+        self.max = 0.0
+
+
+class StreamStats:
+    """Counters and jitter histogram for one flow sensor's frame stream."""
+
+    def __init__(self, expected_hz: float) -> None:
+        self.expected_hz = float(expected_hz)
+        self.jitter_ms = Histogram(JITTER_BIN_MS, JITTER_BINS)
+        self.frames = 0
+        self.dropped_frames = 0
+        self.parse_errors = 0
+        self.overflow_drops = 0
+        self.reconnects = 0
+        self.recoveries = 0
+        self.recovery_s = 0.0
+        self._recovering_since: Optional[float] = None
+        self._last_count: Optional[int] = None
+        self._last_device_ms: Optional[float] = None
+        self.started_at = time.monotonic()
+        self._window_at = self.started_at
+        self._window_frames = 0
+        self.last_snapshot: Optional[dict] = None
+
+    @property
+    def period_ms(self) -> float:
+        return 1000.0 / self.expected_hz if self.expected_hz > 0 else 0.0
+
+    def resync(self) -> None:
+        """Forget the previous frame (stream restarted; the count starts over)."""
+        self._last_count = None
+        self._last_device_ms = None
+
+    def stream_started(self, expected_hz: float) -> None:
+        """A start command went out: new nominal rate, rate window from now."""
+        self.expected_hz = float(expected_hz)
+        self.resync()
+        self._window_at = time.monotonic()
+        self._window_frames = self.frames
+
+    def frame(self, count: Optional[int], device_ms: Optional[float]) -> None:
+        """Account for one frame (JSON lines). Reader thread only."""
+        self.frames += 1
+        last_count, last_ms = self._last_count, self._last_device_ms
+        self._last_count, self._last_device_ms = count, device_ms
+        if count is None or last_count is None:
+            return
+        step = count - last_count
+        if step > 1:
+            self.dropped_frames += step - 1
+        elif step == 1 and device_ms is not None and last_ms is not None:
+            self.jitter_ms.add(abs(device_ms - last_ms - self.period_ms))
+
+    def batch(self, count, device_ms) -> None:
+        """Account for a batch of binary frames (NumPy arrays or lists)."""
+        n = len(count)
+        if not n:
+            return
+        if not NUMPY_AVAILABLE or isinstance(count, list):
+            for c, t in zip(count, device_ms):
+                self.frame(int(c), float(t))
+            return
+        self.frames += n
+        counts = count.astype(np.int64)
+        times = device_ms.astype(np.float64)
+        if self._last_count is not None and self._last_device_ms is not None:
+            counts = np.concatenate(([self._last_count], counts))
+            times = np.concatenate(([self._last_device_ms], times))
+        steps = np.diff(counts)
+        # A count that goes backwards is a firmware restart, not a drop
+        self.dropped_frames += int(np.sum(steps[steps > 1] - 1))
+        consecutive = steps == 1
+        self.jitter_ms.add_many(np.abs(np.diff(times)[consecutive] - self.period_ms))
+        self._last_count = int(counts[-1])
+        self._last_device_ms = float(times[-1])
+
+    def recovery_started(self, reconnect: bool = False) -> None:
+        if reconnect:
+            self.reconnects += 1
+        self.recoveries += 1
+        if self._recovering_since is None:
+            self._recovering_since = time.monotonic()
+
+    def recovery_finished(self) -> None:
+        if self._recovering_since is not None:
+            self.recovery_s += time.monotonic() - self._recovering_since
+            self._recovering_since = None
+        self.resync()
+
+    def snapshot(self, roll: bool = False, **counters) -> dict:
+        """Current telemetry; ``counters`` (e.g. crc_errors) are merged in.
+
+        ``rate_hz`` covers the time since the last rolling snapshot, which
+        ``roll=True`` takes (the reader loop, every SNAPSHOT_INTERVAL_S).
+        """
+        now = time.monotonic()
+        elapsed = now - self._window_at
+        frames = self.frames - self._window_frames
+        recovery_s = self.recovery_s
+        if self._recovering_since is not None:
+            recovery_s += now - self._recovering_since
+        snapshot = {
+            'frames': self.frames,
+            'rate_hz': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'expected_hz': self.expected_hz,
+            'dropped_frames': self.dropped_frames,
+            'jitter_ms': {
+                **{f'p{q}': self.jitter_ms.percentile(q) for q in PERCENTILES},
+                'max': self.jitter_ms.max if self.jitter_ms.total else None,
+            },
+            'parse_errors': self.parse_errors,
+            'overflow_drops': self.overflow_drops,
+            'reconnects': self.reconnects,
+            'recoveries': self.recoveries,
+            'recovery_s': round(recovery_s, 3),
+            'recovering': self._recovering_since is not None,
+            'uptime_s': round(now - self.started_at, 1),
+        }
+        snapshot.update(counters)
+        if roll:
+            self._window_at = now
+            self._window_frames = self.frames
+            self.last_snapshot = snapshot
+        return snapshot